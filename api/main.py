@@ -1,11 +1,18 @@
-from fastapi import FastAPI, Request
+import asyncio
+from fastapi import Depends, FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from api.routers import questions, submissions, evaluations, auth, leaderboard, analytics # Added auth, leaderboard, and analytics routers
+from api.routers import questions, submissions, evaluations, auth, leaderboard, analytics, admin, search # Added auth, leaderboard, analytics, and admin routers
 from promptcraft.exceptions import PromptCraftBaseException # Import base custom exception
 from promptcraft.logger_config import setup_logger # Import logger
 from promptcraft.error_handlers import setup_error_handlers
 from promptcraft.middleware import setup_middleware
+from promptcraft import auth_utils
+from promptcraft.llm import get_llm_client, llm_response_cache
+from promptcraft.password_hashing import password_hasher
+from promptcraft.rate_limiter import rate_limit_stats
+from promptcraft.submission_queue import submission_queue
+from promptcraft.idempotency import idempotency_store
 
 logger = setup_logger(__name__) # Setup logger for main API module
 
@@ -34,6 +41,7 @@ async def promptcraft_exception_handler(request: Request, exc: PromptCraftBaseEx
     return JSONResponse(
         status_code=exc.status_code,
         content={"error_type": exc.__class__.__name__, "detail": exc.detail},
+        headers=getattr(exc, "headers", None), # e.g. Retry-After on 429
     )
 
 # Global Exception Handler for unhandled Python exceptions
@@ -51,6 +59,11 @@ async def startup_event():
     # Setup error handlers (middleware already set up above)
     setup_error_handlers(app)
     logger.info("Error handlers configured")
+    if questions.QUESTION_CACHE_WARMUP:
+        try:
+            await asyncio.to_thread(questions.warm_question_cache) # Full-table query and Redis writes
+        except Exception as e: # A cold cache is not a reason to refuse to start
+            logger.error(f"Question cache warm-up failed: {e}")
     # You can initialize DB connections, Redis connections here if using FastAPI dependencies
     # For now, they are initialized globally in their respective modules or when first used.
 
@@ -58,6 +71,8 @@ async def startup_event():
 async def shutdown_event():
     logger.info("PromptCraft API shutting down...")
     # Clean up resources here if needed (e.g., close DB pools)
+    password_hasher.shutdown()
+    await get_llm_client().aclose()
 
 @app.get("/", tags=["Root"])
 async def read_root():
@@ -71,12 +86,27 @@ async def health_check():
     # For example, check redis_cache.is_connected() and db_handler.connect() (without making a full query)
     return {"status": "healthy"}
 
+@app.get("/metrics", tags=["Health"], dependencies=[Depends(auth.get_current_admin_user)])
+async def metrics():
+    """Runtime metrics for this API worker. Admin only, it exposes cache and queue internals."""
+    return {
+        "password_hashing": password_hasher.stats(),
+        "rate_limits": rate_limit_stats(),
+        "jwt_payload_cache": auth_utils.token_payload_cache.stats(),
+        "llm": get_llm_client().stats(),
+        "llm_response_cache": llm_response_cache.stats(),
+        "submission_queue": submission_queue.stats(), # Queue depth: scale submission workers on this
+        "idempotency": idempotency_store.stats(),
+    }
+
 app.include_router(questions.router) # Include the questions router
 app.include_router(submissions.router) # Include the submissions router
 app.include_router(evaluations.router) # Include the evaluations router
 app.include_router(auth.router) # Added authentication router
 app.include_router(leaderboard.router) # Added leaderboard router
 app.include_router(analytics.router) # Added analytics router
+app.include_router(admin.router) # Cache administration
+app.include_router(search.router) # Full-text search over submissions and evaluations
 
 # Placeholder for future routers
 # from . import evaluations_router
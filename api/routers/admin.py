@@ -0,0 +1,34 @@
+# api/routers/admin.py
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+
+from api.routers.auth import get_current_admin_user
+from promptcraft.database.db_handler import DatabaseHandler
+from promptcraft.exceptions import NotFoundException
+from promptcraft.llm import llm_response_cache
+from promptcraft.logger_config import setup_logger
+from promptcraft.schemas.auth_schemas import Msg, UserResponse
+
+logger = setup_logger(__name__)
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+
+db_handler = DatabaseHandler()
+
+@router.get("/llm-cache")
+async def get_llm_cache_stats(admin: UserResponse = Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """Hit/miss counters of the LLM response cache in this worker."""
+    return llm_response_cache.stats()
+
+@router.delete("/llm-cache")
+async def purge_llm_cache(admin: UserResponse = Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """Drop every cached LLM completion, e.g. after changing the model or prompt templates."""
+    logger.info(f"Admin {admin.username} purging the LLM response cache.")
+    return llm_response_cache.purge()
+
+@router.post("/users/{user_id}/deactivate", response_model=Msg)
+async def deactivate_user(user_id: int, admin: UserResponse = Depends(get_current_admin_user)):
+    """Deactivate a user account. Their outstanding tokens stop working immediately."""
+    logger.info(f"Admin {admin.username} deactivating user ID {user_id}.")
+    if not db_handler.deactivate_user(user_id):
+        raise NotFoundException(detail="User not found or already inactive.")
+    return {"message": f"User {user_id} deactivated."}
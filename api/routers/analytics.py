@@ -3,10 +3,11 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Optional, Dict, Any
 from promptcraft.database.db_handler import DatabaseHandler
 from promptcraft.logger_config import setup_logger
-from api.routers.auth import get_current_active_user
+from promptcraft.llm import SIMULATED_MODEL
+from api.routers.auth import get_current_active_user, get_current_admin_user
 from promptcraft.schemas.auth_schemas import UserResponse
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from enum import Enum
 
 logger = setup_logger(__name__)
@@ -60,6 +61,8 @@ class SubmissionMetrics(BaseModel):
     avg_code_length: float
     avg_prompt_length: float
     completion_rate: float
+    avg_quality_score: float = 0.0
+    avg_criteria_coverage: float = 0.0 # Share of the question's evaluation criteria a prompt covers
 
 class QuestionMetrics(BaseModel):
     total_questions: int
@@ -83,6 +86,28 @@ class DashboardAnalytics(BaseModel):
     key_metrics: List[MetricSummary]
     time_series: Dict[str, List[TimeSeriesPoint]]
 
+class LLMUsageBucket(BaseModel):
+    key: str # Day (YYYY-MM-DD), question ID or model name
+    submissions: int
+    llm_calls: int # Submissions that reached the provider (not cached, not simulated)
+    cache_hits: int
+    simulated: int
+    cache_hit_rate: float
+    latency_p50_ms: Optional[float] = None
+    latency_p95_ms: Optional[float] = None
+    latency_p99_ms: Optional[float] = None
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+class LLMUsageReport(BaseModel):
+    start_date: date
+    end_date: date
+    overall: LLMUsageBucket
+    by_day: List[LLMUsageBucket]
+    by_question: List[LLMUsageBucket]
+    by_model: List[LLMUsageBucket]
+
 class DetailedAnalytics(BaseModel):
     period: str
     generated_at: datetime
@@ -126,16 +151,19 @@ async def get_dashboard_analytics(
         """)
         active_data = cursor.fetchone()
         
-        # Submission Metrics
+        # Submission Metrics (lengths and quality come from the precomputed submission_features rows)
         cursor.execute("""
             SELECT 
                 COUNT(*) as total_submissions,
-                SUM(CASE WHEN created_at >= CURDATE() THEN 1 ELSE 0 END) as submissions_today,
-                SUM(CASE WHEN created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) THEN 1 ELSE 0 END) as submissions_week,
-                SUM(CASE WHEN created_at >= DATE_SUB(CURDATE(), INTERVAL 30 DAY) THEN 1 ELSE 0 END) as submissions_month,
-                AVG(CASE WHEN generated_code IS NOT NULL THEN LENGTH(generated_code) END) as avg_code_length,
-                AVG(LENGTH(prompt)) as avg_prompt_length
-            FROM submissions
+                SUM(CASE WHEN s.created_at >= CURDATE() THEN 1 ELSE 0 END) as submissions_today,
+                SUM(CASE WHEN s.created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) THEN 1 ELSE 0 END) as submissions_week,
+                SUM(CASE WHEN s.created_at >= DATE_SUB(CURDATE(), INTERVAL 30 DAY) THEN 1 ELSE 0 END) as submissions_month,
+                AVG(CASE WHEN f.code_chars > 0 THEN f.code_chars END) as avg_code_length,
+                AVG(f.prompt_chars) as avg_prompt_length,
+                AVG(f.quality_score) as avg_quality_score,
+                AVG(CASE WHEN f.criteria_total > 0 THEN f.criteria_covered / f.criteria_total END) as avg_criteria_coverage
+            FROM submissions s
+            LEFT JOIN submission_features f ON f.submission_id = s.id
         """)
         submission_data = cursor.fetchone()
         
@@ -335,7 +363,9 @@ async def get_dashboard_analytics(
                 avg_submissions_per_user=round(avg_submissions_per_user, 1),
                 avg_code_length=round(submission_data['avg_code_length'] or 0, 1),
                 avg_prompt_length=round(submission_data['avg_prompt_length'] or 0, 1),
-                completion_rate=round(completion_rate, 1)
+                completion_rate=round(completion_rate, 1),
+                avg_quality_score=round(submission_data['avg_quality_score'] or 0, 1),
+                avg_criteria_coverage=round(submission_data['avg_criteria_coverage'] or 0, 3)
             ),
             question_metrics=QuestionMetrics(
                 total_questions=question_data['total_questions'],
@@ -511,6 +541,64 @@ async def export_analytics(
         logger.error(f"Error exporting analytics: {e}")
         raise HTTPException(status_code=500, detail="Failed to export analytics data")
 
+def _percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return float(ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))])
+
+def _llm_usage_bucket(key: str, rows: List[Dict[str, Any]]) -> LLMUsageBucket:
+    cache_hits = sum(1 for row in rows if row["cache_hit"])
+    simulated = sum(1 for row in rows if row["llm_model"] == SIMULATED_MODEL)
+    # Latency percentiles describe provider calls only; cache hits and simulations would drag them down
+    latencies = sorted(row["llm_latency_ms"] for row in rows
+                       if not row["cache_hit"] and row["llm_model"] != SIMULATED_MODEL
+                       and row["llm_latency_ms"] is not None)
+    prompt_tokens = sum(row["prompt_tokens"] or 0 for row in rows)
+    completion_tokens = sum(row["completion_tokens"] or 0 for row in rows)
+    return LLMUsageBucket(
+        key=key,
+        submissions=len(rows),
+        llm_calls=len(rows) - cache_hits - simulated,
+        cache_hits=cache_hits,
+        simulated=simulated,
+        cache_hit_rate=round(cache_hits / len(rows), 3) if rows else 0.0,
+        latency_p50_ms=_percentile(latencies, 0.50),
+        latency_p95_ms=_percentile(latencies, 0.95),
+        latency_p99_ms=_percentile(latencies, 0.99),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+def _group_llm_usage(rows: List[Dict[str, Any]], field: str) -> List[LLMUsageBucket]:
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(row[field], []).append(row)
+    return [_llm_usage_bucket(str(key), groups[key]) for key in sorted(groups)]
+
+@router.get("/llm-usage", response_model=LLMUsageReport)
+async def get_llm_usage(
+    days: int = Query(30, ge=1, le=366),
+    current_user: UserResponse = Depends(get_current_admin_user)
+):
+    """
+    LLM latency percentiles and token spend per day, per question and per model, for capacity and cost
+    planning. Covers submissions recorded with LLM usage (see the submissions.llm_* columns).
+    """
+    logger.info(f"User {current_user.username} requested LLM usage for the last {days} days")
+    end_date = date.today() + timedelta(days=1)
+    start_date = end_date - timedelta(days=days)
+    rows = db_handler.get_submission_llm_usage(start_date, end_date)
+    return LLMUsageReport(
+        start_date=start_date,
+        end_date=end_date - timedelta(days=1),
+        overall=_llm_usage_bucket("all", rows),
+        by_day=_group_llm_usage(rows, "day"),
+        by_question=_group_llm_usage(rows, "question_id"),
+        by_model=_group_llm_usage(rows, "llm_model"),
+    )
+
 @router.get("/health")
 async def analytics_health_check():
     """Health check endpoint for analytics service."""
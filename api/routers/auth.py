@@ -1,11 +1,15 @@
 # api/routers/auth.py
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer # For login form and dependency
-from typing import Any
+from typing import Any, Optional
+import os
 
 from promptcraft.database.db_handler import DatabaseHandler
-from promptcraft.schemas.auth_schemas import UserCreate, UserResponse, UserUpdate, Token, LoginRequest, Msg, EmailVerificationRequest, VerifyTokenRequest
+from promptcraft.schemas.auth_schemas import UserCreate, UserResponse, UserUpdate, Token, LoginRequest, Msg, EmailVerificationRequest, VerifyTokenRequest, PasswordChangeRequest
 from promptcraft import auth_utils # Renamed from auth_utils to avoid conflict
+from promptcraft import user_cache
+from promptcraft.password_hashing import password_hasher
+from promptcraft.rate_limiter import login_ip_limiter, login_username_limiter, register_ip_limiter
 from promptcraft.exceptions import BadRequestException, NotFoundException
 from promptcraft.logger_config import setup_logger
 from promptcraft.email_service import email_service
@@ -15,9 +19,27 @@ router = APIRouter(prefix="/api/v1/auth", tags=["authentication"])
 
 db_handler = DatabaseHandler() # Consider FastAPI dependency injection
 
+# Usernames allowed to call admin endpoints (comma-separated)
+ADMIN_USERNAMES = {name.strip().lower() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()}
+
 # Add OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login") # Points to your login endpoint
 
+def _user_from_claims(user_id: int, payload: dict) -> Optional[dict]:
+    """
+    The user fields an access token carries (see login_for_access_token), or None for tokens issued
+    before they were added. Profile fields such as full_name are not claims and are left unset.
+    """
+    if not all(claim in payload for claim in ("username", "email", "active", "verified")):
+        return None
+    return {
+        "id": user_id,
+        "username": payload["username"],
+        "email": payload["email"],
+        "is_active": payload["active"],
+        "is_verified": payload["verified"],
+    }
+
 # Dependency to get current user from token
 async def get_current_active_user(token: str = Depends(oauth2_scheme)) -> UserResponse:
     credentials_exception = HTTPException(
@@ -40,10 +62,29 @@ async def get_current_active_user(token: str = Depends(oauth2_scheme)) -> UserRe
         logger.warning("Token 'sub' (user_id) is not a valid integer. Payload: %s", payload)
         raise credentials_exception
 
-    user_data = db_handler.get_user_by_id(user_id=user_id)
-    if user_data is None:
-        logger.warning(f"User with ID {user_id} from token not found in DB.")
+    # Tokens issued before token versions existed carry no "ver" claim and count as version 0
+    token_version = payload.get("ver", 0)
+    current_version, user_data = user_cache.get_auth_state(user_id)
+    if current_version is not None and token_version != current_version:
+        logger.warning(f"Revoked token for user ID {user_id} (token version {token_version}, current {current_version}).")
         raise credentials_exception
+    if user_data is None and current_version is not None:
+        # Version is current, so the token's claims are too: everything they carry bumps the version when it changes
+        user_data = _user_from_claims(user_id, payload)
+
+    if user_data is None:
+        user_data = db_handler.get_user_profile_by_id(user_id=user_id)
+        if user_data is None:
+            logger.warning(f"User with ID {user_id} from token not found in DB.")
+            raise credentials_exception
+        db_version = user_data.get("token_version", 0)
+        if current_version is None:
+            user_cache.set_token_version(user_id, db_version, only_if_missing=True)
+        if token_version != db_version:
+            logger.warning(f"Revoked token for user ID {user_id} (token version {token_version}, current {db_version}).")
+            raise credentials_exception
+        # Cache the projection even for inactive/unverified users so rejections are cheap too
+        user_cache.cache_user(user_id, UserResponse.model_validate(user_data).model_dump(mode="json"))
     
     if not user_data.get("is_active"):
         logger.warning(f"User {user_data.get('username')} is inactive.")
@@ -64,42 +105,37 @@ async def get_current_active_user(token: str = Depends(oauth2_scheme)) -> UserRe
 
     return UserResponse.model_validate(user_data)
 
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def get_current_admin_user(current_user: UserResponse = Depends(get_current_active_user)) -> UserResponse:
+    if current_user.username.lower() not in ADMIN_USERNAMES:
+        logger.warning(f"User {current_user.username} (ID: {current_user.id}) attempted an admin action.")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator privileges required.")
+    return current_user
+
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(register_ip_limiter.dependency())])
 async def register_user(user_in: UserCreate) -> Any:
     logger.info(f"Registration attempt for username: {user_in.username}, email: {user_in.email}")
-    # Check if user already exists by username or email
-    existing_user_by_email = db_handler.get_user_by_email(email=user_in.email)
-    if existing_user_by_email:
-        logger.warning(f"Registration failed: Email {user_in.email} already registered.")
-        raise BadRequestException(detail="Email already registered.")
-    
-    existing_user_by_username = db_handler.get_user_by_username(username=user_in.username)
-    if existing_user_by_username:
-        logger.warning(f"Registration failed: Username {user_in.username} already exists.")
-        raise BadRequestException(detail="Username already exists.")
-
-    hashed_password = auth_utils.get_password_hash(user_in.password)
-    user_id = db_handler.create_user(
+    hashed_password = await password_hasher.hash(user_in.password) # Runs off the event loop
+    # One INSERT: the UNIQUE constraints on email/username detect duplicates without a check-then-insert race
+    created_user_data, conflict = db_handler.register_user_atomic(
         email=user_in.email,
         username=user_in.username,
         hashed_password=hashed_password,
         full_name=user_in.full_name
     )
-    if not user_id:
-        logger.error(f"Failed to create user {user_in.username} in database after checks passed.")
+    if conflict == "email":
+        logger.warning(f"Registration failed: Email {user_in.email} already registered.")
+        raise BadRequestException(detail="Email already registered.")
+    if conflict == "username":
+        logger.warning(f"Registration failed: Username {user_in.username} already exists.")
+        raise BadRequestException(detail="Username already exists.")
+    if not created_user_data:
+        logger.error(f"Failed to create user {user_in.username} in database.")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not create user at this time.",
         )
-    
-    # Fetch the created user to return (or construct if create_user returned full object)
-    # For now, get_user_by_id will work.
-    created_user_data = db_handler.get_user_by_id(user_id)
-    if not created_user_data:
-         logger.error(f"Could not retrieve user {user_id} immediately after creation.")
-         # This case should ideally not happen if user_id was returned.
-         # Return a generic message or a specific error.
-         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User created but could not be retrieved.")
+    user_id = created_user_data["id"]
 
     logger.info(f"User {user_in.username} registered successfully with ID: {user_id}.")
     
@@ -120,18 +156,28 @@ async def register_user(user_in: UserCreate) -> Any:
 
     return UserResponse.model_validate(created_user_data) # Pydantic v2
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(login_ip_limiter.dependency())])
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     # OAuth2PasswordRequestForm uses 'username' and 'password' fields
     # We allow login with either email or username
     logger.info(f"Login attempt for user: {form_data.username}")
+    # Per-account limit catches credential stuffing spread across many IPs; checked before any bcrypt work
+    login_username_limiter.hit(form_data.username.strip().lower())
     user_data = db_handler.get_user_by_username(username=form_data.username) 
     if not user_data:
         user_data = db_handler.get_user_by_email(email=form_data.username)
 
-    if not user_data or not auth_utils.verify_password(form_data.password, user_data["hashed_password"]):
+    password_valid, new_hash = False, None
+    if user_data:
+        password_valid, new_hash = await password_hasher.verify_and_update(form_data.password, user_data["hashed_password"])
+    if not password_valid:
         logger.warning(f"Login failed for user: {form_data.username}. Invalid credentials.")
         raise BadRequestException(detail="Incorrect username/email or password", status_code=status.HTTP_401_UNAUTHORIZED)
+
+    if new_hash:
+        # Stored hash uses an outdated bcrypt cost; upgrade it while we have the plaintext
+        if db_handler.update_user_password(user_data["id"], new_hash):
+            logger.info(f"Rehashed password for user ID {user_data['id']} at cost {auth_utils.BCRYPT_ROUNDS}.")
     
     if not user_data.get("is_active"):
         logger.warning(f"Login failed for inactive user: {form_data.username}")
@@ -144,7 +190,15 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     # For JWT subject, use username or user_id. Using user_id is often better.
     # The 'sub' (subject) of the token. 
     # Standard practice is to use something unique that identifies the user, like user ID.
-    subject_data = {"sub": str(user_data["id"]), "username": user_data["username"]} 
+    subject_data = {
+        "sub": str(user_data["id"]),
+        "username": user_data["username"],
+        "email": user_data["email"],
+        "ver": user_data.get("token_version", 0), # Bumped on deactivation/password change to revoke this token
+        "active": bool(user_data.get("is_active")),
+        "verified": bool(user_data.get("is_verified")),
+    }
+    user_cache.set_token_version(user_data["id"], subject_data["ver"], only_if_missing=True)
     
     access_token = auth_utils.create_access_token(data=subject_data)
     refresh_token = auth_utils.create_refresh_token(data=subject_data)
@@ -222,7 +276,34 @@ async def verify_user_email(request: VerifyTokenRequest):
 async def read_users_me(current_user: UserResponse = Depends(get_current_active_user)):
     """Fetch the current authenticated user."""
     logger.info(f"User {current_user.username} (ID: {current_user.id}) accessed /users/me endpoint.")
-    return current_user
+    # current_user may have been built from the token's claims alone; the profile needs the full record
+    user_data = user_cache.get_cached_user(current_user.id)
+    if user_data is None:
+        user_data = db_handler.get_user_profile_by_id(user_id=current_user.id)
+        if user_data is None:
+            raise NotFoundException(detail="User not found.")
+        user_data = UserResponse.model_validate(user_data).model_dump(mode="json")
+        user_cache.cache_user(current_user.id, user_data)
+    return UserResponse.model_validate(user_data)
+
+@router.post("/users/me/password", response_model=Msg)
+async def change_password(request: PasswordChangeRequest, current_user: UserResponse = Depends(get_current_active_user)):
+    """Change the current user's password. Every outstanding token, including the one used here, is revoked."""
+    logger.info(f"User {current_user.username} (ID: {current_user.id}) changing password.")
+    login_username_limiter.hit(current_user.username.strip().lower()) # Guessing the current password counts as a login attempt
+    user_data = db_handler.get_user_by_id(current_user.id)
+    if not user_data:
+        raise NotFoundException(detail="User not found.")
+    password_valid, _ = await password_hasher.verify_and_update(request.current_password, user_data["hashed_password"])
+    if not password_valid:
+        logger.warning(f"Password change failed for user ID {current_user.id}: wrong current password.")
+        raise BadRequestException(detail="Current password is incorrect.")
+
+    new_hash = await password_hasher.hash(request.new_password)
+    if not db_handler.update_user_password(current_user.id, new_hash, revoke_tokens=True):
+        logger.error(f"Failed to store new password for user ID {current_user.id}.")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not change password at this time.")
+    return {"message": "Password changed. Please log in again."}
 
 @router.patch("/users/me", response_model=UserResponse)
 async def update_user_profile(user_update: UserUpdate, current_user: UserResponse = Depends(get_current_active_user)):
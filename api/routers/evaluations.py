@@ -7,8 +7,10 @@ from promptcraft.evaluation.evaluator import Evaluator
 from promptcraft.database.db_handler import DatabaseHandler
 from promptcraft.logger_config import setup_logger
 from promptcraft.schemas.auth_schemas import UserResponse
-from api.routers.auth import get_current_active_user
+from api.routers.auth import get_current_active_user, get_current_admin_user
 from promptcraft.exceptions import NotFoundException
+from promptcraft.similarity.minhash import PROMPT_DUPLICATE_THRESHOLD, prompt_duplicate_index
+from promptcraft.similarity.vector_index import submission_vector_index
 
 logger = setup_logger(__name__)
 
@@ -29,6 +31,33 @@ class EvaluationRequestData(BaseModel):
     scores: Dict[str, Any] | None = {}
     overall_score: Optional[float] = None
 
+class DuplicatePromptMatch(BaseModel):
+    submission_id: int
+    user_id: int
+    similarity: float # Estimated Jaccard similarity of the prompts' word 3-grams
+
+class DuplicatePromptsResponse(BaseModel):
+    submission_id: int
+    question_id: int
+    threshold: float
+    matches: List[DuplicatePromptMatch]
+
+class SimilarSubmission(BaseModel):
+    submission_id: int
+    user_id: int
+    username: str
+    prompt: str
+    similarity: float # Cosine similarity of the prompts' TF-IDF vectors
+    created_at: Optional[datetime] = None
+    quality_score: Optional[float] = None
+    evaluation_count: int = 0
+    average_score: Optional[float] = None
+
+class SimilarSubmissionsResponse(BaseModel):
+    submission_id: int
+    question_id: int
+    matches: List[SimilarSubmission]
+
 class EvaluationResponse(BaseModel):
     evaluation_id: int
     message: str
@@ -289,4 +318,51 @@ async def get_evaluation_statistics(
         return stats
     except Exception as e:
         logger.error(f"Failed to retrieve evaluation statistics: {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to retrieve statistics: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to retrieve statistics: {str(e)}") 
+
+@router.get("/evaluations/duplicates/{submission_id}", response_model=DuplicatePromptsResponse)
+async def get_duplicate_prompts(
+    submission_id: int,
+    threshold: float = Query(PROMPT_DUPLICATE_THRESHOLD, ge=0.1, le=1.0, description="Minimum estimated similarity"),
+    limit: int = Query(20, ge=1, le=100, description="Number of matches to return"),
+    include_same_user: bool = Query(False, description="Also report the candidate's own earlier submissions"),
+    current_user: UserResponse = Depends(get_current_admin_user)
+):
+    """Likely copied prompts: other candidates' submissions for the same question with a near-duplicate prompt."""
+    logger.info(f"User ID {current_user.id} ({current_user.username}) requesting duplicate prompts of submission {submission_id}.")
+    submission = db_handler.get_submission_by_id(submission_id)
+    if not submission:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Submission {submission_id} not found")
+    try:
+        matches = prompt_duplicate_index.find_duplicates(submission, threshold=threshold, limit=limit,
+                                                         include_same_user=include_same_user)
+    except Exception as e:
+        logger.error(f"Failed to look up duplicate prompts of submission {submission_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to look up duplicates: {str(e)}")
+    logger.debug(f"Found {len(matches)} likely duplicates of submission {submission_id}.")
+    return DuplicatePromptsResponse(submission_id=submission_id, question_id=submission["question_id"],
+                                    threshold=threshold, matches=matches)
+
+@router.get("/evaluations/similar/{submission_id}", response_model=SimilarSubmissionsResponse)
+async def get_similar_submissions(
+    submission_id: int,
+    limit: int = Query(10, ge=1, le=50, description="Number of similar submissions to return"),
+    current_user: UserResponse = Depends(get_current_active_user)
+):
+    """Past submissions for the same task with the most similar prompts, and how they were scored."""
+    logger.info(f"User ID {current_user.id} ({current_user.username}) requesting submissions similar to {submission_id}.")
+    submission = db_handler.get_submission_by_id(submission_id)
+    if not submission:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Submission {submission_id} not found")
+    try:
+        matches = submission_vector_index.find_similar(submission, limit=limit)
+        summaries = db_handler.get_submission_evaluation_summaries([m["submission_id"] for m in matches])
+    except Exception as e:
+        logger.error(f"Failed to look up submissions similar to {submission_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to look up similar submissions: {str(e)}")
+    # Submissions deleted since they were indexed have no summary and are skipped
+    similar = [SimilarSubmission(submission_id=m["submission_id"], similarity=m["similarity"],
+                                 **{k: v for k, v in summaries[m["submission_id"]].items() if k != "id"})
+               for m in matches if m["submission_id"] in summaries]
+    logger.debug(f"Found {len(similar)} submissions similar to {submission_id}.")
+    return SimilarSubmissionsResponse(submission_id=submission_id, question_id=submission["question_id"], matches=similar)
@@ -2,6 +2,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Optional
 from promptcraft.database.db_handler import DatabaseHandler
+from promptcraft.evaluation.features import NO_CODE_SCORE
+from promptcraft.leaderboard_cache import STATS_CACHE_TTL_SECONDS, stats_key
+from promptcraft.redis_cache import RedisCache
 from promptcraft.logger_config import setup_logger
 from api.routers.auth import get_current_active_user
 from promptcraft.schemas.auth_schemas import UserResponse
@@ -12,6 +15,13 @@ logger = setup_logger(__name__)
 router = APIRouter(prefix="/api/v1/leaderboard", tags=["leaderboard"])
 
 db_handler = DatabaseHandler()
+redis_cache = RedisCache()
+
+# Per-submission score, precomputed when the submission is saved (promptcraft/evaluation/features.py).
+# Submissions without a feature row (not yet backfilled: initialize_database.py does it on deploy)
+# count as having produced no code.
+FEATURES_JOIN_SQL = "LEFT JOIN submission_features f ON f.submission_id = s.id"
+SUBMISSION_SCORE_SQL = f"COALESCE(f.quality_score, {NO_CODE_SCORE})"
 
 # Pydantic schemas for leaderboard
 class LeaderboardEntry(BaseModel):
@@ -73,18 +83,12 @@ async def get_leaderboard(
                 COUNT(DISTINCT s.id) as total_submissions,
                 COUNT(DISTINCT s.question_id) as completed_questions,
                 COALESCE(AVG(
-                    CASE 
-                        WHEN LENGTH(s.generated_code) > 0 THEN 
-                            LEAST(100, GREATEST(0, 
-                                50 + (LENGTH(s.generated_code) / 100) + 
-                                (CHAR_LENGTH(s.prompt) / 20)
-                            ))
-                        ELSE 30
-                    END
+                    {SUBMISSION_SCORE_SQL}
                 ), 0) as avg_score,
                 MAX(s.created_at) as recent_activity
             FROM users u
             LEFT JOIN submissions s ON u.id = s.user_id {time_filter}
+            {FEATURES_JOIN_SQL}
             WHERE u.is_active = TRUE AND u.is_verified = TRUE
             GROUP BY u.id, u.username, u.full_name, u.profile_photo_url
             HAVING total_submissions > 0
@@ -147,18 +151,12 @@ async def get_leaderboard(
                 COUNT(DISTINCT s.id) as total_submissions,
                 COUNT(DISTINCT s.question_id) as completed_questions,
                 COALESCE(AVG(
-                    CASE 
-                        WHEN LENGTH(s.generated_code) > 0 THEN 
-                            LEAST(100, GREATEST(0, 
-                                50 + (LENGTH(s.generated_code) / 100) + 
-                                (CHAR_LENGTH(s.prompt) / 20)
-                            ))
-                        ELSE 30
-                    END
+                    {SUBMISSION_SCORE_SQL}
                 ), 0) as avg_score,
                 MAX(s.created_at) as recent_activity
             FROM users u
             LEFT JOIN submissions s ON u.id = s.user_id {time_filter}
+            {FEATURES_JOIN_SQL}
             WHERE u.is_active = TRUE AND u.is_verified = TRUE AND u.id = %s
             GROUP BY u.id, u.username, u.full_name, u.profile_photo_url
             HAVING total_submissions > 0
@@ -174,17 +172,11 @@ async def get_leaderboard(
                 FROM (
                     SELECT 
                         COALESCE(AVG(
-                            CASE 
-                                WHEN LENGTH(s.generated_code) > 0 THEN 
-                                    LEAST(100, GREATEST(0, 
-                                        50 + (LENGTH(s.generated_code) / 100) + 
-                                        (CHAR_LENGTH(s.prompt) / 20)
-                                    ))
-                                ELSE 30
-                            END
+                            {SUBMISSION_SCORE_SQL}
                         ), 0) as avg_score
                     FROM users u
                     LEFT JOIN submissions s ON u.id = s.user_id {time_filter}
+                    {FEATURES_JOIN_SQL}
                     WHERE u.is_active = TRUE AND u.is_verified = TRUE
                     GROUP BY u.id
                     HAVING COUNT(DISTINCT s.id) > 0 AND avg_score > %s
@@ -223,118 +215,107 @@ async def get_leaderboard(
         logger.error(f"Error getting leaderboard: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve leaderboard")
 
-@router.get("/stats/{user_id}", response_model=UserStats)
-async def get_user_stats(
-    user_id: int,
-    current_user: UserResponse = Depends(get_current_active_user)
-):
-    """Get detailed statistics for a specific user."""
-    logger.info(f"User {current_user.username} requested stats for user {user_id}")
-    
+def _load_user_stats(user_id: int) -> Optional[UserStats]:
+    """
+    Get a user's stats from the cache, or compute them with one grouped query and cache them.
+    Returns None if the user does not exist or is inactive.
+    """
+    cache_key = stats_key(user_id)
     try:
-        conn = db_handler.connect()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection failed")
-            
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get user stats
-        stats_query = """
-            SELECT 
+        cached_stats = redis_cache.get(cache_key)
+        if cached_stats is not None:
+            return UserStats(**cached_stats)
+    except Exception as e:
+        logger.error(f"Error retrieving stats for user {user_id} from cache: {e}")
+
+    # Streak is simplified to the number of days with submissions in the last 30 days.
+    # Rank counts the ranked users with a higher average score.
+    stats_query = f"""
+        SELECT
+            st.*,
+            (SELECT COUNT(*) + 1
+             FROM (
+                SELECT
+                    COALESCE(AVG(
+                        {SUBMISSION_SCORE_SQL}
+                    ), 0) as avg_score
+                FROM users u
+                LEFT JOIN submissions s ON u.id = s.user_id
+                {FEATURES_JOIN_SQL}
+                WHERE u.is_active = TRUE AND u.is_verified = TRUE
+                GROUP BY u.id
+             ) better_users
+             WHERE better_users.avg_score > st.avg_score) as user_rank,
+            (SELECT COUNT(*) FROM users WHERE is_active = TRUE AND is_verified = TRUE) as total_users
+        FROM (
+            SELECT
                 u.id as user_id,
                 u.username,
                 COUNT(DISTINCT s.id) as total_submissions,
                 COUNT(DISTINCT s.question_id) as completed_questions,
                 COALESCE(AVG(
-                    CASE 
-                        WHEN LENGTH(s.generated_code) > 0 THEN 
-                            LEAST(100, GREATEST(0, 
-                                50 + (LENGTH(s.generated_code) / 100) + 
-                                (CHAR_LENGTH(s.prompt) / 20)
-                            ))
-                        ELSE 30
-                    END
+                    {SUBMISSION_SCORE_SQL}
                 ), 0) as avg_score,
                 COALESCE(MAX(
-                    CASE 
-                        WHEN LENGTH(s.generated_code) > 0 THEN 
-                            LEAST(100, GREATEST(0, 
-                                50 + (LENGTH(s.generated_code) / 100) + 
-                                (CHAR_LENGTH(s.prompt) / 20)
-                            ))
-                        ELSE 30
-                    END
+                    {SUBMISSION_SCORE_SQL}
                 ), 0) as best_score,
-                COUNT(CASE WHEN s.created_at >= DATE_SUB(NOW(), INTERVAL 7 DAY) THEN 1 END) as recent_submissions
+                COUNT(CASE WHEN s.created_at >= DATE_SUB(NOW(), INTERVAL 7 DAY) THEN 1 END) as recent_submissions,
+                COUNT(DISTINCT CASE WHEN s.created_at >= DATE_SUB(NOW(), INTERVAL 30 DAY)
+                                    THEN DATE(s.created_at) END) as streak_days
             FROM users u
             LEFT JOIN submissions s ON u.id = s.user_id
+            {FEATURES_JOIN_SQL}
             WHERE u.id = %s AND u.is_active = TRUE
             GROUP BY u.id, u.username
-        """
-        
+        ) st
+    """
+
+    conn = db_handler.connect()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    cursor = conn.cursor(dictionary=True)
+    try:
         cursor.execute(stats_query, (user_id,))
-        user_stats = cursor.fetchone()
-        
-        if not user_stats:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Calculate streak (simplified - consecutive days with submissions)
-        streak_query = """
-            SELECT COUNT(DISTINCT DATE(created_at)) as streak_days
-            FROM submissions 
-            WHERE user_id = %s 
-            AND created_at >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-        """
-        cursor.execute(streak_query, (user_id,))
-        streak_result = cursor.fetchone()
-        streak_days = streak_result['streak_days'] if streak_result else 0
-        
-        # Get user rank
-        rank_query = """
-            SELECT COUNT(*) + 1 as rank
-            FROM (
-                SELECT u.id,
-                    COALESCE(AVG(
-                        CASE 
-                            WHEN LENGTH(s.generated_code) > 0 THEN 
-                                LEAST(100, GREATEST(0, 
-                                    50 + (LENGTH(s.generated_code) / 100) + 
-                                    (CHAR_LENGTH(s.prompt) / 20)
-                                ))
-                            ELSE 30
-                        END
-                    ), 0) as avg_score
-                FROM users u
-                LEFT JOIN submissions s ON u.id = s.user_id
-                WHERE u.is_active = TRUE AND u.is_verified = TRUE
-                GROUP BY u.id
-                HAVING avg_score > %s
-            ) better_users
-        """
-        cursor.execute(rank_query, (user_stats['avg_score'],))
-        rank_result = cursor.fetchone()
-        rank = rank_result['rank'] if rank_result else 1
-        
-        # Calculate percentile
-        cursor.execute("SELECT COUNT(*) as total FROM users WHERE is_active = TRUE AND is_verified = TRUE")
-        total_users = cursor.fetchone()['total']
-        percentile = round(((total_users - rank + 1) / total_users) * 100, 1) if total_users > 0 else 0
-        
+        row = cursor.fetchone()
+    finally:
         cursor.close()
         db_handler.close()
-        
-        return UserStats(
-            user_id=user_stats['user_id'],
-            username=user_stats['username'],
-            total_submissions=user_stats['total_submissions'],
-            completed_questions=user_stats['completed_questions'],
-            avg_score=round(user_stats['avg_score'], 1),
-            best_score=round(user_stats['best_score'], 1),
-            recent_submissions=user_stats['recent_submissions'],
-            streak_days=streak_days,
-            rank=rank,
-            percentile=percentile
-        )
+    if not row:
+        return None
+
+    rank, total_users = row['user_rank'], row['total_users']
+    user_stats = UserStats(
+        user_id=row['user_id'],
+        username=row['username'],
+        total_submissions=row['total_submissions'],
+        completed_questions=row['completed_questions'],
+        avg_score=round(row['avg_score'], 1),
+        best_score=round(row['best_score'], 1),
+        recent_submissions=row['recent_submissions'],
+        streak_days=row['streak_days'],
+        rank=rank,
+        percentile=round(((total_users - rank + 1) / total_users) * 100, 1) if total_users > 0 else 0
+    )
+    try:
+        if not redis_cache.set(cache_key, user_stats.model_dump(), ttl_seconds=STATS_CACHE_TTL_SECONDS):
+            logger.warning(f"Failed to set stats for user {user_id} to cache.")
+    except Exception as e:
+        logger.error(f"Error setting stats for user {user_id} to cache: {e}")
+    return user_stats
+
+@router.get("/stats/{user_id}", response_model=UserStats)
+async def get_user_stats(
+    user_id: int,
+    current_user: UserResponse = Depends(get_current_active_user)
+):
+    """Get detailed statistics for a specific user."""
+    logger.info(f"User {current_user.username} requested stats for user {user_id}")
+    
+    try:
+        user_stats = _load_user_stats(user_id)
+        if user_stats is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user_stats
         
     except HTTPException:
         raise
@@ -345,4 +326,4 @@ async def get_user_stats(
 @router.get("/my-stats", response_model=UserStats)
 async def get_my_stats(current_user: UserResponse = Depends(get_current_active_user)):
     """Get detailed statistics for the current user."""
-    return await get_user_stats(current_user.id, current_user)
\ No newline at end of file
+    return await get_user_stats(current_user.id, current_user)
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+import os
+from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List
 from promptcraft.database.db_handler import DatabaseHandler
 from pydantic import BaseModel
 from promptcraft.redis_cache import RedisCache
+from promptcraft.question_catalog import QuestionCatalog
 from promptcraft.logger_config import setup_logger # Import logger setup
-from promptcraft.exceptions import NotFoundException, CacheException # Import custom exceptions
+from promptcraft.exceptions import NotFoundException, CacheException, DatabaseException # Import custom exceptions
 
 logger = setup_logger(__name__) # Setup logger for this module
 
@@ -17,10 +19,21 @@ router = APIRouter(
 # Consider FastAPI dependency injection for these for better testability and management.
 db_handler = DatabaseHandler()
 redis_cache = RedisCache()
+# Per-worker in-memory snapshot of the questions table; Redis/DB paths below are the fallback.
+# It reloads in worker threads, so it gets its own DatabaseHandler (each holds a single connection).
+question_catalog = QuestionCatalog(DatabaseHandler(), redis_cache)
 
 CACHE_TTL_SECONDS = 300 # 5 minutes
 CACHE_PREFIX_QUESTIONS = "promptcraft:questions"
 
+# Missing IDs are cached briefly so repeated lookups of a bad ID don't reach MySQL.
+# Keep this short: a question created right after a miss stays hidden for up to this long.
+NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("QUESTION_NEGATIVE_CACHE_TTL_SECONDS", 30))
+NOT_FOUND_MARKER = {"_not_found": True}
+
+# Load the whole question catalog into the cache when the API starts (disable in tests)
+QUESTION_CACHE_WARMUP = os.getenv("QUESTION_CACHE_WARMUP", "true").lower() == "true"
+
 class QuestionBase(BaseModel):
     id: int
     description: str
@@ -33,6 +46,11 @@ class QuestionDetail(QuestionBase):
 
 @router.get("/questions", response_model=List[QuestionBase])
 async def get_all_questions_api():
+    snapshot = await question_catalog.get_snapshot_async()
+    if snapshot is not None:
+        logger.debug(f"Serving all questions from in-memory catalog (version {snapshot.version}).")
+        return [QuestionBase(id=q["id"], description=q["description"]) for q in snapshot.questions]
+
     cache_key = f"{CACHE_PREFIX_QUESTIONS}:all"
     logger.debug(f"Attempting to get all questions. Cache key: {cache_key}")
     try:
@@ -65,28 +83,59 @@ async def get_all_questions_api():
         # Don't fail the request if caching fails
     return response_questions
 
+@router.get("/questions/catalog", response_model=List[QuestionDetail])
+async def get_questions_catalog_api(
+    difficulty: str | None = Query(None, description="Filter by difficulty level (case-insensitive)"),
+    language: str | None = Query(None, description="Filter by programming language (case-insensitive)")
+):
+    """List question details, optionally filtered, served entirely from the in-memory catalog."""
+    snapshot = await question_catalog.get_snapshot_async()
+    if snapshot is None:
+        logger.error("Question catalog unavailable for filtered listing.")
+        raise DatabaseException(detail="Question catalog is not available at this time.")
+    matches = snapshot.filter(difficulty=difficulty, language=language)
+    logger.debug(f"Catalog filter difficulty={difficulty!r} language={language!r} matched {len(matches)} questions.")
+    return [QuestionDetail(**q) for q in matches]
+
 @router.get("/questions/{question_id}", response_model=QuestionDetail)
 async def get_question_details_api(question_id: int):
+    snapshot = await question_catalog.get_snapshot_async()
+    if snapshot is not None:
+        question = snapshot.get(question_id)
+        if question is not None:
+            logger.debug(f"Serving question details for ID {question_id} from in-memory catalog.")
+            return QuestionDetail(**question)
+
     cache_key = f"{CACHE_PREFIX_QUESTIONS}:details:{question_id}"
     logger.debug(f"Attempting to get question details for ID {question_id}. Cache key: {cache_key}")
     try:
         cached_detail = redis_cache.get(cache_key)
+        if cached_detail == NOT_FOUND_MARKER:
+            logger.info(f"Question ID {question_id} is negatively cached as not found.")
+            raise NotFoundException(detail=f"Question with ID {question_id} not found")
         if cached_detail is not None:
             logger.info(f"Serving question details for ID {question_id} from cache.")
             return QuestionDetail(**cached_detail)
+    except NotFoundException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving question ID {question_id} from cache: {e}. Cache key: {cache_key}")
         # Fall through
 
     logger.info(f"Fetching question details for ID {question_id} from DB.")
     try:
-        details_from_db = db_handler.get_question_details(question_id)
+        details_from_db = db_handler.get_question_details(question_id, raise_errors=True)
     except Exception as e:
+        # Not negatively cached: the question may well exist
         logger.error(f"Database error while fetching question ID {question_id}: {e}")
-        raise NotFoundException(detail=f"Could not retrieve question {question_id} due to a database issue.")
+        raise DatabaseException(detail=f"Could not retrieve question {question_id} due to a database issue.")
 
     if not details_from_db:
         logger.warning(f"Question with ID {question_id} not found in DB.")
+        try:
+            redis_cache.set(cache_key, NOT_FOUND_MARKER, ttl_seconds=NEGATIVE_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logger.error(f"Error setting negative cache entry for question ID {question_id}: {e}. Key: {cache_key}")
         # Use our custom NotFoundException
         raise NotFoundException(detail=f"Question with ID {question_id} not found")
     
@@ -98,10 +147,23 @@ async def get_question_details_api(question_id: int):
         logger.error(f"Error setting question ID {question_id} to cache: {e}. Key: {cache_key}")
     return response_detail
 
-# TODO: Add logging to other routers (submissions, evaluations)
-# TODO: Implement cache invalidation for POST/PUT/DELETE operations on questions.
-# Consider adding a cache invalidation mechanism if questions can be added/updated via API
-# For example, on POST/PUT/DELETE to questions, delete relevant cache keys.
-# @router.post("/questions") or similar would need:
-#   redis_cache.delete(f"{CACHE_PREFIX_QUESTIONS}:all")
-#   redis_cache.delete(f"{CACHE_PREFIX_QUESTIONS}:details:{new_question_id}") 
\ No newline at end of file
+def warm_question_cache() -> int:
+    """
+    Load the full question catalog with one query into this worker's in-memory snapshot, then cache
+    both the list and every detail entry in Redis in one pipelined round trip.
+    Returns the number of questions cached.
+    """
+    snapshot = question_catalog.get_snapshot()
+    questions = snapshot.questions if snapshot is not None else []
+    if not questions:
+        logger.info("Question cache warm-up skipped: no questions found.")
+        return 0
+
+    details = [QuestionDetail(**q) for q in questions]
+    to_cache = {f"{CACHE_PREFIX_QUESTIONS}:details:{d.id}": d.model_dump() for d in details}
+    to_cache[f"{CACHE_PREFIX_QUESTIONS}:all"] = [QuestionBase(id=d.id, description=d.description).model_dump() for d in details]
+    if not redis_cache.set_many(to_cache, ttl_seconds=CACHE_TTL_SECONDS):
+        logger.warning("Question cache warm-up could not write to cache.")
+        return 0
+    logger.info(f"Question cache warmed with {len(details)} questions.")
+    return len(details)
@@ -0,0 +1,115 @@
+# api/routers/search.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional
+from pydantic import BaseModel
+from datetime import date, datetime, timedelta
+from enum import Enum
+import re
+
+from promptcraft.database.db_handler import DatabaseHandler
+from promptcraft.logger_config import setup_logger
+from promptcraft.schemas.auth_schemas import UserResponse
+from api.routers.auth import get_current_admin_user
+
+logger = setup_logger(__name__)
+router = APIRouter(prefix="/api/v1/search", tags=["search"])
+
+db_handler = DatabaseHandler()
+
+SNIPPET_CHARS = 240
+_QUERY_WORD_RE = re.compile(r"\w{3,}")
+
+class SearchScope(str, Enum):
+    PROMPTS = "prompts"
+    CODE = "code"
+    SUBMISSIONS = "submissions" # Prompts and generated code
+    EVALUATIONS = "evaluations" # Evaluation notes
+
+class SearchHit(BaseModel):
+    kind: str # "submission" or "evaluation"
+    id: int
+    submission_id: Optional[int] = None
+    question_id: int
+    user_id: Optional[int] = None # The candidate
+    username: Optional[str] = None
+    evaluator_username: Optional[str] = None
+    overall_score: Optional[float] = None
+    created_at: Optional[datetime] = None
+    relevance: float
+    snippet: str
+
+class SearchResponse(BaseModel):
+    query: str
+    scope: SearchScope
+    limit: int
+    offset: int
+    has_more: bool
+    results: List[SearchHit]
+
+def _snippet(text: Optional[str], query: str) -> str:
+    """About SNIPPET_CHARS of `text` around the first occurrence of a query word."""
+    text = " ".join((text or "").split())
+    if len(text) <= SNIPPET_CHARS:
+        return text
+    lowered = text.lower()
+    positions = [p for p in (lowered.find(w.lower()) for w in _QUERY_WORD_RE.findall(query)) if p >= 0]
+    start = max(0, min(positions, default=0) - SNIPPET_CHARS // 4)
+    end = min(len(text), start + SNIPPET_CHARS)
+    return ("..." if start else "") + text[start:end] + ("..." if end < len(text) else "")
+
+def _submission_hit(row, scope: SearchScope, query: str) -> SearchHit:
+    if scope == SearchScope.CODE:
+        text = row["generated_code"]
+    elif scope == SearchScope.PROMPTS:
+        text = row["prompt"]
+    else:
+        # Show the part that matched: the prompt when it mentions a query word, otherwise the code
+        prompt = row["prompt"].lower()
+        in_prompt = any(w.lower() in prompt for w in _QUERY_WORD_RE.findall(query))
+        text = row["prompt"] if in_prompt or not row["generated_code"] else row["generated_code"]
+    return SearchHit(kind="submission", id=row["id"], submission_id=row["id"], question_id=row["question_id"],
+                     user_id=row["user_id"], username=row["username"], created_at=row["created_at"],
+                     relevance=round(float(row["relevance"]), 4), snippet=_snippet(text, query))
+
+def _evaluation_hit(row, query: str) -> SearchHit:
+    return SearchHit(kind="evaluation", id=row["id"], submission_id=row["submission_id"], question_id=row["question_id"],
+                     user_id=row["user_id"], evaluator_username=row["evaluator_username"],
+                     overall_score=float(row["overall_score"]) if row["overall_score"] is not None else None,
+                     created_at=row["created_at"], relevance=round(float(row["relevance"]), 4),
+                     snippet=_snippet(row["evaluation_notes"], query))
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=3, max_length=200, description="Words to search for"),
+    scope: SearchScope = Query(SearchScope.SUBMISSIONS),
+    boolean: bool = Query(False, description='MySQL boolean syntax: +required -excluded "exact phrase" prefix*'),
+    question_id: Optional[int] = Query(None, ge=1),
+    user_id: Optional[int] = Query(None, ge=1, description="Candidate who made the submission"),
+    start_date: Optional[date] = Query(None, description="Created on or after this day"),
+    end_date: Optional[date] = Query(None, description="Created on or before this day"),
+    limit: int = Query(20, ge=1, le=100, description="Number of results to return"),
+    offset: int = Query(0, ge=0, le=10000, description="Offset for pagination"),
+    current_user: UserResponse = Depends(get_current_admin_user)
+):
+    """
+    Full-text search over submission prompts and generated code, or evaluation notes, most relevant
+    first. Uses the FULLTEXT indexes, so words shorter than three characters and stopwords are ignored.
+    """
+    logger.info(f"User {current_user.username} searching {scope.value} for {q!r} (offset {offset}).")
+    if start_date and end_date and end_date < start_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_date is before start_date")
+    filters = dict(
+        question_id=question_id,
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date + timedelta(days=1) if end_date else None,
+        limit=limit + 1, # One extra row tells whether there is a next page
+        offset=offset,
+    )
+    if scope == SearchScope.EVALUATIONS:
+        rows = db_handler.search_evaluations(q, boolean_mode=boolean, **filters)
+        results = [_evaluation_hit(row, q) for row in rows[:limit]]
+    else:
+        rows = db_handler.search_submissions(q, scope=scope.value, boolean_mode=boolean, **filters)
+        results = [_submission_hit(row, scope, q) for row in rows[:limit]]
+    return SearchResponse(query=q, scope=scope, limit=limit, offset=offset, has_more=len(rows) > limit, results=results)
@@ -1,23 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict
-
-# Need to make get_llm_response accessible, e.g., by moving it to a utility module
-# For now, let's assume it can be imported or we'll define a similar one here.
-# from promptcraft.utils import get_llm_response 
-# Or, we can copy the logic for now if it's simple enough and not yet refactored.
-
-# Simulating get_llm_response if not refactored yet.
-# This should be replaced with the actual OpenAI call logic from cli.py or a shared util.
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+import asyncio
+import json
 import os
-from openai import OpenAI
+import time
+from contextlib import aclosing
 
 # from promptcraft.tasks.task_handler import TaskHandler  # No longer needed for database-only storage
 from promptcraft.database.db_handler import DatabaseHandler
+from promptcraft.evaluation.features import extract_features
+from promptcraft.leaderboard_cache import invalidate_user_stats
+from promptcraft.similarity.minhash import prompt_duplicate_index
+from promptcraft.similarity.vector_index import submission_vector_index
 from promptcraft.logger_config import setup_logger
+from promptcraft.llm import (LLMCallInfo, answered_model, get_llm_client, last_llm_call, last_queue_wait_ms,
+                             llm_response_cache, simulated_completion)
 from promptcraft.schemas.auth_schemas import UserResponse
 from api.routers.auth import get_current_active_user
-from promptcraft.exceptions import NotFoundException
+from promptcraft.submission_queue import submission_queue, result_channel
+from promptcraft.idempotency import IDEMPOTENCY_KEY_MAX_LENGTH, idempotency_store, request_fingerprint
+from promptcraft.exceptions import NotFoundException, LLMConnectionException, LLMProcessingException, ServiceBusyException
+from promptcraft.rate_limiter import submission_ip_limiter
 from promptcraft.error_handlers import (
     DatabaseError, 
     ExternalServiceError, 
@@ -27,36 +33,10 @@ from promptcraft.error_handlers import (
 
 logger = setup_logger(__name__)
 
-# LLM Client Setup (copied from previous, ideally in a shared util)
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-llm_client = None
-if OPENAI_API_KEY:
-    llm_client = OpenAI(api_key=OPENAI_API_KEY)
-    logger.info("OpenAI client initialized for submissions router.")
-else:
-    logger.warning("OPENAI_API_KEY not set. LLM calls in submissions router will be simulated.")
-
-def llm_response_or_simulate(prompt: str):
-    if not llm_client:
-        logger.info(f"Simulating LLM response for prompt: '{prompt[:30]}...'")
-        lower = prompt.lower()
-        if "factorial" in lower: return "```python\ndef factorial(n):\n    if n < 0: raise ValueError(\"Factorial not defined for negative numbers\")\n    if n in (0, 1): return 1\n    return n * factorial(n - 1)\n```"
-        if "sort" in lower and "array" in lower: return "```javascript\nfunction sortByProperty(array, property) {\n  return array.sort((a, b) => (a[property] > b[property] ? 1 : -1));\n}\n```"
-        if "sql" in lower and "top 5" in lower: return "```sql\nSELECT customer_id, SUM(amount) AS total_spent\nFROM purchases\nGROUP BY customer_id\nORDER BY total_spent DESC\nLIMIT 5;\n```"
-        return "```\n-- Simulated LLM response (API key missing or OpenAI client error)\n```"
-    try:
-        logger.info(f"Sending prompt to OpenAI: '{prompt[:30]}...'")
-        completion = llm_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        response_content = completion.choices[0].message.content
-        logger.info("Received response from OpenAI.")
-        return response_content
-    except Exception as e:
-        logger.error(f"Error during OpenAI API call: {e}", exc_info=True)
-        logger.warning("Falling back to simulated LLM response due to OpenAI API error.")
-        return "```\n-- Simulated LLM response (OpenAI API error occurred)\n```"
+# How long a submission WebSocket waits for a background job before giving up
+SUBMISSION_WS_TIMEOUT_SECONDS = float(os.getenv("SUBMISSION_WS_TIMEOUT_SECONDS", 120))
+# Longest a synchronous submission may spend on the LLM; clients can ask for less with X-Request-Timeout
+SUBMISSION_DEADLINE_SECONDS = float(os.getenv("SUBMISSION_DEADLINE_SECONDS", 30))
 
 router = APIRouter(
     prefix="/api/v1",
@@ -74,6 +54,8 @@ class SubmissionResponse(BaseModel):
     generated_code: str
     message: str
     submitted_by_user_id: int
+    cached: bool = False # True when the completion was served from the LLM response cache
+    queue_wait_ms: Optional[float] = None # Time spent waiting for a fair LLM slot; None if no LLM call was made
 
 class SubmissionHistoryItem(BaseModel):
     id: int
@@ -83,6 +65,14 @@ class SubmissionHistoryItem(BaseModel):
     generated_code: str
     created_at: str
     updated_at: str
+    status: str = "completed" # pending | completed | failed (background jobs)
+    error_message: Optional[str] = None
+
+class SubmissionJobResponse(BaseModel):
+    job_id: int # Same as the submission ID
+    status: str
+    status_url: str
+    websocket_url: str
 
 class SubmissionHistoryResponse(BaseModel):
     submissions: list[SubmissionHistoryItem]
@@ -90,57 +80,287 @@ class SubmissionHistoryResponse(BaseModel):
     page: int
     limit: int
 
-@router.post("/submissions", response_model=SubmissionResponse, status_code=status.HTTP_201_CREATED)
-async def create_submission_api(
-    submission: SubmissionRequest, 
-    current_user: UserResponse = Depends(get_current_active_user)
-):
-    logger.info(f"User ID {current_user.id} ({current_user.username}) creating submission for task ID {submission.task_id}.")
-    
+def _get_task_details(task_id: int, user_id: int) -> Dict[str, Any]:
     try:
-        task_details = db_handler.get_question_details(submission.task_id)
-        if not task_details:
-            logger.warning(f"Task ID {submission.task_id} not found for submission by user {current_user.id}.")
-            raise NotFoundError(f"Task with ID {submission.task_id} not found.")
+        task_details = db_handler.get_question_details(task_id)
     except Exception as e:
         logger.error(f"Database error while fetching task details: {e}")
-        raise DatabaseError("Failed to retrieve task details", {"task_id": submission.task_id})
-
-    generated_code = llm_response_or_simulate(submission.prompt)
+        raise DatabaseError("Failed to retrieve task details", {"task_id": task_id})
+    if not task_details:
+        logger.warning(f"Task ID {task_id} not found for submission by user {user_id}.")
+        raise NotFoundError(f"Task with ID {task_id} not found.")
+    return task_details
 
+def _save_submission(user_id: int, task_id: int, prompt: str, generated_code: str,
+                     llm_call: Optional[LLMCallInfo] = None, task_details: Optional[Dict[str, Any]] = None) -> int:
+    # Features are computed once here, so leaderboards and analytics never rescan the text
+    try:
+        features = extract_features(prompt, generated_code, task_details).as_dict()
+    except Exception as e:
+        logger.error(f"Feature extraction failed for user {user_id}, task {task_id}: {e}", exc_info=True)
+        features = None
     # Save to database only
     try:
         submission_id = db_handler.create_submission(
-            user_id=current_user.id,
-            question_id=submission.task_id,
-            prompt=submission.prompt,
+            user_id=user_id,
+            question_id=task_id,
+            prompt=prompt,
             generated_code=generated_code,
-            submission_file=None  # No file storage
+            submission_file=None,  # No file storage
+            llm_usage=llm_call.as_dict() if llm_call else None,
+            features=features
         )
         if not submission_id:
-            logger.error(f"Failed to create database submission record for user {current_user.id}, task {submission.task_id}")
+            logger.error(f"Failed to create database submission record for user {user_id}, task {task_id}")
             raise DatabaseError(
                 "Failed to save submission to database", 
-                {"user_id": current_user.id, "task_id": submission.task_id}
+                {"user_id": user_id, "task_id": task_id}
             )
         
-        logger.info(f"Submission by user {current_user.id} for task {submission.task_id} saved to database with ID: {submission_id}.")
+        logger.info(f"Submission by user {user_id} for task {task_id} saved to database with ID: {submission_id}.")
+        prompt_duplicate_index.add(submission_id, task_id, prompt)
+        submission_vector_index.schedule_sync(task_id) # Appends the new prompt in the background
+        invalidate_user_stats(user_id)
+        return submission_id
     except DatabaseError:
         raise  # Re-raise custom database errors
     except Exception as e:
-        logger.error(f"Unexpected error saving submission for user {current_user.id}, task {submission.task_id}: {e}", exc_info=True)
+        logger.error(f"Unexpected error saving submission for user {user_id}, task {task_id}: {e}", exc_info=True)
         raise DatabaseError(
             "Unexpected database error occurred", 
-            {"user_id": current_user.id, "task_id": submission.task_id, "error": str(e)}
+            {"user_id": user_id, "task_id": task_id, "error": str(e)}
         )
 
-    return SubmissionResponse(
-        submission_id=submission_id,
-        generated_code=generated_code,
-        message="Submission processed and recorded successfully.",
-        submitted_by_user_id=current_user.id
+def _request_deadline(request: Request) -> float:
+    """Monotonic deadline for the LLM work of this request: the X-Request-Timeout header (seconds), capped."""
+    budget = SUBMISSION_DEADLINE_SECONDS
+    header = request.headers.get("x-request-timeout")
+    if header:
+        try:
+            budget = min(budget, max(0.0, float(header)))
+        except ValueError:
+            logger.warning(f"Ignoring invalid X-Request-Timeout header: {header!r}")
+    return time.monotonic() + budget
+
+async def _run_idempotent(idempotency_key: Optional[str], scope: str, payload: BaseModel, status_code: int,
+                          produce: Callable[[], Awaitable[BaseModel]]):
+    """
+    Run `produce` once per Idempotency-Key. Duplicates wait for the first run's response and replays get the
+    stored response (marked with Idempotent-Replayed), without repeating LLM or database work.
+    """
+    if not idempotency_key:
+        return await produce()
+    fingerprint = request_fingerprint(jsonable_encoder(payload))
+    stored = await idempotency_store.reserve_or_replay(scope, idempotency_key, fingerprint)
+    if stored is not None:
+        return JSONResponse(stored["body"], status_code=stored["status_code"], headers={"Idempotent-Replayed": "true"})
+    try:
+        response = await produce()
+    except BaseException:
+        idempotency_store.release(scope, idempotency_key) # Failed attempts may be retried with the same key
+        raise
+    idempotency_store.complete(scope, idempotency_key, fingerprint, status_code, jsonable_encoder(response))
+    return response
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/submissions", response_model=SubmissionResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(submission_ip_limiter.dependency())])
+async def create_submission_api(
+    submission: SubmissionRequest, 
+    request: Request,
+    current_user: UserResponse = Depends(get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=IDEMPOTENCY_KEY_MAX_LENGTH)
+):
+    logger.info(f"User ID {current_user.id} ({current_user.username}) creating submission for task ID {submission.task_id}.")
+    deadline = _request_deadline(request)
+
+    async def produce() -> SubmissionResponse:
+        task_details = _get_task_details(submission.task_id, current_user.id)
+
+        last_queue_wait_ms.set(None)
+        last_llm_call.set(None)
+        generated_code, from_cache = await llm_response_cache.complete_or_simulate(
+            submission.prompt, question_id=submission.task_id, user_id=current_user.id, deadline=deadline)
+
+        submission_id = _save_submission(current_user.id, submission.task_id, submission.prompt, generated_code,
+                                         last_llm_call.get(), task_details)
+
+        return SubmissionResponse(
+            submission_id=submission_id,
+            generated_code=generated_code,
+            message="Submission processed and recorded successfully.",
+            submitted_by_user_id=current_user.id,
+            cached=from_cache,
+            queue_wait_ms=last_queue_wait_ms.get()
+        )
+
+    return await _run_idempotent(idempotency_key, f"submissions:{current_user.id}", submission,
+                                 status.HTTP_201_CREATED, produce)
+
+@router.post("/submissions/stream", dependencies=[Depends(submission_ip_limiter.dependency())])
+async def stream_submission_api(
+    submission: SubmissionRequest,
+    request: Request,
+    current_user: UserResponse = Depends(get_current_active_user)
+):
+    """
+    Streaming variant of POST /submissions using Server-Sent Events.
+
+    Emits "token" events ({"text": ...}) as the completion is generated, then a single "done" event
+    ({"submission_id", "cached", "queue_wait_ms"}) once the full text has been saved, or an "error" event.
+    If the client disconnects, the upstream LLM request is closed and nothing is saved.
+    """
+    logger.info(f"User ID {current_user.id} ({current_user.username}) streaming submission for task ID {submission.task_id}.")
+    task_details = _get_task_details(submission.task_id, current_user.id) # 404 before the stream starts
+    deadline = _request_deadline(request)
+
+    async def event_stream() -> AsyncIterator[str]:
+        llm_client = get_llm_client()
+        last_queue_wait_ms.set(None)
+        last_llm_call.set(None)
+        answered_model.set(None)
+        chunks = []
+        from_cache = False
+        cached = llm_response_cache.get_cached(submission.prompt, question_id=submission.task_id)
+        if cached is not None:
+            from_cache = True
+            chunks.append(cached)
+            yield _sse_event("token", {"text": cached})
+        elif not llm_client.enabled:
+            chunks.append(simulated_completion(submission.prompt, reason="API key missing"))
+            yield _sse_event("token", {"text": chunks[0]})
+        else:
+            try:
+                async with aclosing(llm_client.stream(submission.prompt, user_id=current_user.id, deadline=deadline,
+                                                     question_id=submission.task_id)) as tokens:
+                    async for text in tokens:
+                        if await request.is_disconnected():
+                            logger.info(f"Client disconnected during streamed submission for task {submission.task_id}; cancelling LLM request.")
+                            return
+                        chunks.append(text)
+                        yield _sse_event("token", {"text": text})
+            except (LLMConnectionException, LLMProcessingException) as e:
+                if chunks:
+                    # Part of the answer was already sent; don't save a truncated completion
+                    yield _sse_event("error", {"detail": e.detail})
+                    return
+                logger.warning(f"Falling back to simulated LLM response: {e.detail}")
+                chunks.append(simulated_completion(submission.prompt, reason="LLM API error occurred"))
+                yield _sse_event("token", {"text": chunks[0]})
+            else:
+                llm_response_cache.put(submission.prompt, "".join(chunks), question_id=submission.task_id,
+                                       model=answered_model.get())
+
+        try:
+            submission_id = _save_submission(current_user.id, submission.task_id, submission.prompt, "".join(chunks),
+                                             last_llm_call.get(), task_details)
+        except DatabaseError as e:
+            yield _sse_event("error", {"detail": e.message})
+            return
+        yield _sse_event("done", {"submission_id": submission_id, "cached": from_cache,
+                                  "queue_wait_ms": last_queue_wait_ms.get()})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, # Disable proxy buffering
     )
 
+@router.post("/submissions/async", response_model=SubmissionJobResponse, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(submission_ip_limiter.dependency())])
+async def create_submission_job_api(
+    submission: SubmissionRequest,
+    current_user: UserResponse = Depends(get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=IDEMPOTENCY_KEY_MAX_LENGTH)
+):
+    """
+    Queue a submission for a background worker and return immediately with 202 Accepted.
+    Poll GET /submissions/{job_id} or connect to the WebSocket for the result.
+    """
+    logger.info(f"User ID {current_user.id} ({current_user.username}) queueing submission for task ID {submission.task_id}.")
+
+    async def produce() -> SubmissionJobResponse:
+        _get_task_details(submission.task_id, current_user.id)
+
+        submission_id = db_handler.create_pending_submission(current_user.id, submission.task_id, submission.prompt)
+        if not submission_id:
+            raise DatabaseError("Failed to save submission to database", {"user_id": current_user.id, "task_id": submission.task_id})
+        if not submission_queue.enqueue(submission_id, current_user.id, submission.task_id, submission.prompt):
+            db_handler.complete_submission(submission_id, None, status="failed", error_message="Job queue unavailable")
+            raise ServiceBusyException(detail="Submission queue is unavailable or full. Please retry shortly.")
+        prompt_duplicate_index.add(submission_id, submission.task_id, submission.prompt)
+        submission_vector_index.schedule_sync(submission.task_id)
+
+        return SubmissionJobResponse(
+            job_id=submission_id,
+            status="pending",
+            status_url=f"/api/v1/submissions/{submission_id}",
+            websocket_url=f"/api/v1/submissions/{submission_id}/ws",
+        )
+
+    return await _run_idempotent(idempotency_key, f"submissions-async:{current_user.id}", submission,
+                                 status.HTTP_202_ACCEPTED, produce)
+
+@router.websocket("/submissions/{submission_id}/ws")
+async def submission_result_websocket(websocket: WebSocket, submission_id: int, token: str):
+    """
+    Push the result of a queued submission as one JSON message, then close.
+    Browsers cannot set an Authorization header on WebSockets, so the access token is passed as ?token=.
+    """
+    await websocket.accept()
+    try:
+        current_user = await get_current_active_user(token)
+    except HTTPException:
+        await websocket.close(code=1008) # Policy violation
+        return
+
+    # DB calls are blocking; run them off the loop so other connections keep being served. The shared
+    # db_handler holds a single connection, so this connection's calls (one at a time) get their own
+    ws_db_handler = DatabaseHandler()
+    submission = await asyncio.to_thread(ws_db_handler.get_submission_by_id, submission_id)
+    if not submission or submission['user_id'] != current_user.id:
+        await websocket.close(code=1008)
+        return
+
+    client, pubsub = submission_queue.async_pubsub()
+    try:
+        # Subscribe before re-reading the row so a completion between the two cannot be missed
+        subscribed = True
+        try:
+            await pubsub.subscribe(result_channel(submission_id))
+        except Exception as e:
+            logger.warning(f"Cannot subscribe for submission {submission_id} results, polling instead: {e}")
+            subscribed = False
+
+        deadline = asyncio.get_running_loop().time() + SUBMISSION_WS_TIMEOUT_SECONDS
+        while True:
+            submission = await asyncio.to_thread(ws_db_handler.get_submission_by_id, submission_id)
+            if submission and submission.get('status', 'completed') != 'pending':
+                await websocket.send_json({
+                    "submission_id": submission_id,
+                    "status": submission.get('status', 'completed'),
+                    "generated_code": submission.get('generated_code'),
+                    "error_message": submission.get('error_message'),
+                })
+                break
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                await websocket.send_json({"submission_id": submission_id, "status": "pending", "detail": "Timed out waiting for result."})
+                break
+            if subscribed:
+                # Wake on the worker's notification (or re-check after a few seconds in case it was lost)
+                await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 5))
+            else:
+                await asyncio.sleep(min(remaining, 1))
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Client disconnected while waiting for submission {submission_id}.")
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
 @router.get("/submissions/my", response_model=SubmissionHistoryResponse)
 async def get_my_submissions(
     page: int = 1,
@@ -169,7 +389,9 @@ async def get_my_submissions(
                 prompt=sub['prompt'],
                 generated_code=sub['generated_code'] or "",
                 created_at=sub['created_at'].isoformat() if sub['created_at'] else "",
-                updated_at=sub['updated_at'].isoformat() if sub['updated_at'] else ""
+                updated_at=sub['updated_at'].isoformat() if sub['updated_at'] else "",
+                status=sub.get('status') or "completed",
+                error_message=sub.get('error_message')
             ))
         
         logger.info(f"Retrieved {len(submission_items)} submissions for user {current_user.id} (page {page}, limit {limit})")
@@ -211,7 +433,9 @@ async def get_submission_by_id(
             prompt=submission['prompt'],
             generated_code=submission['generated_code'] or "",
             created_at=submission['created_at'].isoformat() if submission['created_at'] else "",
-            updated_at=submission['updated_at'].isoformat() if submission['updated_at'] else ""
+            updated_at=submission['updated_at'].isoformat() if submission['updated_at'] else "",
+            status=submission.get('status') or "completed",
+            error_message=submission.get('error_message')
         )
     except HTTPException:
         raise
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Score pending submissions automatically by running each question's test harness
+against the generated code in sandboxed processes.
+
+Evaluations are recorded under an existing user account (the evaluator), so
+re-running the script only picks up submissions that account has not scored yet.
+
+Candidate code is only run isolated (network namespace, chroot, unprivileged uid), which
+needs root on Linux; in Docker run it with --user root --cap-add SYS_ADMIN.
+
+Usage:
+    python auto_evaluate.py --evaluator autograder [--processes 8] [--batch-size 500] [--limit 10000]
+"""
+import argparse
+import json
+import os
+import sys
+
+from promptcraft.database.db_handler import DatabaseHandler
+from promptcraft.evaluation.auto_evaluator import (AUTO_EVALUATION_BATCH_SIZE, AUTO_EVALUATION_PROCESSES,
+                                                   AutoEvaluator)
+from promptcraft.evaluation.evaluator import Evaluator
+from promptcraft.evaluation.sandbox import SandboxLimits
+from promptcraft.exceptions import SandboxUnavailableException
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger("auto_evaluate")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PromptCraft automated evaluation")
+    parser.add_argument("--evaluator", default=os.getenv("AUTO_EVALUATOR_USERNAME"), help="Username the evaluations are recorded under")
+    parser.add_argument("--processes", "-p", type=int, default=AUTO_EVALUATION_PROCESSES, help="Sandbox runs in parallel")
+    parser.add_argument("--batch-size", type=int, default=AUTO_EVALUATION_BATCH_SIZE, help="Submissions fetched per query")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many submissions")
+    args = parser.parse_args()
+
+    if not args.evaluator:
+        parser.error("--evaluator (or AUTO_EVALUATOR_USERNAME) is required")
+    db_handler = DatabaseHandler()
+    user = db_handler.get_user_by_username(args.evaluator)
+    if not user:
+        print(f"Evaluator user '{args.evaluator}' not found.", file=sys.stderr)
+        sys.exit(1)
+
+    auto_evaluator = AutoEvaluator(user["id"], user["username"], evaluator=Evaluator(use_database=True),
+                                   processes=args.processes, limits=SandboxLimits())
+    try:
+        stats = auto_evaluator.run(batch_size=args.batch_size, max_submissions=args.limit)
+    except SandboxUnavailableException as e:
+        print(f"Cannot run candidate code safely: {e.detail}", file=sys.stderr)
+        sys.exit(1)
+    logger.info(f"Auto-evaluation finished: {stats}")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Compute submission_features rows for submissions saved before feature extraction
+existed, or with an older FEATURE_VERSION. Safe to re-run; it only picks up rows
+that still need features. initialize_database.py runs the same backfill on deploy.
+
+Usage:
+    python backfill_features.py [--batch-size 1000]
+"""
+import argparse
+
+from promptcraft.database.db_handler import DatabaseHandler
+from promptcraft.evaluation.features import backfill_features
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill PromptCraft submission features")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Submissions per query and transaction")
+    args = parser.parse_args()
+    total = backfill_features(DatabaseHandler(), args.batch_size)
+    print(f"Backfilled features for {total} submissions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request cost of authenticating a bearer token.
+
+Measures auth_utils.decode_token and the get_current_active_user dependency,
+with the verified-payload cache disabled and enabled. The user lookup is served
+from a local dict in place of Redis/MySQL so only token handling is measured.
+
+Usage:
+    python benchmarks/auth_token_benchmark.py [--iterations 20000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+os.environ.setdefault("ENABLE_FILE_LOGGING", "false")
+
+from promptcraft import auth_utils
+
+USER = {
+    "id": 1, "email": "bench@example.com", "username": "bench", "full_name": "Bench User",
+    "is_active": True, "is_verified": True, "created_at": "2025-01-01T00:00:00",
+}
+
+
+def _time_per_op(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6  # microseconds
+
+
+def run(iterations):
+    from api.routers import auth
+    auth.user_cache.get_cached_user = lambda user_id: USER  # Isolate token handling from Redis/MySQL
+
+    token = auth_utils.create_access_token({"sub": "1", "username": "bench"})
+    loop = asyncio.new_event_loop()
+
+    def dependency():
+        loop.run_until_complete(auth.get_current_active_user(token))
+
+    results = []
+    for label, enabled in (("no cache", False), ("cache", True)):
+        auth_utils.JWT_PAYLOAD_CACHE_SIZE = auth_utils.token_payload_cache.max_size if enabled else 0
+        auth_utils.token_payload_cache.clear()
+        decode_us = _time_per_op(lambda: auth_utils.decode_token(token), iterations)
+        dependency_us = _time_per_op(dependency, iterations)
+        results.append((label, decode_us, dependency_us))
+    loop.close()
+
+    print(f"{'mode':<12}{'decode_token us':>18}{'dependency us':>16}")
+    for label, decode_us, dependency_us in results:
+        print(f"{label:<12}{decode_us:>18.1f}{dependency_us:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PromptCraft auth token benchmark")
+    parser.add_argument("--iterations", "-n", type=int, default=20000, help="Operations per measurement")
+    args = parser.parse_args()
+    run(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
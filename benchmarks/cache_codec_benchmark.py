@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Redis cache codecs on representative PromptCraft payloads.
+
+Reports encode/decode time and bytes stored for every serializer/compression
+combination available in the current environment. No Redis server is needed.
+
+Usage:
+    python benchmarks/cache_codec_benchmark.py [--iterations 2000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from promptcraft.cache_codecs import CacheCodec, SERIALIZER_NAMES, COMPRESSION_NAMES
+
+WORDS = (
+    "write a function that returns the sorted list of unique values handling empty input "
+    "negative numbers and large arrays efficiently with clear docstrings and type hints"
+).split()
+
+
+def _sentence(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def build_payloads(seed=42):
+    """Build payloads shaped like the values the API actually caches."""
+    rng = random.Random(seed)
+    question_list = [{"id": i, "description": _sentence(rng, 40)} for i in range(1, 51)]
+    question_detail = {
+        "id": 7,
+        "description": _sentence(rng, 60),
+        "expected_outcome": _sentence(rng, 30),
+        "evaluation_criteria": [_sentence(rng, 8) for _ in range(5)],
+        "programming_language": "Python",
+        "difficulty_level": "Medium",
+    }
+    leaderboard_page = {
+        "entries": [
+            {
+                "user_id": i,
+                "username": f"user{i}",
+                "full_name": f"User Number {i}",
+                "profile_photo_url": f"https://gateway.pinata.cloud/ipfs/Qm{i:044d}",
+                "rank": i,
+                "score": round(rng.uniform(30, 100), 1),
+                "total_submissions": rng.randint(1, 200),
+                "completed_questions": rng.randint(1, 20),
+                "avg_score": round(rng.uniform(30, 100), 1),
+                "recent_activity": "2025-06-01T12:00:00",
+                "badge": None,
+            }
+            for i in range(1, 51)
+        ],
+        "total_users": 1234,
+        "current_user_rank": 17,
+    }
+    return {
+        "question_detail": question_detail,
+        "question_list": question_list,
+        "leaderboard_page": leaderboard_page,
+    }
+
+
+def _time_per_op(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6  # microseconds
+
+
+def run(iterations):
+    payloads = build_payloads()
+    codecs = []
+    for serializer in SERIALIZER_NAMES:
+        for compression in COMPRESSION_NAMES:
+            codec = CacheCodec(serializer=serializer, compression=compression, compress_min_bytes=1024)
+            # Skip combinations that fell back because a module is not installed
+            if codec.serializer_id != SERIALIZER_NAMES[serializer] or codec.compression_id != COMPRESSION_NAMES[compression]:
+                continue
+            codecs.append((f"{serializer}+{compression}", codec))
+
+    print(f"{'payload':<18}{'codec':<18}{'bytes':>9}{'encode us':>12}{'decode us':>12}")
+    for payload_name, payload in payloads.items():
+        legacy = json.dumps(payload).encode("utf-8")
+        legacy_encode = _time_per_op(lambda: json.dumps(payload), iterations)
+        legacy_decode = _time_per_op(lambda: json.loads(legacy), iterations)
+        print(f"{payload_name:<18}{'legacy json':<18}{len(legacy):>9}{legacy_encode:>12.1f}{legacy_decode:>12.1f}")
+        for codec_name, codec in codecs:
+            encoded = codec.encode(payload)
+            assert codec.decode(encoded) == json.loads(legacy)
+            encode_us = _time_per_op(lambda: codec.encode(payload), iterations)
+            decode_us = _time_per_op(lambda: codec.decode(encoded), iterations)
+            print(f"{'':<18}{codec_name:<18}{len(encoded):>9}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PromptCraft cache codec benchmark")
+    parser.add_argument("--iterations", "-n", type=int, default=2000, help="Operations per measurement")
+    args = parser.parse_args()
+    run(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
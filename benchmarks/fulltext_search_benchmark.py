@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark full-text search over submissions and evaluations on a synthetic corpus.
+
+Creates a scratch MySQL database (--database, dropped afterwards unless --keep)
+with the PromptCraft schema, fills it with --submissions synthetic prompts and
+code and --evaluations notes, then times DatabaseHandler.search_submissions and
+search_evaluations (FULLTEXT, relevance-ranked) against the LIKE '%term%' scan
+they replace. Uses the MYSQL_* connection settings; the user needs CREATE/DROP
+rights on the scratch database.
+
+Usage:
+    python benchmarks/fulltext_search_benchmark.py [--submissions 200000] [--evaluations 50000]
+        [--repeat 20] [--database promptcraft_search_bench] [--keep]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+os.environ.setdefault("ENABLE_FILE_LOGGING", "false")
+
+COMMON_WORDS = (
+    "write function returns value input output list array string number handle case should using python "
+    "javascript query table sort order result element index loop return print test check error data type "
+    "parameter variable class method object key map filter reduce file line count sum average maximum minimum"
+).split()
+# Rarer topic words, searched for below; their frequency falls off with their position
+TOPIC_WORDS = ("recursion memoization binary search pagination concurrency deadlock regex tokenizer "
+               "fibonacci palindrome dijkstra heap trie backtracking").split()
+QUERIES = ["recursion", "memoization", "binary search", "dijkstra heap", "palindrome"]
+QUESTIONS = 20
+USERS = 200
+
+
+def _text(rng, words):
+    tokens = rng.choices(COMMON_WORDS, k=words)
+    for _ in range(rng.randint(0, 2)):
+        rank = min(int(rng.expovariate(0.35)), len(TOPIC_WORDS) - 1)
+        tokens.insert(rng.randrange(len(tokens) + 1), TOPIC_WORDS[rank])
+    return " ".join(tokens)
+
+
+def seed(db_handler, submissions, evaluations, batch_size, rng):
+    conn = db_handler.connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM submissions")
+    if cursor.fetchone()[0] >= submissions:
+        print("Reusing the existing corpus.")
+        cursor.close()
+        db_handler.close()
+        return
+    started = time.perf_counter()
+    cursor.executemany("INSERT INTO users (email, username, hashed_password) VALUES (%s, %s, 'x')",
+                       [(f"bench{i}@example.com", f"bench{i}") for i in range(USERS)])
+    cursor.executemany("INSERT INTO questions (description) VALUES (%s)", [(f"Question {i}",) for i in range(QUESTIONS)])
+    conn.commit()
+    cursor.execute("SELECT MIN(id) FROM users")
+    first_user = cursor.fetchone()[0]
+    cursor.execute("SELECT MIN(id) FROM questions")
+    first_question = cursor.fetchone()[0]
+    for start in range(0, submissions, batch_size):
+        cursor.executemany("""
+            INSERT INTO submissions (user_id, question_id, prompt, generated_code, created_at)
+            VALUES (%s, %s, %s, %s, NOW() - INTERVAL %s MINUTE)
+        """, [(first_user + rng.randrange(USERS), first_question + rng.randrange(QUESTIONS), _text(rng, 40),
+               f"def solve(data):\n    # {_text(rng, 12)}\n    return data", rng.randrange(525600))
+              for _ in range(min(batch_size, submissions - start))])
+        conn.commit()
+    cursor.execute("SELECT MIN(id), MAX(id) FROM submissions")
+    first_submission, last_submission = cursor.fetchone()
+    for start in range(0, evaluations, batch_size):
+        rows = []
+        for _ in range(min(batch_size, evaluations - start)):
+            submission_id = rng.randint(first_submission, last_submission)
+            rows.append((f"user_{submission_id}", first_question + rng.randrange(QUESTIONS), submission_id,
+                         first_user, "bench0", "prompt", _text(rng, 30), rng.uniform(0, 100)))
+        cursor.executemany("""
+            INSERT INTO evaluations (candidate_id, task_id, submission_id, evaluator_user_id, evaluator_username,
+                                     prompt_evaluated, evaluation_notes, overall_score)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        conn.commit()
+    cursor.close()
+    db_handler.close()
+    print(f"Seeded {submissions} submissions and {evaluations} evaluations in {time.perf_counter() - started:.1f} s.")
+
+
+def _timed(fn, repeat):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    durations.sort()
+    return result, statistics.median(durations), durations[min(len(durations) - 1, int(0.95 * len(durations)))]
+
+
+def _like_scan(db_handler, column, table, term):
+    conn = db_handler.connect()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT id FROM {table} WHERE {column} LIKE %s ORDER BY id DESC LIMIT 20", (f"%{term}%",))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        db_handler.close()
+
+
+def run(db_handler, repeat):
+    print(f"{'query':<16} {'scope':<12} {'hits':>5} {'FULLTEXT p50/p95 ms':>21} {'LIKE p50/p95 ms':>17}")
+    for query in QUERIES:
+        for scope, table, column in (("prompts", "submissions", "prompt"), ("code", "submissions", "generated_code"),
+                                     ("evaluations", "evaluations", "evaluation_notes")):
+            if scope == "evaluations":
+                search = lambda: db_handler.search_evaluations(query, limit=20)
+            else:
+                search = lambda: db_handler.search_submissions(query, scope=scope, limit=20)
+            rows, p50, p95 = _timed(search, repeat)
+            _, like_p50, like_p95 = _timed(lambda: _like_scan(db_handler, column, table, query.split()[0]), max(1, repeat // 5))
+            print(f"{query:<16} {scope:<12} {len(rows):>5} {p50:>10.1f}/{p95:<10.1f} {like_p50:>8.1f}/{like_p95:<8.1f}")
+    # Deep pages and filters: relevance ranking still has to score every match
+    for label, kwargs in (("offset 2000", {"offset": 2000}), ("question filter", {"question_id": 1}),
+                          ("last 30 days", {"start_date": time.strftime("%Y-%m-%d", time.localtime(time.time() - 30 * 86400))})):
+        _, p50, p95 = _timed(lambda: db_handler.search_submissions("recursion", limit=20, **kwargs), repeat)
+        print(f"{'recursion':<16} {label:<12} {'':>5} {p50:>10.1f}/{p95:<10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PromptCraft full-text search")
+    parser.add_argument("--submissions", type=int, default=200000)
+    parser.add_argument("--evaluations", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query")
+    parser.add_argument("--database", default="promptcraft_search_bench", help="Scratch database (never the app's)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database for later runs")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["MYSQL_DATABASE"] = args.database
+    from promptcraft.database.db_handler import DatabaseHandler
+    db_handler = DatabaseHandler()
+    db_handler.ensure_database_exists()
+    db_handler.initialize_tables()
+    try:
+        seed(db_handler, args.submissions, args.evaluations, args.batch_size, random.Random(args.seed))
+        run(db_handler, args.repeat)
+    finally:
+        if not args.keep:
+            conn = db_handler.connect()
+            cursor = conn.cursor()
+            cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+            cursor.close()
+            db_handler.close()
+            print(f"Dropped scratch database {args.database}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible chat completions server for load testing.
+
+Serves POST /v1/chat/completions (plain and streaming) and GET /v1/models.
+Unlike simulate_llm_response, it behaves like a real provider over HTTP:
+
+- time to first token is drawn from a log-normal distribution (median and sigma),
+- the completion is produced at a configurable token rate,
+- a configurable fraction of requests fail with 429/500/503,
+- answers come from the built-in simulated responses, a template, or a JSON file
+  mapping prompt keywords to canned answers.
+
+Point PromptCraft at it with OPENAI_BASE_URL=http://127.0.0.1:8100/v1 and any
+non-empty OPENAI_API_KEY.
+
+Usage:
+    python benchmarks/mock_llm_server.py [--port 8100] [--latency-ms 400] [--sigma 0.5]
+        [--tokens-per-second 50] [--error-rate 0.02] [--template "Answer: {prompt}"]
+        [--responses canned.json] [--seed 1]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+os.environ.setdefault("ENABLE_FILE_LOGGING", "false")
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from promptcraft.llm.simulation import simulate_llm_response
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+_ERRORS = {
+    429: ("rate_limit_error", "Rate limit reached for requests (mock)."),
+    500: ("server_error", "The server had an error while processing your request (mock)."),
+    503: ("server_error", "The engine is currently overloaded (mock)."),
+}
+
+
+@dataclass
+class MockLLMConfig:
+    latency_ms: float = float(os.getenv("MOCK_LLM_LATENCY_MS", 400)) # Median time to first token
+    latency_sigma: float = float(os.getenv("MOCK_LLM_LATENCY_SIGMA", 0.5)) # Log-normal spread; 0 = fixed
+    tokens_per_second: float = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", 50)) # 0 = instant
+    error_rate: float = float(os.getenv("MOCK_LLM_ERROR_RATE", 0.0))
+    error_statuses: List[int] = field(default_factory=lambda: [429, 500, 503])
+    template: Optional[str] = os.getenv("MOCK_LLM_TEMPLATE") or None # e.g. "Answer to: {prompt}"
+    responses: Dict[str, str] = field(default_factory=dict) # keyword (lower case) -> canned answer
+    seed: Optional[int] = None
+
+
+def split_tokens(text: str) -> List[str]:
+    """Word-sized chunks standing in for model tokens."""
+    return _TOKEN_RE.findall(text)
+
+
+class MockLLM:
+    def __init__(self, config: MockLLMConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.requests = 0
+        self.errors = 0
+
+    def first_token_delay(self) -> float:
+        median = self.config.latency_ms / 1000.0
+        if median <= 0:
+            return 0.0
+        if self.config.latency_sigma <= 0:
+            return median
+        return self.random.lognormvariate(math.log(median), self.config.latency_sigma)
+
+    def token_delay(self) -> float:
+        return 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+
+    def pick_error(self) -> Optional[int]:
+        if self.config.error_rate > 0 and self.random.random() < self.config.error_rate:
+            return self.random.choice(self.config.error_statuses)
+        return None
+
+    def answer(self, prompt: str) -> str:
+        lower = prompt.lower()
+        for keyword, response in self.config.responses.items():
+            if keyword in lower:
+                return response
+        if self.config.template:
+            return self.config.template.format(prompt=prompt)
+        return simulate_llm_response(prompt, reason="mock LLM server")
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list): # Content parts
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _error_response(status_code: int) -> JSONResponse:
+    error_type, message = _ERRORS.get(status_code, ("server_error", "Mock error."))
+    headers = {"retry-after": "1"} if status_code == 429 else None
+    return JSONResponse({"error": {"message": message, "type": error_type, "code": None}},
+                        status_code=status_code, headers=headers)
+
+
+def create_app(config: Optional[MockLLMConfig] = None) -> FastAPI:
+    mock = MockLLM(config or MockLLMConfig())
+    app = FastAPI(title="PromptCraft mock LLM")
+    app.state.mock = mock
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "promptcraft"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": mock.requests, "errors": mock.errors}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        mock.requests += 1
+        model = body.get("model", "mock-model")
+        prompt = _prompt_text(body.get("messages", []))
+
+        await asyncio.sleep(mock.first_token_delay())
+        status_code = mock.pick_error()
+        if status_code is not None:
+            mock.errors += 1
+            return _error_response(status_code)
+
+        tokens = split_tokens(mock.answer(prompt))
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+        if max_tokens:
+            tokens = tokens[:int(max_tokens)]
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        usage = {"prompt_tokens": len(split_tokens(prompt)), "completion_tokens": len(tokens)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            await asyncio.sleep(len(tokens) * mock.token_delay())
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra: Any) -> str:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events() -> AsyncIterator[str]:
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                await asyncio.sleep(mock.token_delay())
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            if include_usage:
+                usage_chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                               "model": model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(usage_chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def load_responses(path: Optional[str]) -> Dict[str, str]:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {keyword.lower(): answer for keyword, answer in json.load(f).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("MOCK_LLM_PORT", 8100)))
+    defaults = MockLLMConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Median time to first token")
+    parser.add_argument("--sigma", type=float, default=defaults.latency_sigma, help="Log-normal sigma of the latency")
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fraction of requests that fail")
+    parser.add_argument("--error-statuses", default="429,500,503", help="Statuses to fail with, e.g. 429,503")
+    parser.add_argument("--template", default=defaults.template, help="Answer template; {prompt} is substituted")
+    parser.add_argument("--responses", help="JSON file mapping prompt keywords to canned answers")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible latencies and errors")
+    args = parser.parse_args()
+
+    config = MockLLMConfig(
+        latency_ms=args.latency_ms, latency_sigma=args.sigma, tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate, error_statuses=[int(s) for s in args.error_statuses.split(",") if s.strip()],
+        template=args.template, responses=load_responses(args.responses), seed=args.seed,
+    )
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark LLM submission throughput against the local mock LLM server.
+
+Starts benchmarks/mock_llm_server.py in-process on a free port (or uses
+--base-url), points a fresh LLMClient at it and sends --requests completions
+from --users simulated users, --concurrency at a time. Reports throughput,
+end-to-end latency percentiles, scheduler queue wait and hedging. Nothing
+leaves the machine.
+
+Usage:
+    python benchmarks/submission_throughput_benchmark.py [--requests 200] [--concurrency 50]
+        [--users 10] [--latency-ms 400] [--tokens-per-second 50] [--error-rate 0.02] [--stream]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+os.environ.setdefault("ENABLE_FILE_LOGGING", "false")
+
+from benchmarks.mock_llm_server import MockLLMConfig, create_app
+from promptcraft.exceptions import LLMConnectionException, LLMProcessingException
+from promptcraft.llm import LLMClient
+
+PROMPTS = [
+    "Write a factorial function in Python",
+    "Sort an array of objects by a property in JavaScript",
+    "Write a SQL query for the top 5 customers by total purchases",
+    "Explain the difference between a list and a tuple",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock_server(config: MockLLMConfig) -> str:
+    """Run the mock server on a background thread and return its base URL."""
+    import uvicorn
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Mock LLM server did not start.")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+async def run(base_url, requests, concurrency, users, stream):
+    client = LLMClient(api_key="mock", base_url=base_url, max_concurrency=concurrency)
+    gate = asyncio.Semaphore(concurrency) # Offered load: at most this many submissions open at once
+    latencies, failures = [], 0
+
+    async def submit(i):
+        nonlocal failures
+        prompt, user_id = PROMPTS[i % len(PROMPTS)], i % users
+        async with gate:
+            started = time.monotonic()
+            try:
+                if stream:
+                    async for _ in client.stream(prompt, user_id=user_id):
+                        pass
+                else:
+                    await client.complete(prompt, user_id=user_id)
+                latencies.append(time.monotonic() - started)
+            except (LLMConnectionException, LLMProcessingException):
+                failures += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(submit(i) for i in range(requests)))
+    elapsed = time.monotonic() - started
+    stats = client.stats()
+    await client.aclose()
+
+    ordered = sorted(latencies)
+    print(f"requests {requests}  concurrency {concurrency}  users {users}  mode {'stream' if stream else 'complete'}")
+    print(f"throughput      {len(latencies) / elapsed:8.1f} req/s  ({elapsed:.2f}s total, {failures} failed)")
+    if ordered:
+        print(f"latency  p50    {_percentile(ordered, 0.5) * 1000:8.0f} ms")
+        print(f"latency  p95    {_percentile(ordered, 0.95) * 1000:8.0f} ms")
+        print(f"latency  p99    {_percentile(ordered, 0.99) * 1000:8.0f} ms")
+        print(f"latency  mean   {statistics.mean(ordered) * 1000:8.0f} ms")
+    scheduler = stats["scheduler"] or {}
+    print(f"queue wait avg  {scheduler.get('avg_wait_ms', 0):8.0f} ms  (max {scheduler.get('max_wait_ms', 0):.0f} ms)")
+    print(f"retries {stats['retries']}  hedges sent {stats['hedging']['sent']}  won {stats['hedging']['won']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PromptCraft LLM submission throughput benchmark")
+    parser.add_argument("--requests", "-n", type=int, default=200)
+    parser.add_argument("--concurrency", "-c", type=int, default=50)
+    parser.add_argument("--users", "-u", type=int, default=10)
+    parser.add_argument("--stream", action="store_true", help="Use streaming completions")
+    parser.add_argument("--base-url", help="Use an already running OpenAI-compatible server instead of starting one")
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    base_url = args.base_url or start_mock_server(MockLLMConfig(
+        latency_ms=args.latency_ms, latency_sigma=args.sigma, tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate, seed=args.seed,
+    ))
+    asyncio.run(run(base_url, args.requests, args.concurrency, max(1, args.users), args.stream))
+
+
+if __name__ == "__main__":
+    main()
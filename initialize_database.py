@@ -48,7 +48,15 @@ def main():
                 "Mentions handling edge cases (negative numbers, zero)"
             ],
             "programming_language": "Python",
-            "difficulty_level": "Easy"
+            "difficulty_level": "Easy",
+            # Run against the generated code by auto_evaluate.py
+            "test_harness": (
+                "def test_base_cases():\n"
+                "    assert factorial(0) == 1 and factorial(1) == 1\n"
+                "\n"
+                "def test_larger_values():\n"
+                "    assert factorial(5) == 120 and factorial(10) == 3628800\n"
+            )
         },
         {
             "description": "Create a JavaScript function to sort an array of objects by a specific property.",
@@ -84,10 +92,16 @@ def main():
             expected_outcome=question_data["expected_outcome"],
             evaluation_criteria=question_data["evaluation_criteria"],
             programming_language=question_data["programming_language"],
-            difficulty_level=question_data["difficulty_level"]
+            difficulty_level=question_data["difficulty_level"],
+            test_harness=question_data.get("test_harness")
         )
     
     print("Database initialization complete. Sample questions have been added.")
 
+    # Score submissions saved before feature extraction existed (or with an older FEATURE_VERSION);
+    # until then the leaderboard counts them as having produced no code
+    from promptcraft.evaluation.features import backfill_features
+    print(f"Backfilled features for {backfill_features(db_handler)} submissions.")
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
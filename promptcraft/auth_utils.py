@@ -1,8 +1,12 @@
 # promptcraft/auth_utils.py
+import hashlib
 import os
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone # Ensure timezone awareness
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -13,11 +17,24 @@ from promptcraft.exceptions import BadRequestException # For token validation er
 logger = setup_logger(__name__)
 
 # --- Password Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor. Pinning min/max to the same value makes passlib flag hashes
+# made at any other cost as needing an update, so they get rehashed on login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Returns (valid, new_hash). new_hash is set only when the password is valid and the stored hash is outdated."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -52,10 +69,67 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# --- Verified Token Cache ---
+# Clients re-send the same access token on every request. Payloads that passed
+# verification are kept in a bounded LRU, keyed by a SHA-256 of the token string,
+# until the token's own "exp", so repeat requests skip the HMAC check and JSON decode.
+JWT_PAYLOAD_CACHE_SIZE = int(os.getenv("JWT_PAYLOAD_CACHE_SIZE", 4096)) # 0 disables
+
+class _TokenPayloadCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(payload) # Callers may mutate their copy
+
+    def put(self, key: bytes, payload: Dict[str, Any]) -> None:
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return # Never cache a token that does not expire
+        with self._lock:
+            self._entries[key] = (float(expires_at), dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+token_payload_cache = _TokenPayloadCache(JWT_PAYLOAD_CACHE_SIZE)
+
 # --- JWT Token Decoding/Validation (Basic) ---
 def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    cache_key = None
+    if JWT_PAYLOAD_CACHE_SIZE > 0:
+        cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+        cached = token_payload_cache.get(cache_key)
+        if cached is not None:
+            return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if cache_key is not None:
+            token_payload_cache.put(cache_key, payload)
         return payload
     except JWTError as e:
         logger.error(f"JWT decoding/validation error: {e}")
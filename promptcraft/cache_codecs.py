@@ -0,0 +1,194 @@
+"""
+Binary value codecs for the PromptCraft Redis cache.
+
+Every value written by RedisCache is framed with a small header so that the
+serializer and compression used to produce it travel with the value itself:
+
+    byte 0   MAGIC (0x00) - never the first byte of a JSON document
+    byte 1   serializer id (json / orjson / msgpack)
+    byte 2   compression id (none / zlib / zstd)
+    byte 3+  payload
+
+Values without the magic byte are treated as legacy plain-JSON strings, which
+lets old and new formats coexist in Redis while a rollout is in progress.
+orjson, msgpack and zstandard are optional; when a module is missing the codec
+falls back to the standard library (json / zlib).
+"""
+import json
+import os
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+MAGIC = 0x00
+
+# Serializer ids (byte 1). Never renumber: ids are persisted inside cached values.
+SERIALIZER_JSON = 1
+SERIALIZER_ORJSON = 2
+SERIALIZER_MSGPACK = 3
+
+# Compression ids (byte 2).
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+SERIALIZER_NAMES = {"json": SERIALIZER_JSON, "orjson": SERIALIZER_ORJSON, "msgpack": SERIALIZER_MSGPACK}
+COMPRESSION_NAMES = {"none": COMPRESSION_NONE, "zlib": COMPRESSION_ZLIB, "zstd": COMPRESSION_ZSTD}
+
+# Configuration from environment variables
+CACHE_CODEC = os.getenv("CACHE_CODEC", "auto").lower()  # auto | json | orjson | msgpack
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "auto").lower()  # auto | none | zlib | zstd
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 1024))
+CACHE_ZLIB_LEVEL = int(os.getenv("CACHE_ZLIB_LEVEL", 6))
+CACHE_ZSTD_LEVEL = int(os.getenv("CACHE_ZSTD_LEVEL", 3))
+
+
+class CodecError(ValueError):
+    """Raised when a value cannot be encoded or decoded."""
+
+
+# --- Serializers ---
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data)
+
+def _orjson_dumps(value: Any) -> bytes:
+    # OPT_NON_STR_KEYS keeps parity with json.dumps for dicts keyed by ints
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+def _orjson_loads(data: bytes) -> Any:
+    return orjson.loads(data)
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+def _available_serializers() -> Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    serializers = {SERIALIZER_JSON: (_json_dumps, _json_loads)}
+    if orjson is not None:
+        serializers[SERIALIZER_ORJSON] = (_orjson_dumps, _orjson_loads)
+    if msgpack is not None:
+        serializers[SERIALIZER_MSGPACK] = (_msgpack_dumps, _msgpack_loads)
+    return serializers
+
+
+# --- Compressors ---
+def _available_compressors(zlib_level: int, zstd_level: int) -> Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    compressors = {
+        COMPRESSION_NONE: (lambda data: data, lambda data: data),
+        COMPRESSION_ZLIB: (lambda data: zlib.compress(data, zlib_level), zlib.decompress),
+    }
+    if zstandard is not None:
+        # zstandard (de)compressor objects are not thread safe, so build one per call
+        compressors[COMPRESSION_ZSTD] = (
+            lambda data: zstandard.ZstdCompressor(level=zstd_level).compress(data),
+            lambda data: zstandard.ZstdDecompressor().decompress(data),
+        )
+    return compressors
+
+
+class CacheCodec:
+    """Encodes Python values to framed bytes and back."""
+
+    def __init__(self, serializer: str = CACHE_CODEC, compression: str = CACHE_COMPRESSION,
+                 compress_min_bytes: int = CACHE_COMPRESS_MIN_BYTES,
+                 zlib_level: int = CACHE_ZLIB_LEVEL, zstd_level: int = CACHE_ZSTD_LEVEL):
+        self._serializers = _available_serializers()
+        self._compressors = _available_compressors(zlib_level, zstd_level)
+        self.serializer_id = self._resolve_serializer(serializer)
+        self.compression_id = self._resolve_compression(compression)
+        self.compress_min_bytes = compress_min_bytes
+        logger.debug(
+            f"CacheCodec configured: serializer={self.serializer_id}, compression={self.compression_id}, "
+            f"compress_min_bytes={self.compress_min_bytes}"
+        )
+
+    def _resolve_serializer(self, name: str) -> int:
+        if name == "auto":
+            return SERIALIZER_ORJSON if SERIALIZER_ORJSON in self._serializers else SERIALIZER_JSON
+        serializer_id = SERIALIZER_NAMES.get(name)
+        if serializer_id is None:
+            raise CodecError(f"Unknown cache serializer '{name}'.")
+        if serializer_id not in self._serializers:
+            logger.warning(f"Cache serializer '{name}' is not installed. Falling back to json.")
+            return SERIALIZER_JSON
+        return serializer_id
+
+    def _resolve_compression(self, name: str) -> int:
+        if name == "auto":
+            return COMPRESSION_ZSTD if COMPRESSION_ZSTD in self._compressors else COMPRESSION_ZLIB
+        compression_id = COMPRESSION_NAMES.get(name)
+        if compression_id is None:
+            raise CodecError(f"Unknown cache compression '{name}'.")
+        if compression_id not in self._compressors:
+            logger.warning(f"Cache compression '{name}' is not installed. Falling back to zlib.")
+            return COMPRESSION_ZLIB
+        return compression_id
+
+    def encode(self, value: Any) -> bytes:
+        """Serialize a value and compress it if the payload exceeds the size threshold."""
+        dumps, _ = self._serializers[self.serializer_id]
+        try:
+            payload = dumps(value)
+        except (TypeError, ValueError) as e:
+            raise CodecError(f"Value is not serializable: {e}") from e
+
+        compression_id = COMPRESSION_NONE
+        if self.compression_id != COMPRESSION_NONE and len(payload) >= self.compress_min_bytes:
+            compress, _ = self._compressors[self.compression_id]
+            compressed = compress(payload)
+            # Only keep the compressed form when it actually saves space
+            if len(compressed) < len(payload):
+                payload = compressed
+                compression_id = self.compression_id
+
+        return bytes((MAGIC, self.serializer_id, compression_id)) + payload
+
+    def decode(self, data: Optional[bytes]) -> Any:
+        """Decode a framed value, or a legacy plain-JSON value written before codecs existed."""
+        if data is None:
+            return None
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data or data[0] != MAGIC:
+            try:
+                return json.loads(data)
+            except ValueError as e:
+                raise CodecError(f"Legacy JSON value could not be decoded: {e}") from e
+        if len(data) < 3:
+            raise CodecError("Cached value is truncated.")
+
+        serializer_id, compression_id = data[1], data[2]
+        if serializer_id not in self._serializers:
+            raise CodecError(f"Serializer id {serializer_id} is not available in this process.")
+        if compression_id not in self._compressors:
+            raise CodecError(f"Compression id {compression_id} is not available in this process.")
+
+        _, decompress = self._compressors[compression_id]
+        _, loads = self._serializers[serializer_id]
+        try:
+            return loads(decompress(data[3:]))
+        except Exception as e:
+            raise CodecError(f"Cached value could not be decoded: {e}") from e
@@ -4,69 +4,19 @@ PromptCraft CLI - A framework for assessing prompting proficiency.
 """
 import os
 import argparse
-from openai import OpenAI
 from promptcraft.database.db_handler import DatabaseHandler
 from promptcraft.tasks.task_handler import TaskHandler
 from promptcraft.evaluation.evaluator import Evaluator
+from promptcraft.llm import get_llm_client, simulate_llm_response # simulate_llm_response kept importable from here
 
-# Load API key from environment variable
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-client = None
-if OPENAI_API_KEY:
-    client = OpenAI(api_key=OPENAI_API_KEY)
-else:
+if not OPENAI_API_KEY:
     print("Warning: OPENAI_API_KEY environment variable not set. LLM calls will be simulated.")
 
 
 def get_llm_response(prompt):
-    """Gets a response from the OpenAI API or simulates if key is missing."""
-    if not client:
-        print("(Simulating LLM response as API key is missing...)")
-        return simulate_llm_response(prompt) # Fallback to simulation
-    try:
-        completion = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Or another suitable model
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return completion.choices[0].message.content
-    except Exception as e:
-        print(f"Error during LLM API call: {e}")
-        print("Falling back to simulated response.")
-        return simulate_llm_response(prompt) # Fallback to simulation on error
-
-def simulate_llm_response(prompt):
-    """
-    Simulate getting a response from an LLM.
-    """
-    lower = prompt.lower()
-    if "factorial" in lower:
-        return """```python
-def factorial(n):
-    if n < 0:
-        raise ValueError("Factorial is not defined for negative numbers")
-    if n in (0, 1):
-        return 1
-    return n * factorial(n - 1)
-```"""
-    if "sort" in lower and "array" in lower:
-        return """```javascript
-function sortByProperty(array, property) {
-  return array.sort((a, b) => (a[property] > b[property] ? 1 : -1));
-}
-```"""
-    if "sql" in lower and "top 5" in lower:
-        return """```sql
-SELECT customer_id, SUM(amount) AS total_spent
-FROM purchases
-GROUP BY customer_id
-ORDER BY total_spent DESC
-LIMIT 5;
-```"""
-    return """```
--- Simulated LLM response
-```"""
+    """Gets a response from the shared LLM client, or a simulated one if the key is missing or the call fails."""
+    return get_llm_client().complete_sync(prompt)
 
 
 def run_assessment(candidate_id):
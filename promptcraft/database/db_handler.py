@@ -5,11 +5,33 @@ import mysql.connector
 from mysql.connector import Error, IntegrityError # Added IntegrityError for unique constraint violations
 import json
 import os
+import re
+from datetime import datetime
 from promptcraft.logger_config import setup_logger # Import the logger
-from typing import Dict, Any, Optional # For type hinting
+from promptcraft import user_cache # Invalidated whenever a user's row changes
+from promptcraft.question_catalog import bump_catalog_version
+from promptcraft.exceptions import DatabaseException
+from typing import Dict, Any, List, Optional, Sequence, Tuple # For type hinting
 
 logger = setup_logger(__name__) # Get a logger for this module
 
+# Extracts the index name from "Duplicate entry '...' for key 'users.email'" (MySQL 8) or "... for key 'email'"
+_DUPLICATE_KEY_RE = re.compile(r"for key '(?:[^'.]+\.)?([^']+)'")
+
+# FULLTEXT indexes behind search_submissions/search_evaluations: (table, index name, columns)
+FULLTEXT_INDEXES = (
+    ("submissions", "ft_prompt", "prompt"),
+    ("submissions", "ft_generated_code", "generated_code"),
+    ("submissions", "ft_prompt_code", "prompt, generated_code"),
+    ("evaluations", "ft_evaluation_notes", "evaluation_notes"),
+)
+# MATCH() column lists per search scope; each must be exactly the column list of one FULLTEXT index
+SUBMISSION_SEARCH_COLUMNS = {
+    "prompts": "s.prompt",
+    "code": "s.generated_code",
+    "submissions": "s.prompt, s.generated_code",
+}
+
 class DatabaseHandler:
     """Handles all database operations for PromptCraft using MySQL."""
     
@@ -109,7 +131,8 @@ class DatabaseHandler:
                     expected_outcome TEXT,
                     evaluation_criteria JSON,
                     programming_language VARCHAR(50),
-                    difficulty_level VARCHAR(50)
+                    difficulty_level VARCHAR(50),
+                    test_harness TEXT
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
             """)
             cursor.execute("""
@@ -132,6 +155,7 @@ class DatabaseHandler:
                     profile_photo_ipfs_hash VARCHAR(255),
                     is_active BOOLEAN DEFAULT TRUE,
                     is_verified BOOLEAN DEFAULT FALSE,
+                    token_version INT NOT NULL DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -154,12 +178,59 @@ class DatabaseHandler:
                     prompt TEXT NOT NULL,
                     generated_code TEXT,
                     submission_file VARCHAR(255),
+                    status VARCHAR(20) NOT NULL DEFAULT 'completed',
+                    error_message TEXT,
+                    llm_model VARCHAR(100),
+                    llm_latency_ms INT,
+                    prompt_tokens INT,
+                    completion_tokens INT,
+                    cache_hit BOOLEAN NOT NULL DEFAULT FALSE,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
                     FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE,
                     INDEX idx_user_question (user_id, question_id),
-                    INDEX idx_created_at (created_at)
+                    INDEX idx_created_at (created_at),
+                    FULLTEXT INDEX ft_prompt (prompt),
+                    FULLTEXT INDEX ft_generated_code (generated_code),
+                    FULLTEXT INDEX ft_prompt_code (prompt, generated_code)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS prompt_minhash (
+                    submission_id INT PRIMARY KEY,
+                    question_id INT NOT NULL,
+                    signature VARBINARY(1024) NOT NULL,
+                    FOREIGN KEY (submission_id) REFERENCES submissions(id) ON DELETE CASCADE,
+                    INDEX idx_question (question_id)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS prompt_lsh_buckets (
+                    question_id INT NOT NULL,
+                    band TINYINT UNSIGNED NOT NULL,
+                    bucket BIGINT NOT NULL,
+                    submission_id INT NOT NULL,
+                    PRIMARY KEY (question_id, band, bucket, submission_id),
+                    FOREIGN KEY (submission_id) REFERENCES submissions(id) ON DELETE CASCADE,
+                    INDEX idx_submission (submission_id)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS submission_features (
+                    submission_id INT PRIMARY KEY,
+                    feature_version TINYINT UNSIGNED NOT NULL,
+                    prompt_token_count INT NOT NULL,
+                    prompt_chars INT NOT NULL,
+                    code_chars INT NOT NULL,
+                    code_lines INT NOT NULL,
+                    code_blocks SMALLINT NOT NULL,
+                    criteria_total SMALLINT NOT NULL,
+                    criteria_covered SMALLINT NOT NULL,
+                    language_match BOOLEAN NOT NULL,
+                    mentions_edge_cases BOOLEAN NOT NULL,
+                    quality_score DECIMAL(5,2) NOT NULL,
+                    FOREIGN KEY (submission_id) REFERENCES submissions(id) ON DELETE CASCADE
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
             """)
             cursor.execute("""
@@ -185,7 +256,8 @@ class DatabaseHandler:
                     INDEX idx_candidate_task (candidate_id, task_id),
                     INDEX idx_evaluator (evaluator_user_id),
                     INDEX idx_submission (submission_id),
-                    INDEX idx_created_at (created_at)
+                    INDEX idx_created_at (created_at),
+                    FULLTEXT INDEX ft_evaluation_notes (evaluation_notes)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
             """)
             
@@ -214,6 +286,65 @@ class DatabaseHandler:
                         
                 except Error as migration_error:
                     logger.warning(f"Could not add profile photo columns (they may already exist): {migration_error}")
+
+            # Add submission job status columns if they don't exist (migration)
+            try:
+                cursor.execute("DESCRIBE submissions")
+                submission_columns = [row[0] for row in cursor.fetchall()]
+                if 'status' not in submission_columns:
+                    cursor.execute("ALTER TABLE submissions ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'completed'")
+                    logger.info("Added status column to submissions table.")
+                if 'error_message' not in submission_columns:
+                    cursor.execute("ALTER TABLE submissions ADD COLUMN error_message TEXT")
+                    logger.info("Added error_message column to submissions table.")
+            except Error as migration_error:
+                logger.warning(f"Could not add submission status columns: {migration_error}")
+
+            # Add LLM usage columns to submissions if they don't exist (migration)
+            try:
+                cursor.execute("DESCRIBE submissions")
+                submission_columns = [row[0] for row in cursor.fetchall()]
+                for column, definition in (
+                    ("llm_model", "VARCHAR(100)"),
+                    ("llm_latency_ms", "INT"),
+                    ("prompt_tokens", "INT"),
+                    ("completion_tokens", "INT"),
+                    ("cache_hit", "BOOLEAN NOT NULL DEFAULT FALSE"),
+                ):
+                    if column not in submission_columns:
+                        cursor.execute(f"ALTER TABLE submissions ADD COLUMN {column} {definition}")
+                        logger.info(f"Added {column} column to submissions table.")
+            except Error as migration_error:
+                logger.warning(f"Could not add submission LLM usage columns: {migration_error}")
+
+            # Add test_harness column to questions if it doesn't exist (migration)
+            try:
+                cursor.execute("DESCRIBE questions")
+                if 'test_harness' not in [row[0] for row in cursor.fetchall()]:
+                    cursor.execute("ALTER TABLE questions ADD COLUMN test_harness TEXT")
+                    logger.info("Added test_harness column to questions table.")
+            except Error as migration_error:
+                logger.warning(f"Could not add test_harness column: {migration_error}")
+
+            # Add token_version column if it doesn't exist (migration)
+            try:
+                cursor.execute("DESCRIBE users")
+                if 'token_version' not in [row[0] for row in cursor.fetchall()]:
+                    cursor.execute("ALTER TABLE users ADD COLUMN token_version INT NOT NULL DEFAULT 0")
+                    logger.info("Added token_version column to users table.")
+            except Error as migration_error:
+                logger.warning(f"Could not add token_version column: {migration_error}")
+
+            # Add FULLTEXT search indexes if they don't exist (migration). InnoDB rebuilds the
+            # table for the first one, so this can take a while on a large existing table.
+            for table, index_name, columns in FULLTEXT_INDEXES:
+                try:
+                    cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index_name,))
+                    if not cursor.fetchall():
+                        cursor.execute(f"ALTER TABLE {table} ADD FULLTEXT INDEX {index_name} ({columns})")
+                        logger.info(f"Added FULLTEXT index {index_name} to {table} table.")
+                except Error as migration_error:
+                    logger.warning(f"Could not add FULLTEXT index {index_name} to {table}: {migration_error}")
             
             conn.commit()
             logger.info(f"Tables in database '{self.db_name}' initialized.")
@@ -225,7 +356,7 @@ class DatabaseHandler:
             self.close()
             
     def add_question(self, description, expected_outcome=None, evaluation_criteria=None,
-                     programming_language=None, difficulty_level=None):
+                     programming_language=None, difficulty_level=None, test_harness=None):
         conn = self.connect()
         if not conn: return None
         cursor = conn.cursor()
@@ -233,15 +364,16 @@ class DatabaseHandler:
         try:
             sql = """
                 INSERT INTO questions (description, expected_outcome, evaluation_criteria,
-                                       programming_language, difficulty_level)
-                VALUES (%s, %s, %s, %s, %s)
+                                       programming_language, difficulty_level, test_harness)
+                VALUES (%s, %s, %s, %s, %s, %s)
             """
             ec_json = json.dumps(evaluation_criteria) if evaluation_criteria is not None else None
             cursor.execute(sql, (description, expected_outcome, ec_json,
-                                  programming_language, difficulty_level))
+                                  programming_language, difficulty_level, test_harness))
             conn.commit()
             question_id = cursor.lastrowid
             logger.info(f"Question added with ID: {question_id}")
+            bump_catalog_version() # API workers rebuild their in-memory catalog
         except Error as e:
             logger.error(f"Error adding question: {e}")
             conn.rollback()
@@ -266,9 +398,16 @@ class DatabaseHandler:
             self.close()
         return questions
 
-    def get_question_details(self, question_id):
+    def get_question_details(self, question_id, raise_errors: bool = False):
+        """
+        Details of one question, or None if there is no such question. With raise_errors a database
+        failure raises DatabaseException instead of also returning None, so callers can tell the two apart.
+        """
         conn = self.connect()
-        if not conn: return None
+        if not conn:
+            if raise_errors:
+                raise DatabaseException(detail="Could not connect to the database.")
+            return None
         cursor = conn.cursor(dictionary=True) 
         details = None
         try:
@@ -280,25 +419,79 @@ class DatabaseHandler:
             """, (question_id,))
             result = cursor.fetchone()
             if result:
-                if result.get('evaluation_criteria') and isinstance(result['evaluation_criteria'], (str, bytes, bytearray)):
-                    try:
-                        result['evaluation_criteria'] = json.loads(result['evaluation_criteria'])
-                    except json.JSONDecodeError as json_err:
-                        logger.warning(f"JSON decode error for evaluation_criteria in question ID {question_id}: {json_err}")
-                        result['evaluation_criteria'] = [] 
-                elif not result.get('evaluation_criteria'):
-                     result['evaluation_criteria'] = []
-                details = result
+                details = self._parse_question_row(result)
                 logger.debug(f"Retrieved details for question ID {question_id}")
             else:
                 logger.warning(f"No details found for question ID {question_id}")
         except Error as e:
             logger.error(f"Error retrieving question details for ID {question_id}: {e}")
+            if raise_errors:
+                raise DatabaseException(detail=f"Could not retrieve question {question_id}.") from e
         finally:
             cursor.close()
             self.close()
         return details
 
+    def get_all_question_details(self) -> list:
+        """Fetch every question with all of its detail columns in a single query."""
+        conn = self.connect()
+        if not conn: return []
+        cursor = conn.cursor(dictionary=True)
+        questions = []
+        try:
+            cursor.execute("""
+                SELECT id, description, expected_outcome, evaluation_criteria,
+                       programming_language, difficulty_level
+                FROM questions
+                ORDER BY id
+            """)
+            questions = [self._parse_question_row(row) for row in cursor.fetchall()]
+            logger.debug(f"Retrieved details for all {len(questions)} questions.")
+        except Error as e:
+            logger.error(f"Error retrieving all question details: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return questions
+
+    def get_question_test_harnesses(self, question_ids) -> Dict[int, Dict[str, Any]]:
+        """Fetch the test harness and language of several questions. Questions without a harness are left out."""
+        question_ids = list(dict.fromkeys(question_ids))
+        if not question_ids:
+            return {}
+        conn = self.connect()
+        if not conn: return {}
+        cursor = conn.cursor(dictionary=True)
+        harnesses = {}
+        try:
+            placeholders = ", ".join(["%s"] * len(question_ids))
+            cursor.execute(f"""
+                SELECT id, programming_language, test_harness
+                FROM questions
+                WHERE id IN ({placeholders}) AND test_harness IS NOT NULL
+            """, tuple(question_ids))
+            for row in cursor.fetchall():
+                harnesses[row['id']] = row
+        except Error as e:
+            logger.error(f"Error retrieving test harnesses for question IDs {question_ids}: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return harnesses
+
+    @staticmethod
+    def _parse_question_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Decode the JSON evaluation_criteria column of a questions row in place."""
+        if row.get('evaluation_criteria') and isinstance(row['evaluation_criteria'], (str, bytes, bytearray)):
+            try:
+                row['evaluation_criteria'] = json.loads(row['evaluation_criteria'])
+            except json.JSONDecodeError as json_err:
+                logger.warning(f"JSON decode error for evaluation_criteria in question ID {row.get('id')}: {json_err}")
+                row['evaluation_criteria'] = []
+        elif not row.get('evaluation_criteria'):
+            row['evaluation_criteria'] = []
+        return row
+
     def add_exam_question(self, guide_section, question_text, answer_text=None, question_type='short-answer'):
         conn = self.connect()
         if not conn: return None
@@ -368,6 +561,58 @@ class DatabaseHandler:
             self.close()
         return user_id
 
+    def register_user_atomic(self, email: str, username: str, hashed_password: str,
+                             full_name: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Create a user in a single INSERT, relying on the UNIQUE constraints instead of pre-checks.
+
+        Returns:
+            (user, None) on success, where user holds the UserResponse columns of the new row.
+            (None, "email" | "username") if that field is already taken.
+            (None, None) on any other database error.
+        """
+        conn = self.connect()
+        if not conn: return None, None
+        cursor = conn.cursor()
+        try:
+            sql = """
+                INSERT INTO users (email, username, hashed_password, full_name, is_active, is_verified)
+                VALUES (%s, %s, %s, %s, TRUE, FALSE)
+            """
+            cursor.execute(sql, (email, username, hashed_password, full_name))
+            user_id = cursor.lastrowid
+            # created_at comes from the column default (the database clock); read it back for the response
+            cursor.execute("SELECT created_at FROM users WHERE id = %s", (user_id,))
+            created_at = cursor.fetchone()[0]
+            conn.commit()
+            user = {
+                "id": user_id,
+                "email": email,
+                "username": username,
+                "full_name": full_name,
+                "is_active": True,
+                "is_verified": False,
+                "profile_photo_url": None,
+                "profile_photo_ipfs_hash": None,
+                "created_at": created_at,
+                "token_version": 0,
+            }
+            logger.info(f"User created with ID: {user['id']}, username: {username}, email: {email}")
+            return user, None
+        except IntegrityError as ie:
+            conn.rollback()
+            match = _DUPLICATE_KEY_RE.search(str(ie.msg))
+            conflict = match.group(1) if match and match.group(1) in ("email", "username") else None
+            logger.warning(f"Registration conflict on {conflict or 'unknown key'} for username {username}: {ie}")
+            return None, conflict
+        except Error as e:
+            logger.error(f"Error creating user {username}: {e}")
+            conn.rollback()
+            return None, None
+        finally:
+            cursor.close()
+            self.close()
+
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         conn = self.connect()
         if not conn: return None
@@ -425,6 +670,28 @@ class DatabaseHandler:
             self.close()
         return user_data
 
+    def get_user_profile_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get the public projection of a user (the UserResponse columns plus token_version, no password hash)."""
+        conn = self.connect()
+        if not conn: return None
+        cursor = conn.cursor(dictionary=True)
+        user_data = None
+        try:
+            cursor.execute("""
+                SELECT id, email, username, full_name, is_active, is_verified,
+                       profile_photo_url, profile_photo_ipfs_hash, created_at, token_version
+                FROM users WHERE id = %s
+            """, (user_id,))
+            user_data = cursor.fetchone()
+            if not user_data:
+                logger.debug(f"No user found with ID: {user_id}")
+        except Error as e:
+            logger.error(f"Error getting user profile by ID {user_id}: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return user_data
+
     def update_user(self, user_id: int, **kwargs) -> bool:
         """Update user fields. Accepts any combination of updateable fields."""
         conn = self.connect()
@@ -452,6 +719,10 @@ class DatabaseHandler:
         try:
             # Build dynamic SQL
             set_clauses = [f"{field} = %s" for field in update_fields.keys()]
+            # Access tokens carry the email and username as claims; changing either revokes them
+            revoke_tokens = bool({'email', 'username'} & update_fields.keys())
+            if revoke_tokens:
+                set_clauses.append("token_version = token_version + 1")
             sql = f"""
                 UPDATE users 
                 SET {', '.join(set_clauses)}, updated_at = CURRENT_TIMESTAMP 
@@ -467,6 +738,9 @@ class DatabaseHandler:
             if cursor.rowcount > 0:
                 logger.info(f"User ID {user_id} updated successfully. Fields: {list(update_fields.keys())}")
                 updated = True
+                if revoke_tokens:
+                    self._publish_token_version(cursor, user_id)
+                user_cache.invalidate_user(user_id)
             else:
                 logger.warning(f"Attempted to update user ID {user_id}, but user not found or no change needed.")
                 
@@ -527,6 +801,7 @@ class DatabaseHandler:
             if cursor.rowcount > 0:
                 logger.info(f"User ID {user_id} marked as verified.")
                 updated = True
+                user_cache.invalidate_user(user_id)
             else:
                 logger.warning(f"Attempted to mark user ID {user_id} as verified, but user not found or no change needed.")
         except Error as e:
@@ -537,6 +812,92 @@ class DatabaseHandler:
             self.close()
         return updated
 
+    def bump_token_version(self, user_id: int) -> Optional[int]:
+        """Revoke every outstanding token for a user. Returns the new token version, or None on failure."""
+        conn = self.connect()
+        if not conn: return None
+        cursor = conn.cursor()
+        new_version = None
+        try:
+            cursor.execute("UPDATE users SET token_version = token_version + 1 WHERE id = %s", (user_id,))
+            conn.commit()
+            if cursor.rowcount > 0:
+                new_version = self._publish_token_version(cursor, user_id)
+                logger.info(f"Token version for user ID {user_id} bumped to {new_version}.")
+        except Error as e:
+            logger.error(f"Error bumping token version for user ID {user_id}: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.close()
+        return new_version
+
+    @staticmethod
+    def _publish_token_version(cursor, user_id: int) -> Optional[int]:
+        # Read back the committed version and mirror it to Redis so outstanding tokens are rejected immediately
+        cursor.execute("SELECT token_version FROM users WHERE id = %s", (user_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        new_version = row["token_version"] if isinstance(row, dict) else row[0]
+        user_cache.set_token_version(user_id, new_version)
+        return new_version
+
+    def deactivate_user(self, user_id: int) -> bool:
+        """Mark a user as inactive and revoke their outstanding tokens. Cached authentication data is dropped."""
+        conn = self.connect()
+        if not conn: return False
+        cursor = conn.cursor()
+        updated = False
+        try:
+            sql = """
+                UPDATE users SET is_active = FALSE, token_version = token_version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """
+            cursor.execute(sql, (user_id,))
+            conn.commit()
+            if cursor.rowcount > 0:
+                logger.info(f"User ID {user_id} deactivated.")
+                updated = True
+                self._publish_token_version(cursor, user_id)
+            else:
+                logger.warning(f"Attempted to deactivate user ID {user_id}, but user not found or already inactive.")
+        except Error as e:
+            logger.error(f"Error deactivating user ID {user_id}: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.close()
+        # Invalidate even on a no-op so a stale active entry can never outlive a deactivation attempt
+        user_cache.invalidate_user(user_id)
+        return updated
+
+    def update_user_password(self, user_id: int, hashed_password: str, revoke_tokens: bool = False) -> bool:
+        """
+        Replace a user's stored password hash.
+        Pass revoke_tokens=True for an actual password change; a transparent rehash at a new bcrypt cost must not log the user out.
+        """
+        conn = self.connect()
+        if not conn: return False
+        cursor = conn.cursor()
+        updated = False
+        try:
+            version_clause = ", token_version = token_version + 1" if revoke_tokens else ""
+            sql = f"UPDATE users SET hashed_password = %s{version_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = %s"
+            cursor.execute(sql, (hashed_password, user_id))
+            conn.commit()
+            updated = cursor.rowcount > 0
+            if updated and revoke_tokens:
+                logger.info(f"Password changed for user ID {user_id}; outstanding tokens revoked.")
+                self._publish_token_version(cursor, user_id)
+        except Error as e:
+            logger.error(f"Error updating password hash for user ID {user_id}: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.close()
+        return updated
+
     def delete_email_verification_token(self, token: str) -> bool:
         conn = self.connect()
         if not conn: return False
@@ -558,21 +919,58 @@ class DatabaseHandler:
         return deleted
 
     # Submission methods
+    @staticmethod
+    def _llm_usage_values(llm_usage: Optional[Dict[str, Any]]) -> tuple:
+        """Column values (llm_model, llm_latency_ms, prompt_tokens, completion_tokens, cache_hit) from an LLMCallInfo dict."""
+        llm_usage = llm_usage or {}
+        latency = llm_usage.get("latency_ms")
+        return (
+            llm_usage.get("model"),
+            int(round(latency)) if latency is not None else None,
+            llm_usage.get("prompt_tokens"),
+            llm_usage.get("completion_tokens"),
+            bool(llm_usage.get("cached", False)),
+        )
+
+    _FEATURE_COLUMNS = ("feature_version", "prompt_token_count", "prompt_chars", "code_chars", "code_lines", "code_blocks",
+                        "criteria_total", "criteria_covered", "language_match", "mentions_edge_cases", "quality_score")
+
+    @classmethod
+    def _upsert_features(cls, cursor, rows: List[Dict[str, Any]]) -> None:
+        """Insert or replace submission_features rows (dicts with submission_id and SubmissionFeatures fields)."""
+        columns = ("submission_id",) + cls._FEATURE_COLUMNS
+        sql = f"""
+            INSERT INTO submission_features ({", ".join(columns)})
+            VALUES ({", ".join(["%s"] * len(columns))})
+            ON DUPLICATE KEY UPDATE {", ".join(f"{c} = VALUES({c})" for c in cls._FEATURE_COLUMNS)}
+        """
+        cursor.executemany(sql, [tuple(row[c] for c in columns) for row in rows])
+
     def create_submission(self, user_id: int, question_id: int, prompt: str, 
-                         generated_code: Optional[str] = None, submission_file: Optional[str] = None) -> Optional[int]:
-        """Create a new submission record."""
+                         generated_code: Optional[str] = None, submission_file: Optional[str] = None,
+                         llm_usage: Optional[Dict[str, Any]] = None,
+                         features: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        Create a new submission record. `llm_usage` is LLMCallInfo.as_dict() of the call that produced the code;
+        `features` (SubmissionFeatures.as_dict()) is stored in submission_features in the same transaction.
+        """
         conn = self.connect()
         if not conn: return None
         cursor = conn.cursor()
         submission_id = None
         try:
             sql = """
-                INSERT INTO submissions (user_id, question_id, prompt, generated_code, submission_file)
-                VALUES (%s, %s, %s, %s, %s)
+                INSERT INTO submissions (user_id, question_id, prompt, generated_code, submission_file,
+                                         llm_model, llm_latency_ms, prompt_tokens, completion_tokens, cache_hit)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
-            cursor.execute(sql, (user_id, question_id, prompt, generated_code, submission_file))
+            cursor.execute(sql, (user_id, question_id, prompt, generated_code, submission_file)
+                           + self._llm_usage_values(llm_usage))
+            new_id = cursor.lastrowid
+            if features:
+                self._upsert_features(cursor, [dict(features, submission_id=new_id)])
             conn.commit()
-            submission_id = cursor.lastrowid
+            submission_id = new_id
             logger.info(f"Submission created with ID: {submission_id} for user {user_id}, question {question_id}")
         except Error as e:
             logger.error(f"Error creating submission for user {user_id}, question {question_id}: {e}")
@@ -582,6 +980,256 @@ class DatabaseHandler:
             self.close()
         return submission_id
 
+    def create_pending_submission(self, user_id: int, question_id: int, prompt: str) -> Optional[int]:
+        """Create a submission whose code will be filled in by a background worker."""
+        conn = self.connect()
+        if not conn: return None
+        cursor = conn.cursor()
+        submission_id = None
+        try:
+            sql = """
+                INSERT INTO submissions (user_id, question_id, prompt, status)
+                VALUES (%s, %s, %s, 'pending')
+            """
+            cursor.execute(sql, (user_id, question_id, prompt))
+            conn.commit()
+            submission_id = cursor.lastrowid
+            logger.info(f"Pending submission created with ID: {submission_id} for user {user_id}, question {question_id}")
+        except Error as e:
+            logger.error(f"Error creating pending submission for user {user_id}, question {question_id}: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.close()
+        return submission_id
+
+    def complete_submission(self, submission_id: int, generated_code: Optional[str], status: str = 'completed',
+                            error_message: Optional[str] = None, llm_usage: Optional[Dict[str, Any]] = None,
+                            features: Optional[Dict[str, Any]] = None) -> bool:
+        """Record the outcome of a background submission job ('completed' or 'failed'), with its features if given."""
+        conn = self.connect()
+        if not conn: return False
+        cursor = conn.cursor()
+        updated = False
+        try:
+            sql = """
+                UPDATE submissions
+                SET generated_code = %s, status = %s, error_message = %s,
+                    llm_model = %s, llm_latency_ms = %s, prompt_tokens = %s, completion_tokens = %s, cache_hit = %s,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """
+            cursor.execute(sql, (generated_code, status, error_message) + self._llm_usage_values(llm_usage)
+                           + (submission_id,))
+            updated = cursor.rowcount > 0
+            if updated and features:
+                self._upsert_features(cursor, [dict(features, submission_id=submission_id)])
+            conn.commit()
+            logger.info(f"Submission {submission_id} marked {status}.")
+        except Error as e:
+            logger.error(f"Error completing submission {submission_id}: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.close()
+        return updated
+
+    def save_submission_features(self, rows: List[Dict[str, Any]]) -> bool:
+        """Store features for several existing submissions in one transaction (used by the backfill)."""
+        if not rows:
+            return True
+        conn = self.connect()
+        if not conn: return False
+        cursor = conn.cursor()
+        saved = False
+        try:
+            self._upsert_features(cursor, rows)
+            conn.commit()
+            saved = True
+        except Error as e:
+            logger.error(f"Error saving features for {len(rows)} submissions: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.close()
+        return saved
+
+    def get_submissions_needing_features(self, feature_version: int, after_id: int = 0, limit: int = 1000) -> list:
+        """Completed submissions without a submission_features row of `feature_version`, in ID order after `after_id`."""
+        conn = self.connect()
+        if not conn: return []
+        cursor = conn.cursor(dictionary=True)
+        rows = []
+        try:
+            cursor.execute("""
+                SELECT s.id, s.question_id, s.prompt, s.generated_code
+                FROM submissions s
+                LEFT JOIN submission_features f ON f.submission_id = s.id
+                WHERE s.id > %s AND s.status = 'completed' AND (f.submission_id IS NULL OR f.feature_version <> %s)
+                ORDER BY s.id
+                LIMIT %s
+            """, (after_id, feature_version, limit))
+            rows = cursor.fetchall()
+        except Error as e:
+            logger.error(f"Error fetching submissions needing features after ID {after_id}: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return rows
+
+    # Prompt near-duplicate index (see promptcraft/similarity/minhash.py)
+    def save_prompt_signatures(self, entries: List[Dict[str, Any]]) -> bool:
+        """Store MinHash signatures and LSH buckets ({submission_id, question_id, signature, buckets}), replacing old ones."""
+        if not entries:
+            return True
+        conn = self.connect()
+        if not conn: return False
+        cursor = conn.cursor()
+        saved = False
+        try:
+            ids = [e["submission_id"] for e in entries]
+            cursor.execute(f"DELETE FROM prompt_lsh_buckets WHERE submission_id IN ({', '.join(['%s'] * len(ids))})", tuple(ids))
+            cursor.executemany("""
+                INSERT INTO prompt_minhash (submission_id, question_id, signature) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE question_id = VALUES(question_id), signature = VALUES(signature)
+            """, [(e["submission_id"], e["question_id"], e["signature"]) for e in entries])
+            cursor.executemany("""
+                INSERT INTO prompt_lsh_buckets (question_id, band, bucket, submission_id) VALUES (%s, %s, %s, %s)
+            """, [(e["question_id"], band, bucket, e["submission_id"]) for e in entries for band, bucket in e["buckets"]])
+            conn.commit()
+            saved = True
+        except Error as e:
+            logger.error(f"Error saving prompt signatures for {len(entries)} submissions: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.close()
+        return saved
+
+    def get_lsh_candidates(self, question_id: int, buckets: List[Tuple[int, int]], exclude_submission_id: int,
+                           limit: int = 5000) -> list:
+        """Submissions of `question_id` sharing at least one (band, bucket) pair, with their user and signature."""
+        if not buckets:
+            return []
+        conn = self.connect()
+        if not conn: return []
+        cursor = conn.cursor(dictionary=True)
+        rows = []
+        try:
+            pairs = ", ".join(["(%s, %s)"] * len(buckets))
+            cursor.execute(f"""
+                SELECT m.submission_id, s.user_id, m.signature
+                FROM (
+                    SELECT DISTINCT submission_id
+                    FROM prompt_lsh_buckets
+                    WHERE question_id = %s AND (band, bucket) IN ({pairs}) AND submission_id <> %s
+                    LIMIT %s
+                ) c
+                JOIN prompt_minhash m ON m.submission_id = c.submission_id
+                JOIN submissions s ON s.id = c.submission_id
+            """, (question_id, *[v for pair in buckets for v in pair], exclude_submission_id, limit))
+            rows = cursor.fetchall()
+        except Error as e:
+            logger.error(f"Error fetching LSH candidates for question {question_id}: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return rows
+
+    def get_submission_prompts(self, after_id: int = 0, limit: int = 1000, question_id: Optional[int] = None) -> list:
+        """(id, question_id, prompt) of submissions after `after_id` in ID order, optionally for one question."""
+        conn = self.connect()
+        if not conn: return []
+        cursor = conn.cursor(dictionary=True)
+        rows = []
+        try:
+            question_clause = "AND question_id = %s" if question_id is not None else ""
+            params = (after_id,) + ((question_id,) if question_id is not None else ()) + (limit,)
+            cursor.execute(f"""
+                SELECT id, question_id, prompt FROM submissions
+                WHERE id > %s {question_clause}
+                ORDER BY id
+                LIMIT %s
+            """, params)
+            rows = cursor.fetchall()
+        except Error as e:
+            logger.error(f"Error fetching submission prompts after ID {after_id}: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return rows
+
+    def clear_prompt_index(self, question_id: Optional[int] = None) -> bool:
+        """Delete stored signatures and buckets, for one question or all."""
+        conn = self.connect()
+        if not conn: return False
+        cursor = conn.cursor()
+        cleared = False
+        try:
+            for table in ("prompt_lsh_buckets", "prompt_minhash"):
+                if question_id is None:
+                    cursor.execute(f"DELETE FROM {table}")
+                else:
+                    cursor.execute(f"DELETE FROM {table} WHERE question_id = %s", (question_id,))
+            conn.commit()
+            cleared = True
+        except Error as e:
+            logger.error(f"Error clearing prompt index (question {question_id}): {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.close()
+        return cleared
+
+    def get_submission_evaluation_summaries(self, submission_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Prompt, author, quality score and evaluation count/average of each submission, keyed by ID."""
+        if not submission_ids:
+            return {}
+        conn = self.connect()
+        if not conn: return {}
+        cursor = conn.cursor(dictionary=True)
+        summaries = {}
+        try:
+            placeholders = ", ".join(["%s"] * len(submission_ids))
+            cursor.execute(f"""
+                SELECT s.id, s.user_id, u.username, s.prompt, s.created_at, f.quality_score,
+                       COUNT(e.id) AS evaluation_count, AVG(e.overall_score) AS average_score
+                FROM submissions s
+                JOIN users u ON u.id = s.user_id
+                LEFT JOIN submission_features f ON f.submission_id = s.id
+                LEFT JOIN evaluations e ON e.submission_id = s.id
+                WHERE s.id IN ({placeholders})
+                GROUP BY s.id, s.user_id, u.username, s.prompt, s.created_at, f.quality_score
+            """, tuple(submission_ids))
+            summaries = {row["id"]: row for row in cursor.fetchall()}
+        except Error as e:
+            logger.error(f"Error getting evaluation summaries for {len(submission_ids)} submissions: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return summaries
+
+    def get_submission_llm_usage(self, start_date, end_date) -> list:
+        """Per-submission LLM usage rows (day, question, model, latency, tokens, cache hit) created in [start_date, end_date)."""
+        conn = self.connect()
+        if not conn: return []
+        cursor = conn.cursor(dictionary=True)
+        rows = []
+        try:
+            cursor.execute("""
+                SELECT DATE(created_at) AS day, question_id, llm_model, llm_latency_ms,
+                       prompt_tokens, completion_tokens, cache_hit
+                FROM submissions
+                WHERE created_at >= %s AND created_at < %s AND llm_model IS NOT NULL
+            """, (start_date, end_date))
+            rows = cursor.fetchall()
+        except Error as e:
+            logger.error(f"Error fetching submission LLM usage: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return rows
+
     def get_user_submissions(self, user_id: int, limit: int = 50, offset: int = 0) -> list:
         """Get all submissions for a specific user."""
         conn = self.connect()
@@ -659,6 +1307,120 @@ class DatabaseHandler:
             self.close()
         return submission
 
+    def get_unevaluated_submissions(self, evaluator_user_id: int, after_id: int = 0, limit: int = 500,
+                                    harness_languages: Optional[Sequence[str]] = None) -> list:
+        """
+        Completed submissions with generated code that `evaluator_user_id` has not evaluated yet, in ID order
+        after `after_id` (keyset pagination, so batch runs over many rows stay cheap). With `harness_languages`,
+        only submissions to questions that have a test harness in one of those (lowercase) languages are
+        returned; a question without a language counts as Python.
+        """
+        conn = self.connect()
+        if not conn: return []
+        cursor = conn.cursor(dictionary=True)
+        submissions = []
+        try:
+            harness_join, harness_params = "", ()
+            if harness_languages is not None:
+                placeholders = ", ".join(["%s"] * len(harness_languages)) or "NULL"
+                harness_join = f"""
+                    JOIN questions q ON q.id = s.question_id AND q.test_harness IS NOT NULL
+                        AND LOWER(COALESCE(q.programming_language, 'python')) IN ({placeholders})"""
+                harness_params = tuple(harness_languages)
+            cursor.execute(f"""
+                SELECT s.id, s.user_id, s.question_id, s.prompt, s.generated_code, u.username
+                FROM submissions s
+                JOIN users u ON s.user_id = u.id{harness_join}
+                LEFT JOIN evaluations e ON e.submission_id = s.id AND e.evaluator_user_id = %s
+                WHERE s.id > %s AND s.status = 'completed' AND s.generated_code IS NOT NULL AND e.id IS NULL
+                ORDER BY s.id
+                LIMIT %s
+            """, harness_params + (evaluator_user_id, after_id, limit))
+            submissions = cursor.fetchall()
+            logger.debug(f"Retrieved {len(submissions)} unevaluated submissions after ID {after_id}")
+        except Error as e:
+            logger.error(f"Error getting unevaluated submissions after ID {after_id}: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return submissions
+
+    @staticmethod
+    def _search_filters(question_column: str, user_column: str, created_column: str, question_id: Optional[int],
+                        user_id: Optional[int], start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[str, tuple]:
+        clauses, params = [], []
+        for column, operator, value in ((question_column, "=", question_id), (user_column, "=", user_id),
+                                        (created_column, ">=", start_date), (created_column, "<", end_date)):
+            if value is not None:
+                clauses.append(f"AND {column} {operator} %s")
+                params.append(value)
+        return " ".join(clauses), tuple(params)
+
+    def search_submissions(self, query: str, scope: str = "submissions", boolean_mode: bool = False,
+                           question_id: Optional[int] = None, user_id: Optional[int] = None,
+                           start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                           limit: int = 20, offset: int = 0) -> list:
+        """
+        Full-text search over submission prompts and/or generated code (scope: prompts, code or submissions),
+        most relevant first. boolean_mode enables MySQL operators (+required -excluded "phrase" prefix*).
+        """
+        conn = self.connect()
+        if not conn: return []
+        cursor = conn.cursor(dictionary=True)
+        rows = []
+        try:
+            match = f"MATCH({SUBMISSION_SEARCH_COLUMNS[scope]}) AGAINST (%s IN {'BOOLEAN' if boolean_mode else 'NATURAL LANGUAGE'} MODE)"
+            filters, params = self._search_filters("s.question_id", "s.user_id", "s.created_at",
+                                                   question_id, user_id, start_date, end_date)
+            cursor.execute(f"""
+                SELECT s.id, s.user_id, u.username, s.question_id, s.prompt, s.generated_code, s.created_at,
+                       {match} AS relevance
+                FROM submissions s
+                JOIN users u ON u.id = s.user_id
+                WHERE {match} {filters}
+                ORDER BY relevance DESC, s.id DESC
+                LIMIT %s OFFSET %s
+            """, (query, query, *params, limit, offset))
+            rows = cursor.fetchall()
+            logger.debug(f"Submission search ({scope}) for {query!r} returned {len(rows)} rows.")
+        except Error as e:
+            logger.error(f"Error searching submissions ({scope}) for {query!r}: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return rows
+
+    def search_evaluations(self, query: str, boolean_mode: bool = False, question_id: Optional[int] = None,
+                           user_id: Optional[int] = None, start_date: Optional[datetime] = None,
+                           end_date: Optional[datetime] = None, limit: int = 20, offset: int = 0) -> list:
+        """Full-text search over evaluation notes, most relevant first. user_id is the evaluated candidate."""
+        conn = self.connect()
+        if not conn: return []
+        cursor = conn.cursor(dictionary=True)
+        rows = []
+        try:
+            match = f"MATCH(e.evaluation_notes) AGAINST (%s IN {'BOOLEAN' if boolean_mode else 'NATURAL LANGUAGE'} MODE)"
+            filters, params = self._search_filters("e.task_id", "s.user_id", "e.created_at",
+                                                   question_id, user_id, start_date, end_date)
+            cursor.execute(f"""
+                SELECT e.id, e.submission_id, s.user_id, e.candidate_id, e.task_id AS question_id,
+                       e.evaluator_username, e.overall_score, e.evaluation_notes, e.created_at,
+                       {match} AS relevance
+                FROM evaluations e
+                LEFT JOIN submissions s ON s.id = e.submission_id
+                WHERE {match} {filters}
+                ORDER BY relevance DESC, e.id DESC
+                LIMIT %s OFFSET %s
+            """, (query, query, *params, limit, offset))
+            rows = cursor.fetchall()
+            logger.debug(f"Evaluation search for {query!r} returned {len(rows)} rows.")
+        except Error as e:
+            logger.error(f"Error searching evaluations for {query!r}: {e}")
+        finally:
+            cursor.close()
+            self.close()
+        return rows
+
     def get_user_submission_count(self, user_id: int) -> int:
         """Get total number of submissions for a user."""
         conn = self.connect()
@@ -0,0 +1,140 @@
+"""
+Automated evaluation of submissions against question test harnesses.
+
+AutoEvaluator walks the completed submissions that its evaluator account has not
+scored yet, in pages ordered by ID, and runs each question's harness against the
+generated code (see sandbox.py). Runs are spread over a process pool; results are
+written back through Evaluator.create_evaluation_structured as they finish.
+
+Submissions for questions without a harness, or in a language other than Python,
+are left out of the candidate query, so runs do not fetch them again and again; they
+are picked up once their question gets a Python harness. A submission whose pool
+worker crashed counts as skipped and is retried on the next run.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from promptcraft.evaluation.evaluator import Evaluator
+from promptcraft.evaluation.sandbox import SandboxLimits, check_isolation, extract_code, run_tests
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+AUTO_EVALUATION_PROCESSES = int(os.getenv("AUTO_EVALUATION_PROCESSES", os.cpu_count() or 2))
+AUTO_EVALUATION_BATCH_SIZE = int(os.getenv("AUTO_EVALUATION_BATCH_SIZE", 500))
+SUPPORTED_LANGUAGES = {"python"}
+
+
+def evaluate_code(generated_code: str, harness: str, limits: SandboxLimits) -> Dict[str, Any]:
+    """Score one answer. Top-level so that it can run in a pool process."""
+    scores = run_tests(extract_code(generated_code), harness, limits)
+    return {"scores": scores, "overall_score": round(scores["pass_rate"] * 100, 2)}
+
+
+def candidate_id_for(submission: Dict[str, Any]) -> str:
+    # Same format the frontend uses to look up a user's evaluations
+    return f"user_{submission['user_id']}_{submission['username']}"
+
+
+class AutoEvaluator:
+    """Batch scoring of submissions in sandboxed processes."""
+
+    def __init__(self, evaluator_user_id: int, evaluator_username: str, evaluator: Optional[Evaluator] = None,
+                 processes: int = AUTO_EVALUATION_PROCESSES, limits: Optional[SandboxLimits] = None):
+        self.evaluator_user_id = evaluator_user_id
+        self.evaluator_username = evaluator_username
+        self.evaluator = evaluator or Evaluator(use_database=True)
+        self.processes = max(1, processes)
+        self.limits = limits or SandboxLimits()
+        # Metrics
+        self.evaluated = 0
+        self.skipped = 0
+        self.save_failures = 0
+        self.by_status: Dict[str, int] = {}
+
+    @property
+    def db_handler(self):
+        return self.evaluator.db_handler
+
+    def run(self, batch_size: int = AUTO_EVALUATION_BATCH_SIZE, max_submissions: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Evaluate every pending submission (or up to `max_submissions`). Returns the run's stats.
+        Raises SandboxUnavailableException before scoring anything if candidate code could not be isolated.
+        """
+        check_isolation()
+        started = time.monotonic()
+        after_id = 0
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            while max_submissions is None or self.evaluated + self.skipped < max_submissions:
+                limit = batch_size if max_submissions is None else min(batch_size, max_submissions - self.evaluated - self.skipped)
+                page = self.db_handler.get_unevaluated_submissions(self.evaluator_user_id, after_id, limit,
+                                                                   harness_languages=sorted(SUPPORTED_LANGUAGES))
+                if not page:
+                    break
+                after_id = page[-1]["id"]
+                self.evaluate_batch(page, pool)
+                logger.info(f"Auto-evaluation progress: {self.evaluated} evaluated, {self.skipped} skipped (last submission {after_id}).")
+        stats = self.stats()
+        stats["seconds"] = round(time.monotonic() - started, 1)
+        return stats
+
+    def evaluate_batch(self, submissions: List[Dict[str, Any]], pool: ProcessPoolExecutor) -> None:
+        harnesses = self.db_handler.get_question_test_harnesses(s["question_id"] for s in submissions)
+        pending = {}
+        for submission in submissions:
+            harness = harnesses.get(submission["question_id"])
+            if harness is None or (harness.get("programming_language") or "python").lower() not in SUPPORTED_LANGUAGES:
+                # The query already leaves these out; only a harness changed since then gets here
+                self.skipped += 1
+                continue
+            future = pool.submit(evaluate_code, submission["generated_code"], harness["test_harness"], self.limits)
+            pending[future] = submission
+            # Keep a bounded number of runs queued, so large batches do not hold every answer in the pool's queue
+            if len(pending) >= self.processes * 4:
+                self._save_finished(pending, wait(pending, return_when=FIRST_COMPLETED).done)
+        self._save_finished(pending, wait(pending).done)
+
+    def _save_finished(self, pending: Dict[Any, Dict[str, Any]], done: Iterable[Any]) -> None:
+        for future in done:
+            submission = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                # A crash of the pool worker itself, not of the candidate code (that is scored as an error)
+                logger.error(f"Auto-evaluation of submission {submission['id']} failed: {e}", exc_info=True)
+                self.skipped += 1
+                continue
+            self.save(submission, result)
+
+    def save(self, submission: Dict[str, Any], result: Dict[str, Any]) -> Optional[int]:
+        scores = result["scores"]
+        evaluation_id = self.evaluator.create_evaluation_structured(
+            candidate_id=candidate_id_for(submission),
+            task_id=submission["question_id"],
+            evaluator_user_id=self.evaluator_user_id,
+            evaluator_username=self.evaluator_username,
+            prompt_evaluated=submission["prompt"],
+            generated_code_evaluated=submission["generated_code"],
+            evaluation_notes=f"Automated: {scores['tests_passed']}/{scores['tests_total']} tests passed ({scores['status']})."
+                             + (f" {scores['error']}" if scores["error"] else ""),
+            evaluation_criteria_used={"method": "test_harness", "limits": asdict(self.limits)},
+            scores=scores,
+            submission_id=submission["id"],
+            overall_score=result["overall_score"],
+        )
+        self.evaluated += 1
+        self.by_status[scores["status"]] = self.by_status.get(scores["status"], 0) + 1
+        if evaluation_id is None:
+            self.save_failures += 1
+        return evaluation_id
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "evaluated": self.evaluated,
+            "skipped": self.skipped,
+            "save_failures": self.save_failures,
+            "by_status": dict(self.by_status),
+        }
@@ -0,0 +1,176 @@
+"""
+Prompt and code features, computed once per submission.
+
+Leaderboards and analytics used to score submissions with SQL over the raw
+prompt and code TEXT columns on every read. Instead, each submission gets a
+compact row in submission_features when it is saved, holding:
+
+- prompt size (tokens, characters) and code size (characters, lines, fenced blocks),
+- how many of the question's evaluation_criteria the prompt covers (keyword match),
+- whether the prompt or the code's fence tag names the question's language,
+- whether the prompt mentions edge cases,
+- quality_score (0-100), derived from the above; this is the leaderboard score.
+
+FEATURE_VERSION is stored with each row; bump it when the extraction changes.
+backfill_features() computes missing and older rows; initialize_database.py runs it
+on every deploy, and backfill_features.py runs it on demand.
+"""
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from promptcraft.evaluation.sandbox import FENCE_RE
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+FEATURE_VERSION = 1
+# Score of a submission that produced no code (also used for submissions without a feature row)
+NO_CODE_SCORE = 30.0
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+# Words that appear in most criteria ("Prompt clearly specifies ...") and say nothing about the content
+_CRITERIA_STOPWORDS = {
+    "prompt", "clearly", "specifies", "specify", "defines", "define", "mentions", "mention", "asks", "identifies",
+    "that", "with", "from", "into", "the", "and", "for", "are", "needed", "requirement", "handling", "correctly",
+}
+_EDGE_CASE_RE = re.compile(
+    r"\b(edge[- ]cases?|corner[- ]cases?|empty|null|none|negative|zero|invalid|boundar(?:y|ies)|overflow|"
+    r"missing|exceptions?|errors?|validat\w*)\b", re.IGNORECASE)
+_LANGUAGE_ALIASES = {
+    "python": ("python", "py", "python3"),
+    "javascript": ("javascript", "js", "node", "nodejs"),
+    "typescript": ("typescript", "ts"),
+    "sql": ("sql", "mysql", "postgresql", "sqlite"),
+    "java": ("java",),
+    "c++": ("c++", "cpp"),
+    "c#": ("c#", "csharp", "cs"),
+    "go": ("go", "golang"),
+}
+# Word stems are compared on this many characters ("sorting" matches "sort", "cases" matches "case")
+_STEM_LENGTH = 5
+
+
+@dataclass
+class SubmissionFeatures:
+    prompt_token_count: int
+    prompt_chars: int
+    code_chars: int
+    code_lines: int
+    code_blocks: int
+    criteria_total: int
+    criteria_covered: int
+    language_match: bool
+    mentions_edge_cases: bool
+    quality_score: float
+    feature_version: int = FEATURE_VERSION
+
+    @property
+    def criteria_coverage(self) -> float:
+        return self.criteria_covered / self.criteria_total if self.criteria_total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _stems(text: str) -> set:
+    return {word[:_STEM_LENGTH] for word in _WORD_RE.findall(text.lower())}
+
+
+def _criterion_keywords(criterion: str) -> set:
+    return {word[:_STEM_LENGTH] for word in _WORD_RE.findall(criterion.lower())
+            if len(word) >= 3 and word not in _CRITERIA_STOPWORDS}
+
+
+def _language_names(language: Optional[str]) -> tuple:
+    if not language:
+        return ()
+    language = language.strip().lower()
+    return _LANGUAGE_ALIASES.get(language, (language,))
+
+
+def quality_score(code_chars: int, criteria_covered: int, criteria_total: int, language_match: bool,
+                  mentions_edge_cases: bool) -> float:
+    """0-100: half for producing code, the rest for criteria coverage (30), naming the language (10) and edge cases (10)."""
+    if code_chars == 0:
+        return NO_CODE_SCORE
+    coverage = criteria_covered / criteria_total if criteria_total else 0.0
+    return round(50 + 30 * coverage + 10 * language_match + 10 * mentions_edge_cases, 2)
+
+
+def extract_features(prompt: str, generated_code: Optional[str],
+                     question: Optional[Mapping[str, Any]] = None) -> SubmissionFeatures:
+    """Compute the features of one submission. `question` is its questions row (evaluation_criteria decoded)."""
+    question = question or {}
+    generated_code = generated_code or ""
+    prompt_stems = _stems(prompt)
+
+    criteria: Iterable[str] = [c for c in (question.get("evaluation_criteria") or ()) if isinstance(c, str)]
+    criteria_total = criteria_covered = 0
+    for criterion in criteria:
+        keywords = _criterion_keywords(criterion)
+        if not keywords:
+            continue
+        criteria_total += 1
+        # Covered when at least half of the criterion's keywords appear in the prompt
+        if 2 * len(keywords & prompt_stems) >= len(keywords):
+            criteria_covered += 1
+
+    blocks = FENCE_RE.findall(generated_code)
+    code = "\n".join(body for _, body in blocks) if blocks else generated_code.strip()
+    languages = _language_names(question.get("programming_language"))
+    fence_tags = [tag.lower() for tag, _ in blocks if tag]
+    if fence_tags:
+        language_match = fence_tags[0] in languages
+    else:
+        prompt_words = set(_WORD_RE.findall(prompt.lower()))
+        language_match = any(name in prompt_words for name in languages)
+    mentions_edge_cases = _EDGE_CASE_RE.search(prompt) is not None
+
+    return SubmissionFeatures(
+        prompt_token_count=len(_TOKEN_RE.findall(prompt)),
+        prompt_chars=len(prompt),
+        code_chars=len(code),
+        code_lines=len([line for line in code.splitlines() if line.strip()]),
+        code_blocks=len(blocks),
+        criteria_total=criteria_total,
+        criteria_covered=criteria_covered,
+        language_match=language_match,
+        mentions_edge_cases=mentions_edge_cases,
+        quality_score=quality_score(len(code), criteria_covered, criteria_total, language_match, mentions_edge_cases),
+    )
+
+
+def extract_features_batch(rows: List[Dict[str, Any]], questions: Mapping[int, Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Features for submission rows (id, question_id, prompt, generated_code), keyed for save_submission_features."""
+    return [
+        {"submission_id": row["id"],
+         **extract_features(row["prompt"], row.get("generated_code"), questions.get(row["question_id"])).as_dict()}
+        for row in rows
+    ]
+
+
+def backfill_features(db_handler, batch_size: int = 1000) -> int:
+    """
+    Compute submission_features for completed submissions without a row of the current FEATURE_VERSION.
+    Safe to re-run; returns the number of submissions updated.
+    """
+    questions = {q["id"]: q for q in db_handler.get_all_question_details()}
+    if not questions:
+        # No questions (or the query failed): features computed now would all lack their question
+        logger.warning("Feature backfill skipped: no questions could be loaded.")
+        return 0
+    after_id = 0
+    total = 0
+    while True:
+        rows = db_handler.get_submissions_needing_features(FEATURE_VERSION, after_id, batch_size)
+        if not rows:
+            break
+        after_id = rows[-1]["id"]
+        if not db_handler.save_submission_features(extract_features_batch(rows, questions)):
+            logger.error(f"Stopping feature backfill: could not save features up to submission {after_id}.")
+            break
+        total += len(rows)
+        logger.info(f"Backfilled features for {total} submissions (last submission {after_id}).")
+    return total
@@ -0,0 +1,245 @@
+"""
+Sandboxed execution of generated code against a question's test harness.
+
+The code is taken from the fenced blocks of the LLM answer. Each run uses two fresh
+Python interpreters, in a temporary directory:
+
+- a trusted harness process (sandbox_harness.py), which executes the harness, runs every
+  test_* function and reports the outcome to this process with a per-run secret nonce;
+- an untrusted worker process (sandbox_worker.py), which loads the candidate's code and
+  answers the harness's calls to it over a pipe. Test results are never taken from it.
+
+The worker is isolated from the host:
+
+- a new network namespace, so it has no network interfaces (only a down loopback),
+- chrooted into an empty directory, under an unprivileged per-run uid (SANDBOX_UID_BASE + PID)
+  with no groups, so it cannot read host files or signal other processes,
+- CPU time (RLIMIT_CPU) and a wall-clock deadline, address space (RLIMIT_AS), file size,
+  open files, processes (RLIMIT_NPROC: it cannot fork) and no core dumps.
+
+Only the stdlib modules preloaded by the worker (math, collections, itertools, ...) can be
+imported by the candidate's code. Isolation needs root on Linux (in Docker: --user root
+--cap-add SYS_ADMIN); without it run_tests fails closed, unless SANDBOX_ALLOW_UNISOLATED=true
+is set for local development, which keeps the process split but drops the isolation.
+
+A harness is Python source that defines test_* functions calling the solution's top-level
+names, e.g.
+
+    def test_base_case():
+        assert factorial(0) == 1
+
+Each test passes unless it raises. Arguments and return values cross the process boundary
+as Python literals (numbers, strings, lists, dicts, ...); other objects, such as instances
+of a class the solution defines, are proxies whose methods and attributes can be used.
+Only Python harnesses are supported.
+"""
+import functools
+import hmac
+import json
+import os
+import re
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError: # Not available on Windows; only the wall-clock timeout applies there
+    resource = None
+
+from promptcraft.exceptions import SandboxUnavailableException
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", 5))
+SANDBOX_WALL_SECONDS = float(os.getenv("SANDBOX_WALL_SECONDS", 10))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", 256))
+SANDBOX_MAX_FILE_BYTES = 1024 * 1024
+SANDBOX_MAX_OPEN_FILES = 64
+SANDBOX_MAX_PROCESSES = 1
+# Worker uids are SANDBOX_UID_BASE + the harness process's PID, so concurrent runs never share one
+SANDBOX_UID_BASE = int(os.getenv("SANDBOX_UID_BASE", 200000))
+SANDBOX_ALLOW_UNISOLATED = os.getenv("SANDBOX_ALLOW_UNISOLATED", "false").lower() == "true"
+# Startup of both interpreters, on top of the wall-clock limit of the tests themselves
+_STARTUP_GRACE_SECONDS = 5
+_HERE = os.path.dirname(os.path.abspath(__file__))
+HARNESS_SCRIPT = os.path.join(_HERE, "sandbox_harness.py")
+WORKER_SCRIPT = os.path.join(_HERE, "sandbox_worker.py")
+
+# Outcomes of one sandbox run
+PASSED = "passed"
+FAILED = "failed"
+TIMEOUT = "timeout"
+ERROR = "error" # Code or harness could not be loaded, or the interpreter died
+NO_CODE = "no_code"
+
+FENCE_RE = re.compile(r"```[ \t]*([\w+#.-]*)[^\n]*\n(.*?)```", re.DOTALL)
+
+@dataclass
+class SandboxLimits:
+    cpu_seconds: int = SANDBOX_CPU_SECONDS
+    wall_seconds: float = SANDBOX_WALL_SECONDS
+    memory_mb: int = SANDBOX_MEMORY_MB
+
+
+def extract_code(generated_code: Optional[str], language: str = "python") -> str:
+    """
+    Return the code in the fenced blocks of an LLM answer. Blocks tagged with another language are skipped;
+    several matching blocks are joined. An answer without fences is taken to be code as a whole.
+    """
+    if not generated_code:
+        return ""
+    blocks = FENCE_RE.findall(generated_code)
+    if not blocks:
+        return generated_code.strip()
+    language = language.lower()
+    selected = [body for tag, body in blocks if not tag or tag.lower() in (language, "py", "python3")]
+    return "\n\n".join(block.strip("\n") for block in selected)
+
+
+def _limit_resources(limits: SandboxLimits):
+    def apply() -> None:
+        # Runs in the harness process between fork and exec; the worker gets its own, stricter limits
+        memory = max(limits.memory_mb, 256) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_CPU, (limits.cpu_seconds + 5, limits.cpu_seconds + 6))
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    return apply
+
+
+def _kill_group(process: subprocess.Popen) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        process.kill()
+
+
+def _run_harness(workdir: str, config: Dict[str, Any], timeout: float) -> Optional[Dict[str, Any]]:
+    """Run sandbox_harness.py; returns its report, None on timeout. Raises ValueError if the report is missing or forged."""
+    nonce = secrets.token_hex(16)
+    process = subprocess.Popen(
+        [sys.executable, "-I", "-B", HARNESS_SCRIPT], cwd=workdir, env={"PYTHONHASHSEED": "0"},
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        preexec_fn=_limit_resources(config["limits"]) if resource is not None else None,
+        start_new_session=True,
+    )
+    payload = {k: v for k, v in config.items() if k != "limits"}
+    try:
+        stdout, _ = process.communicate((json.dumps({**payload, "nonce": nonce}) + "\n").encode(), timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_group(process)
+        process.communicate()
+        return None
+    finally:
+        if process.poll() is None:
+            _kill_group(process)
+    try:
+        report = json.loads(stdout.decode("utf-8", "replace").strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise ValueError(f"Sandbox exited with code {process.returncode} without a result.")
+    if not hmac.compare_digest(str(report.get("nonce", "")), nonce):
+        raise ValueError("Sandbox result could not be verified.")
+    return report
+
+
+def _config(limits: SandboxLimits, isolate: bool) -> Dict[str, Any]:
+    return {
+        "limits": limits,
+        "isolate": isolate,
+        "wall_seconds": limits.wall_seconds,
+        "cpu_seconds": limits.cpu_seconds,
+        "memory_mb": limits.memory_mb,
+        "max_file_bytes": SANDBOX_MAX_FILE_BYTES,
+        "max_open_files": SANDBOX_MAX_OPEN_FILES,
+        "max_processes": SANDBOX_MAX_PROCESSES,
+        "uid_base": SANDBOX_UID_BASE,
+        "worker_script": WORKER_SCRIPT,
+    }
+
+
+def _prepare(workdir: str, code: str, harness: str) -> None:
+    for name, source in (("solution.py", code), ("harness.py", harness)):
+        with open(os.path.join(workdir, name), "w", encoding="utf-8") as f:
+            f.write(source)
+    # The worker's root directory after chroot: empty, and not writable by its uid
+    os.mkdir(os.path.join(workdir, "jail"), 0o555)
+
+
+@functools.lru_cache(maxsize=1)
+def isolation_error() -> Optional[str]:
+    """Why the worker cannot be isolated on this host (None when it can). Checked once per process."""
+    if not sys.platform.startswith("linux") or resource is None:
+        return "Sandbox isolation needs Linux."
+    if os.geteuid() != 0:
+        return "Sandbox isolation needs root (chroot, setuid and a network namespace); in Docker also --cap-add SYS_ADMIN."
+    with tempfile.TemporaryDirectory(prefix="promptcraft-sandbox-") as workdir:
+        _prepare(workdir, "", "")
+        try:
+            report = _run_harness(workdir, {**_config(SandboxLimits(), isolate=True), "probe": True}, 30)
+        except ValueError as e:
+            return str(e)
+    if report is None or report.get("stage") != "probe":
+        return f"Sandbox isolation probe failed: {report and report.get('error')}"
+    if report.get("uid") in (None, 0):
+        return "Sandbox worker did not switch to an unprivileged uid."
+    return None
+
+
+def check_isolation() -> None:
+    """Raise SandboxUnavailableException unless runs will be isolated (or SANDBOX_ALLOW_UNISOLATED is set)."""
+    if SANDBOX_ALLOW_UNISOLATED:
+        logger.warning("SANDBOX_ALLOW_UNISOLATED is set: candidate code runs without network, filesystem or uid isolation.")
+        return
+    error = isolation_error()
+    if error:
+        raise SandboxUnavailableException(error)
+
+
+def run_tests(code: str, harness: str, limits: Optional[SandboxLimits] = None) -> Dict[str, Any]:
+    """
+    Run `harness` against `code` in the sandbox.
+
+    Returns {"status", "tests_passed", "tests_total", "pass_rate", "duration_ms", "error", "tests"}.
+    """
+    limits = limits or SandboxLimits()
+    if not code.strip():
+        return _result(NO_CODE, [], 0.0, "No code found in the generated answer.")
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory(prefix="promptcraft-sandbox-") as workdir:
+        _prepare(workdir, code, harness)
+        try:
+            report = _run_harness(workdir, _config(limits, isolate=not SANDBOX_ALLOW_UNISOLATED),
+                                  limits.wall_seconds + _STARTUP_GRACE_SECONDS)
+        except ValueError as e:
+            return _result(ERROR, [], time.monotonic() - started, str(e))
+    duration = time.monotonic() - started
+
+    if report is None or report["stage"] == "timeout":
+        return _result(TIMEOUT, [], duration, f"Exceeded the {limits.cpu_seconds}s CPU or {limits.wall_seconds:g}s wall-clock limit.")
+    if report["stage"] == "isolation":
+        return _result(ERROR, [], duration, f"Sandbox could not be set up: {report['error']}")
+    if report["stage"] != "tests":
+        return _result(ERROR, [], duration, f"{report['stage'].capitalize()} failed to load: {report['error']}")
+    if not report["tests"]:
+        return _result(ERROR, [], duration, "The harness defines no test_* functions.")
+    status = PASSED if all(t["passed"] for t in report["tests"]) else FAILED
+    return _result(status, report["tests"], duration)
+
+
+def _result(status: str, tests: list, duration: float, error: Optional[str] = None) -> Dict[str, Any]:
+    passed = sum(1 for t in tests if t["passed"])
+    return {
+        "status": status,
+        "tests_passed": passed,
+        "tests_total": len(tests),
+        "pass_rate": round(passed / len(tests), 4) if tests else 0.0,
+        "duration_ms": round(duration * 1000, 1),
+        "error": error,
+        "tests": tests,
+    }
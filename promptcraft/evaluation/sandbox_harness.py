@@ -0,0 +1,266 @@
+"""
+Trusted side of a sandbox run: executes a question's test harness and decides which tests pass.
+
+Started by sandbox.run_tests as `python -I -B sandbox_harness.py` in a directory holding
+solution.py, harness.py and an empty jail/ directory. The run configuration, including a
+per-run nonce, arrives as one JSON line on stdin; the report, carrying the nonce, goes to the
+original stdout, which only this process holds.
+
+The candidate's code never runs here. It runs in a separate worker process (sandbox_worker.py):
+started in a new network namespace, with CPU, memory, file and process limits, chrooted into
+jail/ and switched to an unprivileged per-run uid (SANDBOX_UID_BASE + this process's PID).
+The harness sees the solution's top-level names as proxies: calling one, or an attribute of an
+object it returned, is a request to the worker, whose reply is decoded with ast.literal_eval.
+Exceptions of builtin types are re-raised as such, others as CandidateError. Whatever the
+worker sends, it can only influence return values, never the test results themselves.
+
+Only uses the standard library: it runs in isolated mode, without the application on sys.path.
+"""
+import ast
+import builtins
+import ctypes
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+import types
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CLONE_NEWNET = 0x40000000
+MAX_ERROR_LENGTH = 300
+MAX_REPLY_BYTES = 1024 * 1024
+_UNRAISABLE = (SystemExit, KeyboardInterrupt, GeneratorExit)
+TIMED_OUT = "timed out"
+
+
+class CandidateError(Exception):
+    """An exception raised by the candidate's code that is not a builtin exception type."""
+
+
+class WorkerGone(BaseException):
+    """
+    The worker died, timed out or broke the protocol; no further calls can be made.
+    A BaseException, so that `except Exception` in a harness does not swallow it.
+    """
+
+
+def _error_text(e):
+    return (type(e).__name__ + ": " + str(e))[:MAX_ERROR_LENGTH]
+
+
+def _worker_limits(config):
+    libc = ctypes.CDLL(None, use_errno=True) if config["isolate"] else None
+
+    def apply():
+        # Runs in the worker between fork and exec
+        if resource is not None:
+            cpu, memory = config["cpu_seconds"], config["memory_mb"] * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+            resource.setrlimit(resource.RLIMIT_FSIZE, (config["max_file_bytes"], config["max_file_bytes"]))
+            resource.setrlimit(resource.RLIMIT_NOFILE, (config["max_open_files"], config["max_open_files"]))
+            resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+            # Counted against the worker's own uid once it has switched to it
+            resource.setrlimit(resource.RLIMIT_NPROC, (config["max_processes"], config["max_processes"]))
+        if libc is not None and libc.unshare(CLONE_NEWNET) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"unshare(CLONE_NEWNET) failed: {os.strerror(errno)}")
+    return apply
+
+
+class Worker:
+    """The candidate's process, and the request/reply channel to it."""
+
+    def __init__(self, config, deadline, probe=False):
+        self.deadline = deadline
+        jail, uid = ("jail", config["uid_base"] + os.getpid()) if config["isolate"] else ("-", os.getuid())
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", "-B", "-S", config["worker_script"], jail, str(uid)] + (["--probe"] if probe else []),
+            env={"PYTHONHASHSEED": "0"}, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            preexec_fn=_worker_limits(config),
+        )
+        self._buffer = b""
+
+    def _read_line(self):
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self._buffer:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                self.kill()
+                raise WorkerGone(TIMED_OUT)
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                self.process.wait()
+                raise WorkerGone("exited")
+            self._buffer += chunk
+            if len(self._buffer) > MAX_REPLY_BYTES:
+                self.kill()
+                raise WorkerGone("broke the sandbox protocol")
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        try:
+            message = json.loads(line)
+            if not isinstance(message, dict):
+                raise ValueError("not an object")
+            return message
+        except ValueError:
+            self.kill()
+            raise WorkerGone("broke the sandbox protocol")
+
+    def receive(self):
+        return self._read_line()
+
+    def request(self, **message):
+        try:
+            self.process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self.process.wait()
+            raise WorkerGone("exited")
+        return self._read_line()
+
+    def killed_by_limit(self):
+        return self.process.poll() in (-signal.SIGXCPU, -signal.SIGKILL)
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+
+class Remote:
+    """Proxy for an object living in the worker."""
+
+    def __init__(self, worker, handle):
+        object.__setattr__(self, "_worker", worker)
+        object.__setattr__(self, "_handle", handle)
+
+    def __call__(self, *args, **kwargs):
+        return _reply_value(self._worker, self._worker.request(
+            op="call", target=self._handle, args=[_encode(a) for a in args],
+            kwargs={k: _encode(v) for k, v in kwargs.items()}))
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return _reply_value(self._worker, self._worker.request(op="getattr", target=self._handle, attr=attr))
+
+    def __repr__(self):
+        return f"<candidate object {self._handle}>"
+
+
+def _encode(value):
+    if isinstance(value, Remote):
+        return {"handle": value._handle}
+    text = repr(value)
+    ast.literal_eval(text) # Only plain data can be passed to the candidate's code
+    return {"literal": text}
+
+
+def _decode(worker, value):
+    if not isinstance(value, dict):
+        raise WorkerGone("broke the sandbox protocol")
+    if isinstance(value.get("handle"), int):
+        return Remote(worker, value["handle"])
+    if isinstance(value.get("literal"), str):
+        try:
+            return ast.literal_eval(value["literal"])
+        except Exception:
+            raise WorkerGone("broke the sandbox protocol")
+    raise WorkerGone("broke the sandbox protocol")
+
+
+def _reply_value(worker, reply):
+    if reply.get("ok") is True:
+        return _decode(worker, reply.get("value"))
+    error_type = getattr(builtins, str(reply.get("error_type")), None)
+    message = str(reply.get("error", ""))[:MAX_ERROR_LENGTH]
+    exception = CandidateError(message)
+    if isinstance(error_type, type) and issubclass(error_type, BaseException) and not issubclass(error_type, _UNRAISABLE):
+        try:
+            exception = error_type(message)
+        except Exception: # Builtin types with other constructor arguments, e.g. UnicodeDecodeError
+            pass
+    raise exception
+
+
+def run(config, report):
+    deadline = time.monotonic() + config["wall_seconds"]
+    try:
+        worker = Worker(config, deadline, probe=config.get("probe", False))
+    except (OSError, subprocess.SubprocessError) as e:
+        return report({"stage": "isolation", "error": _error_text(e), "tests": []})
+    try:
+        try:
+            hello = worker.receive()
+        except WorkerGone as e:
+            if str(e) == TIMED_OUT or worker.killed_by_limit():
+                return report({"stage": "timeout", "error": None, "tests": []})
+            return report({"stage": "isolation" if config.get("probe") else "solution",
+                           "error": f"The sandboxed process {e} before loading the solution.", "tests": []})
+        if config.get("probe"):
+            return report({"stage": "probe", "error": None, "tests": [], "uid": hello.get("uid")})
+        if hello.get("ok") is not True or not isinstance(hello.get("names"), dict):
+            return report({"stage": "solution", "error": str(hello.get("error", ""))[:MAX_ERROR_LENGTH], "tests": []})
+
+        namespace = {"__name__": "harness", "CandidateError": CandidateError}
+        try:
+            for name, value in hello["names"].items():
+                if isinstance(name, str) and name.isidentifier():
+                    namespace[name] = _decode(worker, value)
+            with open("harness.py", encoding="utf-8") as f:
+                exec(compile(f.read(), "harness.py", "exec"), namespace)
+        except WorkerGone:
+            return report({"stage": "solution", "error": "The solution's process broke the sandbox protocol.", "tests": []})
+        except BaseException as e:
+            return report({"stage": "harness", "error": _error_text(e), "tests": []})
+
+        tests = []
+        # Only functions the harness itself defines are tests, not names the solution exported
+        harness_tests = [(name, fn) for name, fn in list(namespace.items())
+                         if name.startswith("test_") and isinstance(fn, types.FunctionType)
+                         and fn.__code__.co_filename == "harness.py"]
+        for name, fn in harness_tests:
+            try:
+                fn()
+                tests.append({"name": name, "passed": True, "error": None})
+            except WorkerGone as e:
+                if str(e) == TIMED_OUT or worker.killed_by_limit():
+                    return report({"stage": "timeout", "error": None, "tests": tests})
+                tests.append({"name": name, "passed": False, "error": f"The solution's process {e}."})
+                # Later tests cannot reach the solution either
+                tests.extend({"name": n, "passed": False, "error": "Not run: the solution's process is gone."}
+                             for n, _ in harness_tests[len(tests):])
+                break
+            except BaseException as e:
+                tests.append({"name": name, "passed": False, "error": _error_text(e)})
+        return report({"stage": "tests", "error": None, "tests": tests})
+    finally:
+        worker.kill()
+
+
+def main():
+    config = json.loads(sys.stdin.readline())
+    result_fd = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd) # Harness output must not mix with the report
+
+    def report(payload):
+        payload["nonce"] = config["nonce"]
+        os.write(result_fd, (json.dumps(payload) + "\n").encode("utf-8"))
+
+    run(config, report)
+
+
+if __name__ == "__main__":
+    main()
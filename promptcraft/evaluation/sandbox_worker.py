@@ -0,0 +1,131 @@
+"""
+Untrusted side of a sandbox run: loads the candidate's solution and answers calls from the harness.
+
+Started by sandbox_harness.py as `python -I -B -S sandbox_worker.py <jail> <uid>` in a directory
+holding solution.py, with its stdin/stdout connected to the harness. Before any candidate code
+runs it reads the solution, preloads the stdlib modules solutions may import, then (unless <jail>
+is "-") chroots into the empty <jail> directory and switches to <uid> with no groups. The network
+namespace, resource limits and process limit are applied by the harness before exec.
+
+Nothing this process says is trusted: the harness only uses its replies as the return values of
+the calls it makes, and decides on its own whether each test passed. Protocol, one JSON object per line:
+
+    worker:  {"ok": true, "names": {name: value}} | {"ok": false, "error": "..."}   (once, after loading)
+    harness: {"op": "call", "target": handle, "args": [value], "kwargs": {name: value}}
+             {"op": "getattr", "target": handle, "attr": name}
+    worker:  {"ok": true, "value": value} | {"ok": false, "error_type": "ValueError", "error": "..."}
+
+where a value is {"literal": repr} for anything ast.literal_eval can read back, or {"handle": n}
+for other objects, which stay in this process.
+
+Only uses the standard library: it runs in isolated mode, without the application on sys.path.
+"""
+import ast
+import json
+import os
+import sys
+
+# Modules a solution may import: after the chroot only already-loaded modules are importable
+PRELOADED_MODULES = (
+    "bisect", "collections", "copy", "dataclasses", "datetime", "decimal", "enum", "fractions", "functools",
+    "heapq", "itertools", "json", "math", "operator", "random", "re", "statistics", "string", "typing",
+)
+MAX_ERROR_LENGTH = 300
+MAX_LITERAL_LENGTH = 64 * 1024
+
+for _module in PRELOADED_MODULES:
+    try:
+        __import__(_module)
+    except ImportError:
+        pass
+
+_channel_in = os.fdopen(os.dup(0), "rb")
+_channel_out = os.dup(1)
+# The candidate's own output (and input) goes nowhere
+_devnull = os.open(os.devnull, os.O_RDWR)
+for _fd in (0, 1, 2):
+    os.dup2(_devnull, _fd)
+
+_handles = {}
+
+
+def _send(message):
+    data = (json.dumps(message) + "\n").encode("utf-8")
+    while data:
+        data = data[os.write(_channel_out, data):]
+
+
+def _error_text(e):
+    try:
+        return (type(e).__name__ + ": " + str(e))[:MAX_ERROR_LENGTH]
+    except BaseException:
+        return type(e).__name__
+
+
+def _encode(value):
+    try:
+        text = repr(value)
+        if len(text) <= MAX_LITERAL_LENGTH:
+            ast.literal_eval(text)
+            return {"literal": text}
+    except BaseException:
+        pass
+    _handles[len(_handles) + 1] = value
+    return {"handle": len(_handles)}
+
+
+def _decode(value):
+    if "handle" in value:
+        return _handles[value["handle"]]
+    return ast.literal_eval(value["literal"])
+
+
+def _jail(jail, uid):
+    os.chroot(jail)
+    os.chdir("/")
+    os.setgroups([])
+    os.setgid(uid)
+    os.setuid(uid)
+
+
+def main():
+    jail, uid = sys.argv[1], int(sys.argv[2])
+    with open("solution.py", encoding="utf-8") as f:
+        source = f.read()
+    if jail != "-":
+        _jail(jail, uid)
+    if len(sys.argv) > 3 and sys.argv[3] == "--probe":
+        _send({"ok": True, "names": {}, "uid": os.getuid()})
+        return
+
+    namespace = {"__name__": "solution"}
+    try:
+        exec(compile(source, "solution.py", "exec"), namespace)
+        names = {name: _encode(value) for name, value in list(namespace.items()) if not name.startswith("_")}
+    except BaseException as e:
+        _send({"ok": False, "error": _error_text(e)})
+        return
+    _send({"ok": True, "names": names})
+
+    for line in _channel_in:
+        try:
+            request = json.loads(line)
+            target = _handles[request["target"]]
+            if request["op"] == "call":
+                value = target(*[_decode(a) for a in request["args"]],
+                               **{k: _decode(v) for k, v in request["kwargs"].items()})
+            else:
+                value = getattr(target, request["attr"])
+            reply = {"ok": True, "value": _encode(value)}
+        except BaseException as e:
+            try:
+                message = str(e)[:MAX_ERROR_LENGTH]
+            except BaseException:
+                message = ""
+            reply = {"ok": False, "error_type": type(e).__name__, "error": message}
+        _send(reply)
+
+
+if __name__ == "__main__":
+    main()
+    os._exit(0)
@@ -22,6 +22,30 @@ class CacheException(PromptCraftBaseException):
     status_code = 503 # Service Unavailable
     detail = "A cache service error occurred."
 
+class ServiceBusyException(PromptCraftBaseException):
+    """Custom exception for when a bounded worker pool or queue is full."""
+    status_code = 503 # Service Unavailable
+    detail = "The service is busy. Please retry shortly."
+
+class RateLimitException(PromptCraftBaseException):
+    """Custom exception for clients that exceeded a rate limit."""
+    status_code = 429 # Too Many Requests
+    detail = "Too many requests. Please slow down."
+
+    def __init__(self, detail: str | None = None, retry_after: int = 60):
+        super().__init__(detail)
+        self.retry_after = retry_after
+        self.headers = {"Retry-After": str(retry_after)}
+
+class IdempotencyConflictException(PromptCraftBaseException):
+    """Custom exception for an Idempotency-Key that is reused with a different request or is still being processed."""
+    status_code = 409 # Conflict
+    detail = "This Idempotency-Key is already in use."
+
+    def __init__(self, detail: str | None = None, retry_after: int | None = None):
+        super().__init__(detail)
+        self.headers = {"Retry-After": str(retry_after)} if retry_after else None
+
 class LLMConnectionException(PromptCraftBaseException):
     """Custom exception for errors connecting to the LLM service."""
     status_code = 504 # Gateway Timeout
@@ -32,6 +56,11 @@ class LLMProcessingException(PromptCraftBaseException):
     status_code = 502 # Bad Gateway
     detail = "Error processing request with the Language Model service."
 
+class SandboxUnavailableException(PromptCraftBaseException):
+    """Custom exception for when candidate code cannot be run in an isolated sandbox on this host."""
+    status_code = 503 # Service Unavailable
+    detail = "The code sandbox is not available."
+
 class NotFoundException(PromptCraftBaseException):
     """Custom exception for resource not found errors."""
     status_code = 404
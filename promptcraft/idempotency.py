@@ -0,0 +1,179 @@
+"""
+Idempotency keys for PromptCraft write endpoints.
+
+A client that sends an Idempotency-Key header with POST /api/v1/submissions
+gets exactly one LLM call and one submission row per key, however often it
+retries or double-clicks:
+
+- the first request reserves the key (SET NX) and records its response when done,
+- a duplicate that arrives while the first is still running waits for that response,
+- a later replay gets the stored response directly,
+- reusing a key with a different request body is rejected with 409.
+
+Keys are scoped per user and stored in Redis for IDEMPOTENCY_TTL_SECONDS. The
+in-flight marker has a short TTL, so a crashed worker does not hold a key for
+long. If Redis is unavailable, each worker falls back to an in-memory store.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from promptcraft.exceptions import IdempotencyConflictException
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+IDEMPOTENCY_PREFIX = "promptcraft:idempotency"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+# How long a reservation survives without a recorded response (should exceed the slowest request)
+IDEMPOTENCY_IN_FLIGHT_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_IN_FLIGHT_TTL_SECONDS", 120))
+# How long a duplicate waits for the original request before answering 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 60))
+IDEMPOTENCY_POLL_SECONDS = 0.1
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+MEMORY_FALLBACK_MAX_KEYS = 10000
+
+IN_FLIGHT = "in_flight"
+COMPLETED = "completed"
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of the request body, used to detect a key reused for a different request."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Reservations and stored responses for idempotency keys."""
+
+    def __init__(self, redis_cache=None, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS,
+                 in_flight_ttl_seconds: int = IDEMPOTENCY_IN_FLIGHT_TTL_SECONDS):
+        self._redis_cache = redis_cache
+        self.ttl_seconds = ttl_seconds
+        self.in_flight_ttl_seconds = in_flight_ttl_seconds
+        self._local: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._local_lock = threading.Lock()
+        # Metrics
+        self.reserved = 0
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+
+    def _get_cache(self):
+        # Resolved lazily so that importing this module does not open a Redis connection
+        if self._redis_cache is None:
+            from promptcraft.redis_cache import RedisCache
+            self._redis_cache = RedisCache()
+        return self._redis_cache
+
+    @staticmethod
+    def _key(scope: str, key: str) -> str:
+        return f"{IDEMPOTENCY_PREFIX}:{scope}:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+    # --- Storage (Redis, or this worker's memory when Redis is down) ---
+
+    def _add(self, redis_key: str, record: Dict[str, Any], ttl_seconds: int) -> bool:
+        added = self._get_cache().set_if_absent(redis_key, record, ttl_seconds)
+        if added is not None:
+            return added
+        with self._local_lock:
+            now = time.monotonic()
+            entry = self._local.get(redis_key)
+            if entry is not None and entry[0] > now:
+                return False
+            if len(self._local) >= MEMORY_FALLBACK_MAX_KEYS:
+                self._local = {k: v for k, v in self._local.items() if v[0] > now}
+            self._local[redis_key] = (now + ttl_seconds, record)
+            return True
+
+    def _get(self, redis_key: str) -> Optional[Dict[str, Any]]:
+        cache = self._get_cache()
+        if cache.r is not None:
+            return cache.get_many([redis_key]).get(redis_key)
+        with self._local_lock:
+            entry = self._local.get(redis_key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+
+    def _put(self, redis_key: str, record: Dict[str, Any], ttl_seconds: int) -> None:
+        cache = self._get_cache()
+        if cache.r is not None and cache.set_many({redis_key: record}, ttl_seconds=ttl_seconds):
+            return
+        with self._local_lock:
+            self._local[redis_key] = (time.monotonic() + ttl_seconds, record)
+
+    def _delete(self, redis_key: str) -> None:
+        cache = self._get_cache()
+        if cache.r is not None:
+            cache.delete(redis_key)
+        with self._local_lock:
+            self._local.pop(redis_key, None)
+
+    # --- Protocol ---
+
+    def _check_fingerprint(self, record: Dict[str, Any], fingerprint: str) -> None:
+        if record.get("fingerprint") != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflictException(detail="This Idempotency-Key was already used for a different request.")
+
+    async def reserve_or_replay(self, scope: str, key: str, fingerprint: str,
+                                wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS) -> Optional[Dict[str, Any]]:
+        """
+        Reserve `key` for the caller, or return the stored response of an earlier request with the same key.
+
+        Returns None when the caller now owns the key and must call complete() or release().
+        Otherwise returns {"status_code": ..., "body": ...}. A duplicate of a request still in flight waits
+        up to `wait_seconds` for its response; if the original fails and releases the key, the duplicate
+        takes it over.
+
+        Raises:
+            IdempotencyConflictException: The key belongs to a different request, or the original is still running.
+        """
+        redis_key = self._key(scope, key)
+        deadline = time.monotonic() + wait_seconds
+        waiting = False
+        while True:
+            if self._add(redis_key, {"state": IN_FLIGHT, "fingerprint": fingerprint}, self.in_flight_ttl_seconds):
+                self.reserved += 1
+                return None
+            record = self._get(redis_key)
+            if record is not None:
+                self._check_fingerprint(record, fingerprint)
+                if record.get("state") == COMPLETED:
+                    self.replayed += 1
+                    logger.info(f"Replaying stored response for idempotency key in scope {scope}.")
+                    return {"status_code": record["status_code"], "body": record["body"]}
+            # else: released or expired between our two calls; try to reserve again after the pause
+            if not waiting:
+                waiting = True
+                self.waited += 1
+                logger.info(f"Duplicate request for an in-flight idempotency key in scope {scope}; waiting.")
+            if time.monotonic() >= deadline:
+                raise IdempotencyConflictException(
+                    detail="A request with this Idempotency-Key is still being processed.", retry_after=1)
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+    def complete(self, scope: str, key: str, fingerprint: str, status_code: int, body: Any) -> None:
+        """Store the response of the request that owns `key`, for replays."""
+        record = {"state": COMPLETED, "fingerprint": fingerprint, "status_code": status_code, "body": body}
+        self._put(self._key(scope, key), record, self.ttl_seconds)
+
+    def release(self, scope: str, key: str) -> None:
+        """Give up a reservation after a failure, so the client can retry with the same key."""
+        self._delete(self._key(scope, key))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "reserved": self.reserved,
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "conflicts": self.conflicts,
+            "local_entries": len(self._local),
+        }
+
+
+idempotency_store = IdempotencyStore()
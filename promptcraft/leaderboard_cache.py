@@ -0,0 +1,34 @@
+"""
+Short-lived cache of per-user leaderboard statistics for PromptCraft.
+
+GET /leaderboard/stats/{user_id} and /my-stats read and fill it. Saving a
+submission, synchronously or through the submission worker, drops the
+submitter's entry so their own stats are never stale. Other users' rank and
+percentile shift with it and may lag by up to STATS_CACHE_TTL_SECONDS.
+"""
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+CACHE_PREFIX_LEADERBOARD = "promptcraft:leaderboard"
+STATS_CACHE_TTL_SECONDS = 60 # Stats change with every submission, keep them short-lived
+
+_redis_cache = None
+
+def _get_cache():
+    # Created lazily so that importing this module does not open a Redis connection
+    global _redis_cache
+    if _redis_cache is None:
+        from promptcraft.redis_cache import RedisCache
+        _redis_cache = RedisCache()
+    return _redis_cache
+
+def stats_key(user_id: int) -> str:
+    return f"{CACHE_PREFIX_LEADERBOARD}:stats:{user_id}"
+
+def invalidate_user_stats(user_id: int) -> None:
+    """Drop a user's cached stats. Call after saving one of their submissions."""
+    try:
+        _get_cache().delete(stats_key(user_id))
+    except Exception as e:
+        logger.error(f"Error invalidating cached stats for user {user_id}: {e}")
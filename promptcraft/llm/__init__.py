@@ -0,0 +1,11 @@
+"""LLM access for PromptCraft, shared by the CLI and the API."""
+from promptcraft.llm.client import SIMULATED_MODEL, BaseLLMClient, LLMCallInfo, LLMClient, last_llm_call, simulated_completion
+from promptcraft.llm.router import LLMProvider, LLMRouter, answered_model, get_llm_client
+from promptcraft.llm.response_cache import LLMResponseCache, llm_response_cache
+from promptcraft.llm.scheduler import FairScheduler, last_queue_wait_ms
+from promptcraft.llm.simulation import simulate_llm_response
+
+__all__ = ["BaseLLMClient", "LLMCallInfo", "LLMClient", "SIMULATED_MODEL", "last_llm_call", "LLMProvider", "LLMRouter", "answered_model",
+           "get_llm_client",
+           "LLMResponseCache", "llm_response_cache", "FairScheduler", "last_queue_wait_ms", "simulate_llm_response",
+           "simulated_completion"]
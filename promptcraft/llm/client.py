@@ -0,0 +1,447 @@
+"""
+Async OpenAI client for PromptCraft.
+
+One LLMClient per process keeps a pooled HTTP connection to the provider, admits
+completions through a FairScheduler (per-user and global concurrency caps, a
+tokens-per-minute budget), applies a per-attempt timeout and retries transient
+failures (timeouts, connection errors, 429, 5xx) with full-jitter exponential
+backoff.
+
+Callers may pass a deadline (a time.monotonic() value). It bounds the whole
+call, including the scheduler wait, the attempts and the backoff between them.
+With hedging enabled, a duplicate request is sent once an attempt has run past
+the recent p95 latency, and the loser of the two is cancelled.
+
+Each finished call leaves an LLMCallInfo (model, latency, token usage) in the
+last_llm_call context variable. Submission paths read it and store it with the row.
+
+The API awaits LLMClient.complete() directly. The CLI, which is synchronous,
+uses complete_sync(), which runs on a private event loop kept for the life of
+the client so that connections are reused between calls.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from promptcraft.exceptions import LLMConnectionException, LLMProcessingException
+from promptcraft.llm.scheduler import FairScheduler
+from promptcraft.llm.simulation import simulate_llm_response
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+# Completions allowed in flight at once per process; further calls wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+# Completions one user may have in flight at once; their further calls queue behind other users'
+LLM_PER_USER_CONCURRENCY = int(os.getenv("LLM_PER_USER_CONCURRENCY", 2))
+# Provider token budget shared by this process (0 = unlimited); set below the account's TPM limit
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 0))
+# Completion length assumed when reserving budget before a call
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", 512))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", 5))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", 0.5))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", 8))
+# Hedging: send a duplicate request when an attempt outlives the recent latency percentile
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0.95))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", 1.0))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+LLM_LATENCY_WINDOW = 200
+
+# Errors worth retrying: the request may succeed if sent again
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def _backoff_seconds(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, stretched to honour a Retry-After header when the provider sends one."""
+    delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * (2 ** attempt)))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), LLM_RETRY_MAX_SECONDS))
+        except ValueError:
+            pass
+    return delay
+
+
+@dataclass
+class LLMCallInfo:
+    """What a completion cost. Tokens are None when the provider did not report usage."""
+    model: Optional[str]
+    latency_ms: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached: bool = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+SIMULATED_MODEL = "simulated"
+
+# Details of the most recent completion obtained by the current task
+last_llm_call: ContextVar[Optional[LLMCallInfo]] = ContextVar("last_llm_call", default=None)
+
+
+def _usage_tokens(usage: Any) -> tuple:
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class _LatencyWindow:
+    """Latencies of the most recent successful attempts, for the hedge delay and provider ranking."""
+
+    def __init__(self, size: int = LLM_LATENCY_WINDOW):
+        self._samples: deque = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough token count for budgeting (about 4 characters per token) plus the expected completion."""
+    return len(prompt) // 4 + 1 + LLM_EXPECTED_COMPLETION_TOKENS
+
+
+def simulated_completion(prompt: str, reason: str) -> str:
+    """Canned answer that stands in for a failed or unconfigured completion, recorded as a simulated call."""
+    last_llm_call.set(LLMCallInfo(model=SIMULATED_MODEL))
+    return simulate_llm_response(prompt, reason=reason)
+
+
+class BaseLLMClient:
+    """Simulated fallback and the blocking bridge shared by LLMClient and LLMRouter.
+
+    Subclasses provide ``enabled`` and an async ``complete()``.
+    """
+    fallback_log_message = "Falling back to simulated LLM response"
+
+    def __init__(self):
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_lock = threading.Lock()
+
+    async def complete_or_simulate(self, prompt: str, **kwargs: Any) -> str:
+        """Like complete(), but returns a simulated answer if the LLM is not configured or the call fails."""
+        if not self.enabled:
+            logger.info(f"Simulating LLM response for prompt: '{prompt[:30]}...'")
+            return simulated_completion(prompt, reason="API key missing")
+        try:
+            return await self.complete(prompt, **kwargs)
+        except (LLMConnectionException, LLMProcessingException) as e:
+            logger.warning(f"{self.fallback_log_message}: {e.detail}")
+            return simulated_completion(prompt, reason="LLM API error occurred")
+
+    def complete_sync(self, prompt: str, simulate_on_error: bool = True, **kwargs: Any) -> str:
+        """Blocking wrapper for synchronous callers such as the CLI. Must not be called from a running event loop."""
+        coroutine = self.complete_or_simulate(prompt, **kwargs) if simulate_on_error else self.complete(prompt, **kwargs)
+        with self._sync_lock:
+            if self._sync_loop is None or self._sync_loop.is_closed():
+                self._sync_loop = asyncio.new_event_loop()
+            return self._sync_loop.run_until_complete(coroutine)
+
+
+class LLMClient(BaseLLMClient):
+    """Pooled, fairly scheduled async access to the chat completions API."""
+
+    def __init__(self, api_key: Optional[str] = None, model: str = LLM_MODEL, base_url: Optional[str] = None,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+                 max_retries: int = LLM_MAX_RETRIES, per_user_concurrency: int = LLM_PER_USER_CONCURRENCY,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE, hedge_enabled: bool = LLM_HEDGE_ENABLED):
+        super().__init__()
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY")
+        self.model = model
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_user_concurrency = max(1, per_user_concurrency)
+        self.tokens_per_minute = max(0, tokens_per_minute)
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max(0, max_retries)
+        self.hedge_enabled = hedge_enabled
+        self.latencies = _LatencyWindow()
+        # asyncio primitives and the HTTP pool belong to one event loop; they are rebuilt if the loop changes
+        self._client: Optional[AsyncOpenAI] = None
+        self._scheduler: Optional[FairScheduler] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Metrics
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.deadline_exceeded = 0
+
+    @property
+    def enabled(self) -> bool:
+        """False when no API key is configured; callers should fall back to simulation."""
+        return bool(self.api_key)
+
+    def _ensure_loop_state(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._scheduler = FairScheduler(self.max_concurrency, self.per_user_concurrency, self.tokens_per_minute)
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            timeout=httpx.Timeout(self.timeout_seconds, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+        )
+        # Retries are handled here (with jitter and metrics), not by the SDK
+        self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client, max_retries=0)
+        logger.info(f"LLM client ready: model {self.model}, max concurrency {self.max_concurrency}.")
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging an attempt, or None while hedging is off or latency data is thin."""
+        if not self.hedge_enabled or len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, self.latencies.percentile(LLM_HEDGE_PERCENTILE))
+
+    async def _timed_create(self, client: AsyncOpenAI, timeout: float, **kwargs: Any):
+        started = time.monotonic()
+        completion = await client.chat.completions.create(timeout=timeout, **kwargs)
+        self.latencies.add(time.monotonic() - started)
+        return completion
+
+    async def _create_hedged(self, client: AsyncOpenAI, timeout: float, **kwargs: Any):
+        """One attempt, duplicated after the hedge delay if still running. Returns (completion, hedged)."""
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None or hedge_delay >= timeout:
+            return await self._timed_create(client, timeout, **kwargs), False
+
+        primary = asyncio.ensure_future(self._timed_create(client, timeout, **kwargs))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return primary.result(), False
+            self.hedges_sent += 1
+            tasks.append(asyncio.ensure_future(self._timed_create(client, timeout - hedge_delay, **kwargs)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedges_won += 1
+                        return task.result(), True
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel() # The loser stops here; no-op for finished tasks
+
+    async def complete(self, prompt: str, model: Optional[str] = None, timeout_seconds: Optional[float] = None,
+                       user_id: Optional[Any] = None, deadline: Optional[float] = None) -> str:
+        """
+        Return the completion text for a single-turn prompt. Calls are scheduled fairly per `user_id`;
+        calls without one (CLI, system jobs) share a single "system" queue. `deadline` (time.monotonic())
+        bounds the whole call, queueing and retries included.
+
+        Raises:
+            LLMConnectionException: The provider could not be reached (after retries) or the deadline passed.
+            LLMProcessingException: The provider returned an error or an empty response.
+        """
+        if not self.enabled:
+            raise LLMConnectionException(detail="LLM API key is not configured.")
+        remaining = _remaining(deadline)
+        if remaining is not None and remaining <= 0:
+            self.deadline_exceeded += 1
+            raise LLMConnectionException(detail="The request deadline passed before the LLM call started.")
+        self._ensure_loop_state()
+        client, scheduler = self._client, self._scheduler
+
+        try:
+            async with asyncio.timeout(remaining):
+                return await self._complete_scheduled(client, scheduler, prompt, model or self.model,
+                                                      timeout_seconds or self.timeout_seconds, user_id, deadline)
+        except TimeoutError as e:
+            self.deadline_exceeded += 1
+            self.failures += 1
+            logger.warning(f"LLM call for user {user_id} exceeded its deadline.")
+            raise LLMConnectionException(detail="The LLM call did not finish before the request deadline.") from e
+
+    async def _complete_scheduled(self, client: AsyncOpenAI, scheduler: FairScheduler, prompt: str, model: str,
+                                  timeout: float, user_id: Optional[Any], deadline: Optional[float]) -> str:
+        async with scheduler.slot(user_id if user_id is not None else "system", estimate_tokens(prompt)) as ticket:
+            self.calls += 1
+            started = time.monotonic()
+            for attempt in range(self.max_retries + 1):
+                remaining = _remaining(deadline)
+                try:
+                    completion, hedged = await self._create_hedged(
+                        client,
+                        timeout if remaining is None else max(0.001, min(timeout, remaining)),
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                    )
+                    usage = getattr(completion, "usage", None)
+                    used_tokens = getattr(usage, "total_tokens", None)
+                    if used_tokens is not None and hedged:
+                        used_tokens *= 2 # The cancelled duplicate was billed for roughly as much
+                    ticket.record_usage(used_tokens)
+                    content = completion.choices[0].message.content if completion.choices else None
+                    if content is None:
+                        raise LLMProcessingException(detail="The Language Model returned an empty response.")
+                    prompt_tokens, completion_tokens = _usage_tokens(usage)
+                    last_llm_call.set(LLMCallInfo(model=getattr(completion, "model", None) or model,
+                                                  latency_ms=round((time.monotonic() - started) * 1000, 1),
+                                                  prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+                    return content
+                except RETRYABLE_ERRORS as e:
+                    delay = _backoff_seconds(attempt, e)
+                    remaining = _remaining(deadline)
+                    if attempt >= self.max_retries or (remaining is not None and remaining <= delay):
+                        self.failures += 1
+                        logger.error(f"LLM call failed after {attempt + 1} attempts: {e}")
+                        if isinstance(e, (openai.APITimeoutError, openai.APIConnectionError)):
+                            raise LLMConnectionException() from e
+                        raise LLMProcessingException() from e
+                    self.retries += 1
+                    logger.warning(f"LLM call attempt {attempt + 1} failed ({e.__class__.__name__}); retrying in {delay:.2f}s.")
+                    await asyncio.sleep(delay)
+                except openai.APIError as e:
+                    self.failures += 1
+                    logger.error(f"LLM call rejected by provider: {e}")
+                    raise LLMProcessingException() from e
+
+    async def stream(self, prompt: str, model: Optional[str] = None, timeout_seconds: Optional[float] = None,
+                     user_id: Optional[Any] = None, deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yield completion text chunks as the provider produces them.
+
+        Failures before the first chunk are retried like complete(); once text has been yielded, an error
+        ends the stream with LLMConnectionException/LLMProcessingException. Closing the generator early
+        (e.g. the HTTP client disconnected) closes the upstream response so no more tokens are generated.
+        `deadline` bounds starting the stream (attempts and retries), not reading it. Streams are never hedged.
+        """
+        if not self.enabled:
+            raise LLMConnectionException(detail="LLM API key is not configured.")
+        if deadline is not None and _remaining(deadline) <= 0:
+            self.deadline_exceeded += 1
+            raise LLMConnectionException(detail="The request deadline passed before the LLM call started.")
+        self._ensure_loop_state()
+        client, scheduler = self._client, self._scheduler
+        timeout = timeout_seconds or self.timeout_seconds
+
+        async with scheduler.slot(user_id if user_id is not None else "system", estimate_tokens(prompt)) as ticket:
+            self.calls += 1
+            upstream = None
+            streamed_chars = 0
+            usage = None
+            started = time.monotonic()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    remaining = _remaining(deadline)
+                    if remaining is not None and remaining <= 0:
+                        self.deadline_exceeded += 1
+                        self.failures += 1
+                        raise LLMConnectionException(detail="The LLM stream did not start before the request deadline.")
+                    try:
+                        upstream = await client.chat.completions.create(
+                            model=model or self.model,
+                            messages=[{"role": "user", "content": prompt}],
+                            timeout=timeout if remaining is None else min(timeout, remaining),
+                            stream=True,
+                            stream_options={"include_usage": True}, # Usage arrives in a final chunk
+                        )
+                        break
+                    except RETRYABLE_ERRORS as e:
+                        delay = _backoff_seconds(attempt, e)
+                        remaining = _remaining(deadline)
+                        if attempt >= self.max_retries or (remaining is not None and remaining <= delay):
+                            self.failures += 1
+                            logger.error(f"LLM stream failed to start after {attempt + 1} attempts: {e}")
+                            raise LLMConnectionException() from e
+                        self.retries += 1
+                        logger.warning(f"LLM stream attempt {attempt + 1} failed ({e.__class__.__name__}); retrying in {delay:.2f}s.")
+                        await asyncio.sleep(delay)
+                    except openai.APIError as e:
+                        self.failures += 1
+                        logger.error(f"LLM stream rejected by provider: {e}")
+                        raise LLMProcessingException() from e
+
+                try:
+                    async for chunk in upstream:
+                        if getattr(chunk, "usage", None) is not None:
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        text = chunk.choices[0].delta.content
+                        if text:
+                            streamed_chars += len(text)
+                            yield text
+                except (openai.APIError, httpx.HTTPError) as e:
+                    self.failures += 1
+                    logger.error(f"LLM stream interrupted: {e}")
+                    raise LLMProcessingException(detail="The Language Model stream was interrupted.") from e
+                prompt_tokens, completion_tokens = _usage_tokens(usage)
+                last_llm_call.set(LLMCallInfo(model=model or self.model,
+                                              latency_ms=round((time.monotonic() - started) * 1000, 1),
+                                              prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+            finally:
+                if upstream is not None:
+                    await upstream.close() # Stops generation upstream if we are exiting early
+                if usage is not None:
+                    ticket.record_usage(getattr(usage, "total_tokens", None))
+                else:
+                    # No usage reported (e.g. closed early); charge the prompt plus what was actually generated
+                    ticket.record_usage(len(prompt) // 4 + streamed_chars // 4 + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "model": self.model,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedging": {
+                "enabled": self.hedge_enabled,
+                "delay_seconds": self._hedge_delay(),
+                "sent": self.hedges_sent,
+                "won": self.hedges_won, # Hedges that beat the original request
+                "win_rate": round(self.hedges_won / self.hedges_sent, 3) if self.hedges_sent else 0.0,
+            },
+            "latency_p50_seconds": self.latencies.percentile(0.5),
+            "latency_p95_seconds": self.latencies.percentile(0.95),
+            "scheduler": self._scheduler.stats() if self._scheduler is not None else None,
+        }
+
+    async def aclose(self) -> None:
+        """Close the HTTP pool. Call from the event loop that used the client (e.g. on API shutdown)."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+            self._loop = None
+
@@ -0,0 +1,228 @@
+"""
+LLM response cache for PromptCraft.
+
+Candidates often resubmit the same prompt, and demo traffic repeats a handful of
+them. Completions are cached under a hash of (model, normalized prompt,
+parameters) in Redis, where the model is the one that actually answered: after
+a failover to another provider the completion is not served to lookups for the
+question's own model. If Redis is unavailable, a small per-process LRU is used
+instead. Only real completions are cached, never simulated fallbacks.
+
+Concurrent misses for the same key within one worker share a single LLM call.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from promptcraft.exceptions import LLMConnectionException, LLMProcessingException
+from promptcraft.llm.client import LLMCallInfo, last_llm_call, simulated_completion
+from promptcraft.llm.router import LLMRouter, answered_model, get_llm_client
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+LLM_CACHE_PREFIX = "promptcraft:llm:response"
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 24 * 3600))
+LLM_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("LLM_CACHE_LOCAL_MAX_ENTRIES", 512))
+# Questions whose submissions must always get a fresh completion, e.g. "3,7"
+LLM_CACHE_DISABLED_QUESTION_IDS: Set[int] = {
+    int(qid) for qid in os.getenv("LLM_CACHE_DISABLED_QUESTION_IDS", "").split(",") if qid.strip().isdigit()
+}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Unicode-normalize and collapse whitespace, so trivially different resubmissions share a key."""
+    return " ".join(unicodedata.normalize("NFC", prompt).split())
+
+
+def make_cache_key(model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    material = json.dumps({"model": model, "prompt": normalize_prompt(prompt), "params": params or {}},
+                          sort_keys=True, separators=(",", ":"))
+    return f"{LLM_CACHE_PREFIX}:{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+
+class LLMResponseCache:
+    """Read-through cache in front of LLMRouter.complete()."""
+
+    def __init__(self, llm_client: Optional[LLMRouter] = None, redis_cache=None,
+                 ttl_seconds: int = LLM_CACHE_TTL_SECONDS, local_max_entries: int = LLM_CACHE_LOCAL_MAX_ENTRIES):
+        self._llm_client = llm_client
+        self._redis_cache = redis_cache
+        self.ttl_seconds = ttl_seconds
+        self.local_max_entries = local_max_entries
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._local_lock = threading.Lock()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # Metrics
+        self.hits = 0
+        self.local_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.coalesced = 0
+
+    @property
+    def llm_client(self) -> LLMRouter:
+        return self._llm_client or get_llm_client()
+
+    def _get_cache(self):
+        # Resolved lazily so that importing this module does not open a Redis connection
+        if self._redis_cache is None:
+            from promptcraft.redis_cache import RedisCache
+            self._redis_cache = RedisCache()
+        return self._redis_cache
+
+    def _redis_available(self) -> bool:
+        return self._get_cache().r is not None
+
+    def _lookup(self, key: str) -> Optional[str]:
+        if self._redis_available():
+            value = self._get_cache().get_many([key]).get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+        with self._local_lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._local.move_to_end(key)
+                    self.hits += 1
+                    self.local_hits += 1
+                    return entry[1]
+                del self._local[key]
+        return None
+
+    def _store(self, key: str, value: str) -> None:
+        if self._redis_available() and self._get_cache().set_many({key: value}, ttl_seconds=self.ttl_seconds):
+            return
+        with self._local_lock:
+            self._local[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def is_cacheable(self, question_id: Optional[int]) -> bool:
+        return LLM_CACHE_ENABLED and self.ttl_seconds > 0 and question_id not in LLM_CACHE_DISABLED_QUESTION_IDS
+
+    def get_cached(self, prompt: str, question_id: Optional[int] = None, model: Optional[str] = None) -> Optional[str]:
+        """Return a cached completion without calling the LLM, or None. Used by the streaming route."""
+        client = self.llm_client
+        if not client.enabled or not self.is_cacheable(question_id):
+            return None
+        started = time.monotonic()
+        model = model or client.model_for(question_id)
+        cached = self._lookup(make_cache_key(model, prompt))
+        if cached is None:
+            self.misses += 1
+        else:
+            last_llm_call.set(self._hit_info(model, started))
+        return cached
+
+    @staticmethod
+    def _hit_info(model: str, started: float) -> LLMCallInfo:
+        # Served without spending tokens
+        return LLMCallInfo(model=model, latency_ms=round((time.monotonic() - started) * 1000, 1),
+                           prompt_tokens=0, completion_tokens=0, cached=True)
+
+    def put(self, prompt: str, completion: str, question_id: Optional[int] = None, model: Optional[str] = None) -> None:
+        """
+        Store a completion produced outside complete_or_simulate (e.g. assembled from a stream).
+        Pass the `model` that produced it (router.answered_model) when the router may have failed over.
+        """
+        client = self.llm_client
+        if client.enabled and self.is_cacheable(question_id):
+            self._store(make_cache_key(model or client.model_for(question_id), prompt), completion)
+
+    async def complete_or_simulate(self, prompt: str, question_id: Optional[int] = None,
+                                   model: Optional[str] = None, user_id: Optional[Any] = None,
+                                   deadline: Optional[float] = None) -> Tuple[str, bool]:
+        """
+        Return (completion, served_from_cache). Falls back to a simulated answer, which is never cached,
+        when the LLM is not configured, the call fails or `deadline` (time.monotonic()) passes.
+        Cache misses are scheduled fairly per `user_id`.
+        """
+        client = self.llm_client
+        if not client.enabled:
+            return await client.complete_or_simulate(prompt), False
+        if not self.is_cacheable(question_id):
+            self.bypassed += 1
+            return await client.complete_or_simulate(prompt, model=model, user_id=user_id, deadline=deadline,
+                                                     question_id=question_id), False
+
+        requested_model = model
+        model = model or client.model_for(question_id)
+        key = make_cache_key(model, prompt)
+        started = time.monotonic()
+        cached = self._lookup(key)
+        if cached is not None:
+            logger.info(f"LLM cache hit for question {question_id}.")
+            last_llm_call.set(self._hit_info(model, started))
+            return cached, True
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            # Same prompt already being generated in this worker; share its result
+            self.coalesced += 1
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                completion = await asyncio.wait_for(asyncio.shield(pending), timeout)
+                last_llm_call.set(self._hit_info(model, started)) # Shared another request's tokens
+                return completion, False
+            except (LLMConnectionException, LLMProcessingException, asyncio.TimeoutError):
+                return simulated_completion(prompt, reason="LLM API error occurred"), False
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            # The router picks the provider; only an explicitly requested model is forced on it
+            answered_model.set(None)
+            completion = await client.complete(prompt, model=requested_model, user_id=user_id, deadline=deadline,
+                                               question_id=question_id)
+            answered = answered_model.get() or model
+            if answered != model:
+                logger.info(f"LLM call for question {question_id} was answered by {answered} instead of {model}.")
+            self._store(make_cache_key(answered, prompt), completion)
+            future.set_result(completion)
+            return completion, False
+        except (LLMConnectionException, LLMProcessingException) as e:
+            future.set_exception(e)
+            future.exception() # Mark retrieved so an unawaited failure is not logged as unhandled
+            logger.warning(f"Falling back to simulated LLM response: {e.detail}")
+            return simulated_completion(prompt, reason="LLM API error occurred"), False
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    def purge(self) -> Dict[str, Any]:
+        """Drop every cached completion, in Redis and in this worker's local fallback."""
+        redis_cleared = self._redis_available() and self._get_cache().clear_all_promptcraft_cache(prefix=f"{LLM_CACHE_PREFIX}:")
+        with self._local_lock:
+            removed = len(self._local)
+            self._local.clear()
+        logger.info(f"LLM response cache purged (redis cleared: {redis_cleared}, local entries: {removed}).")
+        return {"redis_cleared": redis_cleared, "local_entries_removed": removed}
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "hits": self.hits,
+            "local_hits": self.local_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "local_entries": len(self._local),
+        }
+
+
+llm_response_cache = LLMResponseCache()
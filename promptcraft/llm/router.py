@@ -0,0 +1,347 @@
+"""
+Routing of LLM calls across providers.
+
+Providers are OpenAI and any OpenAI-compatible endpoint (a local model server,
+the mock in benchmarks/). Each is an LLMClient with its own pool, scheduler and
+latency history. For every call the router:
+
+- puts the provider pinned for the question first, if there is one
+  (LLM_QUESTION_MODELS),
+- otherwise ranks providers by their recent p95 latency. Now and then
+  (LLM_ROUTER_EXPLORE_RATE) it tries another provider first, so that a
+  provider with little traffic gets latency samples,
+- moves providers that failed several times in a row behind the healthy ones
+  for a cooldown period,
+- fails over to the next provider when a call errors or times out. With a
+  request deadline, each attempt gets min(provider timeout, remaining time /
+  providers left), so a hanging provider leaves time for the others. Simulated
+  answers are left to callers, for when every provider has failed.
+
+Configuration (JSON list in LLM_PROVIDERS; defaults to a single "openai" provider):
+
+    LLM_PROVIDERS=[{"name": "openai", "model": "gpt-4o-mini"},
+                   {"name": "local", "base_url": "http://127.0.0.1:8100/v1", "api_key": "local", "model": "llama3"}]
+    LLM_QUESTION_MODELS=3=openai:gpt-4o,7=local
+
+Provider fields: name, model, base_url, api_key or api_key_env, max_concurrency,
+timeout_seconds, max_retries, tokens_per_minute.
+"""
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from promptcraft.exceptions import LLMConnectionException, LLMProcessingException
+from promptcraft.llm.client import (LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, LLM_MODEL, LLM_TIMEOUT_SECONDS,
+                                    LLM_TOKENS_PER_MINUTE, BaseLLMClient, LLMClient)
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Fraction of calls that try a provider other than the fastest one first
+LLM_ROUTER_EXPLORE_RATE = float(os.getenv("LLM_ROUTER_EXPLORE_RATE", 0.05))
+# Latency samples a provider needs before its p95 is trusted for ranking
+LLM_ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", 20))
+# Consecutive failures that move a provider behind healthy ones, and for how long
+LLM_ROUTER_FAILURE_THRESHOLD = int(os.getenv("LLM_ROUTER_FAILURE_THRESHOLD", 3))
+LLM_ROUTER_COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", 30))
+
+_LLM_ERRORS = (LLMConnectionException, LLMProcessingException)
+
+# Model the current task's last successful call was routed to (the configured name, not the provider's
+# reported snapshot); after a failover it differs from model_for(), so caches key completions by it
+answered_model: ContextVar[Optional[str]] = ContextVar("answered_model", default=None)
+
+
+@dataclass
+class LLMProvider:
+    name: str
+    client: LLMClient
+    # Health and metrics
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    chosen_first: int = 0
+    failovers_to: int = 0
+    successes: int = 0
+    failures: int = 0
+
+    @property
+    def model(self) -> str:
+        return self.client.model
+
+    def p95(self) -> Optional[float]:
+        if len(self.client.latencies) < LLM_ROUTER_MIN_SAMPLES:
+            return None
+        return self.client.latencies.percentile(0.95)
+
+
+def load_providers(spec: Optional[str] = None) -> List[LLMProvider]:
+    """Build providers from an LLM_PROVIDERS JSON list; without one, a single OpenAI provider from OPENAI_* settings."""
+    spec = spec if spec is not None else os.getenv("LLM_PROVIDERS", "")
+    if not spec.strip():
+        return [LLMProvider("openai", LLMClient())]
+    providers = []
+    for entry in json.loads(spec):
+        api_key = entry.get("api_key")
+        if api_key is None:
+            api_key = os.getenv(entry.get("api_key_env", "OPENAI_API_KEY"))
+        client = LLMClient(
+            api_key=api_key or "",
+            model=entry.get("model", LLM_MODEL),
+            base_url=entry.get("base_url"),
+            max_concurrency=int(entry.get("max_concurrency", LLM_MAX_CONCURRENCY)),
+            timeout_seconds=float(entry.get("timeout_seconds", LLM_TIMEOUT_SECONDS)),
+            max_retries=int(entry.get("max_retries", LLM_MAX_RETRIES)),
+            tokens_per_minute=int(entry.get("tokens_per_minute", LLM_TOKENS_PER_MINUTE)),
+        )
+        providers.append(LLMProvider(entry["name"], client))
+    return providers
+
+
+def parse_question_routes(spec: str, provider_names: List[str]) -> Dict[int, Tuple[Optional[str], Optional[str]]]:
+    """
+    Parse "qid=provider[:model]" pairs, e.g. "3=openai:gpt-4o,7=local". A value that does not start with a
+    provider name is a model for the default provider (model names may contain ':', e.g. "llama3:8b").
+    """
+    routes: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+    for item in spec.split(","):
+        question_id, _, target = item.partition("=")
+        if not question_id.strip().isdigit() or not target.strip():
+            continue
+        target = target.strip()
+        name, _, model = target.partition(":")
+        if name in provider_names:
+            routes[int(question_id)] = (name, model or None)
+        else:
+            routes[int(question_id)] = (None, target)
+    return routes
+
+
+class LLMRouter(BaseLLMClient):
+    """Latency-aware routing with failover over several LLMClients. Offers the same calls as LLMClient."""
+    fallback_log_message = "All LLM providers failed; falling back to simulated response"
+
+    def __init__(self, providers: List[LLMProvider],
+                 question_routes: Optional[Dict[int, Tuple[Optional[str], Optional[str]]]] = None,
+                 explore_rate: float = LLM_ROUTER_EXPLORE_RATE, rng: Optional[random.Random] = None):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider.")
+        super().__init__()
+        self.providers = providers
+        self.question_routes = question_routes or {}
+        self.explore_rate = explore_rate
+        self._random = rng or random.Random()
+        # Metrics
+        self.explorations = 0
+        self.failovers = 0
+        self.exhausted = 0 # Calls on which every provider failed
+
+    @property
+    def enabled(self) -> bool:
+        """False when no provider has credentials; callers should fall back to simulation."""
+        return any(p.client.enabled for p in self.providers)
+
+    @property
+    def model(self) -> str:
+        return self.providers[0].model
+
+    def model_for(self, question_id: Optional[int] = None) -> str:
+        """The model a question is meant to use: its override, else the default provider's model. Used in cache keys."""
+        name, model = self.question_routes.get(question_id, (None, None))
+        if model:
+            return model
+        if name:
+            return next(p.model for p in self.providers if p.name == name)
+        return self.model
+
+    def plan(self, question_id: Optional[int] = None, model: Optional[str] = None) -> List[Tuple[LLMProvider, str]]:
+        """Providers to try for one call, in order, each with the model to ask it for."""
+        candidates = [p for p in self.providers if p.client.enabled]
+        now = time.monotonic()
+        healthy = [p for p in candidates if p.cooldown_until <= now]
+        cooling = [p for p in candidates if p.cooldown_until > now]
+        # Known p95 first (fastest first), then providers without enough samples in configured order
+        ranked = sorted(healthy, key=lambda p: (p.p95() is None, p.p95() or 0.0, self.providers.index(p)))
+        if len(ranked) > 1 and self._random.random() < self.explore_rate:
+            ranked.insert(0, ranked.pop(self._random.randrange(1, len(ranked))))
+            self.explorations += 1
+        ranked += cooling # Still worth a try if everything else fails
+
+        pinned_name, pinned_model = self.question_routes.get(question_id, (None, None))
+        if pinned_name is None and pinned_model is not None:
+            pinned_name = self.providers[0].name # Bare model override applies to the default provider
+        for index, provider in enumerate(ranked):
+            if provider.name == pinned_name:
+                ranked.insert(0, ranked.pop(index))
+                break
+
+        plan = []
+        for provider in ranked:
+            provider_model = provider.model
+            if provider.name == pinned_name and pinned_model:
+                provider_model = pinned_model
+            plan.append((provider, provider_model))
+        if plan and model:
+            plan[0] = (plan[0][0], model) # Explicit model from the caller applies to the first choice
+        return plan
+
+    def _record_success(self, provider: LLMProvider) -> None:
+        provider.successes += 1
+        provider.consecutive_failures = 0
+        provider.cooldown_until = 0.0
+
+    def _record_failure(self, provider: LLMProvider, error: Exception) -> None:
+        provider.failures += 1
+        provider.consecutive_failures += 1
+        if provider.consecutive_failures >= LLM_ROUTER_FAILURE_THRESHOLD:
+            provider.cooldown_until = time.monotonic() + LLM_ROUTER_COOLDOWN_SECONDS
+            logger.warning(f"LLM provider {provider.name} failed {provider.consecutive_failures} times in a row; "
+                           f"deprioritised for {LLM_ROUTER_COOLDOWN_SECONDS:.0f}s.")
+        logger.warning(f"LLM provider {provider.name} failed: {getattr(error, 'detail', error)}")
+
+    def _start(self, plan: List[Tuple[LLMProvider, str]], index: int) -> None:
+        provider = plan[index][0]
+        if index == 0:
+            provider.chosen_first += 1
+        else:
+            self.failovers += 1
+            provider.failovers_to += 1
+            logger.info(f"Failing over LLM call from {plan[index - 1][0].name} to {provider.name}.")
+
+    @staticmethod
+    def _attempt_deadline(plan: List[Tuple[LLMProvider, str]], index: int, deadline: Optional[float],
+                          timeout_seconds: Optional[float]) -> Optional[float]:
+        """
+        The share of the request deadline one provider gets: min(its timeout, remaining / providers left),
+        so that a hanging provider cannot use up the time of those after it. The last one gets the rest.
+        """
+        if deadline is None:
+            return None
+        providers_left = len(plan) - index
+        if providers_left == 1:
+            return deadline
+        now = time.monotonic()
+        timeout = timeout_seconds or plan[index][0].client.timeout_seconds
+        return now + max(0.0, min(timeout, (deadline - now) / providers_left))
+
+    async def complete(self, prompt: str, model: Optional[str] = None, timeout_seconds: Optional[float] = None,
+                       user_id: Optional[Any] = None, deadline: Optional[float] = None,
+                       question_id: Optional[int] = None) -> str:
+        """
+        Return the completion from the first provider in the plan that succeeds.
+
+        Raises:
+            LLMConnectionException / LLMProcessingException: Every provider failed (the last error is raised).
+        """
+        plan = self.plan(question_id, model)
+        if not plan:
+            raise LLMConnectionException(detail="No LLM provider is configured.")
+        last_error: Optional[Exception] = None
+        for index, (provider, provider_model) in enumerate(plan):
+            if index and deadline is not None and time.monotonic() >= deadline:
+                break
+            self._start(plan, index)
+            try:
+                text = await provider.client.complete(prompt, model=provider_model, timeout_seconds=timeout_seconds,
+                                                      user_id=user_id,
+                                                      deadline=self._attempt_deadline(plan, index, deadline, timeout_seconds))
+            except _LLM_ERRORS as e:
+                self._record_failure(provider, e)
+                last_error = e
+                continue
+            self._record_success(provider)
+            answered_model.set(provider_model)
+            return text
+        self.exhausted += 1
+        raise last_error or LLMConnectionException(detail="The request deadline passed before the LLM call started.")
+
+    async def stream(self, prompt: str, model: Optional[str] = None, timeout_seconds: Optional[float] = None,
+                     user_id: Optional[Any] = None, deadline: Optional[float] = None,
+                     question_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Stream from the first provider that produces a chunk. Once text has been yielded there is no failover."""
+        plan = self.plan(question_id, model)
+        if not plan:
+            raise LLMConnectionException(detail="No LLM provider is configured.")
+        last_error: Optional[Exception] = None
+        for index, (provider, provider_model) in enumerate(plan):
+            self._start(plan, index)
+            tokens = provider.client.stream(prompt, model=provider_model, timeout_seconds=timeout_seconds,
+                                            user_id=user_id,
+                                            deadline=self._attempt_deadline(plan, index, deadline, timeout_seconds))
+            try:
+                try:
+                    first = await tokens.__anext__()
+                except StopAsyncIteration:
+                    self._record_success(provider)
+                    answered_model.set(provider_model)
+                    return
+                except _LLM_ERRORS as e:
+                    self._record_failure(provider, e)
+                    last_error = e
+                    continue
+                answered_model.set(provider_model)
+                yield first
+                try:
+                    async for text in tokens:
+                        yield text
+                except _LLM_ERRORS as e:
+                    self._record_failure(provider, e)
+                    raise
+                self._record_success(provider)
+                return
+            finally:
+                await tokens.aclose()
+        self.exhausted += 1
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "enabled": self.enabled,
+            "model": self.model,
+            "failovers": self.failovers,
+            "exhausted": self.exhausted,
+            "explorations": self.explorations,
+            "question_routes": {str(qid): f"{name or self.providers[0].name}:{model or ''}".rstrip(":")
+                                for qid, (name, model) in self.question_routes.items()},
+            "providers": {
+                p.name: {
+                    "model": p.model,
+                    "chosen_first": p.chosen_first,
+                    "failovers_to": p.failovers_to,
+                    "successes": p.successes,
+                    "failures": p.failures,
+                    "cooling_down": p.cooldown_until > now,
+                    "ranking_p95_seconds": p.p95(),
+                    "client": p.client.stats(),
+                }
+                for p in self.providers
+            },
+        }
+
+    async def aclose(self) -> None:
+        for provider in self.providers:
+            await provider.client.aclose()
+
+
+_llm_router: Optional[LLMRouter] = None
+_llm_router_lock = threading.Lock()
+
+def get_llm_client() -> LLMRouter:
+    """Return the process-wide LLM entry point, a router over the configured providers, creating it on first use."""
+    global _llm_router
+    if _llm_router is None:
+        with _llm_router_lock:
+            if _llm_router is None:
+                providers = load_providers()
+                routes = parse_question_routes(os.getenv("LLM_QUESTION_MODELS", ""), [p.name for p in providers])
+                _llm_router = LLMRouter(providers, routes)
+                if not _llm_router.enabled:
+                    logger.warning("No LLM provider has an API key (OPENAI_API_KEY / LLM_PROVIDERS). LLM calls will be simulated.")
+                else:
+                    logger.info(f"LLM router ready with providers: {', '.join(p.name for p in providers)}.")
+    return _llm_router
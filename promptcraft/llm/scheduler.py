@@ -0,0 +1,193 @@
+"""
+Fair scheduling of LLM calls within one process.
+
+A plain semaphore serves waiters first come, first served, so one user firing
+many submissions can hold every slot and use up the provider's rate limit. The
+FairScheduler instead:
+
+- caps concurrent calls globally and per user,
+- orders waiting calls by self-clocked weighted fair queueing: each request gets
+  a virtual finish tag of max(virtual time, user's previous tag) + cost / weight,
+  and the smallest tag runs next, so a user's backlog doesn't delay other users,
+- meters a global tokens-per-minute budget with a token bucket. Requests reserve
+  their estimated tokens up front and are reconciled with actual usage afterwards.
+
+The time each request spent waiting is available from last_queue_wait_ms in the
+calling task after the call returns.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Queue wait of the most recent LLM call made by the current task, in milliseconds
+last_queue_wait_ms: ContextVar[Optional[float]] = ContextVar("last_queue_wait_ms", default=None)
+
+
+@dataclass
+class _Waiter:
+    user: str
+    cost: int
+    finish_tag: float
+    future: asyncio.Future
+    enqueued_at: float
+
+
+@dataclass
+class Ticket:
+    """Handed to the holder of a scheduler slot."""
+    user: str
+    reserved_tokens: int
+    wait_seconds: float
+    used_tokens: Optional[int] = field(default=None)
+
+    def record_usage(self, tokens: Optional[int]) -> None:
+        """Report the tokens the call actually consumed, so the budget can be corrected."""
+        if tokens is not None:
+            self.used_tokens = int(tokens)
+
+
+class FairScheduler:
+    """Weighted fair queueing with per-user and global concurrency caps and a tokens-per-minute budget."""
+
+    def __init__(self, max_concurrency: int, per_user_concurrency: int, tokens_per_minute: int = 0,
+                 clock=time.monotonic):
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_user_concurrency = max(1, per_user_concurrency)
+        self.tokens_per_minute = max(0, tokens_per_minute) # 0 disables the token budget
+        self._clock = clock
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._in_flight_total = 0
+        self._last_finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._tokens = float(self.tokens_per_minute)
+        self._last_refill = clock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Metrics
+        self.granted = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.budget_stalls = 0
+
+    # --- Token bucket ---
+
+    def _refill(self) -> None:
+        if not self.tokens_per_minute:
+            return
+        now = self._clock()
+        self._tokens = min(float(self.tokens_per_minute),
+                           self._tokens + (now - self._last_refill) * self.tokens_per_minute / 60.0)
+        self._last_refill = now
+
+    def _schedule_wakeup(self, deficit: float) -> None:
+        if self._timer is not None:
+            return
+        delay = deficit * 60.0 / self.tokens_per_minute
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    # --- Dispatch ---
+
+    def _dispatch(self) -> None:
+        self._refill()
+        while self._in_flight_total < self.max_concurrency:
+            candidate = None
+            for user, queue in self._queues.items():
+                if queue and self._in_flight.get(user, 0) < self.per_user_concurrency:
+                    if candidate is None or queue[0].finish_tag < candidate.finish_tag:
+                        candidate = queue[0]
+            if candidate is None:
+                return
+            if self.tokens_per_minute and self._tokens < candidate.cost:
+                # Keep fair order: wait for the budget rather than letting cheaper requests jump ahead
+                self.budget_stalls += 1
+                self._schedule_wakeup(candidate.cost - self._tokens)
+                return
+            self._queues[candidate.user].popleft()
+            if not self._queues[candidate.user]:
+                del self._queues[candidate.user]
+            if self.tokens_per_minute:
+                self._tokens -= candidate.cost
+            self._in_flight[candidate.user] = self._in_flight.get(candidate.user, 0) + 1
+            self._in_flight_total += 1
+            self._virtual_time = candidate.finish_tag
+            candidate.future.set_result(None)
+
+    def _release(self, user: str) -> None:
+        self._in_flight_total -= 1
+        self._in_flight[user] -= 1
+        if not self._in_flight[user]:
+            del self._in_flight[user]
+            if user not in self._queues and self._last_finish.get(user, 0.0) <= self._virtual_time:
+                self._last_finish.pop(user, None) # Idle users carry no history
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user: Any, estimated_tokens: int, weight: float = 1.0) -> AsyncIterator[Ticket]:
+        """Wait for a fair turn for `user`, then hold one concurrency slot for the duration of the block."""
+        user = str(user)
+        cost = max(1, int(estimated_tokens))
+        if self.tokens_per_minute:
+            cost = min(cost, self.tokens_per_minute) # A request larger than the whole budget would never run
+        finish_tag = max(self._virtual_time, self._last_finish.get(user, 0.0)) + cost / max(weight, 1e-6)
+        self._last_finish[user] = finish_tag
+
+        waiter = _Waiter(user, cost, finish_tag, asyncio.get_running_loop().create_future(), self._clock())
+        self._queues.setdefault(user, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(user) # Granted just as we were cancelled
+            else:
+                queue = self._queues.get(user)
+                if queue is not None and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[user]
+                self._dispatch()
+            raise
+
+        wait_seconds = self._clock() - waiter.enqueued_at
+        self.granted += 1
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        last_queue_wait_ms.set(round(wait_seconds * 1000, 1))
+        if wait_seconds > 1:
+            logger.info(f"LLM call for user {user} waited {wait_seconds:.2f}s in the fair queue.")
+
+        ticket = Ticket(user=user, reserved_tokens=cost, wait_seconds=wait_seconds)
+        try:
+            yield ticket
+        finally:
+            if self.tokens_per_minute and ticket.used_tokens is not None:
+                self._refill()
+                self._tokens -= ticket.used_tokens - cost # Return over-reservation or charge the overrun
+            self._release(user)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "per_user_concurrency": self.per_user_concurrency,
+            "in_flight": self._in_flight_total,
+            "waiting": sum(len(q) for q in self._queues.values()),
+            "waiting_users": len(self._queues),
+            "tokens_per_minute": self.tokens_per_minute,
+            "tokens_available": round(self._tokens) if self.tokens_per_minute else None,
+            "budget_stalls": self.budget_stalls,
+            "granted": self.granted,
+            "avg_wait_ms": round(self.total_wait_seconds / self.granted * 1000, 1) if self.granted else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 1),
+        }
@@ -0,0 +1,35 @@
+"""
+Canned LLM responses used when no API key is configured or the LLM call fails.
+"""
+
+
+def simulate_llm_response(prompt: str, reason: str = "") -> str:
+    """Return a plausible code answer for the built-in sample tasks, or a placeholder."""
+    lower = prompt.lower()
+    if "factorial" in lower:
+        return """```python
+def factorial(n):
+    if n < 0:
+        raise ValueError("Factorial is not defined for negative numbers")
+    if n in (0, 1):
+        return 1
+    return n * factorial(n - 1)
+```"""
+    if "sort" in lower and "array" in lower:
+        return """```javascript
+function sortByProperty(array, property) {
+  return array.sort((a, b) => (a[property] > b[property] ? 1 : -1));
+}
+```"""
+    if "sql" in lower and "top 5" in lower:
+        return """```sql
+SELECT customer_id, SUM(amount) AS total_spent
+FROM purchases
+GROUP BY customer_id
+ORDER BY total_spent DESC
+LIMIT 5;
+```"""
+    suffix = f" ({reason})" if reason else ""
+    return f"""```
+-- Simulated LLM response{suffix}
+```"""
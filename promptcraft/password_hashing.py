@@ -0,0 +1,128 @@
+"""
+Password hashing off the event loop for PromptCraft.
+
+bcrypt is deliberately slow (tens to hundreds of milliseconds per call). Running
+it inside an async route blocks the whole worker, so the auth routes hand hashing
+and verification to a bounded executor instead. The number of jobs waiting for a
+worker is capped; beyond that, callers get ServiceBusyException (HTTP 503)
+rather than queueing without bound.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from promptcraft import auth_utils
+from promptcraft.exceptions import ServiceBusyException
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process").lower()  # process | thread
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Jobs allowed to wait for a free worker before new requests are rejected
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+
+
+# Module-level functions so they can be pickled into process-pool workers
+def _hash_password(password: str) -> str:
+    return auth_utils.get_password_hash(password)
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return auth_utils.verify_and_update_password(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt work in a bounded executor and keeps queue-depth and latency metrics."""
+
+    def __init__(self, executor_type: str = PASSWORD_HASH_EXECUTOR, max_workers: int = PASSWORD_HASH_WORKERS,
+                 max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.executor_type = executor_type
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        # Metrics
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.executor_type == "thread":
+                        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pwhash")
+                    else:
+                        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    logger.info(f"Password hashing executor started: {self.executor_type} x{self.max_workers}, max queue {self.max_queue}.")
+        return self._executor
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                logger.warning(f"Password hashing queue full ({self._in_flight} in flight). Rejecting request.")
+                raise ServiceBusyException(detail="Authentication service is busy. Please retry shortly.")
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), fn, *args)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        # Only successful jobs count towards completed and the timings
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._completed += 1
+            self._total_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+        return result
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured bcrypt cost."""
+        return await self._run(_hash_password, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password. On success, also returns a new hash if the stored one uses an outdated cost."""
+        return await self._run(_verify_and_update, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "executor": self.executor_type,
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.max_workers),
+                "peak_in_flight": self._peak_in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_ms": round(self._total_seconds / self._completed * 1000, 2) if self._completed else 0.0,
+                "max_ms": round(self._max_seconds * 1000, 2),
+                "bcrypt_rounds": auth_utils.BCRYPT_ROUNDS,
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Password hashing executor shut down.")
+
+
+# Shared instance used by the API
+password_hasher = PasswordHasher()
@@ -0,0 +1,183 @@
+"""
+In-memory question catalog for PromptCraft.
+
+The questions table is small and rarely changes, so each API worker keeps an
+immutable snapshot of it in memory, built with a single query. The snapshot
+carries precomputed indexes by difficulty level and programming language.
+
+Workers notice catalog changes through a version counter in Redis: whatever
+changes the questions table (DatabaseHandler.add_question) calls
+bump_catalog_version(), and every worker rebuilds its
+snapshot the next time it sees a different number. Version checks are throttled
+so that serving from the catalog normally costs no network round trip at all.
+"""
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+CATALOG_VERSION_KEY = "promptcraft:questions:catalog_version"
+# How often a worker asks Redis whether the catalog version changed
+CATALOG_VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", 5))
+# Rebuild anyway after this long, in case Redis is unavailable and bumps are missed
+CATALOG_MAX_AGE_SECONDS = float(os.getenv("CATALOG_MAX_AGE_SECONDS", 300))
+
+
+_redis_cache = None
+
+
+def _get_cache():
+    # Created lazily so that importing DatabaseHandler does not open a Redis connection
+    global _redis_cache
+    if _redis_cache is None:
+        from promptcraft.redis_cache import RedisCache
+        _redis_cache = RedisCache()
+    return _redis_cache
+
+
+def bump_catalog_version(redis_cache=None) -> Optional[int]:
+    """
+    Signal every worker to reload its catalog. Called by the DatabaseHandler methods that change the
+    questions table. Returns the new version, or None if Redis is unavailable (workers then reload
+    within CATALOG_MAX_AGE_SECONDS).
+    """
+    try:
+        new_version = (redis_cache or _get_cache()).incr(CATALOG_VERSION_KEY)
+    except Exception as e:
+        logger.error(f"Error bumping question catalog version: {e}")
+        return None
+    logger.info(f"Question catalog version bumped to {new_version}.")
+    return new_version
+
+
+def _index_key(value: Optional[str]) -> Optional[str]:
+    return value.strip().lower() if value else None
+
+
+def _freeze_question(row: Dict[str, Any]) -> Mapping[str, Any]:
+    frozen = dict(row)
+    frozen["evaluation_criteria"] = tuple(frozen.get("evaluation_criteria") or ())
+    return MappingProxyType(frozen)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """A read-only view of the questions table at one catalog version."""
+    version: Optional[int]
+    loaded_at: float
+    questions: Tuple[Mapping[str, Any], ...] = ()
+    by_id: Mapping[int, Mapping[str, Any]] = field(default_factory=lambda: MappingProxyType({}))
+    by_difficulty: Mapping[str, Tuple[int, ...]] = field(default_factory=lambda: MappingProxyType({}))
+    by_language: Mapping[str, Tuple[int, ...]] = field(default_factory=lambda: MappingProxyType({}))
+
+    @classmethod
+    def build(cls, rows: List[Dict[str, Any]], version: Optional[int]) -> "CatalogSnapshot":
+        """Build a snapshot and its filter indexes from question rows (already JSON-decoded)."""
+        questions = tuple(_freeze_question(row) for row in sorted(rows, key=lambda r: r["id"]))
+        by_difficulty: Dict[str, List[int]] = {}
+        by_language: Dict[str, List[int]] = {}
+        for question in questions:
+            difficulty = _index_key(question.get("difficulty_level"))
+            language = _index_key(question.get("programming_language"))
+            if difficulty:
+                by_difficulty.setdefault(difficulty, []).append(question["id"])
+            if language:
+                by_language.setdefault(language, []).append(question["id"])
+        return cls(
+            version=version,
+            loaded_at=time.monotonic(),
+            questions=questions,
+            by_id=MappingProxyType({q["id"]: q for q in questions}),
+            by_difficulty=MappingProxyType({k: tuple(v) for k, v in by_difficulty.items()}),
+            by_language=MappingProxyType({k: tuple(v) for k, v in by_language.items()}),
+        )
+
+    def get(self, question_id: int) -> Optional[Mapping[str, Any]]:
+        return self.by_id.get(question_id)
+
+    def filter(self, difficulty: Optional[str] = None, language: Optional[str] = None) -> List[Mapping[str, Any]]:
+        """Return questions matching the given difficulty and/or language (case-insensitive), ordered by ID."""
+        if not difficulty and not language:
+            return list(self.questions)
+        candidate_ids = None
+        for index, value in ((self.by_difficulty, difficulty), (self.by_language, language)):
+            if not value:
+                continue
+            ids = set(index.get(_index_key(value), ()))
+            candidate_ids = ids if candidate_ids is None else candidate_ids & ids
+        return [self.by_id[qid] for qid in sorted(candidate_ids)]
+
+
+class QuestionCatalog:
+    """Per-worker holder of the current CatalogSnapshot, reloaded when the Redis version changes."""
+
+    def __init__(self, db_handler, redis_cache, version_check_seconds: float = CATALOG_VERSION_CHECK_SECONDS,
+                 max_age_seconds: float = CATALOG_MAX_AGE_SECONDS):
+        self.db_handler = db_handler
+        self.redis_cache = redis_cache
+        self.version_check_seconds = version_check_seconds
+        self.max_age_seconds = max_age_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._last_version_check = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, snapshot: Optional[CatalogSnapshot], now: float) -> bool:
+        # Within the check interval the snapshot is served without asking Redis
+        return snapshot is not None and now - self._last_version_check < self.version_check_seconds
+
+    async def get_snapshot_async(self) -> Optional[CatalogSnapshot]:
+        """
+        get_snapshot for async handlers. The common case returns at once; a due version check (a Redis
+        round trip) and any reload (a full-table query) run in a worker thread, off the event loop.
+        """
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, time.monotonic()):
+            return snapshot
+        return await asyncio.to_thread(self.get_snapshot)
+
+    def get_snapshot(self) -> Optional[CatalogSnapshot]:
+        """Return the current snapshot, reloading it first if it is missing or out of date. Blocking."""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if self._is_fresh(snapshot, now):
+            return snapshot
+
+        self._last_version_check = now
+        current_version = self.redis_cache.get_int(CATALOG_VERSION_KEY)
+        if snapshot is not None and snapshot.version == current_version and now - snapshot.loaded_at < self.max_age_seconds:
+            return snapshot
+        return self.reload(current_version)
+
+    def reload(self, version: Optional[int] = None) -> Optional[CatalogSnapshot]:
+        """Rebuild the snapshot from the database with one query and swap it in atomically."""
+        with self._lock:
+            # Another thread may have reloaded this version while we waited for the lock
+            snapshot = self._snapshot
+            if snapshot is not None and version is not None and snapshot.version == version \
+                    and time.monotonic() - snapshot.loaded_at < self.max_age_seconds:
+                return snapshot
+            try:
+                rows = self.db_handler.get_all_question_details()
+            except Exception as e:
+                logger.error(f"Failed to load question catalog: {e}")
+                return snapshot # Keep serving the previous snapshot, if any
+            if not rows:
+                # get_all_question_details returns [] on DB errors too, so don't replace a good snapshot with nothing
+                logger.warning("Question catalog is empty or could not be loaded.")
+                return snapshot
+            self._snapshot = CatalogSnapshot.build(rows, version)
+            logger.info(f"Question catalog loaded: {len(self._snapshot.questions)} questions, version {version}.")
+            return self._snapshot
+
+    def bump_version(self) -> Optional[int]:
+        """Signal every worker to reload. Call after the questions table changes."""
+        new_version = bump_catalog_version(self.redis_cache)
+        self._last_version_check = 0.0 # Re-check on the next read in this worker
+        return new_version
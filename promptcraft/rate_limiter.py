@@ -0,0 +1,135 @@
+"""
+Request rate limiting for PromptCraft.
+
+Protects CPU-heavy routes (bcrypt on login/registration, LLM calls on submissions)
+from bursts. Limits use a sliding-window counter: the current fixed window's count
+plus the previous window's count weighted by how much of it still overlaps the
+sliding window. Counters live in Redis so that limits hold across API workers; if
+Redis is unavailable, each worker falls back to an in-memory counter.
+
+Usage as a FastAPI dependency:
+
+    submission_limit = RateLimiter("submissions", limit=30, window_seconds=60)
+
+    @router.post("/submissions", dependencies=[Depends(submission_limit.dependency())])
+    async def create_submission(...): ...
+"""
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+
+from promptcraft.exceptions import RateLimitException
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+RATE_LIMIT_PREFIX = "promptcraft:ratelimit"
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Use the first X-Forwarded-For address as the client IP. Only enable behind a trusted proxy.
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+# Upper bound on in-memory fallback keys per limiter, so a spray of distinct keys cannot exhaust memory
+MEMORY_FALLBACK_MAX_KEYS = 10000
+
+
+def parse_rate(spec: str) -> Tuple[int, int]:
+    """Parse a "<limit>/<window seconds>" rate such as "20/60"."""
+    limit, _, window = spec.partition("/")
+    return int(limit), int(window or 60)
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimiter:
+    """A named sliding-window limit of `limit` hits per `window_seconds` per key."""
+
+    def __init__(self, name: str, limit: int, window_seconds: int, redis_cache=None,
+                 clock: Callable[[], float] = time.time):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = max(1, window_seconds)
+        self._redis_cache = redis_cache
+        self._clock = clock
+        self._memory: Dict[str, Tuple[int, int, int]] = {}  # key -> (window index, current count, previous count)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def _get_cache(self):
+        # Resolved lazily so that building limiters at import time does not open a Redis connection
+        if self._redis_cache is None:
+            from promptcraft.redis_cache import RedisCache
+            self._redis_cache = RedisCache()
+        return self._redis_cache
+
+    def _memory_counts(self, key: str, window_index: int) -> Tuple[int, int]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None or entry[0] < window_index - 1:
+                current, previous = 1, 0
+            elif entry[0] == window_index - 1:
+                current, previous = 1, entry[1]
+            else:
+                current, previous = entry[1] + 1, entry[2]
+            if entry is None and len(self._memory) >= MEMORY_FALLBACK_MAX_KEYS:
+                # Drop keys from windows that can no longer affect any decision
+                self._memory = {k: v for k, v in self._memory.items() if v[0] >= window_index - 1}
+            self._memory[key] = (window_index, current, previous)
+            return current, previous
+
+    def hit(self, key: str) -> None:
+        """Record one hit for `key`. Raises RateLimitException (429) if the key is over its limit."""
+        if not RATE_LIMIT_ENABLED or self.limit <= 0:
+            return
+        now = self._clock()
+        window_index = int(now // self.window_seconds)
+        elapsed_fraction = (now % self.window_seconds) / self.window_seconds
+
+        redis_key = f"{RATE_LIMIT_PREFIX}:{self.name}:{key}"
+        counts = None
+        cache = self._get_cache()
+        if cache is not None:
+            counts = cache.incr_window(f"{redis_key}:{window_index}", f"{redis_key}:{window_index - 1}",
+                                       ttl_seconds=self.window_seconds * 2)
+        if counts is None:
+            counts = self._memory_counts(key, window_index)
+        current, previous = counts
+
+        estimated = current + previous * (1 - elapsed_fraction)
+        if estimated > self.limit:
+            self.rejected += 1
+            retry_after = max(1, math.ceil(self.window_seconds * (1 - elapsed_fraction)))
+            logger.warning(f"Rate limit '{self.name}' exceeded for {key}: ~{estimated:.1f}/{self.limit} in {self.window_seconds}s.")
+            raise RateLimitException(retry_after=retry_after)
+        self.allowed += 1
+
+    def dependency(self, key_func: Callable[[Request], str] = client_ip):
+        """Build a FastAPI dependency that applies this limit to the key returned by key_func (client IP by default)."""
+        async def _check_rate_limit(request: Request) -> None:
+            self.hit(key_func(request))
+        return _check_rate_limit
+
+    def stats(self) -> Dict[str, int]:
+        return {"limit": self.limit, "window_seconds": self.window_seconds,
+                "allowed": self.allowed, "rejected": self.rejected}
+
+
+# Limits for the routes that do expensive work on every call
+login_ip_limiter = RateLimiter("login_ip", *parse_rate(os.getenv("LOGIN_RATE_LIMIT_PER_IP", "20/60")))
+login_username_limiter = RateLimiter("login_user", *parse_rate(os.getenv("LOGIN_RATE_LIMIT_PER_USERNAME", "10/60")))
+register_ip_limiter = RateLimiter("register_ip", *parse_rate(os.getenv("REGISTER_RATE_LIMIT_PER_IP", "5/60")))
+submission_ip_limiter = RateLimiter("submissions_ip", *parse_rate(os.getenv("SUBMISSION_RATE_LIMIT_PER_IP", "30/60")))
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, int]]:
+    return {limiter.name: limiter.stats() for limiter in
+            (login_ip_limiter, login_username_limiter, register_ip_limiter, submission_ip_limiter)}
@@ -1,10 +1,13 @@
 import redis
-import json
 import os
+from contextlib import contextmanager
 from promptcraft.logger_config import setup_logger # Import the logger
+from promptcraft.cache_codecs import CacheCodec, CodecError
 
 logger = setup_logger(__name__) # Get a logger for this module
 
+CLEAR_BATCH_SIZE = 500 # Keys per SCAN page and per UNLINK when clearing a prefix
+
 class RedisCache:
     _instance = None
 
@@ -13,7 +16,7 @@ class RedisCache:
             cls._instance = super(RedisCache, cls).__new__(cls, *args, **kwargs)
         return cls._instance
 
-    def __init__(self, host=None, port=None, db=0):
+    def __init__(self, host=None, port=None, db=0, codec=None):
         # Ensure __init__ is idempotent for singleton pattern
         if hasattr(self, '_initialized') and self._initialized:
             return
@@ -21,6 +24,7 @@ class RedisCache:
         self.redis_host = host or os.getenv("REDIS_HOST", "localhost")
         self.redis_port = port or int(os.getenv("REDIS_PORT", 6379))
         self.redis_db = db
+        self.codec = codec or CacheCodec()
         self.r = None
         self._initialized = True
         logger.info(f"RedisCache instance configured for {self.redis_host}:{self.redis_port}, DB {self.redis_db}")
@@ -32,7 +36,7 @@ class RedisCache:
                 host=self.redis_host,
                 port=self.redis_port,
                 db=self.redis_db,
-                decode_responses=True # Decode responses from bytes to string
+                decode_responses=False # Values are framed bytes produced by CacheCodec
             )
             self.r.ping() # Verify connection
             logger.info(f"Successfully connected to Redis at {self.redis_host}:{self.redis_port}")
@@ -57,32 +61,32 @@ class RedisCache:
             value = self.r.get(key)
             if value:
                 logger.debug(f"Cache HIT for key '{key}'.")
-                return json.loads(value) # Assuming all cached values are JSON strings
+                return self.codec.decode(value) # Handles both framed and legacy JSON values
             else:
                 logger.debug(f"Cache MISS for key '{key}'.")
                 return None
         except redis.exceptions.RedisError as e:
             logger.error(f"Redis GET error for key '{key}': {e}")
             return None
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error for key '{key}' from cache: {e}")
+        except CodecError as e:
+            logger.error(f"Decode error for key '{key}' from cache: {e}")
             return None # Or delete the malformed key: self.r.delete(key)
 
     def set(self, key, value, ttl_seconds=300):
-        """Set a value in cache, serializing to JSON."""
+        """Set a value in cache, serializing it with the configured codec."""
         if not self.is_connected():
             logger.warning("Redis not connected. Cannot set to cache.")
             return False
         try:
-            json_value = json.dumps(value)
-            self.r.setex(key, ttl_seconds, json_value)
+            encoded_value = self.codec.encode(value)
+            self.r.setex(key, ttl_seconds, encoded_value)
             logger.debug(f"Cache SET for key '{key}' with TTL {ttl_seconds}s.")
             return True
         except redis.exceptions.RedisError as e:
             logger.error(f"Redis SET error for key '{key}': {e}")
             return False
-        except TypeError as e: # For non-serializable objects
-            logger.error(f"JSON serialization error for key '{key}': {e}")
+        except CodecError as e: # For non-serializable objects
+            logger.error(f"Serialization error for key '{key}': {e}")
             return False
 
     def delete(self, key):
@@ -97,11 +101,157 @@ class RedisCache:
             logger.error(f"Redis DELETE error for key '{key}': {e}")
             return False
 
+    def set_if_absent(self, key, value, ttl_seconds=300):
+        """
+        SET NX with a TTL. Returns True if the key was set, False if it already existed,
+        or None if Redis is unavailable.
+        """
+        if self.r is None:
+            return None
+        try:
+            return bool(self.r.set(key, self.codec.encode(value), ex=ttl_seconds, nx=True))
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis SET NX error for key '{key}': {e}")
+            return None
+        except CodecError as e:
+            logger.error(f"Serialization error for key '{key}': {e}")
+            return None
+
+    # --- Counters (stored as plain Redis integers, not codec-framed) ---
+
+    def get_int(self, key):
+        """Read an integer counter. Returns None if the key is missing or Redis is unavailable."""
+        if self.r is None:
+            return None
+        try:
+            value = self.r.get(key)
+            return int(value) if value is not None else None
+        except (redis.exceptions.RedisError, ValueError) as e:
+            logger.error(f"Redis GET (int) error for key '{key}': {e}")
+            return None
+
+    def incr(self, key, amount=1):
+        """Atomically increment an integer counter. Returns the new value, or None on failure."""
+        if self.r is None:
+            logger.warning("Redis not connected. Cannot increment counter.")
+            return None
+        try:
+            return self.r.incr(key, amount)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis INCR error for key '{key}': {e}")
+            return None
+
+    def incr_window(self, key, previous_key, ttl_seconds):
+        """
+        Increment a fixed-window counter and read the previous window's count in one round trip.
+        Returns (current_count, previous_count), or None if Redis is unavailable.
+        """
+        if self.r is None:
+            return None
+        try:
+            pipe = self.r.pipeline(transaction=False)
+            pipe.incr(key)
+            pipe.expire(key, ttl_seconds)
+            pipe.get(previous_key)
+            current, _, previous = pipe.execute()
+            return int(current), int(previous or 0)
+        except (redis.exceptions.RedisError, ValueError) as e:
+            logger.error(f"Redis window counter error for key '{key}': {e}")
+            return None
+
+    # --- Batched operations ---
+    # These skip the per-call PING done by is_connected() so that a batch really costs one round trip.
+    # A dropped connection surfaces as a RedisError and is handled like any other cache failure.
+
+    def get_many(self, keys):
+        """Fetch several keys with a single MGET. Returns a dict containing only the keys that were hit."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        if self.r is None:
+            logger.warning("Redis not connected. Cannot get_many from cache.")
+            return {}
+        try:
+            raw_values = self.r.mget(keys)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis MGET error for {len(keys)} keys: {e}")
+            return {}
+
+        found = {}
+        for key, raw in zip(keys, raw_values):
+            if raw is None:
+                continue
+            try:
+                found[key] = self.codec.decode(raw)
+            except CodecError as e:
+                logger.error(f"Decode error for key '{key}' from cache: {e}")
+        logger.debug(f"Cache MGET: {len(found)}/{len(keys)} hits.")
+        return found
+
+    def set_many(self, mapping, ttl_seconds=300):
+        """
+        Store several values in one pipelined round trip.
+
+        Args:
+            mapping: Dict of key -> value
+            ttl_seconds: Either a single TTL for every key, or a dict of key -> TTL.
+                         Keys missing from a TTL dict use the default of 300 seconds.
+        """
+        if not mapping:
+            return True
+        if self.r is None:
+            logger.warning("Redis not connected. Cannot set_many to cache.")
+            return False
+        with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                ttl = ttl_seconds.get(key, 300) if isinstance(ttl_seconds, dict) else ttl_seconds
+                pipe.set(key, value, ttl_seconds=ttl)
+        return pipe.succeeded
+
+    @contextmanager
+    def pipeline(self, transaction=False):
+        """
+        Queue cache commands and send them in one round trip when the block exits.
+
+        Usage:
+            with redis_cache.pipeline() as pipe:
+                pipe.set("a", 1, ttl_seconds=60)
+                pipe.get("b")
+            pipe.results  # [True, <value of b or None>]
+
+        If the block raises, the queued commands are discarded rather than sent.
+        """
+        pipe = CachePipeline(self, transaction=transaction)
+        try:
+            yield pipe
+        except BaseException:
+            pipe.discard()
+            raise
+        pipe.execute()
+
     def clear_all_promptcraft_cache(self, prefix="promptcraft:"):
-        """Clear all keys matching a specific prefix (e.g., 'promptcraft:')."""
+        """Clear all keys matching a specific prefix (e.g., 'promptcraft:').
+
+        Walks the keyspace with SCAN and removes keys with UNLINK in batches, so a
+        large keyspace never blocks Redis the way KEYS would.
+        """
         if not self.is_connected():
             logger.warning("Redis not connected. Cannot clear cache.")
             return False
+        try:
+            cleared, batch = 0, []
+            for key in self.r.scan_iter(match=f"{prefix}*", count=CLEAR_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= CLEAR_BATCH_SIZE:
+                    cleared += self.r.unlink(*batch)
+                    batch = []
+            if batch:
+                cleared += self.r.unlink(*batch)
+            logger.info(f"Cleared {cleared} keys with prefix '{prefix}'.")
+            return True
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis SCAN or UNLINK error during clear_all_promptcraft_cache: {e}")
+            return False
         try:
             keys = self.r.keys(f"{prefix}*")
             if keys:
@@ -114,6 +264,112 @@ class RedisCache:
             logger.error(f"Redis KEYS or DELETE error during clear_all_promptcraft_cache: {e}")
             return False
 
+class CachePipeline:
+    """Collects RedisCache commands and executes them together. Created via RedisCache.pipeline()."""
+
+    def __init__(self, cache, transaction=False):
+        self._cache = cache
+        self._pipe = cache.r.pipeline(transaction=transaction) if cache.r is not None else None
+        self._kinds = [] # Command kind per queued command, used to post-process results
+        self.results = []
+        self.succeeded = False
+
+    # Commands are recorded even without a connection, so results line up with the queued commands.
+
+    def get(self, key):
+        if self._pipe is not None:
+            self._pipe.get(key)
+        self._kinds.append("get")
+        return self
+
+    def set(self, key, value, ttl_seconds=300):
+        try:
+            encoded = self._cache.codec.encode(value)
+        except CodecError as e:
+            logger.error(f"Serialization error for key '{key}' in pipeline: {e}")
+            return self
+        if self._pipe is not None:
+            self._pipe.setex(key, ttl_seconds, encoded)
+        self._kinds.append("set")
+        return self
+
+    def delete(self, *keys):
+        if not keys:
+            return self
+        if self._pipe is not None:
+            self._pipe.delete(*keys)
+        self._kinds.append("delete")
+        return self
+
+    def hget_int(self, name, field):
+        """Queue a read of an integer field from a Redis hash (stored as a plain integer, not codec-framed)."""
+        if self._pipe is not None:
+            self._pipe.hget(name, field)
+        self._kinds.append("hget_int")
+        return self
+
+    def hset_int(self, name, field, value, only_if_missing=False):
+        if self._pipe is not None:
+            if only_if_missing:
+                self._pipe.hsetnx(name, field, int(value))
+            else:
+                self._pipe.hset(name, field, int(value))
+        self._kinds.append("hset_int")
+        return self
+
+    def discard(self):
+        """Drop all queued commands without sending them."""
+        if self._pipe is not None:
+            self._pipe.reset()
+        self._kinds = []
+        self.results = []
+        self.succeeded = False
+
+    def execute(self):
+        """Send all queued commands. Failed or undecodable reads come back as None."""
+        if self._pipe is None:
+            logger.warning("Redis not connected. Discarding cache pipeline.")
+            self.results = [None] * len(self._kinds)
+            return self.results
+        if not self._kinds:
+            self.succeeded = True
+            return self.results
+        try:
+            raw_results = self._pipe.execute(raise_on_error=False)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis pipeline error ({len(self._kinds)} commands): {e}")
+            self.results = [None] * len(self._kinds)
+            return self.results
+        finally:
+            self._pipe.reset()
+
+        results = []
+        self.succeeded = True
+        for kind, raw in zip(self._kinds, raw_results):
+            if isinstance(raw, Exception):
+                logger.error(f"Redis pipeline command '{kind}' failed: {raw}")
+                self.succeeded = False
+                results.append(None)
+            elif kind == "get":
+                try:
+                    results.append(self._cache.codec.decode(raw))
+                except CodecError as e:
+                    logger.error(f"Decode error in cache pipeline: {e}")
+                    results.append(None)
+            elif kind == "hget_int":
+                try:
+                    results.append(int(raw) if raw is not None else None)
+                except ValueError:
+                    logger.error(f"Non-integer hash field in cache pipeline: {raw!r}")
+                    results.append(None)
+            elif kind == "set":
+                results.append(bool(raw))
+            else:
+                results.append(raw)
+        self.results = results
+        logger.debug(f"Cache pipeline executed {len(self._kinds)} commands.")
+        return results
+
 # Global instance (Singleton)
 # Initialize with default environment variables. Can be reconfigured if needed.
 # cache_service = RedisCache()
@@ -56,4 +56,8 @@ class PasswordResetRequest(BaseModel):
 
 class SetNewPasswordRequest(BaseModel):
     token: str # Password reset token
-    new_password: str = Field(..., min_length=8) 
\ No newline at end of file
+    new_password: str = Field(..., min_length=8) 
+
+class PasswordChangeRequest(BaseModel):
+    current_password: str
+    new_password: str = Field(..., min_length=8)
@@ -0,0 +1 @@
+"""Similarity search over submissions for PromptCraft."""
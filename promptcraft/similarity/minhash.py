@@ -0,0 +1,165 @@
+"""
+Near-duplicate prompt detection with MinHash and locality-sensitive hashing.
+
+Each prompt is reduced to a set of word 3-grams (shingles) and summarised by a
+MinHash signature of MINHASH_NUM_PERM values; the share of equal values between
+two signatures estimates the Jaccard similarity of the shingle sets. The
+signature is cut into LSH_BANDS bands, and every band is hashed to a bucket.
+Prompts sharing a bucket for the same question are candidate duplicates; only
+those are compared, so a lookup touches a handful of rows instead of every
+submission for the question.
+
+Signatures and buckets live in MySQL (prompt_minhash, prompt_lsh_buckets), are
+added whenever a submission is created, and survive restarts. With 32 bands of 4
+rows, pairs above ~0.6 similarity are found with >98% probability.
+
+Changing MINHASH_NUM_PERM, LSH_BANDS, the seed or the shingling makes stored
+signatures incompatible: run rebuild_prompt_index.py afterwards.
+"""
+import hashlib
+import os
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+MINHASH_NUM_PERM = 128
+LSH_BANDS = 32
+SHINGLE_SIZE = 3
+MINHASH_SEED = 1
+# Estimated Jaccard similarity from which two prompts are reported as likely duplicates
+PROMPT_DUPLICATE_THRESHOLD = float(os.getenv("PROMPT_DUPLICATE_THRESHOLD", 0.6))
+# Upper bound on candidates compared for one lookup (protects against very common prompts)
+LSH_MAX_CANDIDATES = 5000
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Word n-grams of the normalized text. Texts shorter than `size` words give a single shingle."""
+    words = _WORD_RE.findall(unicodedata.normalize("NFKC", text).lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _hash32(value: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class MinHasher:
+    """MinHash signatures from universal hashing (a * x + b) mod p, vectorized over shingles and permutations."""
+
+    def __init__(self, num_perm: int = MINHASH_NUM_PERM, seed: int = MINHASH_SEED):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        tokens = shingles(text)
+        if not tokens:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        hashes = np.fromiter((_hash32(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+        # uint64 arithmetic wraps on overflow, which keeps the values well mixed before the modulo
+        permuted = ((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+def lsh_buckets(signature: np.ndarray, bands: int = LSH_BANDS) -> List[Tuple[int, int]]:
+    """(band, bucket) pairs of a signature; buckets are signed 64-bit hashes of the band's values."""
+    return [
+        (band, int.from_bytes(hashlib.blake2b(rows.tobytes(), digest_size=8).digest(), "little", signed=True))
+        for band, rows in enumerate(np.array_split(signature, bands))
+    ]
+
+
+def estimate_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def signature_from_bytes(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.uint32)
+
+
+class PromptDuplicateIndex:
+    """Per-question MinHash/LSH index of submission prompts, persisted through DatabaseHandler."""
+
+    def __init__(self, db_handler=None, hasher: Optional[MinHasher] = None, bands: int = LSH_BANDS):
+        self._db_handler = db_handler
+        self.hasher = hasher or MinHasher()
+        self.bands = bands
+
+    @property
+    def db_handler(self):
+        # Resolved lazily so that importing this module does not need database settings
+        if self._db_handler is None:
+            from promptcraft.database.db_handler import DatabaseHandler
+            self._db_handler = DatabaseHandler()
+        return self._db_handler
+
+    def _entry(self, submission_id: int, question_id: int, prompt: str) -> Dict[str, Any]:
+        signature = self.hasher.signature(prompt)
+        return {"submission_id": submission_id, "question_id": question_id, "signature": signature.tobytes(),
+                "buckets": lsh_buckets(signature, self.bands)}
+
+    def add(self, submission_id: int, question_id: int, prompt: str) -> bool:
+        """Index one new submission. Failures are logged, not raised: the submission itself is already saved."""
+        try:
+            return self.db_handler.save_prompt_signatures([self._entry(submission_id, question_id, prompt)])
+        except Exception as e:
+            logger.error(f"Could not index prompt of submission {submission_id}: {e}", exc_info=True)
+            return False
+
+    def add_many(self, rows: Iterable[Dict[str, Any]]) -> bool:
+        """Index submission rows (id, question_id, prompt) in one transaction."""
+        return self.db_handler.save_prompt_signatures(
+            [self._entry(row["id"], row["question_id"], row["prompt"]) for row in rows])
+
+    def find_duplicates(self, submission: Dict[str, Any], threshold: float = PROMPT_DUPLICATE_THRESHOLD,
+                        limit: int = 20, include_same_user: bool = False) -> List[Dict[str, Any]]:
+        """
+        Submissions for the same question whose prompt is a likely near-duplicate of `submission`'s
+        (a submissions row with id, user_id, question_id, prompt), most similar first.
+        """
+        signature = self.hasher.signature(submission["prompt"])
+        candidates = self.db_handler.get_lsh_candidates(
+            submission["question_id"], lsh_buckets(signature, self.bands), submission["id"], LSH_MAX_CANDIDATES)
+        matches = []
+        for candidate in candidates:
+            if not include_same_user and candidate["user_id"] == submission["user_id"]:
+                continue
+            similarity = estimate_similarity(signature, signature_from_bytes(candidate["signature"]))
+            if similarity >= threshold:
+                matches.append({"submission_id": candidate["submission_id"], "user_id": candidate["user_id"],
+                                "similarity": round(similarity, 3)})
+        matches.sort(key=lambda m: (-m["similarity"], m["submission_id"]))
+        return matches[:limit]
+
+    def rebuild(self, question_id: Optional[int] = None, batch_size: int = 1000) -> int:
+        """Drop and recompute the index (for one question or all). Returns the number of submissions indexed."""
+        self.db_handler.clear_prompt_index(question_id)
+        after_id = 0
+        total = 0
+        while True:
+            rows = self.db_handler.get_submission_prompts(after_id, batch_size, question_id)
+            if not rows:
+                break
+            after_id = rows[-1]["id"]
+            if not self.add_many(rows):
+                logger.error(f"Stopping prompt index rebuild: could not save signatures up to submission {after_id}.")
+                break
+            total += len(rows)
+            logger.info(f"Prompt index rebuild: {total} submissions indexed (last submission {after_id}).")
+        return total
+
+
+prompt_duplicate_index = PromptDuplicateIndex()
@@ -0,0 +1,329 @@
+"""
+Similar-submission search with hashed TF-IDF vectors and a per-question NumPy index.
+
+Prompts are embedded locally, without a model: word unigrams and bigrams are hashed
+(signed feature hashing) into VECTOR_DIM dimensions, term counts are dampened with
+1 + log(tf), weighted by the question's inverse document frequencies and L2-normalized.
+Cosine similarity is then a dot product, and one matrix-vector product over a
+question's vectors ranks all of its submissions; it is bound by memory bandwidth
+(100k x 512 float32 is ~200 MB, about 20 ms on one core, less for smaller questions).
+
+Each question has a directory under VECTOR_INDEX_DIR holding append-only files that
+are memory-mapped for search:
+
+- vectors.f32: float32 rows, one per submission,
+- ids.i64: the submissions' IDs, in the order they were appended,
+- df.npy: document frequency per dimension, followed by the number of documents counted.
+
+The index is built incrementally, off the request path: creating a submission (and
+every search) schedules a sync of its question on a background thread, which fetches
+the submissions newer than the last indexed ID and appends them. Auto-increment IDs
+can commit out of order, so each sync re-reads VECTOR_INDEX_SYNC_OVERLAP IDs below the
+last indexed one and appends those it has not seen; a submission whose transaction
+commits later than that stays out of the index until the next rebuild. Searches only read
+the rows already on disk, so a submission shows up in results shortly after it is
+created. Rows keep the IDF weights from when they were appended; rebuild_prompt_index.py
+recomputes them from the full corpus (and must be run after changing VECTOR_DIM or the
+tokenization). A file lock serializes writers across processes sharing the directory;
+a background sync that finds it taken skips its turn instead of waiting.
+"""
+import fcntl
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "vector_index")
+VECTOR_DIM = 512
+VECTOR_INDEX_BATCH_SIZE = 1000
+VECTOR_INDEX_SYNC_OVERLAP = 200 # IDs below the last indexed one that every sync reads again
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased word unigrams and bigrams."""
+    words = _WORD_RE.findall(unicodedata.normalize("NFKC", text).lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def term_counts(texts: Sequence[str], dim: int = VECTOR_DIM) -> np.ndarray:
+    """Sublinear term frequencies of each text, feature-hashed into `dim` signed buckets."""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for term in terms(text):
+            h = zlib.crc32(term.encode("utf-8"))
+            # The top bit picks the sign so that colliding terms tend to cancel rather than add up
+            matrix[row, h % dim] += -1.0 if h & 0x80000000 else 1.0
+    nonzero = matrix != 0
+    matrix[nonzero] = np.sign(matrix[nonzero]) * (1 + np.log(np.abs(matrix[nonzero])))
+    return matrix
+
+
+def idf_weights(df: np.ndarray) -> np.ndarray:
+    """Smoothed IDF from a df.npy array (frequencies, then document count)."""
+    return (np.log((1 + df[-1]) / (1 + df[:-1])) + 1).astype(np.float32)
+
+
+def embed(counts: np.ndarray, df: np.ndarray) -> np.ndarray:
+    """IDF-weighted, L2-normalized rows (all-zero rows stay zero)."""
+    weighted = counts * idf_weights(df)
+    norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+    return weighted / np.where(norms == 0, 1, norms)
+
+
+class QuestionVectorIndex:
+    """The on-disk vectors of one question's submissions."""
+
+    def __init__(self, directory: str, dim: int = VECTOR_DIM):
+        self.directory = directory
+        self.dim = dim
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._ids_path = os.path.join(directory, "ids.i64")
+        self._df_path = os.path.join(directory, "df.npy")
+        self._lock_path = os.path.join(directory, "lock")
+        # (row count, file identity, vectors, ids) of the current memory maps
+        self._mapped: Tuple[int, Any, Optional[np.ndarray], Optional[np.ndarray]] = (0, None, None, None)
+
+    def __len__(self) -> int:
+        try:
+            # A write interrupted between the two files leaves a partial tail, which is ignored
+            return min(os.path.getsize(self._vectors_path) // (4 * self.dim), os.path.getsize(self._ids_path) // 8)
+        except FileNotFoundError:
+            return 0
+
+    def _identity(self) -> Any:
+        # A rebuild replaces the files, so the same row count can hold different rows
+        try:
+            return tuple((st.st_dev, st.st_ino) for st in (os.stat(self._vectors_path), os.stat(self._ids_path)))
+        except FileNotFoundError:
+            return None
+
+    def _arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(self)
+        identity = self._identity()
+        count, mapped_identity, vectors, ids = self._mapped
+        if vectors is None or count != n or mapped_identity != identity:
+            if n == 0:
+                vectors, ids = np.empty((0, self.dim), dtype=np.float32), np.empty(0, dtype=np.int64)
+            else:
+                vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+                ids = np.memmap(self._ids_path, dtype=np.int64, mode="r", shape=(n,))
+            self._mapped = (n, identity, vectors, ids)
+        return vectors, ids
+
+    @contextmanager
+    def locked(self, blocking: bool = True) -> Iterator[bool]:
+        """
+        Exclusive write access, across threads and processes. Yields whether the lock was taken:
+        always True when blocking, False without blocking if another writer holds it.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def last_id(self) -> int:
+        _, ids = self._arrays()
+        return int(ids.max()) if len(ids) else 0
+
+    def ids_after(self, after_id: int) -> Set[int]:
+        """Indexed IDs above `after_id`."""
+        _, ids = self._arrays()
+        return set(ids[ids > after_id].tolist())
+
+    def document_frequencies(self) -> np.ndarray:
+        try:
+            return np.load(self._df_path)
+        except FileNotFoundError:
+            return np.zeros(self.dim + 1, dtype=np.int64)
+
+    def save_document_frequencies(self, df: np.ndarray) -> None:
+        tmp_path = f"{self._df_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, df)
+        os.replace(tmp_path, self._df_path)
+
+    def clear(self) -> None:
+        """Remove all rows. Call while holding locked()."""
+        for path in (self._vectors_path, self._ids_path, self._df_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._mapped = (0, None, None, None)
+
+    def append(self, ids: Sequence[int], texts: Sequence[str], update_df: bool = True) -> None:
+        """
+        Append submissions that are not in the index yet. Call while holding locked().
+        With update_df the texts count towards the document frequencies first; a rebuild
+        computes them beforehand and passes update_df=False.
+        """
+        if not ids:
+            return
+        counts = term_counts(texts, self.dim)
+        df = self.document_frequencies()
+        if update_df:
+            df[:-1] += np.count_nonzero(counts, axis=0)
+            df[-1] += len(ids)
+            self.save_document_frequencies(df)
+        n = len(self)
+        with open(self._vectors_path, "ab") as vectors_file, open(self._ids_path, "ab") as ids_file:
+            vectors_file.truncate(n * 4 * self.dim)
+            ids_file.truncate(n * 8)
+            vectors_file.write(embed(counts, df).astype(np.float32).tobytes())
+            ids_file.write(np.asarray(ids, dtype=np.int64).tobytes())
+
+    def search(self, text: str, limit: int = 10, exclude_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(submission ID, cosine similarity) of the `limit` closest rows, most similar first."""
+        vectors, ids = self._arrays()
+        if not len(ids):
+            return []
+        query = embed(term_counts([text], self.dim), self.document_frequencies())[0]
+        scores = vectors @ query
+        if exclude_id is not None:
+            scores[ids == exclude_id] = -np.inf
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+
+class SubmissionVectorIndex:
+    """Per-question QuestionVectorIndex files under one directory, kept in step with the submissions table."""
+
+    def __init__(self, db_handler=None, directory: str = VECTOR_INDEX_DIR, dim: int = VECTOR_DIM):
+        self._db_handler = db_handler
+        self.directory = directory
+        self.dim = dim
+        self._indexes: Dict[int, QuestionVectorIndex] = {}
+        self._lock = threading.Lock()
+        # One background thread does all syncing, so the lazily created DatabaseHandler is never shared
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._scheduled: Set[int] = set()
+
+    @property
+    def db_handler(self):
+        # Resolved lazily so that importing this module does not need database settings
+        if self._db_handler is None:
+            from promptcraft.database.db_handler import DatabaseHandler
+            self._db_handler = DatabaseHandler()
+        return self._db_handler
+
+    def index(self, question_id: int) -> QuestionVectorIndex:
+        with self._lock:
+            if question_id not in self._indexes:
+                self._indexes[question_id] = QuestionVectorIndex(
+                    os.path.join(self.directory, f"question_{question_id}"), self.dim)
+            return self._indexes[question_id]
+
+    def sync(self, question_id: int, batch_size: int = VECTOR_INDEX_BATCH_SIZE, blocking: bool = True) -> int:
+        """
+        Append the question's submissions newer than the last indexed one, and those within
+        VECTOR_INDEX_SYNC_OVERLAP IDs below it that committed after it. Returns how many were added.
+        Without `blocking`, returns 0 at once if another process is writing the question's index.
+        """
+        index = self.index(question_id)
+        added = 0
+        with index.locked(blocking) as acquired:
+            if not acquired:
+                logger.debug(f"Vector index of question {question_id} is being written elsewhere; skipping sync.")
+                return 0
+            after_id = max(0, index.last_id() - VECTOR_INDEX_SYNC_OVERLAP)
+            indexed = index.ids_after(after_id)
+            while True:
+                rows = self.db_handler.get_submission_prompts(after_id, batch_size, question_id)
+                if not rows:
+                    break
+                new_rows = [row for row in rows if row["id"] not in indexed]
+                index.append([row["id"] for row in new_rows], [row["prompt"] for row in new_rows])
+                after_id = rows[-1]["id"]
+                added += len(new_rows)
+                if len(rows) < batch_size:
+                    break
+        if added:
+            logger.debug(f"Vector index of question {question_id}: appended {added} submissions.")
+        return added
+
+    def schedule_sync(self, question_id: int) -> Optional[Future]:
+        """
+        Sync the question's index on the background thread. Returns the Future of the sync,
+        or None if one is already waiting to run (it will pick up the same submissions).
+        """
+        with self._lock:
+            if question_id in self._scheduled:
+                return None
+            self._scheduled.add(question_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-index")
+            return self._executor.submit(self._background_sync, question_id)
+
+    def _background_sync(self, question_id: int) -> int:
+        with self._lock:
+            # Submissions created from here on need another run
+            self._scheduled.discard(question_id)
+        try:
+            return self.sync(question_id, blocking=False)
+        except Exception as e:
+            logger.error(f"Background sync of the vector index of question {question_id} failed: {e}", exc_info=True)
+            return 0
+
+    def find_similar(self, submission: Dict[str, Any], limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Submissions for the same question with the most similar prompts to `submission`'s
+        (a submissions row with id, question_id, prompt), most similar first. Only searches
+        the rows indexed so far; newer submissions are appended in the background.
+        """
+        self.schedule_sync(submission["question_id"])
+        matches = self.index(submission["question_id"]).search(submission["prompt"], limit, submission["id"])
+        return [{"submission_id": submission_id, "similarity": round(similarity, 3)}
+                for submission_id, similarity in matches]
+
+    def rebuild(self, question_id: Optional[int] = None, batch_size: int = VECTOR_INDEX_BATCH_SIZE) -> int:
+        """Recompute the index (for one question or all) with IDF from the full corpus. Returns rows indexed."""
+        if question_id is None:
+            question_ids = [q["id"] for q in self.db_handler.get_all_questions()]
+        else:
+            question_ids = [question_id]
+        total = 0
+        for qid in question_ids:
+            index = self.index(qid)
+            with index.locked():
+                index.clear()
+                df = np.zeros(self.dim + 1, dtype=np.int64)
+                for rows in self._batches(qid, batch_size):
+                    df[:-1] += np.count_nonzero(term_counts([row["prompt"] for row in rows], self.dim), axis=0)
+                    df[-1] += len(rows)
+                index.save_document_frequencies(df)
+                for rows in self._batches(qid, batch_size):
+                    index.append([row["id"] for row in rows], [row["prompt"] for row in rows], update_df=False)
+            total += len(index)
+            logger.info(f"Vector index rebuild: question {qid} has {len(index)} submissions.")
+        return total
+
+    def _batches(self, question_id: int, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        after_id = 0
+        while True:
+            rows = self.db_handler.get_submission_prompts(after_id, batch_size, question_id)
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1]["id"]
+
+
+submission_vector_index = SubmissionVectorIndex()
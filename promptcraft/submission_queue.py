@@ -0,0 +1,210 @@
+"""
+Background job queue for LLM submissions.
+
+POST /api/v1/submissions/async stores a pending submission row and pushes a job
+onto a Redis list. submission_worker.py processes pull jobs, call the LLM and
+complete the row, so API workers never wait on LLM latency.
+
+Jobs are claimed with BLMOVE into the claiming worker's own processing list and
+removed only after the row has been updated. Every worker process registers
+itself and refreshes a heartbeat key with a TTL while it runs; any worker (or
+replica) that finds a registered worker whose heartbeat expired moves that
+worker's unfinished jobs back onto the queue (see requeue_orphaned). Jobs of live
+workers are never touched, so any number of replicas can run. Completion is
+announced on a per-submission Pub/Sub channel, which the submission WebSocket
+listens to.
+"""
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import redis
+import redis.asyncio as redis_async
+
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+QUEUE_KEY = "promptcraft:jobs:submissions"
+PROCESSING_KEY_PREFIX = "promptcraft:jobs:submissions:processing" # One list per worker: <prefix>:<worker ID>
+WORKERS_KEY = "promptcraft:jobs:submissions:workers" # Set of registered worker IDs
+HEARTBEAT_KEY_PREFIX = "promptcraft:jobs:submissions:heartbeat"
+RESULT_CHANNEL_PREFIX = "promptcraft:jobs:submission"
+# A worker refreshes its heartbeat this often; its jobs are requeued once the heartbeat is this old
+SUBMISSION_WORKER_HEARTBEAT_SECONDS = float(os.getenv("SUBMISSION_WORKER_HEARTBEAT_SECONDS", 10))
+SUBMISSION_WORKER_HEARTBEAT_TTL_SECONDS = int(os.getenv("SUBMISSION_WORKER_HEARTBEAT_TTL_SECONDS", 60))
+# Reject new jobs once this many are waiting; queue depth is the signal to add workers
+SUBMISSION_QUEUE_MAX_DEPTH = int(os.getenv("SUBMISSION_QUEUE_MAX_DEPTH", 1000))
+
+
+def result_channel(submission_id: int) -> str:
+    return f"{RESULT_CHANNEL_PREFIX}:{submission_id}:done"
+
+
+def processing_key(worker_id: str) -> str:
+    return f"{PROCESSING_KEY_PREFIX}:{worker_id}"
+
+
+def heartbeat_key(worker_id: str) -> str:
+    return f"{HEARTBEAT_KEY_PREFIX}:{worker_id}"
+
+
+def new_worker_id() -> str:
+    """Unique per worker process, and readable in Redis: host, PID and a random suffix."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class SubmissionQueue:
+    """
+    Thin wrapper over the Redis list used as the submission job queue. API processes use it
+    without a worker ID (enqueue, publish, stats); worker processes pass theirs to claim and ack jobs.
+    """
+
+    def __init__(self, redis_cache=None, worker_id: Optional[str] = None):
+        self._redis_cache = redis_cache
+        self.worker_id = worker_id
+
+    def _get_cache(self):
+        # Resolved lazily so that importing the API does not open a Redis connection
+        if self._redis_cache is None:
+            from promptcraft.redis_cache import RedisCache
+            self._redis_cache = RedisCache()
+        return self._redis_cache
+
+    @property
+    def r(self):
+        return self._get_cache().r
+
+    def enqueue(self, submission_id: int, user_id: int, question_id: int, prompt: str) -> bool:
+        """Push a job. Returns False if Redis is unavailable or the queue is full."""
+        if self.r is None:
+            logger.error("Redis not connected. Cannot enqueue submission job.")
+            return False
+        job = json.dumps({
+            "submission_id": submission_id,
+            "user_id": user_id,
+            "question_id": question_id,
+            "prompt": prompt,
+            "enqueued_at": time.time(),
+        })
+        try:
+            if self.r.llen(QUEUE_KEY) >= SUBMISSION_QUEUE_MAX_DEPTH:
+                logger.warning(f"Submission queue full ({SUBMISSION_QUEUE_MAX_DEPTH}). Rejecting job for submission {submission_id}.")
+                return False
+            self.r.lpush(QUEUE_KEY, job)
+            return True
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis error enqueuing submission {submission_id}: {e}")
+            return False
+
+    def claim(self, timeout_seconds: float = 5) -> Optional[bytes]:
+        """Block until a job is available and move it to this worker's processing list. Returns the raw job or None."""
+        if self.r is None:
+            time.sleep(timeout_seconds)
+            return None
+        try:
+            return self.r.blmove(QUEUE_KEY, processing_key(self.worker_id), timeout_seconds, src="RIGHT", dest="LEFT")
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis error claiming submission job: {e}")
+            time.sleep(min(timeout_seconds, 1))
+            return None
+
+    def ack(self, raw_job: bytes) -> None:
+        """Remove a finished job from this worker's processing list."""
+        try:
+            self.r.lrem(processing_key(self.worker_id), 1, raw_job)
+        except (AttributeError, redis.exceptions.RedisError) as e:
+            logger.error(f"Redis error acknowledging submission job: {e}")
+
+    def heartbeat(self) -> bool:
+        """Register this worker and refresh its heartbeat. Call every SUBMISSION_WORKER_HEARTBEAT_SECONDS."""
+        if self.r is None:
+            return False
+        try:
+            pipe = self.r.pipeline(transaction=False)
+            pipe.set(heartbeat_key(self.worker_id), time.time(), ex=SUBMISSION_WORKER_HEARTBEAT_TTL_SECONDS)
+            pipe.sadd(WORKERS_KEY, self.worker_id)
+            pipe.execute()
+            return True
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis error refreshing heartbeat of worker {self.worker_id}: {e}")
+            return False
+
+    def unregister(self) -> None:
+        """On a clean shutdown: hand back any unfinished jobs and drop this worker's heartbeat."""
+        self._requeue_worker(self.worker_id)
+        try:
+            if self.r is not None:
+                self.r.delete(heartbeat_key(self.worker_id))
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis error unregistering worker {self.worker_id}: {e}")
+
+    def _requeue_worker(self, worker_id: str) -> int:
+        moved = 0
+        try:
+            # LMOVE is atomic, so two workers reaping the same list never requeue a job twice
+            while self.r is not None and self.r.lmove(processing_key(worker_id), QUEUE_KEY, src="RIGHT", dest="RIGHT") is not None:
+                moved += 1
+            if self.r is not None:
+                self.r.srem(WORKERS_KEY, worker_id)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis error requeuing jobs of worker {worker_id}: {e}")
+        return moved
+
+    def requeue_orphaned(self) -> int:
+        """
+        Move the unfinished jobs of workers whose heartbeat expired (they crashed or were killed) back
+        onto the queue. Safe to call from any worker at any time: live workers' jobs are left alone.
+        """
+        if self.r is None:
+            return 0
+        try:
+            worker_ids = [w.decode() if isinstance(w, bytes) else w for w in self.r.smembers(WORKERS_KEY)]
+            pipe = self.r.pipeline(transaction=False)
+            for worker_id in worker_ids:
+                pipe.exists(heartbeat_key(worker_id))
+            alive = pipe.execute()
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis error listing submission workers: {e}")
+            return 0
+        moved = 0
+        for worker_id, is_alive in zip(worker_ids, alive):
+            if not is_alive:
+                count = self._requeue_worker(worker_id)
+                moved += count
+                if count:
+                    logger.warning(f"Requeued {count} unfinished submission jobs of expired worker {worker_id}.")
+        return moved
+
+    def publish_result(self, submission_id: int, payload: Dict[str, Any]) -> None:
+        try:
+            if self.r is not None:
+                self.r.publish(result_channel(submission_id), json.dumps(payload))
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis error publishing result for submission {submission_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        if self.r is None:
+            return {"available": False}
+        try:
+            worker_ids = [w.decode() if isinstance(w, bytes) else w for w in self.r.smembers(WORKERS_KEY)]
+            pipe = self.r.pipeline(transaction=False)
+            for worker_id in worker_ids:
+                pipe.llen(processing_key(worker_id))
+            return {"available": True, "queued": self.r.llen(QUEUE_KEY), "processing": sum(pipe.execute()),
+                    "workers": len(worker_ids), "max_depth": SUBMISSION_QUEUE_MAX_DEPTH}
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis error reading submission queue depth: {e}")
+            return {"available": False}
+
+    def async_pubsub(self):
+        """A Pub/Sub object on a dedicated asyncio Redis connection, for waiting on results without blocking the loop."""
+        cache = self._get_cache()
+        client = redis_async.Redis(host=cache.redis_host, port=cache.redis_port, db=cache.redis_db)
+        return client, client.pubsub()
+
+
+submission_queue = SubmissionQueue()
@@ -0,0 +1,96 @@
+"""
+Short-lived cache of authenticated users for PromptCraft.
+
+get_current_active_user runs on every authenticated request. Caching the
+UserResponse projection (never the password hash) per user ID lets the common
+request authorize without touching MySQL. Entries are invalidated by the
+DatabaseHandler methods that change what the projection contains.
+
+Token revocation uses a per-user token_version. MySQL holds the authoritative
+value; a single Redis hash mirrors it so each request can compare the version
+claim in its access token without a database query.
+"""
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from promptcraft.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+USER_CACHE_PREFIX = "promptcraft:auth:user"
+TOKEN_VERSIONS_KEY = "promptcraft:auth:token_versions" # Redis hash: user_id -> token_version
+AUTH_USER_CACHE_TTL_SECONDS = int(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", 60))
+
+_redis_cache = None
+
+def _get_cache():
+    # Created lazily so that importing DatabaseHandler does not open a Redis connection
+    global _redis_cache
+    if _redis_cache is None:
+        from promptcraft.redis_cache import RedisCache
+        _redis_cache = RedisCache()
+    return _redis_cache
+
+def _key(user_id: int) -> str:
+    return f"{USER_CACHE_PREFIX}:{user_id}"
+
+def get_cached_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """Return the cached user projection, or None on a miss or cache error."""
+    if AUTH_USER_CACHE_TTL_SECONDS <= 0:
+        return None
+    key = _key(user_id)
+    try:
+        # get_many skips the PING that get() performs, keeping a hit to one round trip
+        return _get_cache().get_many([key]).get(key)
+    except Exception as e:
+        logger.error(f"Error reading cached user {user_id}: {e}")
+        return None
+
+def cache_user(user_id: int, user_data: Dict[str, Any]) -> None:
+    """Cache a JSON-safe user projection. Callers must not pass the password hash."""
+    if AUTH_USER_CACHE_TTL_SECONDS <= 0:
+        return
+    if "hashed_password" in user_data:
+        raise ValueError("Refusing to cache a user record containing hashed_password.")
+    try:
+        _get_cache().set_many({_key(user_id): user_data}, ttl_seconds=AUTH_USER_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.error(f"Error caching user {user_id}: {e}")
+
+def invalidate_user(user_id: int) -> None:
+    """Drop the cached projection for a user. Call after any change to the user's row."""
+    try:
+        _get_cache().delete(_key(user_id))
+    except Exception as e:
+        logger.error(f"Error invalidating cached user {user_id}: {e}")
+
+def get_auth_state(user_id: int) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    """
+    Read the user's current token version and cached projection in one round trip.
+    Either element is None on a miss or cache error.
+    """
+    cache = _get_cache()
+    try:
+        with cache.pipeline() as pipe:
+            pipe.hget_int(TOKEN_VERSIONS_KEY, user_id)
+            pipe.get(_key(user_id))
+    except Exception as e:
+        logger.error(f"Error reading auth state for user {user_id}: {e}")
+        return None, None
+    if len(pipe.results) != 2:
+        return None, None
+    token_version, user_data = pipe.results
+    if AUTH_USER_CACHE_TTL_SECONDS <= 0:
+        user_data = None
+    return token_version, user_data
+
+def set_token_version(user_id: int, token_version: int, only_if_missing: bool = False) -> None:
+    """
+    Publish a user's token version (read from MySQL).
+    Read paths must pass only_if_missing=True: a read that raced with a bump could otherwise overwrite the new version.
+    """
+    try:
+        with _get_cache().pipeline() as pipe:
+            pipe.hset_int(TOKEN_VERSIONS_KEY, user_id, token_version, only_if_missing=only_if_missing)
+    except Exception as e:
+        logger.error(f"Error publishing token version for user {user_id}: {e}")
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Rebuild the prompt similarity indexes from the submissions table:
+
+- the near-duplicate index (MinHash signatures and LSH buckets in MySQL),
+- the similar-submission vector index (TF-IDF vectors under VECTOR_INDEX_DIR).
+
+Both are kept up to date on their own; run this after changing their settings, to
+index submissions that predate them, or to refresh the vector index's IDF weights.
+
+Usage:
+    python rebuild_prompt_index.py [--index all|duplicates|vectors] [--question 3] [--batch-size 1000]
+"""
+import argparse
+
+from promptcraft.database.db_handler import DatabaseHandler
+from promptcraft.similarity.minhash import PromptDuplicateIndex
+from promptcraft.similarity.vector_index import SubmissionVectorIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the PromptCraft prompt similarity indexes")
+    parser.add_argument("--index", choices=("all", "duplicates", "vectors"), default="all", help="Which index to rebuild")
+    parser.add_argument("--question", type=int, default=None, help="Only rebuild this question's index")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Submissions per query and transaction")
+    args = parser.parse_args()
+    db_handler = DatabaseHandler()
+    if args.index in ("all", "duplicates"):
+        total = PromptDuplicateIndex(db_handler).rebuild(args.question, args.batch_size)
+        print(f"Duplicate index: {total} submission prompts indexed.")
+    if args.index in ("all", "vectors"):
+        total = SubmissionVectorIndex(db_handler).rebuild(args.question, args.batch_size)
+        print(f"Vector index: {total} submission prompts indexed.")
+
+
+if __name__ == "__main__":
+    main()
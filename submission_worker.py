@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Background worker pool for queued LLM submissions.
+
+Each worker process runs an event loop with several concurrent consumers. A
+consumer claims a job from the Redis queue, gets the completion through the
+shared LLM client and response cache, stores it with its prompt/code features on
+the pending submission row, publishes a completion notice and acknowledges the job.
+
+Each process also keeps a heartbeat in Redis and requeues the jobs of workers
+whose heartbeat expired, so several pools (replicas) can run side by side.
+
+Usage:
+    python submission_worker.py [--processes 2] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+
+from promptcraft.database.db_handler import DatabaseHandler
+from promptcraft.evaluation.features import extract_features
+from promptcraft.leaderboard_cache import invalidate_user_stats
+from promptcraft.llm import last_llm_call, llm_response_cache
+from promptcraft.logger_config import setup_logger
+from promptcraft.submission_queue import SUBMISSION_WORKER_HEARTBEAT_SECONDS, SubmissionQueue, new_worker_id
+
+logger = setup_logger("submission_worker")
+
+SUBMISSION_WORKER_PROCESSES = int(os.getenv("SUBMISSION_WORKER_PROCESSES", 2))
+# Jobs each worker process handles at once; LLM calls are I/O bound, so this can exceed the CPU count
+SUBMISSION_WORKER_CONCURRENCY = int(os.getenv("SUBMISSION_WORKER_CONCURRENCY", 8))
+CLAIM_TIMEOUT_SECONDS = 5
+
+
+async def process_job(raw_job: bytes, queue: SubmissionQueue, db_handler: DatabaseHandler) -> None:
+    try:
+        job = json.loads(raw_job)
+    except json.JSONDecodeError:
+        logger.error(f"Dropping malformed submission job: {raw_job[:100]!r}")
+        queue.ack(raw_job)
+        return
+
+    submission_id = job["submission_id"]
+    last_llm_call.set(None) # Consumers handle jobs one after another in the same context
+    try:
+        generated_code, from_cache = await llm_response_cache.complete_or_simulate(
+            job["prompt"], question_id=job["question_id"], user_id=job.get("user_id"))
+        # DB calls are blocking; keep them off the loop so other consumers keep streaming
+        llm_call = last_llm_call.get()
+        question = await asyncio.to_thread(db_handler.get_question_details, job["question_id"])
+        # Without the question, criteria and language would score as missing under the current FEATURE_VERSION
+        # and the backfill would never redo them; store no features and leave the row to the backfill instead
+        features = extract_features(job["prompt"], generated_code, question).as_dict() if question else None
+        saved = await asyncio.to_thread(db_handler.complete_submission, submission_id, generated_code,
+                                        llm_usage=llm_call.as_dict() if llm_call else None, features=features)
+        if not saved:
+            # Leave the job in the processing list so it is retried when the pool restarts
+            logger.error(f"Could not store result for submission {submission_id}.")
+            return
+        if job.get("user_id") is not None:
+            await asyncio.to_thread(invalidate_user_stats, job["user_id"])
+        queue.publish_result(submission_id, {"status": "completed", "cached": from_cache})
+        logger.info(f"Submission {submission_id} completed (cached: {from_cache}).")
+    except Exception as e:
+        logger.error(f"Submission job {submission_id} failed: {e}", exc_info=True)
+        await asyncio.to_thread(db_handler.complete_submission, submission_id, None, "failed", str(e)[:500])
+        queue.publish_result(submission_id, {"status": "failed"})
+    queue.ack(raw_job)
+
+
+async def consume(worker_name: str, queue: SubmissionQueue, stop: asyncio.Event) -> None:
+    db_handler = DatabaseHandler() # One per consumer: DatabaseHandler holds a single connection
+    while not stop.is_set():
+        raw_job = await asyncio.to_thread(queue.claim, CLAIM_TIMEOUT_SECONDS)
+        if raw_job is not None:
+            await process_job(raw_job, queue, db_handler)
+    logger.info(f"{worker_name} stopped.")
+
+
+async def run_worker(concurrency: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    queue = SubmissionQueue(worker_id=new_worker_id())
+    await asyncio.to_thread(queue.heartbeat) # Registered before the first claim, so its jobs can be recovered
+    name = multiprocessing.current_process().name
+    logger.info(f"{name} started with {concurrency} consumers (worker ID {queue.worker_id}).")
+    heartbeat = asyncio.create_task(keep_alive(queue, stop))
+    await asyncio.gather(*(consume(f"{name}/{i}", queue, stop) for i in range(concurrency)))
+    await heartbeat
+    await asyncio.to_thread(queue.unregister)
+
+
+async def keep_alive(queue: SubmissionQueue, stop: asyncio.Event) -> None:
+    """Refresh this worker's heartbeat, and recover the jobs of workers that stopped refreshing theirs."""
+    while not stop.is_set():
+        await asyncio.to_thread(queue.heartbeat)
+        await asyncio.to_thread(queue.requeue_orphaned)
+        try:
+            await asyncio.wait_for(stop.wait(), SUBMISSION_WORKER_HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _worker_main(concurrency: int) -> None:
+    asyncio.run(run_worker(concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PromptCraft submission worker pool")
+    parser.add_argument("--processes", "-p", type=int, default=SUBMISSION_WORKER_PROCESSES, help="Worker processes")
+    parser.add_argument("--concurrency", "-c", type=int, default=SUBMISSION_WORKER_CONCURRENCY, help="Concurrent jobs per process")
+    args = parser.parse_args()
+
+    # Jobs of workers that died since the last run (other pools also do this while they run)
+    SubmissionQueue().requeue_orphaned()
+
+    processes = [
+        multiprocessing.Process(target=_worker_main, args=(args.concurrency,), name=f"submission-worker-{i}")
+        for i in range(max(1, args.processes))
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import sys
 import os
+import tempfile
 import pytest
 from fastapi.testclient import TestClient
 import mysql.connector
@@ -13,6 +14,13 @@ project_root = os.path.abspath(os.path.join(tests_dir, os.pardir))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+# Startup side effects that need live services are disabled for tests
+os.environ.setdefault("QUESTION_CACHE_WARMUP", "false")
+# Integration tests log in repeatedly from one client address
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# Saving a submission schedules a vector index sync; keep its files out of the working tree
+os.environ.setdefault("VECTOR_INDEX_DIR", os.path.join(tempfile.gettempdir(), "promptcraft-test-vector-index"))
+
 # Now we can import from the application
 from api.main import app # Your FastAPI app instance
 from promptcraft.database.db_handler import DatabaseHandler # To interact with DB for setup/teardown
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from promptcraft import auth_utils
+from promptcraft.auth_utils import _TokenPayloadCache
+
+
+def test_decode_token_uses_cache_and_returns_copies():
+    auth_utils.token_payload_cache.clear()
+    token = auth_utils.create_access_token({"sub": "42"})
+    first = auth_utils.decode_token(token)
+    first["sub"] = "tampered"
+    second = auth_utils.decode_token(token)
+    assert second["sub"] == "42"
+    assert auth_utils.token_payload_cache.stats()["hits"] >= 1
+
+
+def test_invalid_and_expired_tokens_are_not_served_from_cache():
+    expired = auth_utils.create_access_token({"sub": "1"}, expires_delta=timedelta(seconds=-1))
+    assert auth_utils.decode_token(expired) is None
+    assert auth_utils.decode_token("not-a-jwt") is None
+
+    cache = _TokenPayloadCache(max_size=10)
+    cache.put(b"k", {"sub": "1", "exp": 1})  # Already expired
+    assert cache.get(b"k") is None
+
+
+def test_lru_is_bounded():
+    cache = _TokenPayloadCache(max_size=2)
+    far_future = 4_000_000_000
+    for key in (b"a", b"b"):
+        cache.put(key, {"exp": far_future})
+    cache.get(b"a")  # a is now most recently used
+    cache.put(b"c", {"exp": far_future})
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") is not None and cache.get(b"c") is not None
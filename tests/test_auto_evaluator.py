@@ -0,0 +1,189 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from promptcraft.database.db_handler import DatabaseHandler
+from promptcraft.evaluation import sandbox
+from promptcraft.evaluation.auto_evaluator import AutoEvaluator
+from promptcraft.evaluation.sandbox import SandboxLimits, extract_code, run_tests
+
+needs_isolation = pytest.mark.skipif(sandbox.isolation_error() is not None, reason="sandbox isolation needs root on Linux")
+
+
+@pytest.fixture(autouse=True)
+def sandbox_mode(monkeypatch):
+    # Hosts that cannot isolate (not root) still exercise the process split
+    if sandbox.isolation_error() is not None:
+        monkeypatch.setattr(sandbox, "SANDBOX_ALLOW_UNISOLATED", True)
+
+HARNESS = """
+def test_base_cases():
+    assert factorial(0) == 1
+
+def test_larger_values():
+    assert factorial(5) == 120
+"""
+
+ANSWER = """Here is the function:
+
+```python
+def factorial(n):
+    return 1 if n <= 1 else n * factorial(n - 1)
+```
+
+```bash
+python factorial.py
+```
+"""
+
+
+def test_extract_code_keeps_python_blocks_only():
+    assert extract_code(ANSWER).startswith("def factorial(n):")
+    assert "python factorial.py" not in extract_code(ANSWER)
+    assert extract_code("x = 1") == "x = 1"
+    assert extract_code(None) == ""
+
+
+def test_run_tests_reports_each_test():
+    passing = run_tests(extract_code(ANSWER), HARNESS)
+    assert passing["status"] == "passed" and passing["tests_passed"] == 2 and passing["pass_rate"] == 1.0
+
+    failing = run_tests("def factorial(n):\n    print('noise')\n    return max(n, 1)", HARNESS)
+    assert failing["status"] == "failed" and failing["tests_passed"] == 1 and failing["tests_total"] == 2
+    assert failing["tests"][1]["error"].startswith("AssertionError")
+
+
+def test_run_tests_enforces_limits():
+    limits = SandboxLimits(cpu_seconds=1, wall_seconds=5, memory_mb=256)
+    spinning = run_tests("def factorial(n):\n    while True:\n        pass", HARNESS, limits)
+    assert spinning["status"] == "timeout"
+
+    hungry = run_tests("def factorial(n):\n    return len(bytearray(1024 ** 3))", HARNESS, limits)
+    assert hungry["status"] == "failed" and "MemoryError" in hungry["tests"][0]["error"]
+
+    broken = run_tests("def factorial(n) return 1", HARNESS, limits)
+    assert broken["status"] == "error" and broken["error"].startswith("Solution failed to load: SyntaxError")
+
+
+def test_run_tests_proxies_objects_the_solution_returns():
+    code = "class Stack:\n    def __init__(self):\n        self.items = []\n    def push(self, x):\n        self.items.append(x)\n"
+    harness = "def test_stack():\n    s = Stack()\n    s.push(3)\n    assert s.items == [3]\n"
+    assert run_tests(code, harness)["status"] == "passed"
+
+
+def test_solution_cannot_forge_the_report():
+    harness = "def test_value():\n    assert answer() == 42\n"
+    forging = """
+import os, sys
+report = {"stage": "tests", "error": None, "tests": [{"name": "test_value", "passed": True, "error": None}]}
+main = sys.modules.get("__main__")
+if hasattr(main, "report"):
+    main.report(report)
+for fd in range(3, 64):
+    try:
+        os.write(fd, (repr(report).replace("'", '"').replace("None", "null").replace("True", "true") + "\\n").encode())
+    except OSError:
+        pass
+def answer():
+    return 0
+"""
+    result = run_tests(forging, harness)
+    assert result["status"] in ("failed", "error") and result["pass_rate"] == 0.0
+
+
+@needs_isolation
+def test_worker_is_isolated_from_the_host():
+    harness = "def test_probe():\n    assert probe() == 'isolated'\n"
+    code = """
+import os
+def probe():
+    try:
+        __import__("socket")
+        return "network"
+    except ImportError:
+        pass
+    if os.path.exists("/etc/passwd"):
+        return "host files"
+    if os.getuid() == 0:
+        return "root"
+    try:
+        pid = os.fork()
+    except OSError:
+        return "isolated"
+    if pid == 0:
+        os._exit(0)
+    return "fork"
+"""
+    result = run_tests(code, harness)
+    assert result["status"] == "passed", result
+
+
+def test_unisolated_runs_fail_closed(monkeypatch):
+    monkeypatch.setattr(sandbox, "SANDBOX_ALLOW_UNISOLATED", False)
+    monkeypatch.setattr(sandbox, "isolation_error", lambda: "Sandbox isolation needs root.")
+    with pytest.raises(sandbox.SandboxUnavailableException):
+        AutoEvaluator(99, "autograder", evaluator=StubEvaluator([], {})).run()
+
+
+class StubEvaluator:
+    """Stands in for Evaluator: a DB handler with two pages of submissions, and recorded write-backs."""
+
+    def __init__(self, submissions, harnesses):
+        self.saved = []
+
+        class DB:
+            def get_unevaluated_submissions(self, evaluator_user_id, after_id=0, limit=500, harness_languages=None):
+                self.harness_languages = harness_languages
+                return [s for s in submissions if s["id"] > after_id][:limit]
+
+            def get_question_test_harnesses(self, question_ids):
+                return {qid: harnesses[qid] for qid in set(question_ids) if qid in harnesses}
+
+        self.db_handler = DB()
+
+    def create_evaluation_structured(self, **kwargs):
+        self.saved.append(kwargs)
+        return len(self.saved)
+
+
+def test_batch_run_scores_and_writes_back():
+    submissions = [
+        {"id": 1, "user_id": 7, "username": "ann", "question_id": 1, "prompt": "p", "generated_code": ANSWER},
+        {"id": 2, "user_id": 8, "username": "bob", "question_id": 1, "prompt": "p", "generated_code": "def factorial(n): return 1"},
+        {"id": 3, "user_id": 8, "username": "bob", "question_id": 2, "prompt": "p", "generated_code": "SELECT 1"},
+    ]
+    harnesses = {1: {"id": 1, "programming_language": "Python", "test_harness": HARNESS},
+                 2: {"id": 2, "programming_language": "SQL", "test_harness": "-- not runnable"}}
+    evaluator = StubEvaluator(submissions, harnesses)
+    stats = AutoEvaluator(99, "autograder", evaluator=evaluator, processes=2).run(batch_size=2)
+
+    assert stats["evaluated"] == 2 and stats["skipped"] == 1
+    assert evaluator.db_handler.harness_languages == ["python"] # Unscorable questions are filtered by the query
+    assert stats["by_status"] == {"passed": 1, "failed": 1}
+    saved = {e["submission_id"]: e for e in evaluator.saved}
+    assert saved[1]["overall_score"] == 100.0 and saved[2]["overall_score"] == 50.0
+    assert saved[1]["candidate_id"] == "user_7_ann" and saved[1]["evaluator_user_id"] == 99
+    assert saved[2]["scores"]["tests_total"] == 2
+
+
+def test_candidate_query_leaves_out_questions_without_a_runnable_harness(monkeypatch):
+    executed = []
+
+    class Cursor:
+        def execute(self, query, params=()):
+            executed.append((" ".join(query.split()), params))
+
+        def fetchall(self):
+            return []
+
+        def close(self):
+            pass
+
+    handler = DatabaseHandler()
+    monkeypatch.setattr(handler, "connect", lambda: SimpleNamespace(cursor=lambda dictionary=False: Cursor()))
+    monkeypatch.setattr(handler, "close", lambda: None)
+    handler.get_unevaluated_submissions(99, after_id=10, limit=5, harness_languages=["python"])
+    query, params = executed[0]
+    assert "q.test_harness IS NOT NULL AND LOWER(COALESCE(q.programming_language, 'python')) IN (%s)" in query
+    assert params == ("python", 99, 10, 5)
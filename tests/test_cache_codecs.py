@@ -0,0 +1,52 @@
+import json
+import pytest
+
+from promptcraft.cache_codecs import (
+    CacheCodec, CodecError, MAGIC,
+    COMPRESSION_NONE, COMPRESSION_ZLIB, SERIALIZER_JSON, SERIALIZER_ORJSON, orjson,
+)
+
+SAMPLE = {"id": 1, "description": "Write a factorial function " * 100, "evaluation_criteria": ["a", "b"]}
+
+def test_roundtrip_json_without_compression():
+    codec = CacheCodec(serializer="json", compression="none")
+    encoded = codec.encode(SAMPLE)
+    assert encoded[0] == MAGIC
+    assert encoded[1] == SERIALIZER_JSON
+    assert encoded[2] == COMPRESSION_NONE
+    assert codec.decode(encoded) == SAMPLE
+
+def test_large_values_are_compressed_small_values_are_not():
+    codec = CacheCodec(serializer="json", compression="zlib", compress_min_bytes=256)
+    large = codec.encode(SAMPLE)
+    small = codec.encode({"id": 1})
+    assert large[2] == COMPRESSION_ZLIB
+    assert len(large) < len(json.dumps(SAMPLE))
+    assert small[2] == COMPRESSION_NONE
+    assert codec.decode(large) == SAMPLE
+    assert codec.decode(small) == {"id": 1}
+
+def test_legacy_json_values_still_decode():
+    codec = CacheCodec()
+    legacy = json.dumps(SAMPLE)
+    assert codec.decode(legacy) == SAMPLE
+    assert codec.decode(legacy.encode("utf-8")) == SAMPLE
+    assert codec.decode(None) is None
+
+@pytest.mark.skipif(orjson is None, reason="orjson not installed")
+def test_mixed_formats_decode_with_any_codec():
+    orjson_codec = CacheCodec(serializer="orjson", compression="zlib", compress_min_bytes=0)
+    json_codec = CacheCodec(serializer="json", compression="none")
+    encoded = orjson_codec.encode(SAMPLE)
+    assert encoded[1] == SERIALIZER_ORJSON
+    # A worker configured with a different codec can still read the value
+    assert json_codec.decode(encoded) == SAMPLE
+
+def test_unserializable_and_corrupt_values_raise_codec_error():
+    codec = CacheCodec(serializer="json", compression="none")
+    with pytest.raises(CodecError):
+        codec.encode({"obj": object()})
+    with pytest.raises(CodecError):
+        codec.decode(bytes((MAGIC, 99, 0)) + b"{}")
+    with pytest.raises(CodecError):
+        codec.decode(b"not json")
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import submissions
+from api.routers.auth import get_current_active_user
+from promptcraft.exceptions import IdempotencyConflictException
+from promptcraft.idempotency import IdempotencyStore
+from promptcraft.schemas.auth_schemas import UserResponse
+
+USER = UserResponse(id=8, email="i@example.com", username="idem", is_active=True, is_verified=True)
+
+
+class DictCache:
+    """Stands in for RedisCache: the calls IdempotencyStore makes, over a dict."""
+    r = object()
+
+    def __init__(self):
+        self.data = {}
+
+    def set_if_absent(self, key, value, ttl_seconds=300):
+        if key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    def get_many(self, keys):
+        return {k: self.data[k] for k in keys if k in self.data}
+
+    def set_many(self, mapping, ttl_seconds=300):
+        self.data.update(mapping)
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+        return True
+
+
+def test_duplicate_waits_for_the_original_response():
+    store = IdempotencyStore(redis_cache=DictCache())
+
+    async def scenario():
+        assert await store.reserve_or_replay("s", "k", "fp") is None # Owner
+        duplicate = asyncio.create_task(store.reserve_or_replay("s", "k", "fp"))
+        await asyncio.sleep(0.05)
+        assert not duplicate.done()
+        store.complete("s", "k", "fp", 201, {"submission_id": 1})
+        return await duplicate
+
+    assert asyncio.run(scenario()) == {"status_code": 201, "body": {"submission_id": 1}}
+    assert store.stats()["waited"] == 1 and store.stats()["replayed"] == 1
+
+
+def test_key_reused_for_another_request_conflicts():
+    store = IdempotencyStore(redis_cache=DictCache())
+    asyncio.run(store.reserve_or_replay("s", "k", "fp"))
+    with pytest.raises(IdempotencyConflictException):
+        asyncio.run(store.reserve_or_replay("s", "k", "other"))
+
+
+def test_released_key_can_be_retried():
+    store = IdempotencyStore(redis_cache=DictCache())
+    asyncio.run(store.reserve_or_replay("s", "k", "fp"))
+    store.release("s", "k")
+    assert asyncio.run(store.reserve_or_replay("s", "k", "fp")) is None
+
+
+def test_replayed_submission_skips_llm_and_db(monkeypatch):
+    llm_calls, rows = [], []
+
+    async def fake_complete(prompt, **kwargs):
+        llm_calls.append(prompt)
+        return "code", False
+
+    app.dependency_overrides[get_current_active_user] = lambda: USER
+    monkeypatch.setattr(submissions, "idempotency_store", IdempotencyStore(redis_cache=DictCache()))
+    monkeypatch.setattr(submissions.llm_response_cache, "complete_or_simulate", fake_complete)
+    monkeypatch.setattr(submissions.db_handler, "get_question_details", lambda task_id: {"id": task_id})
+    monkeypatch.setattr(submissions.db_handler, "create_submission", lambda **kwargs: rows.append(kwargs) or 41)
+    try:
+        with TestClient(app) as client:
+            body = {"task_id": 1, "prompt": "p"}
+            first = client.post("/api/v1/submissions", json=body, headers={"Idempotency-Key": "abc"})
+            replay = client.post("/api/v1/submissions", json=body, headers={"Idempotency-Key": "abc"})
+            conflict = client.post("/api/v1/submissions", json={"task_id": 1, "prompt": "changed"},
+                                   headers={"Idempotency-Key": "abc"})
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
+
+    assert first.status_code == replay.status_code == 201
+    assert replay.json() == first.json() and replay.headers["idempotent-replayed"] == "true"
+    assert conflict.status_code == 409
+    assert len(llm_calls) == 1 and len(rows) == 1
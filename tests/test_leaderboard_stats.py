@@ -0,0 +1,97 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import leaderboard
+from api.routers.auth import get_current_active_user
+from promptcraft import leaderboard_cache
+from promptcraft.schemas.auth_schemas import UserResponse
+
+USER = UserResponse(id=1, email="a@example.com", username="alice", is_active=True, is_verified=True)
+STATS_ROW = {"user_id": 1, "username": "alice", "total_submissions": 4, "completed_questions": 2, "avg_score": 81.25,
+             "best_score": 95.0, "recent_submissions": 3, "streak_days": 2, "user_rank": 2, "total_users": 4}
+
+
+class DictCache:
+    def __init__(self):
+        self.values, self.ttls = {}, {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ttl_seconds=300):
+        self.values[key], self.ttls[key] = value, ttl_seconds
+        return True
+
+    def delete(self, key):
+        self.values.pop(key, None)
+        return True
+
+
+class FakeCursor:
+    """Answers the stats query for user 1 and records every statement."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = None
+
+    def execute(self, query, params=()):
+        self.db.queries.append((query, params))
+        self.result = STATS_ROW if params == (1,) else None
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeDB:
+    def __init__(self):
+        self.queries = []
+
+    def connect(self):
+        return self
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def env(monkeypatch):
+    db, cache = FakeDB(), DictCache()
+    monkeypatch.setattr(leaderboard, "db_handler", db)
+    monkeypatch.setattr(leaderboard, "redis_cache", cache)
+    monkeypatch.setattr(leaderboard_cache, "_redis_cache", cache)
+    app.dependency_overrides[get_current_active_user] = lambda: USER
+    yield db, cache
+    app.dependency_overrides.pop(get_current_active_user, None)
+
+
+def test_user_stats_use_one_query_and_are_cached(env):
+    db, cache = env
+    stats = leaderboard._load_user_stats(1)
+    assert len(db.queries) == 1 # Stats, streak, rank and user count in one statement
+    assert (stats.avg_score, stats.rank, stats.streak_days, stats.percentile) == (81.2, 2, 2, 75.0)
+    assert cache.ttls[leaderboard_cache.stats_key(1)] == leaderboard_cache.STATS_CACHE_TTL_SECONDS
+
+    assert leaderboard._load_user_stats(1) == stats
+    assert len(db.queries) == 1 # Served from the cache
+
+
+def test_stats_endpoint_returns_404_for_unknown_user(env):
+    with TestClient(app) as client:
+        assert client.get("/api/v1/leaderboard/stats/1").json()["username"] == "alice"
+        assert client.get("/api/v1/leaderboard/stats/3").status_code == 404
+
+
+def test_invalidation_drops_cached_stats(env):
+    db, cache = env
+    leaderboard._load_user_stats(1)
+    leaderboard_cache.invalidate_user_stats(1)
+    assert cache.values == {}
+    leaderboard._load_user_stats(1)
+    assert len(db.queries) == 2
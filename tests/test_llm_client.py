@@ -0,0 +1,143 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from promptcraft.exceptions import LLMConnectionException
+from promptcraft.llm import client as llm_client_module
+from promptcraft.llm import LLMClient
+
+
+def _completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class ScriptedCompletions:
+    """Stands in for AsyncOpenAI.chat.completions: raises or returns the scripted outcomes in order."""
+    def __init__(self, outcomes, delay=0.0, delays=()):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.delays = list(delays) # Per-call delays, used before falling back to `delay`
+        self.calls = 0
+        self.active = 0
+        self.peak_active = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            await asyncio.sleep(self.delays.pop(0) if self.delays else self.delay)
+            outcome = self.outcomes.pop(0) if self.outcomes else _completion("ok")
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        finally:
+            self.active -= 1
+
+
+def _client(completions, monkeypatch, **kwargs):
+    client = LLMClient(api_key="test-key", **kwargs)
+    real_ensure = client._ensure_loop_state
+
+    def ensure_with_stub():
+        real_ensure()
+        client._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(client, "_ensure_loop_state", ensure_with_stub)
+    monkeypatch.setattr(llm_client_module, "LLM_RETRY_BASE_SECONDS", 0.001)
+    return client
+
+
+def _timeout_error():
+    return openai.APITimeoutError(request=httpx.Request("POST", "https://llm.invalid/v1/chat/completions"))
+
+
+def test_retries_transient_errors(monkeypatch):
+    completions = ScriptedCompletions([_timeout_error(), _completion("def f(): pass")])
+    client = _client(completions, monkeypatch, max_retries=2)
+    assert asyncio.run(client.complete("prompt")) == "def f(): pass"
+    assert completions.calls == 2 and client.retries == 1
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    completions = ScriptedCompletions([_timeout_error()] * 3)
+    client = _client(completions, monkeypatch, max_retries=1)
+    with pytest.raises(LLMConnectionException):
+        asyncio.run(client.complete("prompt"))
+    assert completions.calls == 2
+    # complete_or_simulate degrades to the canned answer instead
+    completions.outcomes = [_timeout_error()] * 2
+    assert "Simulated" in client.complete_sync("prompt")
+
+
+def test_concurrency_is_capped(monkeypatch):
+    completions = ScriptedCompletions([], delay=0.01)
+    client = _client(completions, monkeypatch, max_concurrency=2)
+
+    async def burst():
+        await asyncio.gather(*(client.complete(f"p{i}") for i in range(6)))
+
+    asyncio.run(burst())
+    assert completions.peak_active == 2
+
+
+def test_hedge_wins_against_slow_attempt(monkeypatch):
+    # Outcomes are handed out as calls finish: the hedge finishes first, the original never does
+    completions = ScriptedCompletions([_completion("fast")], delays=[1.0, 0.0])
+    client = _client(completions, monkeypatch, hedge_enabled=True)
+    monkeypatch.setattr(llm_client_module, "LLM_HEDGE_MIN_SAMPLES", 1)
+    monkeypatch.setattr(llm_client_module, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.01)
+    client.latencies.add(0.02)
+
+    async def call():
+        started = time.monotonic()
+        text = await client.complete("prompt")
+        await asyncio.sleep(0) # Let the cancelled original unwind
+        return text, time.monotonic() - started
+
+    text, elapsed = asyncio.run(call())
+    assert text == "fast" and elapsed < 0.5
+    assert completions.calls == 2 and completions.active == 0 # The slow original was cancelled
+    hedging = client.stats()["hedging"]
+    assert hedging["sent"] == 1 and hedging["won"] == 1
+
+
+def test_deadline_bounds_the_call(monkeypatch):
+    completions = ScriptedCompletions([], delay=1.0)
+    client = _client(completions, monkeypatch)
+
+    async def call():
+        started = time.monotonic()
+        with pytest.raises(LLMConnectionException):
+            await client.complete("prompt", deadline=time.monotonic() + 0.05)
+        return time.monotonic() - started
+
+    assert asyncio.run(call()) < 0.5
+    assert client.deadline_exceeded == 1
+    # An already expired deadline does not reach the provider at all
+    with pytest.raises(LLMConnectionException):
+        asyncio.run(client.complete("prompt", deadline=time.monotonic() - 1))
+    assert completions.calls == 1
+
+
+def test_records_model_latency_and_usage(monkeypatch):
+    completion = _completion("ok")
+    completion.model = "gpt-test-0613"
+    completion.usage = SimpleNamespace(prompt_tokens=12, completion_tokens=30, total_tokens=42)
+    client = _client(ScriptedCompletions([completion]), monkeypatch)
+
+    async def call():
+        await client.complete("prompt")
+        return llm_client_module.last_llm_call.get()
+
+    info = asyncio.run(call())
+    assert info.model == "gpt-test-0613" and info.latency_ms is not None
+    assert (info.prompt_tokens, info.completion_tokens, info.cached) == (12, 30, False)
+
+
+def test_simulates_without_api_key():
+    client = LLMClient(api_key="")
+    assert "factorial" in client.complete_sync("Write a factorial function")
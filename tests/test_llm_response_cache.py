@@ -0,0 +1,111 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers.auth import get_current_admin_user
+from promptcraft.exceptions import LLMConnectionException
+from promptcraft.llm import response_cache
+from promptcraft.llm.response_cache import LLMResponseCache, make_cache_key
+from promptcraft.schemas.auth_schemas import UserResponse
+
+
+class StubLLM:
+    enabled = True
+    model = "test-model"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+
+    def model_for(self, question_id=None):
+        return self.model
+
+    async def complete(self, prompt, model=None, user_id=None, deadline=None, question_id=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise LLMConnectionException()
+        return f"answer to {prompt.strip()}"
+
+    async def complete_or_simulate(self, prompt, model=None, user_id=None, deadline=None, question_id=None):
+        return await self.complete(prompt, model=model, user_id=user_id)
+
+
+class NoRedis:
+    r = None
+
+
+def test_key_normalizes_whitespace_but_not_model():
+    assert make_cache_key("m", "Write  a\nfunction ") == make_cache_key("m", "Write a function")
+    assert make_cache_key("m", "Write a function") != make_cache_key("other", "Write a function")
+
+
+def test_repeat_prompt_served_from_local_fallback():
+    llm = StubLLM()
+    cache = LLMResponseCache(llm_client=llm, redis_cache=NoRedis())
+    first, cached_first = asyncio.run(cache.complete_or_simulate("sort an array", question_id=1))
+    second, cached_second = asyncio.run(cache.complete_or_simulate("sort  an array ", question_id=1))
+    assert first == second and not cached_first and cached_second
+    assert llm.calls == 1
+    assert cache.stats()["local_hits"] == 1
+
+
+def test_concurrent_misses_share_one_call():
+    llm = StubLLM()
+    cache = LLMResponseCache(llm_client=llm, redis_cache=NoRedis())
+
+    async def burst():
+        return await asyncio.gather(*(cache.complete_or_simulate("same prompt") for _ in range(5)))
+
+    results = asyncio.run(burst())
+    assert len({text for text, _ in results}) == 1
+    assert llm.calls == 1 and cache.stats()["coalesced"] == 4
+
+
+def test_failures_and_opted_out_questions_are_not_cached(monkeypatch):
+    failing = StubLLM(fail=True)
+    cache = LLMResponseCache(llm_client=failing, redis_cache=NoRedis())
+    text, _ = asyncio.run(cache.complete_or_simulate("sql top 5"))
+    assert "SELECT" in text  # Simulated fallback
+    assert cache.stats()["local_entries"] == 0
+
+    monkeypatch.setattr(response_cache, "LLM_CACHE_DISABLED_QUESTION_IDS", {9})
+    llm = StubLLM()
+    cache = LLMResponseCache(llm_client=llm, redis_cache=NoRedis())
+    for _ in range(2):
+        asyncio.run(cache.complete_or_simulate("p", question_id=9))
+    assert llm.calls == 2 and cache.stats()["bypassed"] == 2
+
+
+class FailingOverLLM(StubLLM):
+    """The question's model fails and the router answers from another provider's model."""
+
+    async def complete(self, prompt, model=None, user_id=None, deadline=None, question_id=None):
+        text = await super().complete(prompt, model=model, user_id=user_id)
+        response_cache.answered_model.set("backup-model")
+        return text
+
+
+def test_failover_answers_are_keyed_by_the_answering_model():
+    llm = FailingOverLLM()
+    cache = LLMResponseCache(llm_client=llm, redis_cache=NoRedis())
+    asyncio.run(cache.complete_or_simulate("sort an array", question_id=1))
+    _, cached = asyncio.run(cache.complete_or_simulate("sort an array", question_id=1))
+    assert not cached and llm.calls == 2
+    assert cache.get_cached("sort an array", question_id=1) is None
+    assert cache.get_cached("sort an array", question_id=1, model="backup-model") == "answer to sort an array"
+
+    cache.put("stream prompt", "streamed", question_id=1, model="backup-model")
+    assert cache.get_cached("stream prompt", question_id=1) is None
+
+
+def test_metrics_require_an_admin():
+    with TestClient(app) as client:
+        assert client.get("/metrics").status_code == 401
+        app.dependency_overrides[get_current_admin_user] = lambda: UserResponse(
+            id=1, email="admin@example.com", username="admin", is_active=True, is_verified=True)
+        try:
+            assert "llm_response_cache" in client.get("/metrics").json()
+        finally:
+            app.dependency_overrides.pop(get_current_admin_user, None)
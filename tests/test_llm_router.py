@@ -0,0 +1,129 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from promptcraft.exceptions import LLMConnectionException, LLMProcessingException
+from promptcraft.llm.client import _LatencyWindow
+from promptcraft.llm.router import LLMProvider, LLMRouter, answered_model, parse_question_routes
+
+
+class FakeClient:
+    """Stands in for LLMClient: answers or fails, and records the models it was asked for."""
+    enabled = True
+
+    timeout_seconds = 30.0
+
+    def __init__(self, name, fail=False, latencies=(), hang=False):
+        self.model = f"{name}-model"
+        self.fail = fail
+        self.hang = hang
+        self.latencies = _LatencyWindow()
+        for seconds in latencies:
+            self.latencies.add(seconds)
+        self.models = []
+
+    async def complete(self, prompt, model=None, timeout_seconds=None, user_id=None, deadline=None):
+        self.models.append(model)
+        if self.hang:
+            # Like LLMClient: gives up when its deadline passes
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()) if deadline is not None else 3600)
+            raise LLMConnectionException()
+        if self.fail:
+            raise LLMConnectionException()
+        return f"{model}: {prompt}"
+
+    async def stream(self, prompt, model=None, timeout_seconds=None, user_id=None, deadline=None):
+        self.models.append(model)
+        if self.fail:
+            raise LLMProcessingException()
+        for chunk in (model, ": ", prompt):
+            yield chunk
+
+    def stats(self):
+        return {}
+
+    async def aclose(self):
+        pass
+
+
+def _router(*clients, routes=None):
+    providers = [LLMProvider(name, client) for name, client in clients]
+    return LLMRouter(providers, routes, explore_rate=0.0, rng=random.Random(0))
+
+
+def test_fails_over_to_next_provider():
+    primary, backup = FakeClient("a", fail=True), FakeClient("b")
+    router = _router(("a", primary), ("b", backup))
+    assert asyncio.run(router.complete("p")) == "b-model: p"
+    providers = router.stats()["providers"]
+    assert router.stats()["failovers"] == 1
+    assert providers["a"]["failures"] == 1 and providers["b"]["failovers_to"] == 1
+
+
+def test_simulates_only_when_every_provider_fails():
+    router = _router(("a", FakeClient("a", fail=True)), ("b", FakeClient("b", fail=True)))
+    with pytest.raises(LLMConnectionException):
+        asyncio.run(router.complete("p"))
+    assert "Simulated" in asyncio.run(router.complete_or_simulate("p"))
+    assert router.stats()["exhausted"] == 2
+    assert "Simulated" in router.complete_sync("p") # Same fallback and sync bridge as LLMClient
+
+
+def test_prefers_lowest_p95_latency(monkeypatch):
+    monkeypatch.setattr("promptcraft.llm.router.LLM_ROUTER_MIN_SAMPLES", 5)
+    slow, fast, unknown = FakeClient("slow", latencies=[2.0] * 5), FakeClient("fast", latencies=[0.3] * 5), FakeClient("new")
+    router = _router(("slow", slow), ("new", unknown), ("fast", fast))
+    assert [p.name for p, _ in router.plan()] == ["fast", "slow", "new"]
+    asyncio.run(router.complete("p"))
+    assert router.stats()["providers"]["fast"]["chosen_first"] == 1
+
+
+def test_failing_provider_cools_down(monkeypatch):
+    monkeypatch.setattr("promptcraft.llm.router.LLM_ROUTER_FAILURE_THRESHOLD", 2)
+    router = _router(("a", FakeClient("a", fail=True)), ("b", FakeClient("b")))
+    for _ in range(2):
+        asyncio.run(router.complete("p"))
+    assert [p.name for p, _ in router.plan()] == ["b", "a"]
+    assert router.stats()["providers"]["a"]["cooling_down"] is True
+
+
+def test_question_routes_pin_provider_and_model():
+    a, b = FakeClient("a"), FakeClient("b")
+    routes = parse_question_routes("3=b:llama3:8b, 4=gpt-4o, bad, 5=b", ["a", "b"])
+    assert routes == {3: ("b", "llama3:8b"), 4: (None, "gpt-4o"), 5: ("b", None)}
+    router = _router(("a", a), ("b", b), routes=routes)
+    assert asyncio.run(router.complete("p", question_id=3)) == "llama3:8b: p"
+    assert router.model_for(3) == "llama3:8b" and router.model_for(4) == "gpt-4o" and router.model_for(5) == "b-model"
+    assert router.model_for(9) == "a-model"
+    assert router.plan(4)[0] == (router.providers[0], "gpt-4o")
+
+
+def test_stream_fails_over_before_first_token():
+    router = _router(("a", FakeClient("a", fail=True)), ("b", FakeClient("b")))
+
+    async def collect():
+        return [chunk async for chunk in router.stream("p")]
+
+    assert "".join(asyncio.run(collect())) == "b-model: p"
+    assert router.stats()["providers"]["b"]["successes"] == 1
+
+
+def test_records_the_model_that_answered():
+    router = _router(("a", FakeClient("a", fail=True)), ("b", FakeClient("b")))
+
+    async def call():
+        await router.complete("p")
+        return answered_model.get()
+
+    assert asyncio.run(call()) == "b-model"
+
+
+def test_hanging_primary_leaves_time_to_fail_over():
+    primary, backup = FakeClient("a", hang=True), FakeClient("b")
+    router = _router(("a", primary), ("b", backup))
+    started = time.monotonic()
+    assert asyncio.run(router.complete("p", deadline=started + 1.0)) == "b-model: p"
+    assert time.monotonic() - started < 0.9  # The primary got half the budget, not all of it
+    assert router.stats()["failovers"] == 1
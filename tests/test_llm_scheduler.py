@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from promptcraft.llm.scheduler import FairScheduler, last_queue_wait_ms
+
+
+async def _run(scheduler, user, order, cost=10, hold=0.01):
+    async with scheduler.slot(user, cost):
+        order.append(user)
+        await asyncio.sleep(hold)
+
+
+def test_backlogged_user_does_not_starve_others():
+    scheduler = FairScheduler(max_concurrency=1, per_user_concurrency=1)
+    order = []
+
+    async def scenario():
+        spam = [asyncio.create_task(_run(scheduler, "spammer", order)) for _ in range(5)]
+        await asyncio.sleep(0) # The spammer's backlog is queued first
+        other = asyncio.create_task(_run(scheduler, "other", order))
+        await asyncio.gather(*spam, other)
+
+    asyncio.run(scenario())
+    # FIFO would run "other" last; fair queueing lets it in right after the spammer's first call
+    assert order.index("other") <= 2
+
+
+def test_per_user_concurrency_cap():
+    scheduler = FairScheduler(max_concurrency=8, per_user_concurrency=2)
+    active = {"now": 0, "peak": 0}
+
+    async def call():
+        async with scheduler.slot("u1", 10):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+
+    async def scenario():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert active["peak"] == 2
+    assert scheduler.stats()["granted"] == 6 and scheduler.stats()["in_flight"] == 0
+
+
+def test_token_budget_delays_until_refilled_and_reports_wait():
+    scheduler = FairScheduler(max_concurrency=4, per_user_concurrency=4, tokens_per_minute=6000) # 100 tokens/s
+
+    async def scenario():
+        async with scheduler.slot("a", 6000):
+            pass # Reservation is kept: no usage reported
+        async with scheduler.slot("b", 10):
+            return last_queue_wait_ms.get()
+
+    waited_ms = asyncio.run(scenario())
+    assert waited_ms >= 50
+    assert scheduler.stats()["budget_stalls"] >= 1
+
+
+def test_actual_usage_returns_unused_reservation():
+    scheduler = FairScheduler(max_concurrency=4, per_user_concurrency=4, tokens_per_minute=6000)
+
+    async def scenario():
+        async with scheduler.slot("a", 6000) as ticket:
+            ticket.record_usage(10)
+        async with scheduler.slot("b", 1000):
+            return last_queue_wait_ms.get()
+
+    assert asyncio.run(scenario()) < 50
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = FairScheduler(max_concurrency=1, per_user_concurrency=1)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot("a", 1):
+                await release.wait()
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(_run(scheduler, "b", []))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["waiting"] == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        release.set()
+        await holding
+
+    asyncio.run(scenario())
+    stats = scheduler.stats()
+    assert stats["waiting"] == 0 and stats["in_flight"] == 0
@@ -0,0 +1,61 @@
+import datetime
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import analytics, submissions
+from api.routers.auth import get_current_active_user, get_current_admin_user
+from promptcraft.llm import LLMCallInfo, last_llm_call
+from promptcraft.schemas.auth_schemas import UserResponse
+
+USER = UserResponse(id=3, email="u@example.com", username="admin", is_active=True, is_verified=True)
+
+
+def _row(day, question_id, latency, prompt_tokens=10, completion_tokens=20, cache_hit=False, model="gpt-test"):
+    return {"day": datetime.date(2026, 1, day), "question_id": question_id, "llm_model": model,
+            "llm_latency_ms": latency, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "cache_hit": cache_hit}
+
+
+def test_submission_stores_llm_usage(monkeypatch):
+    saved = {}
+
+    async def fake_complete(prompt, **kwargs):
+        last_llm_call.set(LLMCallInfo(model="gpt-test", latency_ms=812.4, prompt_tokens=11, completion_tokens=42))
+        return "code", False
+
+    app.dependency_overrides[get_current_active_user] = lambda: USER
+    monkeypatch.setattr(submissions.llm_response_cache, "complete_or_simulate", fake_complete)
+    monkeypatch.setattr(submissions.db_handler, "get_question_details", lambda task_id: {"id": task_id})
+    monkeypatch.setattr(submissions.db_handler, "create_submission", lambda **kwargs: saved.update(kwargs) or 12)
+    try:
+        with TestClient(app) as client:
+            response = client.post("/api/v1/submissions", json={"task_id": 4, "prompt": "p"})
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
+
+    assert response.status_code == 201
+    assert saved["llm_usage"] == {"model": "gpt-test", "latency_ms": 812.4, "prompt_tokens": 11,
+                                  "completion_tokens": 42, "cached": False}
+
+
+def test_llm_usage_report_percentiles_and_spend(monkeypatch):
+    rows = [_row(1, 1, latency) for latency in range(100, 1100, 100)] # 10 provider calls
+    rows.append(_row(2, 2, 3, prompt_tokens=0, completion_tokens=0, cache_hit=True))
+    rows.append(_row(2, 2, None, prompt_tokens=None, completion_tokens=None, model="simulated"))
+    monkeypatch.setattr(analytics.db_handler, "get_submission_llm_usage", lambda start, end: rows)
+    app.dependency_overrides[get_current_admin_user] = lambda: USER
+    try:
+        with TestClient(app) as client:
+            report = client.get("/api/v1/analytics/llm-usage?days=7").json()
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+    overall = report["overall"]
+    assert overall["submissions"] == 12 and overall["llm_calls"] == 10
+    assert overall["cache_hits"] == 1 and overall["simulated"] == 1
+    assert overall["latency_p50_ms"] == 500 and overall["latency_p95_ms"] == 1000 # Cache hit excluded
+    assert overall["total_tokens"] == 300
+    assert [bucket["key"] for bucket in report["by_day"]] == ["2026-01-01", "2026-01-02"]
+    question_2 = report["by_question"][1]
+    assert question_2["key"] == "2" and question_2["latency_p50_ms"] is None and question_2["total_tokens"] == 0
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from benchmarks.mock_llm_server import MockLLMConfig, create_app
+
+
+def _sdk_client(config):
+    transport = httpx.ASGITransport(app=create_app(config))
+    return AsyncOpenAI(api_key="mock", base_url="http://mock/v1", max_retries=0,
+                       http_client=httpx.AsyncClient(transport=transport, base_url="http://mock"))
+
+
+def test_openai_sdk_parses_completion_and_usage():
+    config = MockLLMConfig(latency_ms=0, tokens_per_second=0, template="Answer to: {prompt}")
+
+    async def call():
+        client = _sdk_client(config)
+        return await client.chat.completions.create(model="m", messages=[{"role": "user", "content": "sort a list"}])
+
+    completion = asyncio.run(call())
+    assert completion.choices[0].message.content == "Answer to: sort a list"
+    assert completion.usage.completion_tokens == 5 and completion.usage.total_tokens == 8
+
+
+def test_streaming_chunks_reassemble_the_answer():
+    config = MockLLMConfig(latency_ms=0, tokens_per_second=0, responses={"factorial": "def factorial(n): ..."})
+
+    async def call():
+        client = _sdk_client(config)
+        stream = await client.chat.completions.create(
+            model="m", messages=[{"role": "user", "content": "Write a Factorial"}], stream=True)
+        return [chunk.choices[0].delta.content or "" async for chunk in stream if chunk.choices]
+
+    parts = asyncio.run(call())
+    assert "".join(parts) == "def factorial(n): ..."
+    assert len([p for p in parts if p]) == 3
+
+
+def test_configured_errors_surface_as_sdk_errors():
+    config = MockLLMConfig(latency_ms=0, error_rate=1.0, error_statuses=[429], seed=1)
+
+    async def call():
+        client = _sdk_client(config)
+        await client.chat.completions.create(model="m", messages=[{"role": "user", "content": "p"}])
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(call())
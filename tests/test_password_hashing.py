@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from passlib.context import CryptContext
+
+from promptcraft import auth_utils
+from promptcraft.exceptions import ServiceBusyException
+from promptcraft.password_hashing import PasswordHasher
+
+
+def test_hash_and_verify_in_executor():
+    hasher = PasswordHasher(executor_type="thread", max_workers=1, max_queue=4)
+    try:
+        hashed = asyncio.run(hasher.hash("s3cret-pass"))
+        valid, new_hash = asyncio.run(hasher.verify_and_update("s3cret-pass", hashed))
+        assert valid and new_hash is None
+        valid, _ = asyncio.run(hasher.verify_and_update("wrong", hashed))
+        assert not valid
+        stats = hasher.stats()
+        assert stats["completed"] == 3 and stats["in_flight"] == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_outdated_cost_is_rehashed():
+    other_rounds = 4 if auth_utils.BCRYPT_ROUNDS != 4 else 5
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=other_rounds).hash("s3cret-pass")
+    valid, new_hash = auth_utils.verify_and_update_password("s3cret-pass", old_hash)
+    assert valid
+    assert new_hash is not None and auth_utils.verify_password("s3cret-pass", new_hash)
+    assert f"${auth_utils.BCRYPT_ROUNDS:02d}$" in new_hash
+
+
+def test_rejects_when_queue_full():
+    hasher = PasswordHasher(executor_type="thread", max_workers=1, max_queue=0)
+
+    async def burst():
+        return await asyncio.gather(hasher.hash("a"), hasher.hash("b"), return_exceptions=True)
+
+    try:
+        results = asyncio.run(burst())
+        assert sum(isinstance(r, ServiceBusyException) for r in results) == 1
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        hasher.shutdown()
+
+
+def test_failed_jobs_are_counted_apart_from_completed():
+    hasher = PasswordHasher(executor_type="thread", max_workers=1, max_queue=4)
+
+    def broken(password):
+        raise ValueError("malformed hash")
+
+    try:
+        asyncio.run(hasher.hash("s3cret-pass"))
+        with pytest.raises(ValueError):
+            asyncio.run(hasher._run(broken, "s3cret-pass"))
+        stats = hasher.stats()
+        assert (stats["completed"], stats["failed"], stats["in_flight"]) == (1, 1, 0)
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,111 @@
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import evaluations
+from api.routers.auth import get_current_admin_user
+from promptcraft.schemas.auth_schemas import UserResponse
+from promptcraft.similarity.minhash import MinHasher, PromptDuplicateIndex, estimate_similarity
+
+ADMIN = UserResponse(id=1, email="admin@example.com", username="admin", is_active=True, is_verified=True)
+
+ORIGINAL = ("Write a Python function named factorial that takes a non-negative integer n and returns n factorial. "
+            "Raise a ValueError for negative input and return 1 when n is zero. Include type hints and a docstring.")
+COPIED = ORIGINAL.replace("Include type hints and a docstring.", "Include type hints and a short docstring please.")
+UNRELATED = "Create a SQL query that lists customers who placed more than three orders in the last month, newest first."
+
+
+class FakeIndexDB:
+    """In-memory stand-in for the DatabaseHandler prompt index methods."""
+
+    def __init__(self):
+        self.signatures = {}
+        self.buckets = {}
+        self.submissions = {}
+
+    def save_prompt_signatures(self, entries):
+        for entry in entries:
+            self.signatures[entry["submission_id"]] = (entry["question_id"], entry["signature"])
+            for band, bucket in entry["buckets"]:
+                self.buckets.setdefault((entry["question_id"], band, bucket), set()).add(entry["submission_id"])
+        return True
+
+    def get_lsh_candidates(self, question_id, buckets, exclude_submission_id, limit):
+        ids = set()
+        for band, bucket in buckets:
+            ids |= self.buckets.get((question_id, band, bucket), set())
+        ids.discard(exclude_submission_id)
+        return [{"submission_id": i, "user_id": self.submissions[i]["user_id"], "signature": self.signatures[i][1]}
+                for i in sorted(ids)[:limit]]
+
+    def get_submission_prompts(self, after_id, limit, question_id=None):
+        rows = [s for i, s in sorted(self.submissions.items())
+                if i > after_id and (question_id is None or s["question_id"] == question_id)]
+        return rows[:limit]
+
+    def clear_prompt_index(self, question_id=None):
+        self.signatures = {i: v for i, v in self.signatures.items() if question_id is not None and v[0] != question_id}
+        self.buckets = {k: v for k, v in self.buckets.items() if question_id is not None and k[0] != question_id}
+        return True
+
+    def submit(self, submission_id, user_id, question_id, prompt):
+        self.submissions[submission_id] = {"id": submission_id, "user_id": user_id, "question_id": question_id,
+                                           "prompt": prompt}
+        return self.submissions[submission_id]
+
+
+def make_index():
+    db = FakeIndexDB()
+    index = PromptDuplicateIndex(db)
+    for submission_id, user_id, question_id, prompt in [
+        (1, 10, 1, ORIGINAL), (2, 11, 1, COPIED), (3, 12, 1, UNRELATED), (4, 13, 2, ORIGINAL), (5, 10, 1, COPIED),
+    ]:
+        db.submit(submission_id, user_id, question_id, prompt)
+        assert index.add(submission_id, question_id, prompt)
+    return db, index
+
+
+def test_signature_similarity_tracks_shared_wording():
+    hasher = MinHasher()
+    original = hasher.signature(ORIGINAL)
+    assert estimate_similarity(original, hasher.signature(ORIGINAL)) == 1.0
+    assert estimate_similarity(original, hasher.signature(COPIED)) > 0.6
+    assert estimate_similarity(original, hasher.signature(UNRELATED)) < 0.2
+
+
+def test_copied_prompt_is_found_for_the_same_question_only():
+    db, index = make_index()
+    matches = index.find_duplicates(db.submissions[2])
+    # Submission 4 is identical but for another question; 3 is unrelated; 5 is the same prompt, another candidate
+    assert [m["submission_id"] for m in matches] == [5, 1]
+    assert matches[0]["similarity"] == 1.0
+
+
+def test_same_user_matches_are_excluded_by_default():
+    db, index = make_index()
+    assert [m["submission_id"] for m in index.find_duplicates(db.submissions[1])] == [2]
+    assert {m["submission_id"] for m in index.find_duplicates(db.submissions[1], include_same_user=True)} == {2, 5}
+
+
+def test_rebuild_reindexes_one_question():
+    db, index = make_index()
+    assert index.rebuild(question_id=1, batch_size=2) == 4
+    assert 4 in db.signatures
+    assert [m["submission_id"] for m in index.find_duplicates(db.submissions[1])] == [2]
+
+
+def test_duplicates_endpoint(monkeypatch):
+    db, index = make_index()
+    monkeypatch.setattr(evaluations, "prompt_duplicate_index", index)
+    monkeypatch.setattr(evaluations.db_handler, "get_submission_by_id", lambda submission_id: db.submissions.get(submission_id))
+    app.dependency_overrides[get_current_admin_user] = lambda: ADMIN
+    try:
+        with TestClient(app) as client:
+            response = client.get("/api/v1/evaluations/duplicates/1")
+            missing = client.get("/api/v1/evaluations/duplicates/99")
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["question_id"] == 1 and [m["submission_id"] for m in body["matches"]] == [2]
+    assert missing.status_code == 404
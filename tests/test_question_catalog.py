@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import pytest
+
+from promptcraft.question_catalog import QuestionCatalog, CatalogSnapshot, CATALOG_VERSION_KEY
+
+ROWS = [
+    {"id": 2, "description": "Sort an array", "expected_outcome": None, "evaluation_criteria": ["stable"],
+     "programming_language": "JavaScript", "difficulty_level": "Medium"},
+    {"id": 1, "description": "Factorial", "expected_outcome": "Works", "evaluation_criteria": ["edge cases"],
+     "programming_language": "Python", "difficulty_level": "Easy"},
+    {"id": 3, "description": "Top 5 customers", "expected_outcome": None, "evaluation_criteria": [],
+     "programming_language": "python", "difficulty_level": "Medium"},
+]
+
+class StubDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    def get_all_question_details(self):
+        self.calls += 1
+        return [dict(r) for r in self.rows]
+
+class StubCounterCache:
+    def __init__(self):
+        self.counters = {}
+
+    def get_int(self, key):
+        return self.counters.get(key)
+
+    def incr(self, key, amount=1):
+        self.counters[key] = self.counters.get(key, 0) + amount
+        return self.counters[key]
+
+def test_snapshot_indexes_and_filters():
+    snapshot = CatalogSnapshot.build(ROWS, version=1)
+    assert [q["id"] for q in snapshot.questions] == [1, 2, 3]
+    assert [q["id"] for q in snapshot.filter(language="PYTHON")] == [1, 3]
+    assert [q["id"] for q in snapshot.filter(difficulty="medium")] == [2, 3]
+    assert [q["id"] for q in snapshot.filter(difficulty="medium", language="python")] == [3]
+    assert snapshot.filter(language="rust") == []
+    assert snapshot.get(1)["evaluation_criteria"] == ("edge cases",)
+
+def test_snapshot_is_immutable():
+    snapshot = CatalogSnapshot.build(ROWS, version=1)
+    with pytest.raises(TypeError):
+        snapshot.get(1)["description"] = "changed"
+    with pytest.raises(Exception):
+        snapshot.version = 2
+
+def test_catalog_reloads_only_when_version_changes():
+    db, cache = StubDB(ROWS), StubCounterCache()
+    catalog = QuestionCatalog(db, cache, version_check_seconds=0, max_age_seconds=3600)
+    first = catalog.get_snapshot()
+    assert db.calls == 1
+    assert catalog.get_snapshot() is first
+    assert db.calls == 1
+
+    db.rows = ROWS[:1]
+    catalog.bump_version()
+    assert cache.get_int(CATALOG_VERSION_KEY) == 1
+    second = catalog.get_snapshot()
+    assert db.calls == 2
+    assert second.version == 1
+    assert [q["id"] for q in second.questions] == [2]
+
+def test_catalog_keeps_previous_snapshot_when_reload_returns_nothing():
+    db, cache = StubDB(ROWS), StubCounterCache()
+    catalog = QuestionCatalog(db, cache, version_check_seconds=0)
+    first = catalog.get_snapshot()
+    db.rows = []
+    cache.incr(CATALOG_VERSION_KEY)
+    assert catalog.get_snapshot() is first
+
+class InsertOnlyConnection:
+    lastrowid = 9
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, sql, params=()):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def test_add_question_bumps_the_catalog_version(monkeypatch):
+    from promptcraft import question_catalog
+    from promptcraft.database.db_handler import DatabaseHandler
+    cache = StubCounterCache()
+    monkeypatch.setattr(question_catalog, "_redis_cache", cache)
+    handler = DatabaseHandler()
+    monkeypatch.setattr(handler, "connect", lambda: InsertOnlyConnection())
+    monkeypatch.setattr(handler, "close", lambda: None)
+    assert handler.add_question("Reverse a string") == 9
+    assert cache.get_int(CATALOG_VERSION_KEY) == 1
+
+def test_async_snapshot_checks_and_reloads_off_the_event_loop():
+    db, cache = StubDB(ROWS), StubCounterCache()
+    threads = []
+    load = db.get_all_question_details
+    db.get_all_question_details = lambda: threads.append(threading.get_ident()) or load()
+    catalog = QuestionCatalog(db, cache, version_check_seconds=3600)
+
+    async def read_twice():
+        return await catalog.get_snapshot_async(), await catalog.get_snapshot_async(), threading.get_ident()
+    first, second, loop_thread = asyncio.run(read_twice())
+    assert first is second and len(first.questions) == 3
+    assert db.calls == 1 and threads[0] != loop_thread # The second read was served in memory
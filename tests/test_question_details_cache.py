@@ -0,0 +1,97 @@
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import questions
+from promptcraft.exceptions import DatabaseException
+from promptcraft.question_catalog import CatalogSnapshot
+
+QUESTION = {"id": 1, "description": "Factorial", "expected_outcome": "Works", "evaluation_criteria": ["edge cases"],
+            "programming_language": "Python", "difficulty_level": "Easy"}
+
+
+class DictCache:
+    """Stands in for RedisCache: values and TTLs in a dict."""
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ttl_seconds=300):
+        self.values[key], self.ttls[key] = value, ttl_seconds
+        return True
+
+    def get_many(self, keys):
+        return {k: self.values[k] for k in keys if k in self.values}
+
+    def set_many(self, mapping, ttl_seconds=300):
+        for key, value in mapping.items():
+            self.set(key, value, ttl_seconds[key] if isinstance(ttl_seconds, dict) else ttl_seconds)
+        return True
+
+
+class StubDB:
+    def __init__(self, rows, failing=False):
+        self.rows = {row["id"]: row for row in rows}
+        self.failing = failing
+        self.calls = 0
+
+    def get_question_details(self, question_id, raise_errors=False):
+        self.calls += 1
+        if self.failing:
+            raise DatabaseException()
+        return self.rows.get(question_id)
+
+
+def setup(monkeypatch, db, snapshot=None):
+    cache = DictCache()
+    monkeypatch.setattr(questions, "redis_cache", cache)
+    monkeypatch.setattr(questions, "db_handler", db)
+    monkeypatch.setattr(questions.question_catalog, "get_snapshot", lambda: snapshot)
+    return cache
+
+
+def key(question_id):
+    return f"{questions.CACHE_PREFIX_QUESTIONS}:details:{question_id}"
+
+
+def test_confirmed_misses_are_negatively_cached(monkeypatch):
+    db = StubDB([QUESTION])
+    cache = setup(monkeypatch, db)
+    with TestClient(app) as client:
+        assert client.get("/api/v1/questions/9").status_code == 404
+        assert client.get("/api/v1/questions/9").status_code == 404
+        assert client.get("/api/v1/questions/1").json()["description"] == "Factorial"
+        assert client.get("/api/v1/questions/1").json()["description"] == "Factorial"
+    assert db.calls == 2 # One per ID; the repeats were served from the cache
+    assert cache.values[key(9)] == questions.NOT_FOUND_MARKER
+    assert cache.ttls[key(9)] == questions.NEGATIVE_CACHE_TTL_SECONDS
+    assert cache.values[key(1)]["description"] == "Factorial" and cache.ttls[key(1)] == questions.CACHE_TTL_SECONDS
+
+
+def test_database_errors_are_not_cached_as_misses(monkeypatch):
+    db = StubDB([QUESTION], failing=True)
+    cache = setup(monkeypatch, db)
+    with TestClient(app) as client:
+        assert client.get("/api/v1/questions/1").status_code == 503
+        assert client.get("/api/v1/questions/2").status_code == 503
+    assert cache.values == {}
+
+    db.failing = False
+    with TestClient(app) as client:
+        assert client.get("/api/v1/questions/1").json()["description"] == "Factorial"
+
+
+def test_warm_up_caches_list_and_details(monkeypatch):
+    second = dict(QUESTION, id=2, description="Sort an array")
+    cache = setup(monkeypatch, StubDB([]), CatalogSnapshot.build([QUESTION, second], version=1))
+    assert questions.warm_question_cache() == 2
+    assert cache.values[f"{questions.CACHE_PREFIX_QUESTIONS}:all"] == [
+        {"id": 1, "description": "Factorial"}, {"id": 2, "description": "Sort an array"}]
+    assert cache.values[key(2)]["evaluation_criteria"] == ["edge cases"]
+
+    setup(monkeypatch, StubDB([]), None)
+    assert questions.warm_question_cache() == 0
+
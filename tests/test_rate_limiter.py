@@ -0,0 +1,56 @@
+import pytest
+
+from promptcraft import rate_limiter
+from promptcraft.exceptions import RateLimitException
+from promptcraft.rate_limiter import RateLimiter, parse_rate
+
+
+class NoRedis:
+    """Cache stub whose counters are always unavailable, forcing the in-memory fallback."""
+    def incr_window(self, key, previous_key, ttl_seconds):
+        return None
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def enable_rate_limits(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_ENABLED", True)
+
+
+def test_parse_rate():
+    assert parse_rate("20/60") == (20, 60)
+    assert parse_rate("5") == (5, 60)
+
+
+def test_rejects_over_limit_with_retry_after():
+    clock = FakeClock(1000.0)  # start of a 10s window
+    limiter = RateLimiter("test", limit=3, window_seconds=10, redis_cache=NoRedis(), clock=clock)
+    for _ in range(3):
+        limiter.hit("1.2.3.4")
+    with pytest.raises(RateLimitException) as exc_info:
+        limiter.hit("1.2.3.4")
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "10"
+    limiter.hit("5.6.7.8")  # Other keys are unaffected
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_previous_window_is_weighted():
+    clock = FakeClock(1000.0)
+    limiter = RateLimiter("test", limit=4, window_seconds=10, redis_cache=NoRedis(), clock=clock)
+    for _ in range(4):
+        limiter.hit("k")
+    clock.now = 1015.0  # Half way through the next window: previous counts as 4 * 0.5 = 2
+    limiter.hit("k")
+    limiter.hit("k")
+    with pytest.raises(RateLimitException):
+        limiter.hit("k")
+    clock.now = 1030.0  # Two windows later the history no longer counts
+    limiter.hit("k")
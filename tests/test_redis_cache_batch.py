@@ -0,0 +1,139 @@
+import pytest
+import redis
+
+from promptcraft.cache_codecs import CacheCodec
+from promptcraft.redis_cache import RedisCache
+
+
+class FakeRedis:
+    """The string commands the batched RedisCache methods use, in memory, counting round trips."""
+
+    def __init__(self):
+        self.values, self.ttls = {}, {}
+        self.round_trips = 0
+        self.pipelines = []
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.values.get(key) for key in keys]
+
+    def ping(self):
+        return True
+
+    def keys(self, pattern):
+        raise AssertionError("KEYS blocks Redis; clearing must use SCAN")
+
+    def scan_iter(self, match=None, count=None):
+        self.round_trips += 1
+        return iter([key for key in list(self.values) if key.startswith(match.rstrip("*"))])
+
+    def unlink(self, *keys):
+        self.round_trips += 1
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=False):
+        pipe = FakePipeline(self)
+        self.pipelines.append(pipe)
+        return pipe
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self.queued = []
+        self.resets = 0
+
+    def setex(self, key, ttl, value):
+        self.queued.append(("setex", key, ttl, value))
+
+    def get(self, key):
+        self.queued.append(("get", key))
+
+    def delete(self, *keys):
+        self.queued.append(("delete",) + keys)
+
+    def execute(self, raise_on_error=True):
+        self.redis.round_trips += 1
+        results = []
+        for command, key, *rest in self.queued:
+            if command == "setex":
+                self.redis.ttls[key], self.redis.values[key] = rest
+                results.append(True)
+            elif command == "get":
+                results.append(self.redis.values.get(key))
+            else:
+                results.append(sum(self.redis.values.pop(k, None) is not None for k in (key, *rest)))
+        return results
+
+    def reset(self):
+        self.resets += 1
+        self.queued = []
+
+
+@pytest.fixture
+def cache():
+    # Bypass the singleton and its connection attempt
+    instance = object.__new__(RedisCache)
+    instance.codec = CacheCodec()
+    instance.r = FakeRedis()
+    return instance
+
+
+def test_set_many_and_get_many_use_one_round_trip_each(cache):
+    assert cache.set_many({"a": {"n": 1}, "b": [1, 2], "c": "x"}, ttl_seconds={"a": 10, "b": 20})
+    assert cache.r.round_trips == 1
+    assert cache.r.ttls == {"a": 10, "b": 20, "c": 300} # Keys missing from the TTL dict get the default
+
+    assert cache.get_many(["a", "missing", "b", "c"]) == {"a": {"n": 1}, "b": [1, 2], "c": "x"}
+    assert cache.r.round_trips == 2
+    assert cache.get_many([]) == {} and cache.r.round_trips == 2
+
+
+def test_set_many_with_single_ttl(cache):
+    assert cache.set_many({"a": 1, "b": 2}, ttl_seconds=42)
+    assert cache.r.ttls == {"a": 42, "b": 42}
+
+
+def test_batches_degrade_without_redis(cache):
+    cache.r = None
+    assert cache.get_many(["a"]) == {}
+    assert cache.set_many({"a": 1}) is False
+    with cache.pipeline() as pipe:
+        pipe.get("a").set("b", 2)
+    assert pipe.results == [None, None] and not pipe.succeeded
+
+
+def test_get_many_treats_redis_errors_as_misses(cache):
+    def failing_mget(keys):
+        raise redis.exceptions.ConnectionError("gone")
+    cache.r.mget = failing_mget
+    assert cache.get_many(["a", "b"]) == {}
+
+
+def test_pipeline_sends_queued_commands_together(cache):
+    cache.set_many({"b": "old", "c": 3})
+    with cache.pipeline() as pipe:
+        pipe.set("a", {"n": 1}, ttl_seconds=60).get("b").delete("c")
+    assert pipe.succeeded
+    assert pipe.results == [True, "old", 1]
+    assert cache.r.round_trips == 2 # The set_many and the pipeline
+    assert cache.get_many(["a", "c"]) == {"a": {"n": 1}}
+
+
+def test_pipeline_discards_queued_commands_when_the_block_raises(cache):
+    with pytest.raises(RuntimeError):
+        with cache.pipeline() as pipe:
+            pipe.set("a", 1)
+            raise RuntimeError("boom")
+    assert cache.r.round_trips == 0 and cache.r.values == {}
+    assert cache.r.pipelines[0].queued == [] and cache.r.pipelines[0].resets == 1
+    assert pipe.results == [] and not pipe.succeeded
+
+
+def test_clear_prefix_scans_and_unlinks_in_batches(cache, monkeypatch):
+    monkeypatch.setattr("promptcraft.redis_cache.CLEAR_BATCH_SIZE", 2)
+    cache.set_many({"promptcraft:llm:1": 1, "promptcraft:llm:2": 2, "promptcraft:llm:3": 3, "promptcraft:user:1": 4})
+    cache.r.round_trips = 0
+    assert cache.clear_all_promptcraft_cache(prefix="promptcraft:llm:") is True
+    assert list(cache.r.values) == ["promptcraft:user:1"]
+    assert cache.r.round_trips == 3 # One scan, two UNLINK batches
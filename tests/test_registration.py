@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from mysql.connector import IntegrityError
+
+from api.main import app
+from api.routers import auth
+from promptcraft.database import db_handler as db_module
+from promptcraft.database.db_handler import DatabaseHandler
+
+CREATED_AT = datetime(2026, 3, 4, 5, 6, 7)
+NEW_USER = {"email": "new@example.com", "username": "newbie", "password": "long-enough-pw", "full_name": None}
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        self.conn.statements.append((" ".join(query.split()), params))
+        if query.lstrip().startswith("INSERT") and self.conn.error is not None:
+            raise self.conn.error
+        self.lastrowid = 42
+
+    def fetchone(self):
+        return (CREATED_AT,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, error=None):
+        self.error = error
+        self.statements = []
+        self.committed = self.rolled_back = False
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def _register(monkeypatch, error=None):
+    handler, conn = DatabaseHandler(), FakeConnection(error)
+    monkeypatch.setattr(handler, "connect", lambda: conn)
+    monkeypatch.setattr(handler, "close", lambda: None)
+    return handler.register_user_atomic("new@example.com", "newbie", "hash"), conn
+
+
+@pytest.mark.parametrize("message, key", [
+    ("Duplicate entry 'a@example.com' for key 'users.email'", "email"), # MySQL 8.0.19+
+    ("Duplicate entry 'a@example.com' for key 'email'", "email"),
+    ("Duplicate entry 'alice' for key 'users.username'", "username"),
+    ("Duplicate entry 'alice' for key 'username'", "username"),
+    ("Duplicate entry '5' for key 'users.PRIMARY'", "PRIMARY"),
+])
+def test_duplicate_key_name_is_parsed_from_both_message_forms(message, key):
+    assert db_module._DUPLICATE_KEY_RE.search(message).group(1) == key
+
+
+def test_register_user_atomic_uses_the_database_timestamp(monkeypatch):
+    (user, conflict), conn = _register(monkeypatch)
+    assert conflict is None and conn.committed
+    assert user["id"] == 42 and user["created_at"] == CREATED_AT and user["is_verified"] is False
+    insert, _ = conn.statements[0]
+    assert "created_at" not in insert # Left to DEFAULT CURRENT_TIMESTAMP
+    assert conn.statements[1] == ("SELECT created_at FROM users WHERE id = %s", (42,))
+
+
+@pytest.mark.parametrize("message, conflict", [
+    ("Duplicate entry 'new@example.com' for key 'users.email'", "email"),
+    ("Duplicate entry 'newbie' for key 'username'", "username"),
+    ("Duplicate entry '1' for key 'users.PRIMARY'", None),
+])
+def test_register_user_atomic_reports_the_conflicting_field(monkeypatch, message, conflict):
+    (user, reported), conn = _register(monkeypatch, IntegrityError(msg=message, errno=1062))
+    assert user is None and reported == conflict and conn.rolled_back
+
+
+@pytest.mark.parametrize("conflict, detail", [
+    ("email", "Email already registered."),
+    ("username", "Username already exists."),
+])
+def test_register_endpoint_rejects_duplicates_with_400(monkeypatch, conflict, detail):
+    monkeypatch.setattr(auth.db_handler, "register_user_atomic", lambda **kwargs: (None, conflict))
+    with TestClient(app) as client:
+        response = client.post("/api/v1/auth/register", json=NEW_USER)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
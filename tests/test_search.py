@@ -0,0 +1,67 @@
+from datetime import date, datetime
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import search
+from api.routers.auth import get_current_admin_user
+from promptcraft.schemas.auth_schemas import UserResponse
+
+ADMIN = UserResponse(id=1, email="admin@example.com", username="admin", is_active=True, is_verified=True)
+
+
+def submission_row(i, prompt, code="def f(): pass"):
+    return {"id": i, "user_id": 7, "username": "cand", "question_id": 3, "prompt": prompt, "generated_code": code,
+            "created_at": datetime(2026, 5, 1), "relevance": 1.5 / i}
+
+
+def get(path):
+    app.dependency_overrides[get_current_admin_user] = lambda: ADMIN
+    try:
+        with TestClient(app) as client:
+            return client.get(path)
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+
+def test_snippet_centres_on_the_first_query_word():
+    text = "filler " * 100 + "use recursion here " + "tail " * 100
+    snippet = search._snippet(text, "recursion")
+    assert snippet.startswith("...") and snippet.endswith("...") and "recursion" in snippet
+    assert len(snippet) <= search.SNIPPET_CHARS + 6
+    assert search._snippet("short text", "recursion") == "short text"
+
+
+def test_submission_search_passes_filters_and_pages(monkeypatch):
+    calls = []
+    rows = [submission_row(1, "Solve it with recursion"), submission_row(2, "A loop", "# recursion in the code"),
+            submission_row(3, "recursion again")]
+    monkeypatch.setattr(search.db_handler, "search_submissions", lambda q, **kwargs: calls.append((q, kwargs)) or rows)
+
+    response = get("/api/v1/search?q=recursion&question_id=3&user_id=7&start_date=2026-05-01&end_date=2026-05-31&limit=2")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["has_more"] is True and [r["id"] for r in body["results"]] == [1, 2]
+    assert body["results"][1]["snippet"] == "# recursion in the code" # Matched in the code, not the prompt
+    q, kwargs = calls[0]
+    assert q == "recursion" and kwargs["scope"] == "submissions" and kwargs["limit"] == 3
+    assert kwargs["question_id"] == 3 and kwargs["user_id"] == 7
+    assert kwargs["start_date"] == date(2026, 5, 1) and kwargs["end_date"] == date(2026, 6, 1)
+
+
+def test_evaluation_search(monkeypatch):
+    row = {"id": 4, "submission_id": 9, "user_id": 7, "candidate_id": "user_7_cand", "question_id": 3,
+           "evaluator_username": "rev", "overall_score": 82.5, "evaluation_notes": "Good use of recursion.",
+           "created_at": None, "relevance": 0.8}
+    monkeypatch.setattr(search.db_handler, "search_evaluations", lambda q, **kwargs: [row])
+
+    response = get("/api/v1/search?q=recursion&scope=evaluations&boolean=true")
+
+    assert response.status_code == 200
+    [hit] = response.json()["results"]
+    assert hit["kind"] == "evaluation" and hit["submission_id"] == 9 and hit["overall_score"] == 82.5
+
+
+def test_rejects_inverted_date_range():
+    assert get("/api/v1/search?q=recursion&start_date=2026-05-02&end_date=2026-05-01").status_code == 400
@@ -0,0 +1,98 @@
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import submissions
+from api.routers.auth import get_current_active_user
+from promptcraft.evaluation.features import (FEATURE_VERSION, NO_CODE_SCORE, backfill_features, extract_features,
+                                             extract_features_batch)
+from promptcraft.schemas.auth_schemas import UserResponse
+
+USER = UserResponse(id=5, email="f@example.com", username="features", is_active=True, is_verified=True)
+
+QUESTION = {
+    "id": 1,
+    "programming_language": "Python",
+    "evaluation_criteria": [
+        "Prompt clearly specifies a Python function",
+        "Asks for factorial calculation",
+        "Specifies parameter and return types",
+        "Mentions handling edge cases (negative numbers, zero)",
+    ],
+}
+
+
+def test_features_of_a_thorough_prompt():
+    prompt = ("Write a Python function that computes the factorial of n. Take an int parameter and return an int. "
+              "Raise ValueError for negative numbers; factorial of zero is 1.")
+    code = "Sure:\n```python\ndef factorial(n):\n    return 1\n```\n"
+    features = extract_features(prompt, code, QUESTION)
+    assert features.criteria_total == 4 and features.criteria_covered == 4
+    assert features.language_match and features.mentions_edge_cases
+    assert features.code_blocks == 1 and features.code_lines == 2
+    assert features.quality_score == 100.0
+
+
+def test_features_of_a_vague_prompt():
+    features = extract_features("do the thing", "```js\nconsole.log(1)\n```", QUESTION)
+    assert features.criteria_covered == 0 and not features.language_match and not features.mentions_edge_cases
+    assert features.quality_score == 50.0
+    assert extract_features("do the thing", "", QUESTION).quality_score == NO_CODE_SCORE
+
+
+def test_batch_rows_are_keyed_by_submission():
+    rows = [{"id": 9, "question_id": 1, "prompt": "python factorial", "generated_code": "x = 1"}]
+    [row] = extract_features_batch(rows, {1: QUESTION})
+    assert row["submission_id"] == 9 and row["language_match"] is True and row["feature_version"] == 1
+
+
+def test_submission_is_saved_with_features(monkeypatch):
+    saved = {}
+
+    async def fake_complete(prompt, **kwargs):
+        return "```python\ndef factorial(n): ...\n```", False
+
+    app.dependency_overrides[get_current_active_user] = lambda: USER
+    monkeypatch.setattr(submissions.llm_response_cache, "complete_or_simulate", fake_complete)
+    monkeypatch.setattr(submissions.db_handler, "get_question_details", lambda task_id: QUESTION)
+    monkeypatch.setattr(submissions.db_handler, "create_submission", lambda **kwargs: saved.update(kwargs) or 3)
+    try:
+        with TestClient(app) as client:
+            response = client.post("/api/v1/submissions", json={"task_id": 1, "prompt": "A python factorial function"})
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
+
+    assert response.status_code == 201
+    assert saved["features"]["language_match"] is True and saved["features"]["code_blocks"] == 1
+
+
+class BackfillDB:
+    """Completed submissions without features, served in pages; saved rows are recorded."""
+
+    def __init__(self, submissions, questions):
+        self.submissions, self.questions = submissions, questions
+        self.saved = []
+
+    def get_all_question_details(self):
+        return self.questions
+
+    def get_submissions_needing_features(self, feature_version, after_id=0, limit=1000):
+        assert feature_version == FEATURE_VERSION
+        done = {row["submission_id"] for row in self.saved}
+        return [s for s in self.submissions if s["id"] > after_id and s["id"] not in done][:limit]
+
+    def save_submission_features(self, rows):
+        self.saved.extend(rows)
+        return True
+
+
+def test_backfill_pages_through_submissions_and_is_rerunnable():
+    submissions = [{"id": i, "question_id": 1, "prompt": "factorial in Python", "generated_code": "```python\nx\n```"}
+                   for i in range(1, 6)]
+    db = BackfillDB(submissions, [QUESTION])
+    assert backfill_features(db, batch_size=2) == 5
+    assert [row["submission_id"] for row in db.saved] == [1, 2, 3, 4, 5]
+    assert db.saved[0]["language_match"] and db.saved[0]["criteria_total"] == 4
+    assert backfill_features(db, batch_size=2) == 0
+
+    # Without questions every row would be scored as if its question had no criteria
+    assert backfill_features(BackfillDB(submissions, []), batch_size=2) == 0
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+import submission_worker
+from api.main import app
+from api.routers import submissions
+from api.routers.auth import get_current_active_user
+from promptcraft.schemas.auth_schemas import UserResponse
+from promptcraft.submission_queue import QUEUE_KEY, SubmissionQueue, heartbeat_key
+
+USER = UserResponse(id=5, email="q@example.com", username="queuer", is_active=True, is_verified=True)
+
+
+class StubQueue:
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.jobs, self.acked, self.published = [], [], []
+
+    def enqueue(self, submission_id, user_id, question_id, prompt):
+        if self.accept:
+            self.jobs.append(json.dumps({"submission_id": submission_id, "user_id": user_id,
+                                         "question_id": question_id, "prompt": prompt}).encode())
+        return self.accept
+
+    def ack(self, raw_job):
+        self.acked.append(raw_job)
+
+    def publish_result(self, submission_id, payload):
+        self.published.append((submission_id, payload))
+
+
+class StubDB:
+    def __init__(self, question_available=True):
+        self.completed = {}
+        self.features = {}
+        self.question_available = question_available
+
+    def get_question_details(self, question_id):
+        if not self.question_available:
+            return None
+        return {"id": question_id, "evaluation_criteria": [], "programming_language": "Python"}
+
+    def complete_submission(self, submission_id, generated_code, status="completed", error_message=None, llm_usage=None,
+                            features=None):
+        self.completed[submission_id] = (status, generated_code, error_message)
+        self.features[submission_id] = features
+        return True
+
+
+@pytest.fixture
+def api_env(monkeypatch):
+    calls = {"pending": [], "completed": []}
+    app.dependency_overrides[get_current_active_user] = lambda: USER
+    monkeypatch.setattr(submissions.db_handler, "get_question_details", lambda task_id: {"id": task_id})
+    monkeypatch.setattr(submissions.db_handler, "create_pending_submission",
+                        lambda *args: calls["pending"].append(args) or 77)
+    monkeypatch.setattr(submissions.db_handler, "complete_submission",
+                        lambda *args, **kwargs: calls["completed"].append((args, kwargs)) or True)
+    yield calls
+    app.dependency_overrides.pop(get_current_active_user, None)
+
+
+def test_async_submission_returns_202_with_job(api_env, monkeypatch):
+    queue = StubQueue()
+    monkeypatch.setattr(submissions, "submission_queue", queue)
+    with TestClient(app) as client:
+        response = client.post("/api/v1/submissions/async", json={"task_id": 2, "prompt": "p"})
+    assert response.status_code == 202
+    assert response.json()["job_id"] == 77 and response.json()["status"] == "pending"
+    assert len(queue.jobs) == 1
+
+
+def test_async_submission_marks_row_failed_when_queue_unavailable(api_env, monkeypatch):
+    monkeypatch.setattr(submissions, "submission_queue", StubQueue(accept=False))
+    with TestClient(app) as client:
+        response = client.post("/api/v1/submissions/async", json={"task_id": 2, "prompt": "p"})
+    assert response.status_code == 503
+    assert api_env["completed"][0][1]["status"] == "failed"
+
+
+def test_worker_completes_and_acks_job(monkeypatch):
+    async def fake_complete(prompt, question_id=None, user_id=None):
+        return f"code for {prompt}", False
+    monkeypatch.setattr(submission_worker.llm_response_cache, "complete_or_simulate", fake_complete)
+    queue, db = StubQueue(), StubDB()
+    queue.enqueue(9, 5, 2, "factorial")
+    raw_job = queue.jobs[0]
+
+    asyncio.run(submission_worker.process_job(raw_job, queue, db))
+    assert db.completed[9] == ("completed", "code for factorial", None)
+    assert db.features[9]["code_chars"] > 0
+    assert queue.acked == [raw_job]
+    assert queue.published == [(9, {"status": "completed", "cached": False})]
+
+
+def test_worker_leaves_features_to_the_backfill_without_the_question(monkeypatch):
+    async def fake_complete(prompt, question_id=None, user_id=None):
+        return f"code for {prompt}", False
+    monkeypatch.setattr(submission_worker.llm_response_cache, "complete_or_simulate", fake_complete)
+    queue, db = StubQueue(), StubDB(question_available=False)
+    queue.enqueue(9, 5, 2, "factorial")
+
+    asyncio.run(submission_worker.process_job(queue.jobs[0], queue, db))
+    assert db.completed[9] == ("completed", "code for factorial", None)
+    assert db.features[9] is None
+
+
+class FakeRedis:
+    """The list, set and key commands SubmissionQueue uses, in memory."""
+
+    def __init__(self):
+        self.lists, self.sets, self.keys = {}, {}, {}
+
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def lmove(self, first_list, second_list, src="LEFT", dest="RIGHT"):
+        if not self.lists.get(first_list):
+            return None
+        value = self.lists[first_list].pop(-1 if src == "RIGHT" else 0)
+        target = self.lists.setdefault(second_list, [])
+        target.append(value) if dest == "RIGHT" else target.insert(0, value)
+        return value
+
+    def blmove(self, first_list, second_list, timeout, src="LEFT", dest="RIGHT"):
+        return self.lmove(first_list, second_list, src, dest)
+
+    def lrem(self, key, count, value):
+        if value in self.lists.get(key, []):
+            self.lists[key].remove(value)
+
+    def set(self, key, value, ex=None):
+        self.keys[key] = value
+
+    def exists(self, key):
+        return int(key in self.keys)
+
+    def delete(self, key):
+        self.keys.pop(key, None)
+
+    def sadd(self, key, member):
+        self.sets.setdefault(key, set()).add(member)
+
+    def srem(self, key, member):
+        self.sets.get(key, set()).discard(member)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def pipeline(self, transaction=False):
+        redis, calls = self, []
+
+        class Pipeline:
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: calls.append((name, args, kwargs))
+
+            def execute(self):
+                return [getattr(redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+        return Pipeline()
+
+
+def test_requeue_only_takes_jobs_of_expired_workers():
+    cache = SimpleNamespace(r=FakeRedis())
+    api, alive, dead = SubmissionQueue(cache), SubmissionQueue(cache, "alive"), SubmissionQueue(cache, "dead")
+    for submission_id in (1, 2, 3):
+        api.enqueue(submission_id, 5, 2, "p")
+    alive.heartbeat()
+    dead.heartbeat()
+    alive_job, dead_job = alive.claim(0), dead.claim(0)
+    assert api.stats()["processing"] == 2 and api.stats()["workers"] == 2
+
+    # Both heartbeats are fresh: nothing is taken from either worker
+    assert alive.requeue_orphaned() == 0
+    cache.r.delete(heartbeat_key("dead")) # Its TTL ran out
+    assert alive.requeue_orphaned() == 1
+    assert cache.r.lists[QUEUE_KEY][-1] == dead_job # Claimed next
+    assert api.stats() == {"available": True, "queued": 2, "processing": 1, "workers": 1,
+                           "max_depth": api.stats()["max_depth"]}
+
+    alive.ack(alive_job)
+    alive.unregister()
+    assert api.stats()["processing"] == 0 and not cache.r.exists(heartbeat_key("alive"))
+
+
+class StubPubSub:
+    def __init__(self):
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=None):
+        return {"type": "message", "data": b"{}"}
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def websocket_env(monkeypatch):
+    rows = [{"id": 9, "user_id": 5, "status": "pending"},
+            {"id": 9, "user_id": 5, "status": "pending"},
+            {"id": 9, "user_id": 5, "status": "completed", "generated_code": "def f(): pass", "error_message": None}]
+    threads = []
+
+    class RowsDB:
+        def get_submission_by_id(self, submission_id):
+            threads.append(threading.get_ident())
+            return rows.pop(0) if len(rows) > 1 else rows[0]
+
+    async def current_user(token):
+        if token != "good":
+            raise HTTPException(status_code=401)
+        return USER
+
+    pubsub = StubPubSub()
+    monkeypatch.setattr(submissions, "get_current_active_user", current_user)
+    monkeypatch.setattr(submissions, "DatabaseHandler", RowsDB)
+    monkeypatch.setattr(submissions.submission_queue, "async_pubsub", lambda: (pubsub, pubsub))
+    return SimpleNamespace(pubsub=pubsub, threads=threads)
+
+
+def test_websocket_pushes_the_result_once_completed(websocket_env):
+    with TestClient(app) as client:
+        with client.websocket_connect("/api/v1/submissions/9/ws?token=good") as ws:
+            message = ws.receive_json()
+    assert message == {"submission_id": 9, "status": "completed", "generated_code": "def f(): pass", "error_message": None}
+    assert websocket_env.pubsub.channels == ["promptcraft:jobs:submission:9:done"]
+    # Every row read ran on a worker thread, never on the event loop's (or the test's) thread
+    assert len(websocket_env.threads) == 3 and threading.get_ident() not in websocket_env.threads
+
+
+def test_websocket_rejects_bad_tokens_and_other_users(websocket_env, monkeypatch):
+    with TestClient(app) as client:
+        with client.websocket_connect("/api/v1/submissions/9/ws?token=bad") as ws:
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+        assert closed.value.code == 1008
+
+        monkeypatch.setattr(submissions, "get_current_active_user", lambda token: _user(6))
+        with client.websocket_connect("/api/v1/submissions/9/ws?token=good") as ws:
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+        assert closed.value.code == 1008
+
+
+async def _user(user_id):
+    return USER.model_copy(update={"id": user_id})
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import submissions
+from api.routers.auth import get_current_active_user
+from promptcraft.exceptions import LLMProcessingException
+from promptcraft.schemas.auth_schemas import UserResponse
+
+USER = UserResponse(id=3, email="s@example.com", username="streamer", is_active=True, is_verified=True)
+
+
+class StreamingLLM:
+    enabled = True
+    model = "test-model"
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    async def stream(self, prompt, user_id=None, deadline=None, question_id=None):
+        for i, chunk in enumerate(self.chunks):
+            if self.fail_after is not None and i == self.fail_after:
+                raise LLMProcessingException()
+            yield chunk
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def stream_env(monkeypatch):
+    saved = []
+    app.dependency_overrides[get_current_active_user] = lambda: USER
+    monkeypatch.setattr(submissions.db_handler, "get_question_details", lambda task_id: {"id": task_id})
+    monkeypatch.setattr(submissions.db_handler, "create_submission",
+                        lambda **kwargs: saved.append(kwargs) or 101)
+    monkeypatch.setattr(submissions.llm_response_cache, "get_cached", lambda *a, **k: None)
+    monkeypatch.setattr(submissions.llm_response_cache, "put", lambda *a, **k: None)
+    yield saved
+    app.dependency_overrides.pop(get_current_active_user, None)
+
+
+def test_stream_relays_tokens_then_saves(stream_env, monkeypatch):
+    monkeypatch.setattr(submissions, "get_llm_client", lambda: StreamingLLM(["def f():", "\n    return 1"]))
+    with TestClient(app) as client:
+        response = client.post("/api/v1/submissions/stream", json={"task_id": 1, "prompt": "p"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    assert [e for e, _ in events] == ["token", "token", "done"]
+    assert events[-1][1] == {"submission_id": 101, "cached": False, "queue_wait_ms": None}
+    assert stream_env[0]["generated_code"] == "def f():\n    return 1"
+
+
+def test_stream_interrupted_midway_is_not_saved(stream_env, monkeypatch):
+    monkeypatch.setattr(submissions, "get_llm_client", lambda: StreamingLLM(["a", "b"], fail_after=1))
+    with TestClient(app) as client:
+        response = client.post("/api/v1/submissions/stream", json={"task_id": 1, "prompt": "p"})
+    assert [e for e, _ in _events(response.text)] == ["token", "error"]
+    assert stream_env == []
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import admin, auth
+from api.routers.auth import get_current_admin_user
+from promptcraft import auth_utils
+from promptcraft.password_hashing import _hash_password
+from promptcraft.schemas.auth_schemas import UserResponse
+
+PROFILE = {
+    "id": 7, "email": "rev@example.com", "username": "revoked", "full_name": None,
+    "is_active": True, "is_verified": True, "created_at": "2025-01-01T00:00:00",
+}
+
+
+@pytest.fixture
+def auth_state(monkeypatch):
+    """Redis-backed auth state replaced by a dict; DB lookups are counted."""
+    state = {"version": None, "user": None, "db_version": 0, "db_calls": 0}
+    monkeypatch.setattr(auth.user_cache, "get_auth_state", lambda user_id: (state["version"], state["user"]))
+    monkeypatch.setattr(auth.user_cache, "cache_user", lambda user_id, data: state.update(user=data))
+
+    def set_token_version(user_id, version, only_if_missing=False):
+        if not only_if_missing or state["version"] is None:
+            state["version"] = version
+    monkeypatch.setattr(auth.user_cache, "set_token_version", set_token_version)
+    monkeypatch.setattr(auth.user_cache, "invalidate_user", lambda user_id: state.update(user=None))
+
+    def get_user_profile_by_id(user_id):
+        state["db_calls"] += 1
+        return dict(PROFILE, token_version=state["db_version"])
+    monkeypatch.setattr(auth.db_handler, "get_user_profile_by_id", get_user_profile_by_id)
+    return state
+
+
+def _authenticate(token):
+    return asyncio.run(auth.get_current_active_user(token))
+
+
+def test_current_version_authorizes_without_db(auth_state):
+    token = auth_utils.create_access_token({"sub": "7", "ver": 0, "active": True, "verified": True})
+    assert _authenticate(token).id == 7  # Miss: DB lookup fills both caches
+    assert _authenticate(token).id == 7
+    assert auth_state["db_calls"] == 1
+
+
+def test_bumped_version_revokes_outstanding_tokens(auth_state):
+    token = auth_utils.create_access_token({"sub": "7", "ver": 0, "active": True, "verified": True})
+    _authenticate(token)
+    auth_state["version"] = auth_state["db_version"] = 1  # e.g. a password change
+    with pytest.raises(HTTPException) as exc_info:
+        _authenticate(token)
+    assert exc_info.value.status_code == 401
+
+
+def test_stale_version_detected_from_db_when_redis_has_none(auth_state):
+    auth_state["db_version"] = 2
+    token = auth_utils.create_access_token({"sub": "7", "ver": 1, "active": True, "verified": True})
+    with pytest.raises(HTTPException):
+        _authenticate(token)
+    assert auth_state["version"] == 2  # Published for the next request
+
+
+def _claims_token(version=0):
+    return auth_utils.create_access_token({"sub": "7", "username": "revoked", "email": "rev@example.com",
+                                           "ver": version, "active": True, "verified": True})
+
+
+def test_current_version_authorizes_from_claims_without_db(auth_state):
+    auth_state["version"] = 0 # Published at login; the projection cache is empty
+    user = _authenticate(_claims_token())
+    assert (user.id, user.username, user.email) == (7, "revoked", "rev@example.com")
+    assert auth_state["db_calls"] == 0
+
+
+class FakeUsersTable:
+    """A one-row users table: answers the UPDATE/SELECT statements the revocation paths run."""
+
+    def __init__(self, auth_state):
+        self.state = auth_state
+        self.rowcount = 0
+        self.result = None
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, sql, params=()):
+        self.rowcount = 1
+        if "token_version = token_version + 1" in sql:
+            self.state["db_version"] += 1
+        if sql.startswith("SELECT token_version"):
+            self.result = (self.state["db_version"],)
+
+    def fetchone(self):
+        return self.result
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(auth_state, monkeypatch):
+    table = FakeUsersTable(auth_state)
+    for handler in (auth.db_handler, admin.db_handler):
+        monkeypatch.setattr(handler, "connect", lambda: table)
+        monkeypatch.setattr(handler, "close", lambda: None)
+    monkeypatch.setattr(auth.db_handler, "get_user_by_id",
+                        lambda user_id: dict(PROFILE, hashed_password=_hash_password("old-password")))
+    auth_state["version"] = 0
+    with TestClient(app) as client:
+        yield client
+
+
+def test_password_change_revokes_outstanding_tokens(auth_state, client):
+    headers = {"Authorization": f"Bearer {_claims_token()}"}
+    response = client.post("/api/v1/auth/users/me/password", headers=headers,
+                           json={"current_password": "old-password", "new_password": "new-password"})
+    assert response.status_code == 200
+    assert auth_state["version"] == auth_state["db_version"] == 1
+    assert client.get("/api/v1/auth/users/me", headers=headers).status_code == 401
+
+
+def test_password_change_requires_the_current_password(auth_state, client):
+    response = client.post("/api/v1/auth/users/me/password", headers={"Authorization": f"Bearer {_claims_token()}"},
+                           json={"current_password": "wrong-password", "new_password": "new-password"})
+    assert response.status_code == 400
+    assert auth_state["db_version"] == 0
+
+
+def test_deactivation_revokes_outstanding_tokens(auth_state, client):
+    headers = {"Authorization": f"Bearer {_claims_token()}"}
+    assert client.get("/api/v1/auth/users/me", headers=headers).status_code == 200
+    app.dependency_overrides[get_current_admin_user] = lambda: UserResponse(
+        id=1, email="admin@example.com", username="admin", is_active=True, is_verified=True)
+    try:
+        assert client.post("/api/v1/admin/users/7/deactivate").status_code == 200
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+    assert auth_state["version"] == 1 and auth_state["user"] is None
+    assert client.get("/api/v1/auth/users/me", headers=headers).status_code == 401
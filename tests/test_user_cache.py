@@ -0,0 +1,122 @@
+import asyncio
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from api.routers import auth
+from promptcraft import auth_utils, user_cache
+from promptcraft.database.db_handler import DatabaseHandler
+
+PROFILE = {
+    "id": 7, "email": "cached@example.com", "username": "cached", "full_name": None, "is_active": True,
+    "is_verified": True, "profile_photo_url": None, "profile_photo_ipfs_hash": None,
+    "created_at": "2025-01-01T00:00:00", "token_version": 0,
+}
+
+
+class DictCache:
+    """Stands in for RedisCache: plain values and integer hash fields in dicts."""
+
+    def __init__(self):
+        self.values, self.hashes = {}, {}
+
+    def get_many(self, keys):
+        return {k: self.values[k] for k in keys if k in self.values}
+
+    def set_many(self, mapping, ttl_seconds=300):
+        self.values.update(mapping)
+        return True
+
+    def delete(self, key):
+        self.values.pop(key, None)
+        return True
+
+    @contextmanager
+    def pipeline(self):
+        cache, results = self, []
+
+        class Pipeline:
+            def get(self, key):
+                results.append(cache.values.get(key))
+
+            def hget_int(self, name, field):
+                results.append(cache.hashes.get(name, {}).get(field))
+
+            def hset_int(self, name, field, value, only_if_missing=False):
+                fields = cache.hashes.setdefault(name, {})
+                if not only_if_missing or field not in fields:
+                    fields[field] = value
+        pipe = Pipeline()
+        yield pipe
+        pipe.results = results
+
+
+class FakeConnection:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+    def cursor(self, dictionary=False):
+        conn = self
+        return SimpleNamespace(execute=lambda sql, params=(): None, close=lambda: None,
+                               rowcount=conn.rowcount)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = DictCache()
+    monkeypatch.setattr(user_cache, "_redis_cache", cache)
+    return cache
+
+
+def _handler(monkeypatch, rowcount=1):
+    handler = DatabaseHandler()
+    monkeypatch.setattr(handler, "connect", lambda: FakeConnection(rowcount))
+    monkeypatch.setattr(handler, "close", lambda: None)
+    return handler
+
+
+def test_cached_user_hit_and_miss(cache):
+    assert user_cache.get_cached_user(7) is None
+    user_cache.cache_user(7, {"id": 7, "username": "cached"})
+    assert user_cache.get_cached_user(7) == {"id": 7, "username": "cached"}
+    assert user_cache.get_cached_user(8) is None
+
+
+def test_password_hashes_are_never_cached(cache):
+    with pytest.raises(ValueError):
+        user_cache.cache_user(7, {"id": 7, "hashed_password": "x"})
+    assert cache.values == {}
+
+
+def test_current_user_is_served_from_cache_after_first_lookup(cache, monkeypatch):
+    db_calls = []
+    monkeypatch.setattr(auth.db_handler, "get_user_profile_by_id", lambda user_id: db_calls.append(user_id) or dict(PROFILE))
+    token = auth_utils.create_access_token({"sub": "7", "ver": 0, "active": True, "verified": True})
+    for _ in range(3):
+        assert asyncio.run(auth.get_current_active_user(token)).username == "cached"
+    assert db_calls == [7]
+    assert user_cache.get_auth_state(7) == (0, user_cache.get_cached_user(7))
+    assert "token_version" not in user_cache.get_cached_user(7) # Only the UserResponse projection is cached
+
+
+@pytest.mark.parametrize("change", [
+    lambda handler: handler.update_user(7, full_name="New Name"),
+    lambda handler: handler.set_user_verified(7),
+])
+def test_user_changes_invalidate_the_cached_projection(cache, monkeypatch, change):
+    user_cache.cache_user(7, {"id": 7, "full_name": "Old Name"})
+    assert change(_handler(monkeypatch)) is True
+    assert user_cache.get_cached_user(7) is None
+
+
+def test_unchanged_rows_keep_the_cached_projection(cache, monkeypatch):
+    user_cache.cache_user(7, {"id": 7})
+    assert _handler(monkeypatch, rowcount=0).set_user_verified(7) is False
+    assert user_cache.get_cached_user(7) == {"id": 7}
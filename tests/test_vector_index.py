@@ -0,0 +1,143 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routers import evaluations
+from api.routers.auth import get_current_active_user
+from promptcraft.schemas.auth_schemas import UserResponse
+from promptcraft.similarity.vector_index import SubmissionVectorIndex
+
+USER = UserResponse(id=2, email="r@example.com", username="reviewer", is_active=True, is_verified=True)
+
+PROMPTS = {
+    1: "Write a Python function that returns the factorial of n and raises ValueError for negative n.",
+    2: "Python function computing the factorial of n; raise ValueError when n is negative.",
+    3: "Write a SQL query listing customers with more than three orders last month.",
+    4: "Write a Python function that reverses a linked list in place.",
+}
+
+
+class FakePromptDB:
+    def __init__(self, prompts, question_id=1):
+        self.rows = {i: {"id": i, "question_id": question_id, "prompt": p} for i, p in prompts.items()}
+        self.queries = 0
+
+    def get_submission_prompts(self, after_id, limit, question_id=None):
+        self.queries += 1
+        return [r for i, r in sorted(self.rows.items()) if i > after_id and r["question_id"] == question_id][:limit]
+
+    def get_all_questions(self):
+        return [{"id": 1, "description": "factorial"}]
+
+
+def test_most_similar_prompt_ranks_first(tmp_path):
+    index = SubmissionVectorIndex(FakePromptDB(PROMPTS), directory=str(tmp_path))
+    index.sync(1)
+    matches = index.find_similar({"id": 1, "question_id": 1, "prompt": PROMPTS[1]}, limit=3)
+    assert [m["submission_id"] for m in matches][:2] == [2, 4]
+    assert 1 not in [m["submission_id"] for m in matches]
+    assert matches[0]["similarity"] > 2 * matches[-1]["similarity"]
+
+
+def test_index_grows_incrementally_and_persists(tmp_path):
+    db = FakePromptDB(PROMPTS)
+    assert SubmissionVectorIndex(db, directory=str(tmp_path)).sync(1) == 4
+    db.rows[5] = {"id": 5, "question_id": 1, "prompt": "A factorial function in Python for non-negative n."}
+    # A fresh instance (as after a restart) reuses the files and only appends the new submission
+    reopened = SubmissionVectorIndex(db, directory=str(tmp_path))
+    assert reopened.sync(1) == 1
+    assert len(reopened.index(1)) == 5
+    assert reopened.find_similar({"id": 5, "question_id": 1, "prompt": db.rows[5]["prompt"]})[0]["submission_id"] in (1, 2)
+
+
+def test_sync_picks_up_ids_that_commit_out_of_order(tmp_path):
+    late = {i: p for i, p in PROMPTS.items() if i != 2}
+    db = FakePromptDB(late)
+    index = SubmissionVectorIndex(db, directory=str(tmp_path))
+    assert index.sync(1) == 3
+    db.rows[2] = {"id": 2, "question_id": 1, "prompt": PROMPTS[2]} # Committed after 3 and 4
+    assert index.sync(1) == 1
+    assert index.sync(1) == 0 # Rows already in the overlap window are not appended twice
+    assert sorted(index.index(1).ids_after(0)) == [1, 2, 3, 4] and index.index(1).last_id() == 4
+    matches = index.find_similar({"id": 1, "question_id": 1, "prompt": PROMPTS[1]})
+    assert matches[0]["submission_id"] == 2 and 1 not in [m["submission_id"] for m in matches]
+
+
+def test_rebuild_matches_incremental_ids(tmp_path):
+    db = FakePromptDB(PROMPTS)
+    index = SubmissionVectorIndex(db, directory=str(tmp_path))
+    index.sync(1)
+    assert index.rebuild(batch_size=3) == 4
+    assert index.index(1).last_id() == 4
+    assert index.sync(1) == 0
+
+
+class SlowPromptDB(FakePromptDB):
+    """Holds every query until released, like a database under load."""
+
+    def __init__(self, prompts):
+        super().__init__(prompts)
+        self.release = threading.Event()
+
+    def get_submission_prompts(self, after_id, limit, question_id=None):
+        self.release.wait(5)
+        return super().get_submission_prompts(after_id, limit, question_id)
+
+
+def test_search_does_not_wait_for_the_database(tmp_path):
+    db = SlowPromptDB(PROMPTS)
+    index = SubmissionVectorIndex(db, directory=str(tmp_path))
+    sync = index.schedule_sync(1) # As creating a submission does
+    started = time.monotonic()
+    assert index.find_similar({"id": 1, "question_id": 1, "prompt": PROMPTS[1]}) == []
+    assert time.monotonic() - started < 1
+
+    db.release.set()
+    assert sync.result(5) == 4
+    assert index.find_similar({"id": 1, "question_id": 1, "prompt": PROMPTS[1]})[0]["submission_id"] == 2
+
+
+def test_sync_skips_when_another_writer_holds_the_lock(tmp_path):
+    index = SubmissionVectorIndex(FakePromptDB(PROMPTS), directory=str(tmp_path))
+    with index.index(1).locked():
+        assert index.sync(1, blocking=False) == 0
+    assert index.sync(1, blocking=False) == 4
+
+
+def test_search_sees_rebuilt_rows_with_the_same_count(tmp_path):
+    db = FakePromptDB(PROMPTS)
+    index = SubmissionVectorIndex(db, directory=str(tmp_path))
+    index.sync(1)
+    query = {"id": 99, "question_id": 1, "prompt": "reverse a linked list in place"}
+    assert index.find_similar(query)[0]["submission_id"] == 4
+
+    db.rows = {i: {"id": i, "question_id": 1, "prompt": PROMPTS[5 - i]} for i in PROMPTS}
+    SubmissionVectorIndex(db, directory=str(tmp_path)).rebuild(1) # As rebuild_prompt_index.py would
+    assert index.find_similar(query)[0]["submission_id"] == 1
+
+
+def test_similar_endpoint_returns_scores(monkeypatch, tmp_path):
+    index = SubmissionVectorIndex(FakePromptDB(PROMPTS), directory=str(tmp_path))
+    index.sync(1)
+    summaries = {i: {"id": i, "user_id": 10 + i, "username": f"user{i}", "prompt": p, "created_at": None,
+                     "quality_score": 80.0, "evaluation_count": 1, "average_score": 75.5} for i, p in PROMPTS.items()}
+    monkeypatch.setattr(evaluations, "submission_vector_index", index)
+    monkeypatch.setattr(evaluations.db_handler, "get_submission_by_id",
+                        lambda submission_id: {"id": 1, "user_id": 11, "question_id": 1, "prompt": PROMPTS[1]}
+                        if submission_id == 1 else None)
+    monkeypatch.setattr(evaluations.db_handler, "get_submission_evaluation_summaries",
+                        lambda ids: {i: summaries[i] for i in ids})
+    app.dependency_overrides[get_current_active_user] = lambda: USER
+    try:
+        with TestClient(app) as client:
+            response = client.get("/api/v1/evaluations/similar/1?limit=2")
+            missing = client.get("/api/v1/evaluations/similar/99")
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
+
+    assert response.status_code == 200
+    [best, _] = response.json()["matches"]
+    assert best["submission_id"] == 2 and best["username"] == "user2" and best["average_score"] == 75.5
+    assert missing.status_code == 404